@@ -1,3 +1,28 @@
-"""依赖注入模块占位。"""
+"""依赖注入模块。"""
 
+from typing import Optional
 
+from fastapi import Header, HTTPException, status
+
+from ..core.config import settings
+from ..core.security import admin_enabled, extract_bearer_token, verify_admin_token
+
+
+async def require_admin(
+    authorization: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
+) -> None:
+    """
+    管理接口鉴权：令牌通过 Authorization: Bearer <token> 或 X-Admin-Token 头传入。
+    未配置 security.admin_token（或环境变量 ADMIN_TOKEN）时管理接口整体关闭，返回 404。
+    """
+    admin_token = settings.security.ADMIN_TOKEN
+    if not admin_enabled(admin_token):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    token = extract_bearer_token(authorization) or x_admin_token
+    if not verify_admin_token(token, admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="管理员令牌无效",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
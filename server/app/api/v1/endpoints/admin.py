@@ -0,0 +1,162 @@
+"""管理端点（需管理员令牌）：线上按需性能剖析、内存诊断与热重载。"""
+
+import asyncio
+import time
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+
+from ...dependencies import require_admin
+from ....services.hot_reload import get_hot_reloader
+from ....services.memory import get_memory_monitor
+from ....services.model_registry import ModelsNotReady
+from ....services.profiler import (
+    MAX_PIPELINE_EXECUTIONS,
+    MAX_PIPELINE_TIMEOUT,
+    MAX_SAMPLE_DURATION,
+    MAX_SAMPLE_RATE,
+    ProfilerBusy,
+    get_profiler,
+)
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/profile/status", summary="剖析任务状态")
+async def profile_status() -> dict:
+    return get_profiler().status()
+
+
+@router.post("/profile/sample", summary="栈采样（collapsed-stack）")
+async def profile_sample(
+    duration: float = Query(10.0, gt=0, le=MAX_SAMPLE_DURATION, description="采样时长（秒）"),
+    rate: float = Query(100.0, gt=0, le=MAX_SAMPLE_RATE, description="采样频率（Hz）"),
+) -> PlainTextResponse:
+    """
+    在限定时长内按固定频率采集所有线程的调用栈，返回 collapsed-stack 文本，
+    可用 flamegraph.pl 或 speedscope 离线渲染为火焰图
+    """
+    try:
+        sampler = await get_profiler().sample_stacks(duration, rate)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    filename = time.strftime("stacks-%Y%m%d-%H%M%S.collapsed")
+    return PlainTextResponse(
+        sampler.collapsed(),
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Profile-Samples": str(sampler.samples),
+            "X-Profile-Overruns": str(sampler.overruns),
+        },
+    )
+
+
+@router.post("/profile/pipeline", summary="cProfile 剖析接下来的 N 次流水线执行")
+async def profile_pipeline(
+    executions: int = Query(10, ge=1, le=MAX_PIPELINE_EXECUTIONS, description="剖析的流水线执行次数"),
+    timeout: float = Query(60.0, gt=0, le=MAX_PIPELINE_TIMEOUT, description="等待执行的最长时间（秒）"),
+    format: str = Query("pstats", pattern="^(pstats|text)$", description="pstats：二进制文件；text：按累计耗时排序的文本"),
+    sort: str = Query("cumulative", description="text 格式的排序字段（pstats 排序键）"),
+) -> Response:
+    """
+    用 cProfile 包裹接下来的 N 次图像/视频帧处理，超时后返回已完成部分的结果。
+    pstats 文件可用 `python -m pstats` 或 snakeviz 查看
+    """
+    try:
+        capture = await get_profiler().profile_pipeline(executions, timeout)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    headers = {
+        "X-Profile-Executions": str(capture.completed),
+        "X-Profile-Requested": str(capture.executions),
+    }
+    if format == "text":
+        try:
+            return PlainTextResponse(capture.text(sort=sort), headers=headers)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"不支持的排序字段: {sort}")
+    filename = time.strftime("pipeline-%Y%m%d-%H%M%S.pstats")
+    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return Response(capture.pstats_bytes(), media_type="application/octet-stream", headers=headers)
+
+
+@router.get("/memory", summary="内存概况")
+async def memory_report(
+    top: int = Query(20, ge=0, le=500, description="按近似内存排序返回的会话数"),
+    history: int = Query(60, ge=0, le=10000, description="返回最近的周期采样点数"),
+) -> dict:
+    """当前 RSS/堆、增长趋势、tracemalloc 状态与各会话的近似内存归属"""
+    return get_memory_monitor().report(top_sessions=top, history=history)
+
+
+@router.get("/memory/snapshots", summary="tracemalloc 快照列表")
+async def memory_snapshots() -> dict:
+    return get_memory_monitor().tracemalloc_status()
+
+
+@router.post("/memory/snapshots", summary="拍摄 tracemalloc 快照")
+async def memory_take_snapshot(label: str = Query("", max_length=64, description="快照备注")) -> dict:
+    """
+    未开启 tracemalloc 时先开启（之前的分配不会被记录，且开启期间有额外的 CPU 与内存开销），
+    典型用法：拍一次快照作为基准，运行一段时间后调用 /memory/diff 对比
+    """
+    return await asyncio.to_thread(get_memory_monitor().take_snapshot, label)
+
+
+@router.get("/memory/snapshots/{snapshot_id}", summary="快照中分配最多的位置")
+async def memory_snapshot_top(
+    snapshot_id: int,
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(30, ge=1, le=500),
+) -> dict:
+    try:
+        top = await asyncio.to_thread(get_memory_monitor().top, snapshot_id, group_by, limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    return {"id": snapshot_id, "group_by": group_by, "top": top}
+
+
+@router.get("/memory/diff", summary="对比两个 tracemalloc 快照")
+async def memory_diff(
+    base: int = Query(..., description="基准快照 ID"),
+    target: Optional[int] = Query(None, description="目标快照 ID，缺省时现拍一个"),
+    group_by: str = Query("lineno", pattern="^(lineno|filename|traceback)$"),
+    limit: int = Query(30, ge=1, le=500),
+) -> dict:
+    """按分配增长量排序，列出 base 到 target 之间增长最多的代码位置"""
+    try:
+        return await asyncio.to_thread(get_memory_monitor().diff, base, target, group_by, limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+
+
+@router.delete("/memory/snapshots", summary="关闭 tracemalloc 并清空快照")
+async def memory_stop_tracing() -> dict:
+    get_memory_monitor().stop_tracing()
+    return get_memory_monitor().tracemalloc_status()
+
+
+@router.get("/reload", summary="热重载状态")
+async def reload_status() -> dict:
+    return get_hot_reloader().status()
+
+
+@router.post("/reload", summary="热重载配置、提示词与模型")
+async def reload(
+    models: str = Query(
+        "auto",
+        pattern="^(auto|all|vision|language|none)$",
+        description="模型重建范围：auto 按变化的配置 / 文件决定，all / vision / language 强制重建，none 只重新加载配置与提示词",
+    ),
+) -> dict:
+    """
+    重新读取 app.yaml 的 vision / language / model_cache 段与提示词，在后台新建并预热需要重建的模型后原子切换；
+    连接不断开，切换前开始的请求在旧实例上完成。重建失败时返回 500，当前模型继续服务
+    """
+    try:
+        return await get_hot_reloader().reload(models=models)
+    except ModelsNotReady as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"热重载失败，继续使用当前模型: {type(e).__name__}: {e}")
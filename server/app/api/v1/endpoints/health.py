@@ -1,14 +1,17 @@
-"""健康检查端点。"""
+"""健康检查端点：存活（live）、就绪（ready）与深度检查（deep）。"""
 
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from datetime import datetime
 
+from ....services.health import get_health_service
+
 router = APIRouter()
 
 
 @router.get("/health", summary="健康检查")
 async def health_check() -> dict:
-    """健康检查端点，用于测试服务器连接。"""
+    """健康检查端点，用于测试服务器连接（等同于存活检查，保持向后兼容）。"""
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
@@ -17,3 +20,28 @@ async def health_check() -> dict:
     }
 
 
+@router.get("/health/live", summary="存活检查")
+async def liveness() -> dict:
+    """进程与事件循环可响应即返回 200，供容器编排判断是否需要重启。"""
+    return get_health_service().liveness()
+
+
+@router.get("/health/ready", summary="就绪检查")
+async def readiness() -> JSONResponse:
+    """
+    模型已加载预热且未饱和时返回 200（语言后端异常时 status 为 degraded，仍返回 200），
+    否则返回 503，负载均衡器据此把流量路由到其他实例。附带 ORT 执行提供方与各阶段最近 p50/p95 耗时。
+    只读内存状态，开销很小；语言后端可达性取缓存的探测结果，过期时在后台刷新
+    """
+    ready, report = get_health_service().readiness()
+    return JSONResponse(report, status_code=200 if ready else 503)
+
+
+@router.get("/health/deep", summary="深度健康检查")
+async def deep_health() -> JSONResponse:
+    """
+    等待语言后端探测结果（按 health.probe_interval 缓存，过期时当场探测），
+    并返回各模型状态、预热报告、熔断器详情与各阶段最近 p50/p95 耗时
+    """
+    ready, report = await get_health_service().deep()
+    return JSONResponse(report, status_code=200 if ready else 503)
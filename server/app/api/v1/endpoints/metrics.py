@@ -0,0 +1,55 @@
+"""指标端点（Prometheus 文本格式）。"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ....core.metrics import get_metrics_registry
+from ....services.admission import get_admission_controller
+from ....services.websocket_manager import get_ws_manager
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _register_runtime_metrics() -> None:
+    """连接数、队列深度等运行时状态在抓取时直接从各组件读取，不占用热路径"""
+    registry = get_metrics_registry()
+    ws_manager = get_ws_manager()
+    admission = get_admission_controller()
+
+    registry.gauge(
+        "seeforme_active_sessions", "当前活跃的 WebSocket 连接数", ["endpoint"]
+    ).set_function(lambda: {(endpoint,): count for endpoint, count in ws_manager.snapshot()["by_endpoint"].items()})
+
+    registry.gauge(
+        "seeforme_queue_depth", "各队列当前深度", ["queue"]
+    ).set_function(lambda: {
+        ("admission_in_flight",): admission.in_flight,
+        ("admission_waiting",): admission.waiting,
+        ("ws_send_queue",): ws_manager.snapshot()["queued"],
+    })
+
+    registry.counter(
+        "seeforme_admission_total", "准入控制结果计数", ["result"]
+    ).set_function(lambda: {
+        ("admitted",): admission.total_admitted,
+        ("rejected",): admission.total_rejected,
+    })
+
+    registry.counter(
+        "seeforme_ws_connections_total", "WebSocket 连接结果计数", ["result"]
+    ).set_function(lambda: {
+        ("accepted",): ws_manager.total_accepted,
+        ("rejected",): ws_manager.total_rejected,
+        ("evicted",): ws_manager.total_evicted,
+    })
+
+
+_register_runtime_metrics()
+
+
+@router.get("/metrics", summary="Prometheus 指标", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """各阶段耗时直方图、回退/缓存计数、连接数与队列深度（Prometheus 文本格式）"""
+    return PlainTextResponse(get_metrics_registry().render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,74 @@
+"""视觉批量描述端点（HTTP）。"""
+
+import json
+import logging
+import uuid
+from typing import List
+
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+
+from ....core.config import settings
+from ....services.admission import get_admission_controller
+from ....services.model_registry import get_model_registry, ModelsNotReady
+from ....services.vision_service import get_vision_service
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+
+@router.post("/vision/describe", summary="批量图像描述（NDJSON 流式返回）")
+async def describe_images(files: List[UploadFile] = File(...)) -> StreamingResponse:
+    """
+    接收一张或多张图像（multipart/form-data，字段名 files），
+    使用与 WebSocket 相同的共享模型批量推理，并按完成顺序以 NDJSON 逐行返回结果。
+
+    每行一个 JSON 对象：
+    - {"type": "final_result", "index": 0, "filename": "a.jpg", "content": "...", ...}
+    - {"type": "error", "index": 1, "filename": "b.jpg", "code": "INVALID_IMAGE", "content": "..."}
+    """
+    max_images = settings.vision.BATCH_MAX_IMAGES
+    if len(files) > max_images:
+        raise HTTPException(status_code=413, detail=f"单次最多上传 {max_images} 张图像")
+
+    # 准入控制已饱和时直接拒绝，避免读取大量上传数据后再排队
+    admission = get_admission_controller()
+    if admission.is_saturated():
+        raise HTTPException(
+            status_code=503,
+            detail="服务器繁忙，请稍后重试",
+            headers={"Retry-After": "1"},
+        )
+
+    # 模型仍在后台加载时短暂等待，超时返回 503
+    try:
+        await get_model_registry().wait_until_serving()
+    except ModelsNotReady as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"{e}，请稍后重试",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))},
+        )
+
+    # 在返回流式响应之前读完上传内容（响应开始后上传文件可能已被关闭）
+    images = []
+    for upload in files:
+        images.append((upload.filename or "", await upload.read()))
+
+    session_id = f"http_{uuid.uuid4().hex[:12]}"
+    logger.info(f"批量描述请求 [{session_id}]: {len(images)} 张图像")
+    vision_service = get_vision_service()
+
+    async def ndjson_stream():
+        async for result in vision_service.describe_batch(
+            images,
+            session_id,
+            batch_size=settings.vision.BATCH_SIZE,
+        ):
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        ndjson_stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Session-Id": session_id},
+    )
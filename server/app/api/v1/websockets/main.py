@@ -2,17 +2,34 @@
 
 import json
 import logging
+import time
 from typing import Optional
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from datetime import datetime
 
-from ....services.websocket_manager import WebSocketManager
+from ....services.websocket_manager import get_ws_manager, ConnectionLimitExceeded
+from ....services.admission import get_admission_controller, AdmissionRejected
+from ....services.model_registry import get_model_registry, ModelsNotReady
+from ....services.session_options import InvalidSessionOptions, configure_connection
+from ....services import memory
+from ....core import tracing
+from ....core.metrics import stage
+from ....utils.logger import log_extra
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# 全局 WebSocket 管理器实例
-ws_manager = WebSocketManager()
+# 全局 WebSocket 管理器实例（与 /ws/vision 共用）
+ws_manager = get_ws_manager()
+
+# 全局准入控制器（与 /ws/vision、HTTP 批量接口共用）
+admission = get_admission_controller()
+
+# 共享模型注册表（模型在后台加载，就绪前图像短暂等待）
+models = get_model_registry()
+
+_RECEIVE = stage("receive")
+_BASE64_DECODE = stage("base64_decode")
 
 
 @router.websocket("/ws")
@@ -23,6 +40,8 @@ async def main_ws_endpoint(websocket: WebSocket) -> None:
     支持的消息格式：
     - 客户端发送：{"eventType": "image_data", "data": {...}, "sessionId": "xxx"}
     - 服务器响应：{"eventType": "result", "data": {...}, "sessionId": "xxx"}
+    - 会话参数协商：{"eventType": "configure", "data": {"template": "concise", "maxDetections": 3, ...}}，
+      服务器回复 {"eventType": "configured", "data": {"options": {...}}}（见 services/session_options.py）
     """
     # 获取客户端信息
     client_host = websocket.client.host if websocket.client else "unknown"
@@ -34,28 +53,34 @@ async def main_ws_endpoint(websocket: WebSocket) -> None:
     # 生成客户端 ID
     client_id = f"client_{datetime.now().timestamp()}"
     
-    # 输出连接信息
-    print("=" * 60)
-    print(f"🔌 WebSocket 客户端连接建立")
-    print(f"   客户端 ID: {client_id}")
-    print(f"   来源地址: {client_host}:{client_port}")
-    print(f"   连接时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"   端点路径: /ws")
-    print("=" * 60)
-    logger.info(f"WebSocket 客户端连接: {client_id} (来自 {client_host}:{client_port})")
+    logger.info(
+        f"WebSocket 客户端连接: {client_id} (来自 {client_host}:{client_port})",
+        extra=log_extra(client_id=client_id, endpoint="/ws"),
+    )
     
     try:
-        # 注册连接
-        await ws_manager.connect(client_id, websocket)
+        # 注册连接（超过连接上限时拒绝）
+        try:
+            conn = await ws_manager.connect(client_id, websocket, endpoint="/ws")
+        except ConnectionLimitExceeded as e:
+            logger.warning(f"拒绝 WebSocket 连接 {client_id}: {e}")
+            await websocket.send_json({
+                "eventType": "error",
+                "data": {
+                    "message": "服务器繁忙，请稍后重试"
+                },
+                "timestamp": datetime.now().isoformat()
+            })
+            await websocket.close(code=1013, reason="too many connections")
+            return
         
         # 获取当前连接数
         active_connections = len(ws_manager.active_connections)
         
-        print(f"✅ 连接已注册 | 当前活跃连接数: {active_connections}")
         logger.info(f"WebSocket 连接已注册: {client_id} | 当前活跃连接: {active_connections}")
         
         # 发送连接成功消息
-        await websocket.send_json({
+        await conn.send_json({
             "eventType": "connected",
             "data": {
                 "clientId": client_id,
@@ -69,22 +94,46 @@ async def main_ws_endpoint(websocket: WebSocket) -> None:
         while True:
             # 接收消息
             data = await websocket.receive_text()
+            received_ns = time.time_ns()
+            conn.record_frame_in(len(data))
             
             try:
-                message = json.loads(data)
+                with _RECEIVE.time():
+                    message = json.loads(data)
                 event_type = message.get("eventType", "unknown")
-                print(f"📨 收到消息 [{client_id[:20]}...] | 类型: {event_type}")
-                logger.info(f"收到消息 [{client_id}]: {event_type}")
+                logger.info(f"收到消息 [{client_id}]: {event_type}", extra=log_extra(per_frame=True, client_id=client_id))
                 
                 # 处理不同类型的消息
                 if event_type == "ping" or event_type == "heartbeat":
                     # 心跳检测（支持 ping 和 heartbeat）
-                    await websocket.send_json({
+                    await conn.send_json({
                         "eventType": "pong",
                         "data": {},
                         "timestamp": datetime.now().isoformat()
                     })
                 
+                elif event_type == "configure":
+                    # 会话参数协商：校验后缓存在连接上，之后每帧直接使用
+                    try:
+                        options = configure_connection(conn, message.get("data", {}))
+                    except InvalidSessionOptions as e:
+                        await conn.send_json({
+                            "eventType": "error",
+                            "data": {
+                                "message": str(e),
+                                "code": e.code
+                            },
+                            "timestamp": datetime.now().isoformat()
+                        })
+                    else:
+                        await conn.send_json({
+                            "eventType": "configured",
+                            "data": {
+                                "options": options.to_dict(camel=True)
+                            },
+                            "timestamp": datetime.now().isoformat()
+                        })
+                
                 elif event_type == "image_data" or event_type == "image_analysis":
                     # 图像数据处理（支持两种消息格式：image_data 和 image_analysis）
                     session_id = message.get("sessionId", message.get("data", {}).get("sessionId", "unknown"))
@@ -92,16 +141,26 @@ async def main_ws_endpoint(websocket: WebSocket) -> None:
                     # 支持两种数据字段格式：data.image 和 data.imageData
                     image_data_base64 = data_obj.get("image") or data_obj.get("imageData", "")
                     
-                    print(f"🖼️  收到图像数据 [{client_id[:20]}...] | 会话: {session_id}")
-                    logger.info(f"收到图像数据 [{client_id}]: session={session_id}, eventType={event_type}")
+                    logger.info(
+                        f"收到图像数据 [{client_id}]: eventType={event_type}",
+                        extra=log_extra(session_id, per_frame=True, client_id=client_id),
+                    )
                     
+                    # 每帧一条 trace，从收到消息时开始计时（包含 JSON 解析），trace_id 在 final_result 中回传
+                    frame_trace = tracing.start_trace(
+                        "frame", session_id=session_id, start_ns=received_ns,
+                        endpoint="/ws", client_id=client_id, message_bytes=len(data),
+                    )
+                    process_start = time.monotonic()
+                    frame_memory = memory.begin_frame(conn, len(data))
                     try:
                         # 导入视觉服务
-                        from ....services.vision_service import VisionService
+                        from ....services.vision_service import get_vision_service
                         import base64
                         
-                        # 创建视觉服务实例（可以优化为单例）
-                        vision_service = VisionService()
+                        # 使用共享视觉服务（模型只加载一次；后台加载未完成时短暂等待）
+                        await models.wait_until_serving()
+                        vision_service = get_vision_service()
                         
                         # 解码 base64 图像数据
                         if image_data_base64:
@@ -109,10 +168,13 @@ async def main_ws_endpoint(websocket: WebSocket) -> None:
                             if ',' in image_data_base64:
                                 image_data_base64 = image_data_base64.split(',')[1]
                             
-                            image_bytes = base64.b64decode(image_data_base64)
+                            with _BASE64_DECODE.time(), tracing.span("base64_decode"):
+                                image_bytes = base64.b64decode(image_data_base64)
+                            frame_trace.set_attribute("image_bytes", len(image_bytes))
+                            memory.note_allocation("image_bytes", len(image_bytes))
                             
                             # 发送处理中消息
-                            await websocket.send_json({
+                            await conn.send_json({
                                 "eventType": "processing",
                                 "data": {
                                     "message": "正在处理图像...",
@@ -121,49 +183,60 @@ async def main_ws_endpoint(websocket: WebSocket) -> None:
                                 "timestamp": datetime.now().isoformat()
                             })
                             
-                            # 流式处理图像
-                            async for result in vision_service.process_image_stream(image_bytes, session_id):
-                                result_type = result.get("type")
+                            # 流式处理图像（受准入控制，超出并发与排队上限时快速拒绝）
+                            async with admission.slot():
+                                async for result in vision_service.process_image_stream(
+                                    image_bytes, session_id, options=conn.options, tracker=conn.tracker
+                                ):
+                                    result_type = result.get("type")
                                 
-                                if result_type == "text_stream":
-                                    # 流式文本结果
-                                    await websocket.send_json({
-                                        "eventType": "text_stream",
-                                        "data": {
-                                            "content": result.get("content", ""),
-                                            "is_final": result.get("is_final", False),
-                                            "sessionId": session_id
-                                        },
-                                        "timestamp": datetime.now().isoformat()
-                                    })
+                                    if result_type == "text_stream":
+                                        # 流式文本结果
+                                        await conn.send_json({
+                                            "eventType": "text_stream",
+                                            "data": {
+                                                "content": result.get("content", ""),
+                                                "is_final": result.get("is_final", False),
+                                                "sessionId": session_id
+                                            },
+                                            "timestamp": datetime.now().isoformat()
+                                        })
                                 
-                                elif result_type == "final_result":
-                                    # 最终结果
-                                    await websocket.send_json({
-                                        "eventType": "final_result",
-                                        "data": {
+                                    elif result_type == "final_result":
+                                        # 最终结果
+                                        payload = {
                                             "text": result.get("content", ""),
                                             "sessionId": session_id,
                                             "vision_time": result.get("vision_time", 0),
                                             "total_time": result.get("total_time", 0),
-                                            "detection_count": result.get("detection_count", 0)
-                                        },
-                                        "timestamp": datetime.now().isoformat()
-                                    })
+                                            "detection_count": result.get("detection_count", 0),
+                                            "traceId": frame_trace.trace_id
+                                        }
+                                        if "changes" in result:
+                                            # 开启跟踪的会话：画面是否无变化，以及新出现 / 离开的 track_id
+                                            payload["unchanged"] = result["unchanged"]
+                                            payload["changes"] = result["changes"]
+                                        await conn.send_json({
+                                            "eventType": "final_result",
+                                            "data": payload,
+                                            "timestamp": datetime.now().isoformat()
+                                        })
                                 
-                                elif result_type == "error":
-                                    # 错误结果
-                                    await websocket.send_json({
-                                        "eventType": "error",
-                                        "data": {
-                                            "message": result.get("content", "处理失败"),
-                                            "sessionId": session_id
-                                        },
-                                        "timestamp": datetime.now().isoformat()
-                                    })
+                                    elif result_type == "error":
+                                        # 错误结果
+                                        frame_trace.set_error(result.get("code") or result.get("content", "处理失败"))
+                                        await conn.send_json({
+                                            "eventType": "error",
+                                            "data": {
+                                                "message": result.get("content", "处理失败"),
+                                                "sessionId": session_id
+                                            },
+                                            "timestamp": datetime.now().isoformat()
+                                        })
                         else:
                             # 没有图像数据
-                            await websocket.send_json({
+                            frame_trace.set_error("未提供图像数据")
+                            await conn.send_json({
                                 "eventType": "error",
                                 "data": {
                                     "message": "未提供图像数据",
@@ -172,9 +245,36 @@ async def main_ws_endpoint(websocket: WebSocket) -> None:
                                 "timestamp": datetime.now().isoformat()
                             })
                     
+                    except ModelsNotReady as e:
+                        conn.record_drop()
+                        frame_trace.set_error(f"{e.code}: {e}")
+                        await conn.send_json({
+                            "eventType": "error",
+                            "data": {
+                                "message": f"{e}，请稍后重试",
+                                "code": e.code,
+                                "retryAfter": round(e.retry_after, 1),
+                                "sessionId": session_id
+                            },
+                            "timestamp": datetime.now().isoformat()
+                        })
+                    except AdmissionRejected as e:
+                        conn.record_drop()
+                        frame_trace.set_error(f"OVERLOADED: {e}")
+                        logger.warning(f"图像处理被拒绝 [{client_id}]: {e}")
+                        await conn.send_json({
+                            "eventType": "error",
+                            "data": {
+                                "message": "服务器繁忙，请稍后重试",
+                                "code": "OVERLOADED",
+                                "sessionId": session_id
+                            },
+                            "timestamp": datetime.now().isoformat()
+                        })
                     except Exception as e:
+                        frame_trace.set_error(f"{type(e).__name__}: {e}")
                         logger.error(f"图像处理错误 [{client_id}]: {e}", exc_info=True)
-                        await websocket.send_json({
+                        await conn.send_json({
                             "eventType": "error",
                             "data": {
                                 "message": f"处理失败: {str(e)}",
@@ -182,11 +282,15 @@ async def main_ws_endpoint(websocket: WebSocket) -> None:
                             },
                             "timestamp": datetime.now().isoformat()
                         })
+                    finally:
+                        conn.record_processing(time.monotonic() - process_start)
+                        memory.end_frame(conn, frame_memory)
+                        frame_trace.end()
                 
                 else:
                     # 未知消息类型
                     logger.warning(f"未知消息类型 [{client_id}]: {event_type}")
-                    await websocket.send_json({
+                    await conn.send_json({
                         "eventType": "error",
                         "data": {
                             "message": f"未知的消息类型: {event_type}"
@@ -196,7 +300,7 @@ async def main_ws_endpoint(websocket: WebSocket) -> None:
                     
             except json.JSONDecodeError:
                 logger.error(f"无效的 JSON 消息 [{client_id}]: {data}")
-                await websocket.send_json({
+                await conn.send_json({
                     "eventType": "error",
                     "data": {
                         "message": "无效的 JSON 格式"
@@ -205,19 +309,12 @@ async def main_ws_endpoint(websocket: WebSocket) -> None:
                 })
                 
     except WebSocketDisconnect:
-        print("=" * 60)
-        print(f"🔌 WebSocket 客户端断开连接")
-        print(f"   客户端 ID: {client_id}")
-        print(f"   断开时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print("=" * 60)
         logger.info(f"WebSocket 客户端断开连接: {client_id}")
     except Exception as e:
-        print(f"❌ WebSocket 错误 [{client_id[:20]}...]: {str(e)}")
         logger.error(f"WebSocket 错误 [{client_id}]: {str(e)}", exc_info=True)
     finally:
         # 清理连接
         await ws_manager.disconnect(client_id)
         active_connections = len(ws_manager.active_connections)
-        print(f"🧹 连接已清理 | 剩余活跃连接数: {active_connections}")
         logger.info(f"WebSocket 连接已清理: {client_id} | 剩余活跃连接: {active_connections}")
 
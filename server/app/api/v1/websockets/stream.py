@@ -0,0 +1,271 @@
+"""
+连续视频流 WebSocket 端点（实时引导模式）
+客户端持续推送 MJPEG 帧或 H.264 分片，服务端自适应抽帧并返回描述结果
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from ....services.vision_service import get_vision_service
+from ....services.websocket_manager import get_ws_manager, ConnectionLimitExceeded, ManagedConnection
+from ....services.admission import get_admission_controller, AdmissionRejected
+from ....services.model_registry import get_model_registry, ModelsNotReady
+from ....services import memory
+from ....services.video_ingest import AdaptiveSampler, VideoStreamSession, SampledFrame, STREAM_FORMATS
+from ....services.session_options import apply_session_options, stream_options
+from ....core import tracing
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+# 全局 WebSocket 管理器实例（与 /ws、/ws/vision 共用）
+ws_manager = get_ws_manager()
+
+# 全局准入控制器（与 /ws、/ws/vision、HTTP 批量接口共用）
+admission = get_admission_controller()
+
+
+def _admission_load() -> float:
+    """当前推理负载占比（0~1），用于调节抽帧间隔"""
+    return admission.in_flight / admission.max_concurrent
+
+
+@router.websocket("/ws/vision/stream/{session_id}")
+async def vision_stream_endpoint(websocket: WebSocket, session_id: str, format: str = "auto") -> None:
+    """
+    连续视频流端点
+
+    - URL 参数 format：auto（默认，按首个分片自动识别）/ mjpeg / h264
+    - 二进制消息：视频数据（MJPEG 帧可任意切分；H.264 为 Annex-B 裸流或 MPEG-TS 等可流式读取的容器）
+    - 文本消息：{"type": "end"} 结束推流（处理完剩余帧后返回统计并关闭），{"type": "stats"} 查询统计
+
+    服务端按画面变化与推理负载抽帧，结果格式与 /ws/vision 相同，并附带 frame_index / motion / reason；
+    默认开启多目标跟踪并只描述新出现 / 离开的物体，画面内物体没有变化时 final_result 的 content 为空、unchanged 为 true；
+    服务器繁忙时直接跳过当前帧，不排队。
+    """
+    client_host = websocket.client.host if websocket.client else "unknown"
+    client_port = websocket.client.port if websocket.client else "unknown"
+
+    await websocket.accept()
+
+    if format not in STREAM_FORMATS:
+        await websocket.send_json({
+            "type": "error",
+            "session_id": session_id,
+            "content": f"不支持的视频流格式: {format}（可选: {', '.join(STREAM_FORMATS)}）",
+            "timestamp": datetime.now().isoformat()
+        })
+        await websocket.close(code=1003, reason="unsupported format")
+        return
+
+    logger.info(f"视频流 WebSocket 连接: session={session_id} format={format} (来自 {client_host}:{client_port})")
+
+    client_id = f"stream_{session_id}_{datetime.now().timestamp()}"
+    try:
+        conn = await ws_manager.connect(client_id, websocket, endpoint="/ws/vision/stream", session_id=session_id)
+    except ConnectionLimitExceeded as e:
+        logger.warning(f"拒绝视频流 WebSocket 连接 session={session_id}: {e}")
+        await websocket.send_json({
+            "type": "error",
+            "session_id": session_id,
+            "content": "服务器繁忙，请稍后重试",
+            "timestamp": datetime.now().isoformat()
+        })
+        await websocket.close(code=1013, reason="too many connections")
+        return
+
+    stream = VideoStreamSession(
+        session_id,
+        stream_format=format,
+        sampler=AdaptiveSampler(load_fn=_admission_load),
+    )
+    conn.attach(stream)
+    # 连续画面默认开启跟踪并只描述变化（app.yaml 的 tracking.stream / stream_changes_only）
+    apply_session_options(conn, stream_options())
+    processor = asyncio.create_task(_process_frames(conn, stream, session_id))
+
+    await conn.send_json({
+        "type": "stream_started",
+        "session_id": session_id,
+        "format": format,
+        "timestamp": datetime.now().isoformat()
+    })
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes") is not None:
+                chunk = message["bytes"]
+                conn.record_frame_in(len(chunk))
+                if not stream.feed(chunk):
+                    conn.record_drop()
+                continue
+
+            text = message.get("text") or ""
+            conn.record_frame_in(len(text))
+            try:
+                control = json.loads(text)
+            except json.JSONDecodeError:
+                control = {}
+            control_type = control.get("type") if isinstance(control, dict) else None
+
+            if control_type == "end":
+                stream.end()
+                await processor
+                await conn.send_json(_stats_message(stream, session_id))
+                await conn.close(code=1000, reason="stream ended")
+                break
+            elif control_type == "stats":
+                await conn.send_json(_stats_message(stream, session_id))
+            else:
+                await conn.send_json({
+                    "type": "error",
+                    "session_id": session_id,
+                    "content": "视频数据请以二进制消息发送；控制消息支持 {\"type\": \"end\"} / {\"type\": \"stats\"}",
+                    "timestamp": datetime.now().isoformat()
+                })
+
+    except WebSocketDisconnect:
+        logger.info(f"视频流 WebSocket 断开连接: session={session_id}")
+    except Exception as e:
+        logger.error(f"视频流 WebSocket 错误 [{session_id}]: {e}", exc_info=True)
+    finally:
+        if not processor.done():
+            processor.cancel()
+        # 等待解码线程退出（可能短暂阻塞，放到线程池中）
+        await asyncio.to_thread(stream.close)
+        await ws_manager.disconnect(client_id)
+        stats = stream.stats()
+        logger.info(f"视频流 WebSocket 连接已清理: session={session_id} | {stats}")
+
+
+async def _process_frames(conn: ManagedConnection, stream: VideoStreamSession, session_id: str) -> None:
+    """逐个处理抽中的帧；推理期间到达的新帧只保留最新一帧"""
+    models = get_model_registry()
+    warming_notified = False
+    while True:
+        frame = await stream.next_frame()
+        if frame is None:
+            break
+
+        process_start = time.monotonic()
+        # 每个抽中的帧一条 trace，从解码出该帧时开始计时（包含等待推理的时间）
+        frame_trace = tracing.start_trace(
+            "frame", session_id=session_id,
+            start_ns=time.time_ns() - int((process_start - frame.captured_at) * 1e9),
+            endpoint="/ws/vision/stream", frame_index=frame.frame_index, reason=frame.reason,
+        )
+        frame_memory = memory.begin_frame(conn, frame.image.nbytes)
+        try:
+            # 模型未就绪时不等待：跳过该帧，只在首次跳过时通知客户端
+            await models.wait_until_serving(timeout=0)
+            vision_service = get_vision_service()
+            # 不排队：实时画面等待后已过期，繁忙时跳过该帧，由后续帧补上
+            async with admission.slot(timeout=0):
+                async for result in vision_service.process_frame_stream(
+                    frame.image, session_id, options=conn.options, tracker=conn.tracker
+                ):
+                    message = _to_client_message(result, session_id, frame, frame_trace.trace_id)
+                    if message is not None:
+                        await conn.send_json(message)
+            stream.sampler.record_latency(time.monotonic() - process_start)
+        except ModelsNotReady as e:
+            conn.record_drop()
+            frame_trace.set_attribute("skipped", True)
+            if not warming_notified:
+                warming_notified = True
+                await conn.send_json({
+                    "type": "error",
+                    "session_id": session_id,
+                    "frame_index": frame.frame_index,
+                    "code": e.code,
+                    "content": f"{e}，就绪前的画面将被跳过",
+                    "retry_after": round(e.retry_after, 1),
+                    "timestamp": datetime.now().isoformat()
+                })
+        except AdmissionRejected:
+            conn.record_drop()
+            # 跳帧是正常的削峰行为，不视为错误
+            frame_trace.set_attribute("skipped", True)
+            logger.debug(f"服务器繁忙，跳过视频帧 [{session_id}] #{frame.frame_index}")
+        except Exception as e:
+            frame_trace.set_error(f"{type(e).__name__}: {e}")
+            logger.error(f"视频帧处理失败 [{session_id}] #{frame.frame_index}: {e}", exc_info=True)
+            await conn.send_json({
+                "type": "error",
+                "session_id": session_id,
+                "frame_index": frame.frame_index,
+                "content": f"处理失败: {str(e)}",
+                "timestamp": datetime.now().isoformat()
+            })
+        finally:
+            conn.record_processing(time.monotonic() - process_start)
+            memory.end_frame(conn, frame_memory)
+            frame_trace.end()
+
+    if stream.error:
+        await conn.send_json({
+            "type": "error",
+            "session_id": session_id,
+            "code": "DECODE_FAILURE",
+            "content": stream.error,
+            "timestamp": datetime.now().isoformat()
+        })
+
+
+def _to_client_message(
+    result: Dict[str, Any], session_id: str, frame: SampledFrame, trace_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """流水线结果 -> 客户端消息（与 /ws/vision 格式一致，附带帧信息）"""
+    result_type = result.get("type")
+    frame_info = {
+        "frame_index": frame.frame_index,
+        "motion": round(frame.motion, 4),
+        "reason": frame.reason,
+    }
+    if result_type == "vision_result":
+        message = {"type": "vision_result", "data": result.get("data", {})}
+    elif result_type == "text_stream":
+        message = {
+            "type": "text_stream",
+            "content": result.get("content", ""),
+            "is_final": result.get("is_final", False),
+        }
+    elif result_type == "final_result":
+        message = {
+            "type": "final_result",
+            "content": result.get("content", ""),
+            "vision_time": result.get("vision_time", 0),
+            "total_time": result.get("total_time", 0),
+            "detection_count": result.get("detection_count", 0),
+            "trace_id": trace_id,
+        }
+        if "changes" in result:
+            message["unchanged"] = result["unchanged"]
+            message["changes"] = result["changes"]
+    elif result_type == "error":
+        message = {"type": "error", "content": result.get("content", "处理失败")}
+    else:
+        return None
+    message["session_id"] = session_id
+    message.update(frame_info)
+    message["timestamp"] = datetime.now().isoformat()
+    return message
+
+
+def _stats_message(stream: VideoStreamSession, session_id: str) -> Dict[str, Any]:
+    return {
+        "type": "stream_stats",
+        "session_id": session_id,
+        "data": stream.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
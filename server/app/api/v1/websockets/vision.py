@@ -3,18 +3,37 @@
 支持直接接收二进制图像数据流
 """
 
+import json
 import logging
 import base64
+import time
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from datetime import datetime
 
-from ....services.vision_service import VisionService
+from ....services.vision_service import get_vision_service
+from ....services.websocket_manager import get_ws_manager, ConnectionLimitExceeded
+from ....services.admission import get_admission_controller, AdmissionRejected
+from ....services.model_registry import get_model_registry, ModelsNotReady
+from ....services.session_options import InvalidSessionOptions, configure_connection
+from ....services import memory
+from ....core import tracing
+from ....core.metrics import stage
+from ....utils.logger import log_extra
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# 全局视觉服务实例（可以优化为单例）
-vision_service = VisionService()
+# 全局 WebSocket 管理器实例（与 /ws 共用）
+ws_manager = get_ws_manager()
+
+# 全局准入控制器（与 /ws、HTTP 批量接口共用）
+admission = get_admission_controller()
+
+# 共享模型注册表（模型在后台加载，就绪前图像短暂等待）
+models = get_model_registry()
+
+_RECEIVE = stage("receive")
+_BASE64_DECODE = stage("base64_decode")
 
 
 @router.websocket("/ws/vision/{session_id}")
@@ -25,6 +44,9 @@ async def vision_ws_endpoint(websocket: WebSocket, session_id: str) -> None:
     支持两种数据格式：
     1. 二进制图像数据（直接发送）
     2. JSON 格式：{"image": "base64_encoded_image"}
+    
+    会话参数协商：发送 {"type": "configure", "options": {"template": "concise", "max_detections": 3, ...}}，
+    服务器回复 {"type": "configured", "options": {...}}（见 services/session_options.py）
     """
     # 获取客户端信息
     client_host = websocket.client.host if websocket.client else "unknown"
@@ -32,33 +54,89 @@ async def vision_ws_endpoint(websocket: WebSocket, session_id: str) -> None:
     
     await websocket.accept()
     
-    # 输出连接信息
-    print("=" * 60)
-    print(f"👁️  视觉处理 WebSocket 连接建立")
-    print(f"   会话 ID: {session_id}")
-    print(f"   来源地址: {client_host}:{client_port}")
-    print(f"   连接时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print(f"   端点路径: /ws/vision/{session_id}")
-    print("=" * 60)
-    logger.info(f"视觉 WebSocket 连接: session={session_id} (来自 {client_host}:{client_port})")
+    logger.info(
+        f"视觉 WebSocket 连接: session={session_id} (来自 {client_host}:{client_port})",
+        extra=log_extra(session_id, endpoint="/ws/vision"),
+    )
+    
+    client_id = f"vision_{session_id}_{datetime.now().timestamp()}"
+    try:
+        conn = await ws_manager.connect(client_id, websocket, endpoint="/ws/vision", session_id=session_id)
+    except ConnectionLimitExceeded as e:
+        logger.warning(f"拒绝视觉 WebSocket 连接 session={session_id}: {e}")
+        await websocket.send_json({
+            "type": "error",
+            "session_id": session_id,
+            "content": "服务器繁忙，请稍后重试",
+            "timestamp": datetime.now().isoformat()
+        })
+        await websocket.close(code=1013, reason="too many connections")
+        return
     
     try:
         while True:
-            # 尝试接收二进制数据
-            try:
-                data = await websocket.receive_bytes()
-                image_bytes = data
-                image_size_kb = len(image_bytes) / 1024
-                print(f"📸 收到二进制图像 [{session_id}] | 大小: {image_size_kb:.2f} KB")
-                logger.info(f"收到二进制图像数据 [{session_id}]: {len(image_bytes)} bytes")
-            except:
-                # 如果不是二进制，尝试接收 JSON
+            # 接收一条消息：二进制帧直接作为图像，文本帧按 JSON 解析
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            
+            received_ns = time.time_ns()
+            payload = None
+            if message.get("bytes") is None:
+                text = message.get("text") or ""
+                conn.record_frame_in(len(text))
                 try:
-                    message = await websocket.receive_json()
-                    image_data_base64 = message.get("image", "")
+                    with _RECEIVE.time():
+                        payload = json.loads(text)
+                except ValueError as e:
+                    logger.error(f"接收数据失败 [{session_id}]: {e}")
+                    await conn.send_json({
+                        "type": "error",
+                        "session_id": session_id,
+                        "content": f"数据接收失败: {str(e)}",
+                        "timestamp": datetime.now().isoformat()
+                    })
+                    continue
+                
+                if isinstance(payload, dict) and payload.get("type") == "configure":
+                    # 会话参数协商：校验后缓存在连接上，之后每帧直接使用
+                    try:
+                        options = configure_connection(conn, payload.get("options", {}))
+                    except InvalidSessionOptions as e:
+                        await conn.send_json({
+                            "type": "error",
+                            "session_id": session_id,
+                            "code": e.code,
+                            "content": str(e),
+                            "timestamp": datetime.now().isoformat()
+                        })
+                    else:
+                        await conn.send_json({
+                            "type": "configured",
+                            "session_id": session_id,
+                            "options": options.to_dict(),
+                            "timestamp": datetime.now().isoformat()
+                        })
+                    continue
+            
+            # 每帧一条 trace，从收到消息时开始计时（包含 JSON 解析），trace_id 在 final_result 中回传
+            frame_trace = tracing.start_trace("frame", session_id=session_id, start_ns=received_ns, endpoint="/ws/vision")
+            
+            if payload is None:
+                image_bytes = message["bytes"]
+                conn.record_frame_in(len(image_bytes))
+                frame_trace.set_attribute("image_bytes", len(image_bytes))
+                logger.info(
+                    f"收到二进制图像数据 [{session_id}]: {len(image_bytes)} bytes",
+                    extra=log_extra(session_id, per_frame=True, image_bytes=len(image_bytes)),
+                )
+            else:
+                try:
+                    image_data_base64 = payload.get("image", "")
                     
                     if not image_data_base64:
-                        await websocket.send_json({
+                        frame_trace.end(error="未提供图像数据")
+                        await conn.send_json({
                             "type": "error",
                             "session_id": session_id,
                             "content": "未提供图像数据",
@@ -70,13 +148,17 @@ async def vision_ws_endpoint(websocket: WebSocket, session_id: str) -> None:
                     if ',' in image_data_base64:
                         image_data_base64 = image_data_base64.split(',')[1]
                     
-                    image_bytes = base64.b64decode(image_data_base64)
-                    image_size_kb = len(image_bytes) / 1024
-                    print(f"📸 收到 JSON 图像数据 [{session_id}] | 大小: {image_size_kb:.2f} KB")
-                    logger.info(f"收到 JSON 图像数据 [{session_id}]: {len(image_bytes)} bytes")
+                    with _BASE64_DECODE.time(), tracing.span("base64_decode"):
+                        image_bytes = base64.b64decode(image_data_base64)
+                    frame_trace.set_attribute("image_bytes", len(image_bytes))
+                    logger.info(
+                        f"收到 JSON 图像数据 [{session_id}]: {len(image_bytes)} bytes",
+                        extra=log_extra(session_id, per_frame=True, image_bytes=len(image_bytes)),
+                    )
                 except Exception as e:
                     logger.error(f"接收数据失败 [{session_id}]: {e}")
-                    await websocket.send_json({
+                    frame_trace.end(error=f"接收数据失败: {e}")
+                    await conn.send_json({
                         "type": "error",
                         "session_id": session_id,
                         "content": f"数据接收失败: {str(e)}",
@@ -84,69 +166,108 @@ async def vision_ws_endpoint(websocket: WebSocket, session_id: str) -> None:
                     })
                     continue
             
-            # 流式处理图像
+            # 流式处理图像（共享视觉服务，受准入控制）
+            process_start = time.monotonic()
+            frame_memory = memory.begin_frame(conn, len(image_bytes))
             try:
-                async for result in vision_service.process_image_stream(image_bytes, session_id):
-                    result_type = result.get("type")
+                await models.wait_until_serving()
+                vision_service = get_vision_service()
+                async with admission.slot():
+                    async for result in vision_service.process_image_stream(
+                        image_bytes, session_id, options=conn.options, tracker=conn.tracker
+                    ):
+                        result_type = result.get("type")
                     
-                    if result_type == "vision_result":
-                        # 视觉检测结果（可选，用于调试）
-                        await websocket.send_json({
-                            "type": "vision_result",
-                            "session_id": session_id,
-                            "data": result.get("data", {}),
-                            "timestamp": datetime.now().isoformat()
-                        })
+                        if result_type == "vision_result":
+                            # 视觉检测结果（可选，用于调试）
+                            await conn.send_json({
+                                "type": "vision_result",
+                                "session_id": session_id,
+                                "data": result.get("data", {}),
+                                "timestamp": datetime.now().isoformat()
+                            })
                     
-                    elif result_type == "text_stream":
-                        # 流式文本结果
-                        await websocket.send_json({
-                            "type": "text_stream",
-                            "session_id": session_id,
-                            "content": result.get("content", ""),
-                            "is_final": result.get("is_final", False),
-                            "timestamp": datetime.now().isoformat()
-                        })
+                        elif result_type == "text_stream":
+                            # 流式文本结果
+                            await conn.send_json({
+                                "type": "text_stream",
+                                "session_id": session_id,
+                                "content": result.get("content", ""),
+                                "is_final": result.get("is_final", False),
+                                "timestamp": datetime.now().isoformat()
+                            })
                     
-                    elif result_type == "final_result":
-                        # 最终结果
-                        await websocket.send_json({
-                            "type": "final_result",
-                            "session_id": session_id,
-                            "content": result.get("content", ""),
-                            "vision_time": result.get("vision_time", 0),
-                            "total_time": result.get("total_time", 0),
-                            "detection_count": result.get("detection_count", 0),
-                            "timestamp": datetime.now().isoformat()
-                        })
+                        elif result_type == "final_result":
+                            # 最终结果
+                            message = {
+                                "type": "final_result",
+                                "session_id": session_id,
+                                "content": result.get("content", ""),
+                                "vision_time": result.get("vision_time", 0),
+                                "total_time": result.get("total_time", 0),
+                                "detection_count": result.get("detection_count", 0),
+                                "trace_id": frame_trace.trace_id,
+                                "timestamp": datetime.now().isoformat()
+                            }
+                            if "changes" in result:
+                                # 开启跟踪的会话：画面是否无变化，以及新出现 / 离开的 track_id
+                                message["unchanged"] = result["unchanged"]
+                                message["changes"] = result["changes"]
+                            await conn.send_json(message)
                     
-                    elif result_type == "error":
-                        # 错误结果
-                        await websocket.send_json({
-                            "type": "error",
-                            "session_id": session_id,
-                            "content": result.get("content", "处理失败"),
-                            "timestamp": datetime.now().isoformat()
-                        })
+                        elif result_type == "error":
+                            # 错误结果
+                            frame_trace.set_error(result.get("code") or result.get("content", "处理失败"))
+                            await conn.send_json({
+                                "type": "error",
+                                "session_id": session_id,
+                                "content": result.get("content", "处理失败"),
+                                "timestamp": datetime.now().isoformat()
+                            })
             
+            except ModelsNotReady as e:
+                conn.record_drop()
+                frame_trace.set_error(f"{e.code}: {e}")
+                await conn.send_json({
+                    "type": "error",
+                    "session_id": session_id,
+                    "code": e.code,
+                    "content": f"{e}，请稍后重试",
+                    "retry_after": round(e.retry_after, 1),
+                    "timestamp": datetime.now().isoformat()
+                })
+            except AdmissionRejected as e:
+                conn.record_drop()
+                frame_trace.set_error(f"OVERLOADED: {e}")
+                logger.warning(f"图像处理被拒绝 [{session_id}]: {e}")
+                await conn.send_json({
+                    "type": "error",
+                    "session_id": session_id,
+                    "code": "OVERLOADED",
+                    "content": "服务器繁忙，请稍后重试",
+                    "timestamp": datetime.now().isoformat()
+                })
             except Exception as e:
+                frame_trace.set_error(f"{type(e).__name__}: {e}")
                 logger.error(f"图像处理失败 [{session_id}]: {e}", exc_info=True)
-                await websocket.send_json({
+                await conn.send_json({
                     "type": "error",
                     "session_id": session_id,
                     "content": f"处理失败: {str(e)}",
                     "timestamp": datetime.now().isoformat()
                 })
+            finally:
+                conn.record_processing(time.monotonic() - process_start)
+                memory.end_frame(conn, frame_memory)
+                frame_trace.end()
     
     except WebSocketDisconnect:
-        print("=" * 60)
-        print(f"👁️  视觉处理 WebSocket 断开连接")
-        print(f"   会话 ID: {session_id}")
-        print(f"   断开时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print("=" * 60)
         logger.info(f"视觉 WebSocket 断开连接: session={session_id}")
     except Exception as e:
-        print(f"❌ WebSocket 错误 [{session_id}]: {e}")
         logger.error(f"WebSocket 错误 [{session_id}]: {e}", exc_info=True)
+    finally:
+        # 清理连接
+        await ws_manager.disconnect(client_id)
+        logger.info(f"视觉 WebSocket 连接已清理: session={session_id} | 剩余活跃连接: {len(ws_manager.active_connections)}")
 
 
@@ -0,0 +1 @@
+"""性能基准测试包（不依赖网络，结果以 JSON 输出便于跨提交对比）。"""
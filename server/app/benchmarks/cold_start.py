@@ -0,0 +1,144 @@
+"""
+冷启动基准
+在全新子进程中导入 app.main、加载视觉模型并完成预热（一次完整推理），测量到视觉模型就绪的耗时，
+分别在三种场景下测量：不使用编译产物缓存、缓存为空（首次启动，生成缓存）、缓存已存在（重启）。
+
+默认使用规模接近 YOLOv8n 的合成模型（微型模型的图太小，测不出图优化的差别）；
+有真实模型时用 --model 指定。
+
+用法（在 server 目录下执行）：
+    python -m app.benchmarks.cold_start
+    python -m app.benchmarks.cold_start --model models/yolov8n.onnx --repeat 10 -o cold-start.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+from app.benchmarks.common import build_backbone_onnx, environment_info, git_revision
+
+SCENARIOS = ("no_cache", "cold_cache", "warm_cache")
+
+# 子进程内执行：导入 app.main 后加载并预热视觉模型，输出一行 JSON
+_CHILD = r"""
+import asyncio, json, sys, time
+start = time.perf_counter()
+model_path, cache_dir = sys.argv[1], sys.argv[2]
+from app.core.config import settings
+settings.vision.YOLO_MODEL_PATH = model_path
+settings.vision.YOLO_USE_ONNX = True
+settings.model_cache.ENABLED = bool(cache_dir)
+settings.model_cache.DIR = cache_dir or settings.model_cache.DIR
+import app.main
+from app.services.model_registry import get_model_registry
+result = {"import_s": time.perf_counter() - start}
+registry = get_model_registry()
+registry._load_model("vision")
+result["load_s"] = time.perf_counter() - start
+asyncio.run(registry.warmup_vision())
+result["ready_s"] = time.perf_counter() - start
+result["artifact_cache"] = registry._vision_model.artifact_cache_status
+sys.stdout.write("\n" + json.dumps(result) + "\n")
+"""
+
+
+def run_child(model_path: str, cache_dir: Optional[str]) -> Dict[str, Any]:
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", _CHILD, model_path, cache_dir or ""],
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=600,
+    )
+    wall = time.perf_counter() - started
+    lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+    if completed.returncode != 0 or not lines:
+        tail = (completed.stderr or completed.stdout).strip().splitlines()[-3:]
+        return {"error": " | ".join(tail) or f"exit {completed.returncode}", "wall_s": wall}
+    result = json.loads(lines[-1])
+    # 含解释器启动的总耗时
+    result["wall_s"] = wall
+    return result
+
+
+def summarize_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [r for r in runs if "ready_s" in r]
+    summary: Dict[str, Any] = {"runs": len(runs), "ok": len(ok)}
+    for key in ("wall_s", "import_s", "load_s", "ready_s"):
+        values = [r[key] for r in ok if key in r]
+        if values:
+            summary[key] = {
+                "median": round(statistics.median(values), 3),
+                "min": round(min(values), 3),
+                "max": round(max(values), 3),
+            }
+    if ok:
+        summary["artifact_cache"] = sorted({r["artifact_cache"] for r in ok})
+        # 模型加载本身（去掉导入）
+        summary["model_load_s"] = round(statistics.median(r["load_s"] - r["import_s"] for r in ok), 3)
+    errors = sorted({r["error"] for r in runs if "error" in r})
+    if errors:
+        summary["errors"] = errors
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="视觉模型冷启动（到就绪）耗时基准，对比编译产物缓存")
+    parser.add_argument("--model", help="ONNX 模型路径（默认生成规模接近 YOLOv8n 的合成模型）")
+    parser.add_argument("--repeat", type=int, default=5, help="每个场景的子进程次数（默认 5）")
+    parser.add_argument("-o", "--output", help="结果 JSON 输出路径（默认输出到标准输出）")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="cold-start-")
+    try:
+        model_path = os.path.abspath(args.model) if args.model else build_backbone_onnx(os.path.join(workdir, "backbone.onnx"))
+        cache_dir = os.path.join(workdir, "cache")
+
+        results: Dict[str, Any] = {}
+        for scenario in SCENARIOS:
+            runs = []
+            for _ in range(args.repeat):
+                if scenario == "cold_cache":
+                    shutil.rmtree(cache_dir, ignore_errors=True)
+                runs.append(run_child(model_path, None if scenario == "no_cache" else cache_dir))
+            summary = summarize_runs(runs)
+            results[scenario] = summary
+            ready = summary.get("ready_s", {}).get("median", "-")
+            sys.stderr.write(
+                f"{scenario:11} 就绪 {ready}s  模型加载 {summary.get('model_load_s', '-')}s"
+                f"  缓存: {', '.join(summary.get('artifact_cache', [])) or '-'}\n"
+            )
+            for error in summary.get("errors", []):
+                sys.stderr.write(f"            错误: {error}\n")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "benchmark": "cold_start",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": git_revision(),
+        "environment": environment_info(),
+        "config": {"repeat": args.repeat, "model": args.model or "synthetic_yolov8n"},
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        sys.stderr.write(f"结果已写入 {args.output}\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
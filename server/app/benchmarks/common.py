@@ -0,0 +1,376 @@
+"""
+基准测试公共工具
+- 合成图像：按常见手机分辨率生成带渐变与色块的图像，JPEG 编码后体积接近真实照片
+- 合成输出张量：构造 YOLOv8 格式的 [1, 84, 8400] 输出，可控制高置信度候选框数量
+- 微型 ONNX 模型：真实模型不存在时用 onnx.helper 生成一个输入输出形状与 YOLOv8n 一致的小模型，
+  保证基准测试无需联网即可运行；另有规模接近 YOLOv8n 的合成模型，用于冷启动测量
+- 计时与统计：预热 + 多次重复，输出 min / mean / p50 / p95 等
+- 桩 LLM：以子进程启动 app.tools.stub_llm，供流水线基准与浸泡测试离线使用
+"""
+
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+SERVER_DIR = Path(__file__).resolve().parents[2]
+
+# 常见手机拍摄分辨率（宽, 高）
+PHONE_RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "12mp": (4032, 3024),
+}
+
+# YOLOv8n：80x80 + 40x40 + 20x20 个锚点，每个锚点 4 个框坐标 + 80 个类别分数
+NUM_ANCHORS = 8400
+NUM_OUTPUTS = 84
+INPUT_SIZE = 640
+
+# 微型模型固定产生的检测类别（person, car, dog, chair, bottle, cup）
+TINY_DETECTION_CLASSES = (0, 2, 16, 56, 39, 41)
+
+
+def synthetic_image(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """生成 RGB 合成图像：平滑渐变背景 + 随机色块 + 轻微噪声"""
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)
+    image = np.empty((height, width, 3), dtype=np.float32)
+    image[..., 0] = x[None, :]
+    image[..., 1] = y[:, None]
+    image[..., 2] = (x[None, :] + y[:, None]) / 2
+    for _ in range(12):
+        x1, y1 = int(rng.integers(0, width - 1)), int(rng.integers(0, height - 1))
+        x2 = min(width, x1 + int(rng.integers(width // 20, width // 4)))
+        y2 = min(height, y1 + int(rng.integers(height // 20, height // 4)))
+        image[y1:y2, x1:x2] = rng.integers(0, 255, size=3)
+    image += rng.normal(0, 6, size=image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def encode_jpeg(image_rgb: np.ndarray, quality: int = 90) -> bytes:
+    ok, buffer = cv2.imencode(".jpg", cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG 编码失败")
+    return buffer.tobytes()
+
+
+def synthetic_outputs(num_objects: int = 20, boxes_per_object: int = 5, seed: int = 0) -> List[np.ndarray]:
+    """
+    构造 YOLOv8 ONNX 输出 [1, 84, 8400]（框坐标为 640×640 模型输入上的像素中心点格式，与真实模型一致）
+
+    每个目标在相近位置生成 boxes_per_object 个重叠候选框（模拟 NMS 前的真实分布），
+    其余锚点的类别分数很低，会在置信度过滤阶段被丢弃。
+    """
+    rng = np.random.default_rng(seed)
+    output = np.zeros((NUM_OUTPUTS, NUM_ANCHORS), dtype=np.float32)
+    output[:4] = rng.uniform(0.05, 0.95, size=(4, NUM_ANCHORS))
+    output[4:] = rng.uniform(0.0, 0.05, size=(80, NUM_ANCHORS))
+
+    anchors = rng.choice(NUM_ANCHORS, size=min(NUM_ANCHORS, num_objects * boxes_per_object), replace=False)
+    for i, anchor in enumerate(anchors):
+        obj = i // boxes_per_object
+        obj_rng = np.random.default_rng(seed * 1000 + obj)
+        cx, cy = obj_rng.uniform(0.15, 0.85, size=2)
+        w, h = obj_rng.uniform(0.05, 0.3, size=2)
+        jitter = rng.normal(0, 0.01, size=4)
+        output[:4, anchor] = [cx + jitter[0], cy + jitter[1], w + jitter[2], h + jitter[3]]
+        output[4 + int(obj_rng.integers(0, 80)), anchor] = rng.uniform(0.3, 0.95)
+    # 纵向压缩到上半部（横屏图像 letterbox 后的有效区域），再换算为输入像素坐标
+    output[[1, 3]] *= 0.5
+    output[:4] *= INPUT_SIZE
+    return [output[None, ...]]
+
+
+def load_outputs(path: str) -> List[np.ndarray]:
+    """加载录制的输出张量（.npy 单个数组或 .npz 多个数组）"""
+    data = np.load(path)
+    if isinstance(data, np.ndarray):
+        return [data]
+    return [data[key] for key in data.files]
+
+
+def build_tiny_onnx(path: str, detections: int = 0) -> str:
+    """
+    生成与 YOLOv8n 输入输出形状一致的微型 ONNX 模型：
+    images [N, 3, 640, 640] -> 步长 8/16/32 的卷积 -> reshape/concat -> sigmoid -> 框坐标 × 640 -> output0 [N, 84, 8400]
+
+    与真实 YOLOv8 一致，框坐标是 640×640 模型输入（letterbox 后）上的像素坐标。
+
+    类别通道加了较大的负偏置，sigmoid 后分数远低于置信度阈值，
+    使完整 describe 的后处理开销与真实场景（少量检测）接近，而不是 8400 个框全部进入 NMS。
+    detections > 0 时另有这么多个锚点带正偏置（不同类别、互不重叠的位置），
+    每帧稳定产生约 detections 个检测，使流水线会走到语言生成；这些框排布在输入的上半部，
+    横屏图像（16:9）letterbox 后仍落在有效区域内。
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    nodes = []
+    initializers = []
+    branches = []
+    for i, stride in enumerate((8, 16, 32)):
+        weight = (rng.standard_normal((NUM_OUTPUTS, 3, stride, stride)) * 0.01).astype(np.float32)
+        initializers.append(numpy_helper.from_array(weight, f"w{i}"))
+        initializers.append(numpy_helper.from_array(np.array([0, NUM_OUTPUTS, -1], dtype=np.int64), f"shape{i}"))
+        nodes.append(helper.make_node("Conv", ["images", f"w{i}"], [f"conv{i}"], kernel_shape=[stride, stride], strides=[stride, stride]))
+        nodes.append(helper.make_node("Reshape", [f"conv{i}", f"shape{i}"], [f"flat{i}"]))
+        branches.append(f"flat{i}")
+
+    bias = np.zeros((1, NUM_OUTPUTS, NUM_ANCHORS if detections else 1), dtype=np.float32)
+    bias[0, 4:, :] = -8.0
+    if detections:
+        anchors = np.linspace(0, NUM_ANCHORS - 1, detections, dtype=np.int64)
+        columns = int(np.ceil(np.sqrt(detections)))
+        for i, anchor in enumerate(anchors):
+            # 框坐标经 sigmoid 后乘以输入边长，偏置取目标值（占输入边长的比例）的 logit：
+            # 按网格排布在上半部，宽高 0.12，互不重叠
+            cx = (i % columns + 0.5) / columns
+            cy = (i // columns + 0.5) / columns * 0.5
+            for channel, value in enumerate((cx, cy, 0.12, 0.12)):
+                bias[0, channel, anchor] = np.log(value / (1 - value))
+            bias[0, 4 + TINY_DETECTION_CLASSES[i % len(TINY_DETECTION_CLASSES)], anchor] = 12.0
+    initializers.append(numpy_helper.from_array(bias, "bias"))
+    nodes.append(helper.make_node("Concat", branches, ["concat"], axis=2))
+    nodes.append(helper.make_node("Add", ["concat", "bias"], ["logits"]))
+    nodes.append(helper.make_node("Sigmoid", ["logits"], ["probs"]))
+    # 框坐标通道换算为输入像素坐标，类别通道保持概率
+    channel_scale = np.ones((1, NUM_OUTPUTS, 1), dtype=np.float32)
+    channel_scale[0, :4, 0] = INPUT_SIZE
+    initializers.append(numpy_helper.from_array(channel_scale, "channel_scale"))
+    nodes.append(helper.make_node("Mul", ["probs", "channel_scale"], ["output0"]))
+
+    graph = helper.make_graph(
+        nodes,
+        "tiny_yolov8",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, INPUT_SIZE, INPUT_SIZE])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["batch", NUM_OUTPUTS, NUM_ANCHORS])],
+        initializers,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 12)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    onnx.save(model, path)
+    return path
+
+
+def build_backbone_onnx(path: str) -> str:
+    """
+    生成规模与结构接近 YOLOv8n 的合成 ONNX 模型（约 2.6M 参数、5 个下采样阶段、Conv + SiLU 块、三个检测头），
+    输入输出形状与 YOLOv8n 一致。权重随机且类别通道带负偏置，不产生有意义的检测；
+    用于测量图优化、会话创建等与模型规模相关的冷启动开销（微型模型的图太小，测不出差别）。
+    """
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    rng = np.random.default_rng(0)
+    nodes = []
+    initializers = []
+    counter = [0]
+
+    def conv(x: str, cin: int, cout: int, k: int, s: int, act: bool = True, bias_value: Optional[np.ndarray] = None) -> str:
+        counter[0] += 1
+        n = counter[0]
+        weight = (rng.standard_normal((cout, cin, k, k)) * np.sqrt(2.0 / (cin * k * k)) * 0.5).astype(np.float32)
+        bias = bias_value if bias_value is not None else np.zeros(cout, dtype=np.float32)
+        initializers.append(numpy_helper.from_array(weight, f"c{n}.w"))
+        initializers.append(numpy_helper.from_array(bias.astype(np.float32), f"c{n}.b"))
+        nodes.append(helper.make_node(
+            "Conv", [x, f"c{n}.w", f"c{n}.b"], [f"c{n}"],
+            kernel_shape=[k, k], strides=[s, s], pads=[k // 2] * 4,
+        ))
+        if not act:
+            return f"c{n}"
+        # SiLU = x * sigmoid(x)，与 ultralytics 导出的结构一致
+        nodes.append(helper.make_node("Sigmoid", [f"c{n}"], [f"c{n}.sig"]))
+        nodes.append(helper.make_node("Mul", [f"c{n}", f"c{n}.sig"], [f"c{n}.act"]))
+        return f"c{n}.act"
+
+    x = conv("images", 3, 16, 3, 2)
+    features = []
+    channels = 16
+    for out_channels, repeats, keep in ((32, 2, False), (64, 4, True), (128, 4, True), (256, 2, True)):
+        x = conv(x, channels, out_channels, 3, 2)
+        channels = out_channels
+        for _ in range(repeats):
+            x = conv(x, channels, channels, 3, 1)
+        if keep:
+            features.append((x, channels))
+
+    head_bias = np.zeros(NUM_OUTPUTS, dtype=np.float32)
+    head_bias[4:] = -8.0
+    branches = []
+    for i, (feature, cin) in enumerate(features):
+        h = conv(feature, cin, 64, 3, 1)
+        h = conv(h, 64, 64, 3, 1)
+        h = conv(h, 64, NUM_OUTPUTS, 1, 1, act=False, bias_value=head_bias)
+        initializers.append(numpy_helper.from_array(np.array([0, NUM_OUTPUTS, -1], dtype=np.int64), f"head{i}.shape"))
+        nodes.append(helper.make_node("Reshape", [h, f"head{i}.shape"], [f"head{i}"]))
+        branches.append(f"head{i}")
+    nodes.append(helper.make_node("Concat", branches, ["concat"], axis=2))
+    nodes.append(helper.make_node("Sigmoid", ["concat"], ["output0"]))
+
+    graph = helper.make_graph(
+        nodes,
+        "synthetic_yolov8n",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, INPUT_SIZE, INPUT_SIZE])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["batch", NUM_OUTPUTS, NUM_ANCHORS])],
+        initializers,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 12)])
+    model.ir_version = 8
+    onnx.checker.check_model(model)
+    onnx.save(model, path)
+    return path
+
+
+def resolve_model(model_path: Optional[str] = None, force_tiny: bool = False, tiny_detections: int = 0) -> Tuple[str, bool]:
+    """
+    确定基准测试使用的 ONNX 模型
+
+    Args:
+        tiny_detections: 生成微型模型时每帧固定产生的检测数（见 build_tiny_onnx）
+
+    Returns:
+        (模型路径, 是否为生成的微型模型)
+    """
+    if not force_tiny:
+        candidate = model_path
+        if candidate is None:
+            from app.core.config import settings
+            candidate = settings.vision.YOLO_MODEL_PATH
+        path = Path(candidate)
+        if not path.is_absolute():
+            path = SERVER_DIR / path
+        if path.suffix == ".onnx" and path.exists():
+            return str(path), False
+        if model_path is not None:
+            raise FileNotFoundError(f"模型文件不存在: {path}")
+
+    # 文件名带格式版本：框坐标约定变化后不复用旧的生成结果
+    suffix = f"_d{tiny_detections}" if tiny_detections else ""
+    tiny_path = os.path.join(tempfile.gettempdir(), f"seeforme_bench_tiny_yolov8_px{suffix}.onnx")
+    if not os.path.exists(tiny_path):
+        build_tiny_onnx(tiny_path, detections=tiny_detections)
+    return tiny_path, True
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub_llm(
+    ttft: float,
+    tokens_per_sec: float,
+    seed: int = 0,
+    prefill_tokens_per_sec: float = 0.0,
+) -> Tuple[subprocess.Popen, str]:
+    """
+    在空闲端口上以子进程启动桩 LLM（app.tools.stub_llm，不计入调用方进程的内存），等待其可用
+    prefill_tokens_per_sec > 0 时首 token 延迟随 prompt 长度增加
+
+    Returns:
+        (子进程, base_url)；调用方负责 terminate()
+    """
+    import requests
+
+    port = free_port()
+    command = [
+        sys.executable, "-m", "app.tools.stub_llm", "--port", str(port),
+        "--ttft", str(ttft), "--tokens-per-sec", str(tokens_per_sec), "--seed", str(seed),
+    ]
+    if prefill_tokens_per_sec > 0:
+        command += ["--prefill-tokens-per-sec", str(prefill_tokens_per_sec)]
+    process = subprocess.Popen(command, cwd=SERVER_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 15.0
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"桩 LLM 启动失败（退出码 {process.returncode}）")
+        try:
+            requests.get(f"{base_url}/stats", timeout=0.5)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("桩 LLM 在 15 秒内未就绪")
+
+
+def measure(fn: Callable[[], Any], repeat: int, warmup: int = 3) -> Dict[str, float]:
+    """预热后重复执行 fn，返回耗时统计（毫秒）"""
+    for _ in range(warmup):
+        fn()
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples_ms)
+
+    def percentile(q: float) -> float:
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+    return {
+        "repeat": len(ordered),
+        "min_ms": ordered[0],
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "max_ms": ordered[-1],
+        "stdev_ms": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=SERVER_DIR, capture_output=True, text=True, timeout=5,
+        )
+        if result.returncode != 0:
+            return None
+        revision = result.stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=SERVER_DIR, capture_output=True, text=True, timeout=5,
+        )
+        return revision + ("-dirty" if dirty.stdout.strip() else "")
+    except Exception:
+        return None
+
+
+def environment_info() -> Dict[str, Any]:
+    """运行环境信息，便于判断不同结果之间是否可比"""
+    info: Dict[str, Any] = {
+        "git_revision": git_revision(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+    try:
+        import onnxruntime as ort
+        info["onnxruntime"] = ort.__version__
+    except ImportError:
+        info["onnxruntime"] = None
+    return info
@@ -0,0 +1,167 @@
+"""
+启动导入基准
+在全新子进程中导入 app.main（创建 FastAPI 应用），可选再加载模型，测量各模式下的耗时、常驻内存与导入的重量级库。
+ONNX 模式下不应导入 torch / ultralytics；PyTorch 模式需要它们已安装，未安装时该模式记录错误。
+
+用法（在 server 目录下执行）：
+    python -m app.benchmarks.import_startup                       # 两种模式各测 5 次，只导入
+    python -m app.benchmarks.import_startup --load --modes onnx   # 同时测模型加载（默认使用微型 ONNX 模型）
+    python -m app.benchmarks.import_startup --repeat 10 -o import-$(git rev-parse --short HEAD).json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from app.benchmarks.common import environment_info, git_revision, resolve_model
+
+MODES = ("onnx", "pytorch")
+
+# 关注的重量级库（是否出现在 sys.modules 中）
+HEAVY_MODULES = ("torch", "ultralytics", "transformers", "onnxruntime", "cv2", "numpy")
+
+# 子进程内执行：设置模式后导入 app.main，输出一行 JSON
+_CHILD = r"""
+import json, os, sys, time
+start = time.perf_counter()
+mode, load, model_path = sys.argv[1], sys.argv[2] == "1", sys.argv[3]
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+result = {}
+from app.core.config import settings
+settings.vision.YOLO_USE_ONNX = mode == "onnx"
+if model_path:
+    settings.vision.YOLO_MODEL_PATH = model_path
+result["config_s"] = time.perf_counter() - start
+import app.main
+result["import_s"] = time.perf_counter() - start
+result["import_rss_mb"] = rss_mb()
+result["modules"] = len(sys.modules)
+result["heavy_after_import"] = [name for name in HEAVY if name in sys.modules]
+if load:
+    try:
+        from app.services.model_registry import get_model_registry
+        registry = get_model_registry()
+        registry.load()
+        result["runtime"] = "onnxruntime" if registry.vision_model.use_onnx else "pytorch"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["load_s"] = time.perf_counter() - start
+    result["load_rss_mb"] = rss_mb()
+    result["heavy_after_load"] = [name for name in HEAVY if name in sys.modules]
+sys.stdout.write("\n" + json.dumps(result) + "\n")
+"""
+
+
+def run_child(mode: str, load: bool, model_path: Optional[str]) -> Dict[str, Any]:
+    code = f"HEAVY = {HEAVY_MODULES!r}\n" + _CHILD
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", code, mode, "1" if load else "0", model_path or ""],
+        capture_output=True,
+        text=True,
+        env=env,
+        timeout=600,
+    )
+    wall = time.perf_counter() - started
+    lines = [line for line in completed.stdout.splitlines() if line.startswith("{")]
+    if completed.returncode != 0 or not lines:
+        tail = (completed.stderr or completed.stdout).strip().splitlines()[-3:]
+        return {"error": " | ".join(tail) or f"exit {completed.returncode}", "wall_s": wall}
+    result = json.loads(lines[-1])
+    # 含解释器启动的总耗时
+    result["wall_s"] = wall
+    return result
+
+
+def summarize_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [r for r in runs if "import_s" in r]
+    summary: Dict[str, Any] = {"runs": len(runs), "ok": len(ok)}
+    for key in ("wall_s", "import_s", "import_rss_mb", "load_s", "load_rss_mb"):
+        values = [r[key] for r in ok if key in r]
+        if values:
+            summary[key] = {
+                "median": round(statistics.median(values), 3),
+                "min": round(min(values), 3),
+                "max": round(max(values), 3),
+            }
+    if ok:
+        last = ok[-1]
+        summary["modules"] = last["modules"]
+        summary["heavy_after_import"] = last["heavy_after_import"]
+        for key in ("heavy_after_load", "runtime"):
+            if key in last:
+                summary[key] = last[key]
+    errors = sorted({r["error"] for r in runs if "error" in r})
+    if errors:
+        summary["errors"] = errors
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="app.main 启动导入耗时与内存基准")
+    parser.add_argument("--modes", default=",".join(MODES), help=f"测量的模式（{', '.join(MODES)}）")
+    parser.add_argument("--repeat", type=int, default=5, help="每种模式的子进程次数（默认 5）")
+    parser.add_argument("--load", action="store_true", help="导入后同时加载模型")
+    parser.add_argument("--model", help="ONNX 模式加载的模型路径（默认使用微型模型；PyTorch 模式使用 app.yaml 中的配置）")
+    parser.add_argument("-o", "--output", help="结果 JSON 输出路径（默认输出到标准输出）")
+    args = parser.parse_args(argv)
+
+    modes = args.modes.split(",")
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f"未知的模式: {sorted(unknown)}")
+
+    onnx_model = None
+    if args.load and "onnx" in modes:
+        onnx_model, _ = resolve_model(args.model, force_tiny=args.model is None)
+
+    results: Dict[str, Any] = {}
+    for mode in modes:
+        model_path = onnx_model if mode == "onnx" else None
+        runs = [run_child(mode, args.load, model_path) for _ in range(args.repeat)]
+        summary = summarize_runs(runs)
+        results[mode] = summary
+        import_s = summary.get("import_s", {}).get("median")
+        rss = summary.get("import_rss_mb", {}).get("median")
+        line = f"{mode:8} 导入 {import_s if import_s is not None else '-'}s  RSS {rss if rss is not None else '-'}MB"
+        if "load_s" in summary:
+            line += f"  加载后 {summary['load_s']['median']}s / {summary['load_rss_mb']['median']}MB"
+        line += f"  重量级库: {', '.join(summary.get('heavy_after_load', summary.get('heavy_after_import', []))) or '-'}"
+        sys.stderr.write(line + "\n")
+        for error in summary.get("errors", []):
+            sys.stderr.write(f"         错误: {error}\n")
+
+    report = {
+        "benchmark": "import_startup",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_revision": git_revision(),
+        "environment": environment_info(),
+        "config": {"repeat": args.repeat, "load": args.load, "model": args.model},
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        sys.stderr.write(f"结果已写入 {args.output}\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+指标开销基准
+测量 app.core.metrics 在热路径上的单次操作耗时，并折算为每帧开销占比。
+
+用法（在 server 目录下执行）：
+    python -m app.benchmarks.metrics_overhead
+    python -m app.benchmarks.metrics_overhead --iterations 200000 -o metrics_overhead.json
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from typing import Callable, Dict
+
+from app.core.metrics import MetricsRegistry, STAGES
+
+# 单帧（/ws/vision 一次完整处理）在热路径上的指标操作次数：
+# receive + base64 + jpeg + letterbox + ort + postprocess + llm_ttfb + llm_total + sentence_emit + pipeline_total
+# + 约 4 次 send（vision_result / text_stream / final_result）
+OPS_PER_FRAME = 14
+
+
+def _per_op_ns(fn: Callable[[], None], iterations: int) -> float:
+    # 预热，排除首次创建子指标等一次性开销
+    for _ in range(min(1000, iterations)):
+        fn()
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def run(iterations: int, threads: int, frame_ms: float) -> Dict:
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_stage_seconds", "bench", ["stage"])
+    counter = registry.counter("bench_total", "bench", ["reason"])
+    child = histogram.labels("ort_run")
+    counter_child = counter.labels("timeout")
+    for name in STAGES:
+        histogram.labels(name).observe(0.01)
+
+    def baseline() -> None:
+        pass
+
+    def observe() -> None:
+        child.observe(0.0123)
+
+    def timed() -> None:
+        with child.time():
+            pass
+
+    def labels_then_observe() -> None:
+        histogram.labels("ort_run").observe(0.0123)
+
+    def counter_inc() -> None:
+        counter_child.inc()
+
+    baseline_ns = _per_op_ns(baseline, iterations)
+    results = {
+        "observe_ns": _per_op_ns(observe, iterations) - baseline_ns,
+        "time_context_ns": _per_op_ns(timed, iterations) - baseline_ns,
+        "labels_lookup_observe_ns": _per_op_ns(labels_then_observe, iterations) - baseline_ns,
+        "counter_inc_ns": _per_op_ns(counter_inc, iterations) - baseline_ns,
+    }
+
+    # 多线程争用：推理在线程池中执行，多个线程同时写同一个直方图
+    per_thread = max(1, iterations // threads)
+
+    def worker() -> None:
+        for _ in range(per_thread):
+            child.observe(0.0123)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter_ns()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    results["contended_observe_ns"] = (time.perf_counter_ns() - start) / (per_thread * threads)
+
+    start = time.perf_counter()
+    text = registry.render()
+    results["render_ms"] = (time.perf_counter() - start) * 1000
+    results["render_bytes"] = len(text)
+
+    per_frame_us = OPS_PER_FRAME * results["time_context_ns"] / 1000
+    results["ops_per_frame"] = OPS_PER_FRAME
+    results["per_frame_overhead_us"] = per_frame_us
+    results["reference_frame_ms"] = frame_ms
+    results["per_frame_overhead_pct"] = per_frame_us / (frame_ms * 1000) * 100
+    results["iterations"] = iterations
+    results["threads"] = threads
+    results["python"] = sys.version.split()[0]
+    return results
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="测量指标子系统的热路径开销")
+    parser.add_argument("--iterations", type=int, default=100000, help="每项测量的循环次数（默认 100000）")
+    parser.add_argument("--threads", type=int, default=4, help="争用测试的线程数（默认 4）")
+    parser.add_argument("--frame-ms", type=float, default=50.0, help="折算占比所用的单帧参考耗时（毫秒，默认 50）")
+    parser.add_argument("-o", "--output", help="结果 JSON 输出路径（默认打印到标准输出）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    results = {"benchmark": "metrics_overhead", "results": run(args.iterations, args.threads, args.frame_ms)}
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+提示词空间关系基准
+对比两种把物体位置交给语言模型的方式：
+- coordinates：像素坐标（{objects_with_positions}），由 LLM 自己换算成「左边 / 近处」（空间关系引擎之前的默认模板）
+- spatial：服务端空间关系引擎算好的方位事实（{spatial_relations}，当前的 default 模板）
+
+测量项：
+- prompt  合成检测集合上的提示词字符数（桩 LLM 按一字一 token 计算预填充，中文场景下也与 token 数接近）
+          与 build_prompt 耗时（关闭提示词缓存），按物体数量
+- llm     通过 QwenChatAdapter 调用语言后端的单次描述耗时；默认自动启动带预填充速度的桩 LLM
+          （回复文本固定，两种模板的差异即预填充差异），也可用 --base-url 指向真实后端
+
+用法（在 server 目录下执行）：
+    python -m app.benchmarks.prompt_spatial
+    python -m app.benchmarks.prompt_spatial --objects 1,3,5 --scenes 200 -o prompt-spatial.json
+    python -m app.benchmarks.prompt_spatial --only llm --base-url http://127.0.0.1:8080 --model qwen2.5-1.5b-instruct
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.benchmarks.common import PHONE_RESOLUTIONS, environment_info, start_stub_llm, summarize
+
+logger = logging.getLogger(__name__)
+
+CASES = ("prompt", "llm")
+# (名称, 模板)：对照基准在前
+TEMPLATES = (("coordinates", "coordinates"), ("spatial", "default"))
+SCENE = "vision_description"
+RESOLUTION = "1080p"
+
+
+def synthetic_detections(class_table, objects: int, rng: np.random.Generator, width: int, height: int) -> List[Dict[str, Any]]:
+    """随机类别、位置与大小的检测结果（与视觉层输出格式一致，按置信度从高到低）"""
+    class_ids = rng.integers(0, max(1, len(class_table)), size=objects)
+    sizes = rng.uniform(0.05, 0.45, size=(objects, 2)) * (width, height)
+    corners = rng.uniform(0.0, 1.0, size=(objects, 2)) * ((width, height) - sizes)
+    confidences = np.sort(rng.uniform(0.3, 0.95, size=objects))[::-1]
+    detections = []
+    for class_id, (x1, y1), (w, h), confidence in zip(class_ids.tolist(), corners, sizes, confidences):
+        detections.append({
+            "class": class_table.name(class_id),
+            "class_en": class_table.names_en[class_id] if class_id < len(class_table) else f"class_{class_id}",
+            "class_id": class_id,
+            "confidence": round(float(confidence), 4),
+            "bbox": [round(float(x1), 1), round(float(y1), 1), round(float(x1 + w), 1), round(float(y1 + h), 1)],
+        })
+    return detections
+
+
+def build_wrapper(cache_size: int = 0):
+    from app.core.config import settings
+    from app.services.ai_models.language.prompt_wrapper import PromptWrapper
+    from app.services.ai_models.language.prompts import get_prompts_manager
+
+    return PromptWrapper(
+        prompts_manager=get_prompts_manager(settings.language.PROMPTS_DIR),
+        prompts_scene=SCENE,
+        cache_size=cache_size,
+        bbox_quantum=settings.language.PROMPT_BBOX_QUANTUM,
+    )
+
+
+def run_prompt(object_counts: List[int], scenes: int, repeat: int, seed: int) -> List[Dict[str, Any]]:
+    wrapper = build_wrapper(cache_size=0)
+    width, height = PHONE_RESOLUTIONS[RESOLUTION]
+    image_shape = (height, width)
+    results = []
+    for objects in object_counts:
+        rng = np.random.default_rng(seed + objects)
+        sets = [synthetic_detections(wrapper.class_table, objects, rng, width, height) for _ in range(scenes)]
+        entry: Dict[str, Any] = {"case": "prompt", "params": {"objects": objects, "scenes": scenes}}
+        for name, template in TEMPLATES:
+            chars = [len(wrapper.build_prompt(detections, template, image_shape)) for detections in sets]
+            samples = []
+            for _ in range(repeat):
+                for detections in sets:
+                    start = time.perf_counter()
+                    wrapper.build_prompt(detections, template, image_shape)
+                    samples.append((time.perf_counter() - start) * 1000)
+            entry[name] = {
+                "template": template,
+                "prompt_chars_mean": round(statistics.fmean(chars), 1),
+                "prompt_chars_max": max(chars),
+                "build": summarize(samples),
+            }
+        baseline, spatial = entry["coordinates"]["prompt_chars_mean"], entry["spatial"]["prompt_chars_mean"]
+        entry["prompt_chars_reduction_pct"] = round((1 - spatial / baseline) * 100, 1) if baseline else None
+        entry["example"] = {name: wrapper.build_prompt(sets[0], template, image_shape) for name, template in TEMPLATES}
+        results.append(entry)
+        sys.stderr.write(
+            f"prompt[{objects}] 字符数 {baseline:.0f} -> {spatial:.0f}（-{entry['prompt_chars_reduction_pct']}%）\n"
+        )
+    return results
+
+
+async def _describe_all(language_model, sets: List[List[Dict[str, Any]]], template: str, image_shape) -> List[float]:
+    samples = []
+    for detections in sets:
+        start = time.perf_counter()
+        await language_model.generate_description(detections, template=template, image_shape=image_shape)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run_llm(args: argparse.Namespace) -> Dict[str, Any]:
+    from app.core.config import settings
+    from app.services.ai_models.language import QwenChatAdapter
+
+    stub = None
+    base_url = args.base_url
+    if not base_url:
+        stub, base_url = start_stub_llm(args.stub_ttft, args.stub_tokens_per_sec, prefill_tokens_per_sec=args.stub_prefill_tokens_per_sec)
+    try:
+        language_model = QwenChatAdapter(
+            model_name=args.model,
+            max_tokens=settings.language.QWEN_MAX_TOKENS,
+            base_url=base_url,
+            api_key=args.api_key,
+            prompts_dir=settings.language.PROMPTS_DIR,
+            prompts_scene=SCENE,
+            timeout=settings.language.RESPONSE_TIMEOUT,
+        )
+        width, height = PHONE_RESOLUTIONS[RESOLUTION]
+        rng = np.random.default_rng(args.seed)
+        table = language_model.prompt_wrapper.class_table
+        sets = [synthetic_detections(table, args.llm_objects, rng, width, height) for _ in range(args.llm_requests)]
+        loop = asyncio.new_event_loop()
+        try:
+            # 预热：建立 HTTP 连接
+            loop.run_until_complete(_describe_all(language_model, sets[:1], "default", (height, width)))
+            entry: Dict[str, Any] = {
+                "case": "llm",
+                "params": {"objects": args.llm_objects, "requests": args.llm_requests, "backend": "stub" if stub else base_url},
+            }
+            # 两种模板交替执行，抵消后端状态随时间的漂移
+            samples: Dict[str, List[float]] = {name: [] for name, _ in TEMPLATES}
+            for index in range(len(sets)):
+                for name, template in TEMPLATES:
+                    samples[name] += loop.run_until_complete(
+                        _describe_all(language_model, sets[index:index + 1], template, (height, width))
+                    )
+        finally:
+            loop.close()
+    finally:
+        if stub is not None:
+            stub.terminate()
+            stub.wait(timeout=10)
+
+    for name, template in TEMPLATES:
+        entry[name] = {"template": template, "latency": summarize(samples[name])}
+    baseline, spatial = entry["coordinates"]["latency"]["p50_ms"], entry["spatial"]["latency"]["p50_ms"]
+    entry["p50_reduction_ms"] = round(baseline - spatial, 2)
+    sys.stderr.write(f"llm[{args.llm_objects}] p50 {baseline:.0f}ms -> {spatial:.0f}ms\n")
+    return entry
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    cases = [c.strip() for c in args.only.split(",")] if args.only else list(CASES)
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        raise SystemExit(f"未知基准项: {', '.join(unknown)}（可选: {', '.join(CASES)}）")
+
+    results: List[Dict[str, Any]] = []
+    if "prompt" in cases:
+        object_counts = [int(n) for n in args.objects.split(",") if n.strip()]
+        results += run_prompt(object_counts, args.scenes, args.repeat, args.seed)
+    if "llm" in cases:
+        results.append(run_llm(args))
+    return {
+        "benchmark": "prompt_spatial",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment_info(),
+        "config": {
+            "resolution": RESOLUTION,
+            "templates": dict(TEMPLATES),
+            "stub_ttft": args.stub_ttft,
+            "stub_tokens_per_sec": args.stub_tokens_per_sec,
+            "stub_prefill_tokens_per_sec": args.stub_prefill_tokens_per_sec,
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="对比像素坐标与空间关系事实两种提示词的长度、构建耗时与 LLM 延迟")
+    parser.add_argument("--only", help=f"只运行指定基准项，逗号分隔（{', '.join(CASES)}）")
+    parser.add_argument("--objects", default="1,3,5", help="每个场景的物体数量，逗号分隔（默认 1,3,5）")
+    parser.add_argument("--scenes", type=int, default=100, help="每个物体数量的合成场景数（默认 100）")
+    parser.add_argument("--repeat", type=int, default=5, help="构建耗时的重复轮数（默认 5）")
+    parser.add_argument("--seed", type=int, default=0, help="合成场景随机种子（默认 0）")
+    parser.add_argument("--llm-objects", type=int, default=4, help="LLM 延迟测量的物体数量（默认 4）")
+    parser.add_argument("--llm-requests", type=int, default=20, help="每种模板的 LLM 请求数（默认 20）")
+    parser.add_argument("--base-url", help="语言后端地址（OpenAI 兼容），不指定时自动启动桩 LLM")
+    parser.add_argument("--api-key", default="dummy", help="语言后端 API Key（默认 dummy）")
+    parser.add_argument("--model", default="stub", help="语言后端模型名（默认 stub）")
+    parser.add_argument("--stub-ttft", type=float, default=0.1, help="桩 LLM 首 token 基础延迟（秒，默认 0.1）")
+    parser.add_argument("--stub-tokens-per-sec", type=float, default=200.0, help="桩 LLM 生成速度（默认 200）")
+    parser.add_argument("--stub-prefill-tokens-per-sec", type=float, default=500.0,
+                        help="桩 LLM 预填充速度（prompt token/秒，默认 500，接近 CPU 上的小模型）")
+    parser.add_argument("-o", "--output", help="结果 JSON 输出路径（默认打印到标准输出）")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("app").setLevel(logging.WARNING)
+    result = run(args)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+性能回归门禁
+运行视觉热路径基准与流水线基准，与仓库中提交的基线文件（app/benchmarks/baseline.json）对比，
+任一指标超出容差带即以非零状态码退出，并打印可读的对比表。
+
+覆盖的指标：
+- vision.<基准项>[参数].p50_ms / p95_ms   视觉热路径各环节（vision_hot_path，强制使用微型模型）
+- pipeline.stage.<阶段>.p50_ms / p95_ms   流水线各阶段耗时（逐帧 trace 的 span 精确耗时，不是分桶估算）
+- pipeline.frame.p50_ms / p95_ms          单帧端到端耗时
+- pipeline.fps                            固定并发下的吞吐（帧/秒，越高越好）
+- process.peak_rss_mb                     整个门禁进程的峰值常驻内存
+
+完全离线：视觉模型为生成的微型 ONNX 模型（每帧固定产生若干检测，使流水线走到语言生成），
+语言后端为本地启动的桩 LLM（app.tools.stub_llm，固定延迟与随机种子）。
+绝对值与机器相关，基线应在同一台机器上生成；换机器后先用 --update 重新生成再对比改动。
+
+容差带保存在基线文件的 tolerances 中，按顺序匹配指标名（fnmatch 通配），
+允许的劣化量为 max(rel × 基线值, abs)；--update 只刷新 metrics，保留已有的容差设置。
+
+用法（在 server 目录下执行）：
+    python -m app.benchmarks.regression_gate                 # 对比基线，回归时退出码为 1
+    python -m app.benchmarks.regression_gate --update        # 在当前机器上重新生成基线
+    python -m app.benchmarks.regression_gate --only pipeline --frames 60 -o gate.json
+    python -m app.benchmarks.regression_gate --tolerance-scale 2   # 噪声较大的机器上放宽容差
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.benchmarks import vision_hot_path
+from app.benchmarks.common import (
+    PHONE_RESOLUTIONS,
+    SERVER_DIR,
+    encode_jpeg,
+    environment_info,
+    resolve_model,
+    start_stub_llm,
+    summarize,
+    synthetic_image,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASELINE = SERVER_DIR / "app" / "benchmarks" / "baseline.json"
+SUITES = ("vision", "pipeline")
+
+# 视觉热路径只跑一个分辨率，控制门禁总时长
+VISION_CASES = "preprocess,prepare_onnx_input,ort_run,postprocess_onnx,nms,track,describe"
+VISION_RESOLUTION = "1080p"
+
+# 流水线中参与对比的阶段（span 名称，见 app/core/tracing.py 与各适配器）
+PIPELINE_STAGES = (
+    "vision_detect", "jpeg_decode", "letterbox", "ort_run", "postprocess",
+    "llm_wait", "llm_call", "llm_ttfb", "sentence_emit",
+)
+
+# 新基线的默认容差（按顺序匹配，第一个命中的生效）
+DEFAULT_TOLERANCES: List[Tuple[str, Dict[str, float]]] = [
+    ("pipeline.fps", {"rel": 0.15, "abs": 0.0}),
+    ("process.peak_rss_mb", {"rel": 0.10, "abs": 20.0}),
+    ("pipeline.stage.llm_*", {"rel": 0.20, "abs": 20.0}),
+    ("pipeline.frame.*", {"rel": 0.20, "abs": 20.0}),
+    ("*.p95_ms", {"rel": 0.50, "abs": 1.0}),
+    ("*", {"rel": 0.30, "abs": 0.5}),
+]
+
+# 指标方向：fps 越高越好，其余越低越好
+HIGHER_IS_BETTER = ("pipeline.fps",)
+
+
+def _metric(value: float, unit: str) -> Dict[str, Any]:
+    return {"value": round(value, 4), "unit": unit}
+
+
+# ========= 视觉热路径 =========
+
+def run_vision(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    bench_args = vision_hot_path.parse_args([
+        "--tiny", "--only", VISION_CASES, "--resolutions", VISION_RESOLUTION,
+        "--repeat", str(args.repeat), "--threads", str(args.threads),
+    ])
+    result = vision_hot_path.run(bench_args)
+    metrics: Dict[str, Dict[str, Any]] = {}
+    for entry in result["results"]:
+        params = entry["params"]
+        # 只用决定输入规模的参数区分同名基准项（jpeg_bytes、kept 等随实现变化，不适合作为指标名）
+        key = params.get("resolution") or params.get("candidates") or params.get("objects")
+        name = f"vision.{entry['case']}" + (f"[{key}]" if key is not None else "")
+        metrics[f"{name}.p50_ms"] = _metric(entry["stats"]["p50_ms"], "ms")
+        metrics[f"{name}.p95_ms"] = _metric(entry["stats"]["p95_ms"], "ms")
+    return metrics
+
+
+# ========= 流水线 =========
+
+def _install_capture_tracer() -> None:
+    """
+    启用一个只在内存中保留 span 的 Tracer：门禁持有每帧根 span，帧结束后直接读取各 span 耗时，
+    采样率为 0 且慢帧阈值极大，不会写入 logs/traces.jsonl
+    """
+    from app.core import tracing
+    from app.core.config import TracingConfig
+
+    tracing._tracer = tracing.Tracer(TracingConfig(
+        ENABLED=True, SAMPLE_RATE=0.0, ERROR_SAMPLE_RATE=0.0, SLOW_THRESHOLD_MS=1e12,
+    ))
+
+
+async def _drive_pipeline(pipeline, jpeg: bytes, frames: int, concurrency: int) -> Tuple[List, float]:
+    from app.core import tracing
+
+    remaining = frames
+    roots = []
+
+    async def worker(index: int) -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            root = tracing.start_trace("regression_gate.frame")
+            try:
+                async for _ in pipeline.process_image_stream(jpeg, f"gate-{index}"):
+                    pass
+            finally:
+                root.end()
+            roots.append(root)
+
+    start = time.perf_counter()
+    # 每个 worker 是独立任务（复制当前上下文），各自的根 span 互不干扰
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return roots, time.perf_counter() - start
+
+
+def run_pipeline(args: argparse.Namespace) -> Dict[str, Dict[str, Any]]:
+    from app.core.config import settings
+    from app.services.ai_models.language import QwenChatAdapter
+    from app.services.ai_models.pipelines import VisionToTextPipeline
+
+    _install_capture_tracer()
+    model_path, _ = resolve_model(force_tiny=True, tiny_detections=args.detections)
+    vision_model = vision_hot_path.build_adapter(model_path, args.threads)
+    jpeg = encode_jpeg(synthetic_image(*PHONE_RESOLUTIONS[VISION_RESOLUTION], seed=0))
+
+    stub, base_url = start_stub_llm(args.stub_ttft, args.stub_tokens_per_sec)
+    try:
+        language_model = QwenChatAdapter(
+            model_name="stub",
+            max_tokens=settings.language.QWEN_MAX_TOKENS,
+            base_url=base_url,
+            api_key="dummy",
+            timeout=settings.language.RESPONSE_TIMEOUT,
+        )
+        pipeline = VisionToTextPipeline(vision_model=vision_model, language_model=language_model)
+        loop = asyncio.new_event_loop()
+        try:
+            # 预热：首帧包含 ORT 初始化与 HTTP 连接建立
+            loop.run_until_complete(_drive_pipeline(pipeline, jpeg, args.concurrency, args.concurrency))
+            roots, elapsed = loop.run_until_complete(
+                _drive_pipeline(pipeline, jpeg, args.frames, args.concurrency)
+            )
+        finally:
+            loop.close()
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+    durations: Dict[str, List[float]] = {name: [] for name in PIPELINE_STAGES}
+    frame_ms = []
+    for root in roots:
+        frame_ms.append((root.end_ns - root.start_ns) / 1e6)
+        for span in root.trace.spans:
+            if span.name in durations and span.end_ns is not None:
+                durations[span.name].append((span.end_ns - span.start_ns) / 1e6)
+
+    fallbacks = sum(1 for root in roots if root.trace.has_error())
+    if fallbacks:
+        sys.stderr.write(f"警告: {fallbacks}/{len(roots)} 帧出现错误（语言生成回退等），流水线指标可能失真\n")
+
+    metrics: Dict[str, Dict[str, Any]] = {}
+    for name, samples in durations.items():
+        if samples:
+            stats = summarize(samples)
+            metrics[f"pipeline.stage.{name}.p50_ms"] = _metric(stats["p50_ms"], "ms")
+            metrics[f"pipeline.stage.{name}.p95_ms"] = _metric(stats["p95_ms"], "ms")
+    frame_stats = summarize(frame_ms)
+    metrics["pipeline.frame.p50_ms"] = _metric(frame_stats["p50_ms"], "ms")
+    metrics["pipeline.frame.p95_ms"] = _metric(frame_stats["p95_ms"], "ms")
+    metrics["pipeline.fps"] = _metric(len(roots) / elapsed, "frames/s")
+    return metrics
+
+
+def peak_rss_mb() -> float:
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# ========= 对比 =========
+
+def tolerance_for(name: str, tolerances: List[Tuple[str, Dict[str, float]]]) -> Dict[str, float]:
+    for pattern, band in tolerances:
+        if fnmatch.fnmatchcase(name, pattern):
+            return band
+    return {"rel": 0.0, "abs": 0.0}
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Dict[str, Any]], scale: float = 1.0
+) -> List[Dict[str, Any]]:
+    """逐项对比，status 为 ok / improved / regression / new / missing"""
+    tolerances = [tuple(item) for item in baseline.get("tolerances") or DEFAULT_TOLERANCES]
+    base_metrics = baseline.get("metrics", {})
+    rows = []
+    for name in sorted(set(base_metrics) | set(current)):
+        row: Dict[str, Any] = {"metric": name, "baseline": None, "current": None, "allowed": None, "status": "ok"}
+        if name not in current:
+            row.update(baseline=base_metrics[name]["value"], status="missing")
+        elif name not in base_metrics:
+            row.update(current=current[name]["value"], status="new")
+        else:
+            base_value = base_metrics[name]["value"]
+            value = current[name]["value"]
+            band = tolerance_for(name, tolerances)
+            allowed = max(band["rel"] * abs(base_value), band["abs"]) * scale
+            # worse > 0 表示劣化
+            worse = base_value - value if name in HIGHER_IS_BETTER else value - base_value
+            if worse > allowed:
+                status = "regression"
+            elif worse < -allowed:
+                status = "improved"
+            else:
+                status = "ok"
+            row.update(baseline=base_value, current=value, allowed=allowed, status=status)
+        rows.append(row)
+    return rows
+
+
+def print_report(rows: List[Dict[str, Any]], units: Dict[str, str]) -> None:
+    marks = {"ok": "", "improved": "改善", "regression": "回归 ✗", "new": "新增", "missing": "缺失"}
+    width = max([len(row["metric"]) for row in rows] + [6])
+    sys.stderr.write(f"\n{'指标':<{width - 2}}  {'基线':>10}  {'当前':>12}  {'变化':>8}  {'容差':>10}  {'单位':<8}  结果\n")
+    sys.stderr.write("-" * (width + 68) + "\n")
+    for row in rows:
+        base_value, value = row["baseline"], row["current"]
+        base_text = f"{base_value:.3f}" if base_value is not None else "-"
+        value_text = f"{value:.3f}" if value is not None else "-"
+        delta = f"{(value - base_value) / base_value * 100:+.1f}%" if base_value and value is not None else "-"
+        allowed = f"±{row['allowed']:.3f}" if row["allowed"] is not None else "-"
+        unit = units.get(row["metric"], "")
+        sys.stderr.write(
+            f"{row['metric']:<{width}}  {base_text:>12}  {value_text:>14}  {delta:>10}  {allowed:>12}  {unit:<10}  "
+            f"{marks[row['status']]}\n"
+        )
+    counts = {status: sum(1 for row in rows if row["status"] == status) for status in marks}
+    sys.stderr.write(
+        f"\n共 {len(rows)} 项：回归 {counts['regression']}，改善 {counts['improved']}，"
+        f"新增 {counts['new']}，缺失 {counts['missing']}\n"
+    )
+
+
+def _comparable(baseline_env: Dict[str, Any], env: Dict[str, Any]) -> List[str]:
+    keys = ("machine", "cpu_count", "python", "onnxruntime", "numpy", "opencv")
+    return [f"{key}: {baseline_env.get(key)} -> {env.get(key)}" for key in keys if baseline_env.get(key) != env.get(key)]
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    suites = args.only.split(",") if args.only else list(SUITES)
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise ValueError(f"未知的基准组: {sorted(unknown)}，可选: {', '.join(SUITES)}")
+
+    metrics: Dict[str, Dict[str, Any]] = {}
+    if "vision" in suites:
+        sys.stderr.write("== 视觉热路径 ==\n")
+        metrics.update(run_vision(args))
+    if "pipeline" in suites:
+        sys.stderr.write(f"== 流水线：{args.frames} 帧，并发 {args.concurrency} ==\n")
+        metrics.update(run_pipeline(args))
+    metrics["process.peak_rss_mb"] = _metric(peak_rss_mb(), "MB")
+
+    return {
+        "benchmark": "regression_gate",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment_info(),
+        "config": {
+            "suites": suites,
+            "repeat": args.repeat,
+            "frames": args.frames,
+            "concurrency": args.concurrency,
+            "detections": args.detections,
+            "threads": args.threads,
+            "stub_ttft": args.stub_ttft,
+            "stub_tokens_per_sec": args.stub_tokens_per_sec,
+        },
+        "metrics": metrics,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="性能回归门禁：运行基准并与提交的基线对比")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="基线文件（默认 app/benchmarks/baseline.json）")
+    parser.add_argument("--update", action="store_true", help="用本次结果重写基线（保留已有容差设置）")
+    parser.add_argument("--only", help=f"只运行指定基准组，逗号分隔（{', '.join(SUITES)}）")
+    parser.add_argument("--repeat", type=int, default=30, help="视觉热路径每项重复次数（默认 30）")
+    parser.add_argument("--frames", type=int, default=40, help="流水线处理帧数（默认 40）")
+    parser.add_argument("--concurrency", type=int, default=4, help="流水线并发帧数（默认 4）")
+    parser.add_argument("--detections", type=int, default=4, help="微型模型每帧产生的检测数（默认 4）")
+    parser.add_argument("--threads", type=int, default=1, help="ONNX Runtime 算子内线程数（默认 1）")
+    parser.add_argument("--stub-ttft", type=float, default=0.2, help="桩 LLM 首 token 延迟（秒，默认 0.2）")
+    parser.add_argument("--stub-tokens-per-sec", type=float, default=200.0, help="桩 LLM 生成速度（默认 200）")
+    parser.add_argument("--tolerance-scale", type=float, default=1.0, help="容差带整体缩放（默认 1.0）")
+    parser.add_argument("-o", "--output", help="本次结果与对比明细的 JSON 输出路径")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # 逐帧 INFO 日志会干扰计时
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    result = run(args)
+    baseline: Optional[Dict[str, Any]] = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.update:
+        tolerances = (baseline or {}).get("tolerances") or [list(item) for item in DEFAULT_TOLERANCES]
+        new_baseline = {**result, "tolerances": tolerances}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            f.write(json.dumps(new_baseline, ensure_ascii=False, indent=2) + "\n")
+        sys.stderr.write(f"基线已写入 {args.baseline}（{len(result['metrics'])} 项指标）\n")
+        return 0
+
+    if baseline is None:
+        sys.stderr.write(f"基线文件不存在: {args.baseline}，请先运行 --update 生成\n")
+        return 2
+
+    for difference in _comparable(baseline.get("environment", {}), result["environment"]):
+        sys.stderr.write(f"注意: 运行环境与基线不同（{difference}），结果可能不可比\n")
+    # 只运行部分基准组时 suites 不同，其余参数一致即可比
+    base_config = {k: v for k, v in baseline.get("config", {}).items() if k != "suites"}
+    if base_config != {k: v for k, v in result["config"].items() if k != "suites"}:
+        sys.stderr.write("注意: 运行参数与基线不同，结果可能不可比\n")
+
+    rows = compare(baseline, result["metrics"], args.tolerance_scale)
+    units = {name: metric["unit"] for name, metric in result["metrics"].items()}
+    print_report(rows, units)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(json.dumps({**result, "comparison": rows}, ensure_ascii=False, indent=2) + "\n")
+        sys.stderr.write(f"结果已写入 {args.output}\n")
+
+    regressions = [row["metric"] for row in rows if row["status"] == "regression"]
+    if regressions:
+        sys.stderr.write(f"性能回归: {', '.join(regressions)}\n")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
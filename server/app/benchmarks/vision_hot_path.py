@@ -0,0 +1,246 @@
+"""
+视觉热路径微基准
+分别测量 YOLOv8nAdapter 的各个环节，结果以 JSON 输出，便于跨提交对比：
+- preprocess          _preprocess_image（JPEG 解码 + 颜色转换），按分辨率
+- prepare_onnx_input  _prepare_onnx_input（缩放填充 + 归一化），按分辨率
+- ort_run             ort_session.run（640x640 单张）
+- postprocess_onnx    _postprocess_onnx（输出解码 + NMS），使用合成或录制的输出张量
+- nms                 _nms（向量化 NMS），按候选框数量
+- track               会话级多目标跟踪 ObjectTracker.update（单帧），按目标数量；合成序列中目标匀速运动，
+                      带位置抖动、偶发低置信度与漏检
+- describe            完整 describe（解码 -> 推理 -> 后处理），按分辨率
+
+不需要联网：真实模型不存在时自动生成输入输出形状一致的微型 ONNX 模型（结果中 model.synthetic 为 true，
+此时 ort_run / describe 的绝对值不代表真实模型，只适合对比前后处理改动）。
+
+用法（在 server 目录下执行）：
+    python -m app.benchmarks.vision_hot_path
+    python -m app.benchmarks.vision_hot_path --repeat 50 -o bench.json
+    python -m app.benchmarks.vision_hot_path --only preprocess,describe --resolutions 1080p
+    python -m app.benchmarks.vision_hot_path --tiny --outputs recorded_output.npy
+    python -m app.benchmarks.vision_hot_path --only track --track-sizes 5,20,50
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.benchmarks.common import (
+    INPUT_SIZE,
+    PHONE_RESOLUTIONS,
+    encode_jpeg,
+    environment_info,
+    load_outputs,
+    measure,
+    resolve_model,
+    synthetic_image,
+    synthetic_outputs,
+)
+
+logger = logging.getLogger(__name__)
+
+CASES = ("preprocess", "prepare_onnx_input", "ort_run", "postprocess_onnx", "nms", "track", "describe")
+
+
+def build_adapter(model_path: str, threads: int):
+    from app.core.config import settings
+    from app.services.ai_models.vision import YOLOv8nAdapter
+
+    adapter = YOLOv8nAdapter(
+        model_path=model_path,
+        use_onnx=True,
+        confidence_threshold=settings.vision.YOLO_CONFIDENCE_THRESHOLD,
+        iou_threshold=settings.vision.YOLO_IOU_THRESHOLD,
+        intra_op_num_threads=threads,
+    )
+    if not adapter.use_onnx:
+        raise RuntimeError("ONNX 模型加载失败，基准测试只覆盖 ONNX 推理路径")
+    return adapter
+
+
+def synthetic_detections(count: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """构造 NMS 输入 (boxes [N, 4] x1y1x2y2, scores [N])：约每 5 个候选框围绕同一目标，框之间有不同程度的重叠"""
+    rng = np.random.default_rng(seed)
+    boxes = np.empty((count, 4), dtype=np.float32)
+    scores = np.empty(count, dtype=np.float32)
+    for i in range(count):
+        obj_rng = np.random.default_rng(seed * 1000 + i // 5)
+        cx, cy = obj_rng.uniform(100, 1800), obj_rng.uniform(100, 980)
+        w, h = obj_rng.uniform(60, 500), obj_rng.uniform(60, 500)
+        cx, cy = cx + rng.normal(0, 15), cy + rng.normal(0, 15)
+        scores[i] = rng.uniform(0.25, 0.95)
+        boxes[i] = [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+    return boxes, scores
+
+
+def synthetic_track_frames(count: int, frames: int, seed: int = 0) -> List[List[Dict[str, Any]]]:
+    """
+    构造跟踪输入序列（视觉层检测格式）：count 个目标在 1080p 画面中匀速运动，位置带 2 像素抖动，
+    每个目标每帧有 10% 概率为低置信度、5% 概率漏检
+    """
+    rng = np.random.default_rng(seed)
+    start = rng.uniform((100, 100), (1800, 980), size=(count, 2))
+    velocity = rng.normal(0, 4, size=(count, 2))
+    size = rng.uniform(40, 240, size=(count, 2))
+    class_ids = rng.integers(0, 80, size=count)
+    sequence = []
+    for k in range(frames):
+        centers = start + velocity * k + rng.normal(0, 2, size=(count, 2))
+        confidences = np.where(rng.random(count) < 0.1, rng.uniform(0.25, 0.5, count), rng.uniform(0.5, 0.95, count))
+        visible = rng.random(count) >= 0.05
+        sequence.append([
+            {
+                "class": f"class_{class_ids[i]}",
+                "class_en": f"class_{class_ids[i]}",
+                "class_id": int(class_ids[i]),
+                "confidence": float(confidences[i]),
+                "bbox": [*(centers[i] - size[i] / 2).tolist(), *(centers[i] + size[i] / 2).tolist()],
+            }
+            for i in np.flatnonzero(visible)
+        ])
+    return sequence
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    cases = set(args.only.split(",")) if args.only else set(CASES)
+    unknown = cases - set(CASES)
+    if unknown:
+        raise ValueError(f"未知的基准项: {sorted(unknown)}，可选: {', '.join(CASES)}")
+    resolutions = args.resolutions.split(",")
+    for name in resolutions:
+        if name not in PHONE_RESOLUTIONS:
+            raise ValueError(f"未知的分辨率: {name}，可选: {', '.join(PHONE_RESOLUTIONS)}")
+
+    model_path, synthetic_model = resolve_model(args.model, force_tiny=args.tiny)
+    adapter = build_adapter(model_path, args.threads)
+    outputs = load_outputs(args.outputs) if args.outputs else synthetic_outputs(seed=args.seed)
+
+    images = {name: synthetic_image(*PHONE_RESOLUTIONS[name], seed=args.seed) for name in resolutions}
+    jpegs = {name: encode_jpeg(image) for name, image in images.items()}
+
+    results: List[Dict[str, Any]] = []
+
+    def record(case: str, params: Dict[str, Any], fn) -> None:
+        stats = measure(fn, args.repeat, args.warmup)
+        results.append({"case": case, "params": params, "stats": stats})
+        label = ", ".join(f"{k}={v}" for k, v in params.items())
+        sys.stderr.write(
+            f"{case:<20} {label:<28} p50 {stats['p50_ms']:9.3f} ms   p95 {stats['p95_ms']:9.3f} ms\n"
+        )
+
+    if "preprocess" in cases:
+        for name in resolutions:
+            jpeg = jpegs[name]
+            record("preprocess", {"resolution": name, "jpeg_bytes": len(jpeg)},
+                   lambda jpeg=jpeg: adapter._preprocess_image(jpeg))
+
+    if "prepare_onnx_input" in cases:
+        for name in resolutions:
+            image = images[name]
+            record("prepare_onnx_input", {"resolution": name},
+                   lambda image=image: adapter._prepare_onnx_input(image))
+
+    if "ort_run" in cases:
+        input_tensor, _ = adapter._prepare_onnx_input(images[resolutions[0]])
+        feed = {adapter.input_name: input_tensor}
+        record("ort_run", {"input": f"1x3x{INPUT_SIZE}x{INPUT_SIZE}"},
+               lambda: adapter.ort_session.run(adapter.output_names, feed))
+
+    if "postprocess_onnx" in cases:
+        image_shape = images[resolutions[0]].shape
+        scale = adapter.letterbox_scale(image_shape, INPUT_SIZE)
+        kept = len(adapter._postprocess_onnx(outputs, image_shape, scale))
+        record("postprocess_onnx", {"outputs": "recorded" if args.outputs else "synthetic", "kept": kept},
+               lambda: adapter._postprocess_onnx(outputs, image_shape, scale))
+
+    if "nms" in cases:
+        for count in (int(c) for c in args.nms_sizes.split(",")):
+            boxes, scores = synthetic_detections(count, seed=args.seed)
+            record("nms", {"candidates": count},
+                   lambda boxes=boxes, scores=scores: adapter._nms(boxes, scores))
+
+    if "track" in cases:
+        from app.services.ai_models.vision.tracker import ObjectTracker
+
+        for count in (int(c) for c in args.track_sizes.split(",")):
+            # 有状态：每次调用处理序列中的下一帧
+            frames = itertools.cycle(synthetic_track_frames(count, args.warmup + args.repeat, seed=args.seed))
+            tracker = ObjectTracker()
+            record("track", {"objects": count},
+                   lambda tracker=tracker, frames=frames: tracker.update(next(frames)))
+
+    if "describe" in cases:
+        loop = asyncio.new_event_loop()
+        try:
+            for name in resolutions:
+                jpeg = jpegs[name]
+                record("describe", {"resolution": name},
+                       lambda jpeg=jpeg: loop.run_until_complete(adapter.describe(jpeg)))
+        finally:
+            loop.close()
+
+    return {
+        "benchmark": "vision_hot_path",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment_info(),
+        "model": {
+            "path": model_path,
+            "synthetic": synthetic_model,
+            "execution_provider": adapter.execution_provider,
+            "intra_op_threads": args.threads,
+        },
+        "config": {
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "resolutions": {name: list(PHONE_RESOLUTIONS[name]) for name in resolutions},
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="YOLOv8n 视觉热路径微基准（JSON 输出）")
+    parser.add_argument("--repeat", type=int, default=30, help="每项重复次数（默认 30）")
+    parser.add_argument("--warmup", type=int, default=3, help="每项预热次数（默认 3）")
+    parser.add_argument("--only", help=f"只运行指定项，逗号分隔（{', '.join(CASES)}）")
+    parser.add_argument("--resolutions", default=",".join(PHONE_RESOLUTIONS),
+                        help=f"合成图像分辨率，逗号分隔（默认 {','.join(PHONE_RESOLUTIONS)}）")
+    parser.add_argument("--nms-sizes", default="10,100,300", help="NMS 候选框数量，逗号分隔（默认 10,100,300）")
+    parser.add_argument("--track-sizes", default="5,20,50", help="跟踪的目标数量，逗号分隔（默认 5,20,50）")
+    parser.add_argument("--model", help="ONNX 模型路径（默认取 app.yaml，不存在时生成微型模型）")
+    parser.add_argument("--tiny", action="store_true", help="强制使用生成的微型模型")
+    parser.add_argument("--outputs", help="录制的模型输出张量（.npy/.npz），缺省使用合成张量")
+    parser.add_argument("--threads", type=int, default=1,
+                        help="ONNX Runtime 算子内线程数（默认 1，减少结果波动；0 表示由 ORT 决定）")
+    parser.add_argument("--seed", type=int, default=0, help="合成数据随机种子（默认 0）")
+    parser.add_argument("-o", "--output", help="结果 JSON 输出路径（默认打印到标准输出）")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    # 逐次推理的 INFO 日志会干扰计时
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("app").setLevel(logging.WARNING)
+
+    result = run(args)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        sys.stderr.write(f"结果已写入 {args.output}\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,7 @@
 
 from pydantic_settings import BaseSettings
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from pathlib import Path
 import yaml
 import logging
@@ -17,12 +17,128 @@ class VisionConfig(BaseModel):
     YOLO_USE_ONNX: bool = True
     YOLO_CONFIDENCE_THRESHOLD: float = 0.25
     YOLO_IOU_THRESHOLD: float = 0.45
+    ORT_INTRA_OP_THREADS: int = 0     # ONNX Runtime 算子内线程数，0 表示由 ORT 自动决定（多进程部署时设为 1）
     
     # 性能配置（不通过环境变量，而是统一由 app.yaml / 代码显式传入）
     MAX_CONCURRENT_REQUESTS: int = 10
+    MAX_QUEUED_REQUESTS: int = 20     # 并发已满时允许排队等待的请求数，超出直接拒绝
+    ADMISSION_TIMEOUT: float = 10.0   # 排队等待处理名额的最长时间（秒）
+    BATCH_SIZE: int = 8               # HTTP 批量接口单次推理的最大图像数
+    BATCH_MAX_IMAGES: int = 64        # HTTP 批量接口单个请求允许上传的最大图像数
     MODEL_WARMUP: bool = True  # 启动时预热模型
 
 
+class ModelLoadingConfig(BaseModel):
+    """模型加载配置"""
+    BACKGROUND: bool = True            # 后台加载：服务先开始监听，加载完成前 /health/ready 返回 503
+    RETRY_INITIAL: float = 2.0         # 加载失败后首次重试的等待时间（秒），之后每次翻倍
+    RETRY_MAX: float = 60.0            # 重试等待时间上限（秒）
+    MAX_ATTEMPTS: int = 0              # 单个模型的最大加载次数，0 表示一直重试
+    FRAME_WAIT: float = 5.0            # 模型未就绪时图像最多等待的时间（秒），超时回复 WARMING_UP
+
+
+class WarmupConfig(BaseModel):
+    """模型预热计划（vision.model_warmup 开启时执行）"""
+    INPUT_SIZES: List[int] = []      # 预热的输入边长，为空时只用模型默认尺寸；不被模型支持的尺寸跳过
+    BATCH_SIZES: List[int] = []      # 预热的批大小（HTTP 批量接口），单张推理总会预热
+    ITERATIONS: int = 2              # 每种形状的运行次数（首次触发内存分配，之后确认稳定）
+    IMAGE: Optional[str] = None      # 预热图像路径，None 使用内置的合成场景
+    LLM_CONNECTIONS: int = 1         # 预热时并发建立的 LLM 连接数（每个连接发送一次 max_tokens=1 的请求），0 表示不请求
+    LLM_TIMEOUT: float = 10.0        # 单次预热请求超时（秒）
+
+
+class ModelCacheConfig(BaseModel):
+    """编译产物缓存配置（ORT 格式优化模型与类别表）"""
+    ENABLED: bool = True
+    DIR: str = "models/.cache"    # 缓存目录，相对路径相对于 server 目录
+    MAX_ENTRIES: int = 4          # 保留的最大条目数，超出时清理最久未用的条目
+
+
+class HotReloadConfig(BaseModel):
+    """热重载配置：config/ 与 prompts/ 下的文件变化后重建模型 / 重新加载提示词"""
+    WATCH: bool = False               # 轮询监视 config/、prompts/ 与模型文件；关闭时只能通过管理接口触发
+    WATCH_INTERVAL: float = 2.0       # 轮询间隔（秒）
+    DEBOUNCE: float = 1.0             # 文件在该时长内不再变化才触发，避免读到写了一半的文件
+
+
+class WebSocketConfig(BaseModel):
+    """WebSocket 连接管理配置"""
+    MAX_CONNECTIONS: int = 500          # 全部端点合计的最大连接数
+    IDLE_TIMEOUT: float = 120.0         # 超过该时长（秒）无任何消息则视为死连接并回收，<=0 表示不回收
+    IDLE_CHECK_INTERVAL: float = 15.0   # 空闲巡检间隔（秒）
+    SEND_QUEUE_SIZE: int = 32           # 每个连接的广播发送队列长度，满时丢弃最旧消息
+    SEND_TIMEOUT: float = 5.0           # 单条消息写入超时（秒），超时视为对端卡死
+
+
+class StreamConfig(BaseModel):
+    """连续视频流接入配置（实时引导模式）"""
+    MIN_INTERVAL: float = 0.5        # 两次采样之间的最短间隔（秒），推理负载越高实际间隔越长
+    MAX_INTERVAL: float = 5.0        # 画面静止时也至少每隔该时长采样一次（秒）
+    MOTION_THRESHOLD: float = 0.04   # 与上次采样帧的平均差异（0~1）超过该值视为画面发生变化
+    LOAD_BACKOFF: float = 2.0        # 负载退避系数：间隔 = max(MIN_INTERVAL, 近期处理耗时) * (1 + 负载占比 * 系数)
+    MAX_BUFFER_BYTES: int = 8 * 1024 * 1024  # 解码前缓冲的最大字节数，超出时丢弃旧数据
+
+
+class TrackingConfig(BaseModel):
+    """会话级多目标跟踪配置（ByteTrack 风格，见 app/services/ai_models/vision/tracker.py）"""
+    HIGH_THRESHOLD: float = 0.5      # 高置信度检测阈值，低于该值的检测只用于延续已有轨迹
+    MATCH_IOU: float = 0.3           # 高置信度检测与轨迹匹配所需的最小 IoU
+    LOW_MATCH_IOU: float = 0.5       # 低置信度检测与轨迹匹配所需的最小 IoU
+    MIN_HITS: int = 2                # 新轨迹累计命中该帧数后确认（会话首帧除外）
+    MAX_LOST: int = 8                # 已确认的轨迹连续漏检超过该帧数后删除并报告离开
+    COAST_FRAMES: int = 2            # 漏检后仍按预测位置输出的帧数
+    STREAM: bool = True              # 连续视频流端点默认开启跟踪
+    STREAM_CHANGES_ONLY: bool = True # 连续视频流端点默认只描述新出现 / 离开的物体
+
+
+class LoggingConfig(BaseModel):
+    """日志配置"""
+    LEVEL: str = "INFO"
+    FORMAT: str = "text"                # text | json（每行一条 JSON，携带 session_id 与阶段耗时）
+    ASYNC: bool = True                  # 由后台线程写日志，避免 stdout 写阻塞事件循环
+    QUEUE_SIZE: int = 10000             # 异步日志队列长度，满时丢弃新记录（不阻塞调用方）
+    PER_FRAME_SAMPLE_RATE: float = 0.1  # 逐帧 INFO/DEBUG 日志的采样率（1 表示全部输出，0 表示全部丢弃）
+    SAMPLING: Dict[str, float] = {}     # 按 logger 名称前缀覆盖逐帧日志采样率
+    ACCESS_LOG: bool = True             # 是否输出 uvicorn HTTP 访问日志
+
+
+class TracingConfig(BaseModel):
+    """逐帧链路追踪配置"""
+    ENABLED: bool = True
+    FILE: str = "logs/traces.jsonl"      # OTLP/JSON 格式，每行一条 trace；相对路径相对于 server 目录
+    MAX_BYTES: int = 50 * 1024 * 1024    # 单个文件达到该大小后轮转
+    BACKUP_COUNT: int = 5                # 保留的轮转文件数
+    SLOW_THRESHOLD_MS: float = 3000.0    # 根 span 超过该耗时的慢 trace 全部保留
+    SAMPLE_RATE: float = 0.01            # 其余 trace 的随机保留比例
+    ERROR_SAMPLE_RATE: float = 1.0       # 出错 trace 的保留比例
+    QUEUE_SIZE: int = 1000               # 导出队列长度，满时丢弃（不阻塞调用方）
+    SERVICE_NAME: str = "seeforme-server"
+
+
+class HealthConfig(BaseModel):
+    """健康检查配置"""
+    PROBE_INTERVAL: float = 10.0     # 语言后端探测结果的缓存时间（秒），避免负载均衡器频繁探测时打满后端
+    PROBE_TIMEOUT: float = 2.0       # 单次探测超时（秒）
+    REQUIRE_LANGUAGE: bool = False   # 语言后端不可达/熔断时是否视为未就绪（默认仅降级，仍可用模板回退）
+    WARMUP_REQUIRED: bool = True     # 启用模型预热时，预热完成前是否视为未就绪
+
+
+class MemoryConfig(BaseModel):
+    """内存监控配置"""
+    SAMPLE_INTERVAL: float = 30.0        # RSS/堆采样间隔（秒），<=0 关闭后台采样
+    HISTORY: int = 2880                  # 保留的采样点数（默认 24 小时）
+    GROWTH_WINDOW: float = 3600.0        # 增长检测窗口（秒）
+    GROWTH_WARN_MB: float = 200.0        # 窗口内 RSS 增长超过该值时告警
+    TRACEMALLOC_FRAMES: int = 10         # tracemalloc 记录的调用栈深度
+    TRACEMALLOC_AT_STARTUP: bool = False # 启动即开启 tracemalloc（有 CPU 与内存开销，默认按需由管理接口开启）
+    MAX_SNAPSHOTS: int = 4               # 保留的 tracemalloc 快照数
+
+
+class SecurityConfig(BaseModel):
+    """安全配置"""
+    ADMIN_TOKEN: str = ""  # 管理接口（/api/v1/admin/*）令牌，为空时管理接口关闭
+
+
 class LanguageConfig(BaseSettings):
     """语言模型配置"""
     # 语言模式：template | qwen_local | qwen_cloud
@@ -40,10 +156,17 @@ class LanguageConfig(BaseSettings):
     RESPONSE_WARN_THRESHOLD: float = 2.0      # 触发「稍等」提示的间隔下限（秒），两次提示之间的最小间隔
     RESPONSE_TIMEOUT: float = 20.0            # 语言生成的硬超时时间（秒），本地 LLM 通常需要 10-20 秒
 
+    # 熔断：语言后端连续失败（含超时）达到阈值后，在冷却期内直接模板回退
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_TIMEOUT: float = 30.0       # 熔断冷却时间（秒），之后放行一次试探调用
+    HTTP_POOL_SIZE: int = 10                  # 到语言后端的 HTTP 连接池大小（保持的长连接数，建议不小于并发上限）
+
     # 提示词配置
     PROMPTS_DIR: Optional[str] = None  # 提示词目录，None 表示使用默认目录（server/prompts/）
     PROMPTS_SCENE: str = "vision_description"  # 默认使用的提示词场景
     PROMPTS_TEMPLATE: str = "default"  # 默认使用的提示词模板
+    PROMPT_CACHE_SIZE: int = 256  # 组装好的提示词缓存条数（按量化后的检测结果），0 表示关闭
+    PROMPT_BBOX_QUANTUM: int = 8  # 提示词中坐标的量化步长（像素），1 表示不量化
 
     class Config:
         # 对语言配置，不再通过环境变量注入，统一由 app.yaml / 代码显式传入
@@ -98,7 +221,7 @@ def _merge_yaml_to_env(yaml_config: dict, prefix: str = "") -> dict:
 def _apply_yaml_config(yaml_config: dict):
     """将 YAML 配置应用到环境变量（如果环境变量不存在）
 
-    当前仅用于服务器基础配置（HOST / PORT / RELOAD）：
+    当前仅用于服务器基础配置（HOST / PORT / RELOAD / WORKERS）：
     - 视觉与语言相关配置不再通过环境变量注入，而是由 app.yaml / 代码显式解析，
       以保证配置集中、可版本管理。
     """
@@ -110,6 +233,7 @@ def _apply_yaml_config(yaml_config: dict):
         os.environ.setdefault("HOST", str(server_config.get("host", "0.0.0.0")))
         os.environ.setdefault("PORT", str(server_config.get("port", 8000)))
         os.environ.setdefault("RELOAD", str(server_config.get("reload", False)).lower())
+        os.environ.setdefault("WORKERS", str(server_config.get("workers", 1)))
 
     # 视觉与语言配置不再通过环境变量注入，由 app.yaml / 代码显式解析
 
@@ -121,13 +245,48 @@ class Settings(BaseSettings):
     # 视觉配置
     vision: VisionConfig = VisionConfig()
     
+    # 模型加载配置
+    model_loading: ModelLoadingConfig = ModelLoadingConfig()
+    warmup: WarmupConfig = WarmupConfig()
+    
+    # 编译产物缓存配置
+    model_cache: ModelCacheConfig = ModelCacheConfig()
+    
+    # 热重载配置
+    hot_reload: HotReloadConfig = HotReloadConfig()
+    
     # 语言配置
     language: LanguageConfig = LanguageConfig()
     
+    # WebSocket 连接管理配置
+    websocket: WebSocketConfig = WebSocketConfig()
+    
+    # 连续视频流接入配置
+    stream: StreamConfig = StreamConfig()
+    
+    # 多目标跟踪配置
+    tracking: TrackingConfig = TrackingConfig()
+    
+    # 日志配置
+    logging: LoggingConfig = LoggingConfig()
+    
+    # 链路追踪配置
+    tracing: TracingConfig = TracingConfig()
+    
+    # 健康检查配置
+    health: HealthConfig = HealthConfig()
+    
+    # 内存监控配置
+    memory: MemoryConfig = MemoryConfig()
+    
+    # 安全配置
+    security: SecurityConfig = SecurityConfig()
+    
     # 服务器配置
     host: str = "0.0.0.0"
     port: int = 8000
     reload: bool = False
+    workers: int = 1  # 预派生启动器（python -m app.prefork）的工作进程数
     
     class Config:
         env_file = ".env"
@@ -154,12 +313,145 @@ class Settings(BaseSettings):
                     yolo_cfg.get("confidence_threshold", 0.25)
                 ),
                 YOLO_IOU_THRESHOLD=float(yolo_cfg.get("iou_threshold", 0.45)),
+                ORT_INTRA_OP_THREADS=int(yolo_cfg.get("intra_op_threads", 0)),
                 MAX_CONCURRENT_REQUESTS=int(
                     vis_cfg.get("max_concurrent_requests", 10)
                 ),
+                MAX_QUEUED_REQUESTS=int(vis_cfg.get("max_queued_requests", 20)),
+                ADMISSION_TIMEOUT=float(vis_cfg.get("admission_timeout", 10.0)),
+                BATCH_SIZE=int(vis_cfg.get("batch_size", 8)),
+                BATCH_MAX_IMAGES=int(vis_cfg.get("batch_max_images", 64)),
                 MODEL_WARMUP=bool(vis_cfg.get("model_warmup", True)),
             )
 
+        # 模型加载配置
+        loading_cfg = (yaml_config or {}).get("model_loading", {}) or {}
+        self.model_loading = ModelLoadingConfig(
+            BACKGROUND=bool(loading_cfg.get("background", True)),
+            RETRY_INITIAL=float(loading_cfg.get("retry_initial", 2.0)),
+            RETRY_MAX=float(loading_cfg.get("retry_max", 60.0)),
+            MAX_ATTEMPTS=int(loading_cfg.get("max_attempts", 0)),
+            FRAME_WAIT=float(loading_cfg.get("frame_wait", 5.0)),
+        )
+
+        # 预热计划
+        warmup_cfg = (yaml_config or {}).get("warmup", {}) or {}
+        self.warmup = WarmupConfig(
+            INPUT_SIZES=[int(size) for size in (warmup_cfg.get("input_sizes") or [])],
+            BATCH_SIZES=[int(size) for size in (warmup_cfg.get("batch_sizes") or [])],
+            ITERATIONS=int(warmup_cfg.get("iterations", 2)),
+            IMAGE=str(warmup_cfg.get("image")) if warmup_cfg.get("image") else None,
+            LLM_CONNECTIONS=int(warmup_cfg.get("llm_connections", 1)),
+            LLM_TIMEOUT=float(warmup_cfg.get("llm_timeout", 10.0)),
+        )
+
+        # 编译产物缓存配置
+        cache_cfg = (yaml_config or {}).get("model_cache", {}) or {}
+        self.model_cache = ModelCacheConfig(
+            ENABLED=bool(cache_cfg.get("enabled", True)),
+            DIR=str(cache_cfg.get("dir", "models/.cache")),
+            MAX_ENTRIES=int(cache_cfg.get("max_entries", 4)),
+        )
+
+        # 热重载配置
+        reload_cfg = (yaml_config or {}).get("hot_reload", {}) or {}
+        self.hot_reload = HotReloadConfig(
+            WATCH=bool(reload_cfg.get("watch", False)),
+            WATCH_INTERVAL=float(reload_cfg.get("watch_interval", 2.0)),
+            DEBOUNCE=float(reload_cfg.get("debounce", 1.0)),
+        )
+
+        # WebSocket 连接管理配置：直接从 app.yaml 显式解析
+        ws_cfg = (yaml_config or {}).get("websocket", {})
+        if ws_cfg:
+            self.websocket = WebSocketConfig(
+                MAX_CONNECTIONS=int(ws_cfg.get("max_connections", 500)),
+                IDLE_TIMEOUT=float(ws_cfg.get("idle_timeout", 120.0)),
+                IDLE_CHECK_INTERVAL=float(ws_cfg.get("idle_check_interval", 15.0)),
+                SEND_QUEUE_SIZE=int(ws_cfg.get("send_queue_size", 32)),
+                SEND_TIMEOUT=float(ws_cfg.get("send_timeout", 5.0)),
+            )
+
+        # 连续视频流接入配置：直接从 app.yaml 显式解析
+        stream_cfg = (yaml_config or {}).get("stream", {})
+        if stream_cfg:
+            self.stream = StreamConfig(
+                MIN_INTERVAL=float(stream_cfg.get("min_interval", 0.5)),
+                MAX_INTERVAL=float(stream_cfg.get("max_interval", 5.0)),
+                MOTION_THRESHOLD=float(stream_cfg.get("motion_threshold", 0.04)),
+                LOAD_BACKOFF=float(stream_cfg.get("load_backoff", 2.0)),
+                MAX_BUFFER_BYTES=int(stream_cfg.get("max_buffer_bytes", 8 * 1024 * 1024)),
+            )
+
+        # 多目标跟踪配置：直接从 app.yaml 显式解析
+        tracking_cfg = (yaml_config or {}).get("tracking", {}) or {}
+        self.tracking = TrackingConfig(
+            HIGH_THRESHOLD=float(tracking_cfg.get("high_threshold", 0.5)),
+            MATCH_IOU=float(tracking_cfg.get("match_iou", 0.3)),
+            LOW_MATCH_IOU=float(tracking_cfg.get("low_match_iou", 0.5)),
+            MIN_HITS=int(tracking_cfg.get("min_hits", 2)),
+            MAX_LOST=int(tracking_cfg.get("max_lost", 8)),
+            COAST_FRAMES=int(tracking_cfg.get("coast_frames", 2)),
+            STREAM=bool(tracking_cfg.get("stream", True)),
+            STREAM_CHANGES_ONLY=bool(tracking_cfg.get("stream_changes_only", True)),
+        )
+
+        # 日志配置：从 app.yaml 解析，LOG_LEVEL / LOG_FORMAT 环境变量优先（便于容器部署时切换为 JSON）
+        import os
+
+        log_cfg = (yaml_config or {}).get("logging", {}) or {}
+        self.logging = LoggingConfig(
+            LEVEL=str(os.getenv("LOG_LEVEL") or log_cfg.get("level", "INFO")),
+            FORMAT=str(os.getenv("LOG_FORMAT") or log_cfg.get("format", "text")),
+            ASYNC=bool(log_cfg.get("async", True)),
+            QUEUE_SIZE=int(log_cfg.get("queue_size", 10000)),
+            PER_FRAME_SAMPLE_RATE=float(log_cfg.get("per_frame_sample_rate", 0.1)),
+            SAMPLING={str(k): float(v) for k, v in (log_cfg.get("sampling") or {}).items()},
+            ACCESS_LOG=bool(log_cfg.get("access_log", True)),
+        )
+
+        # 链路追踪配置：TRACING_ENABLED 环境变量优先
+        trace_cfg = (yaml_config or {}).get("tracing", {}) or {}
+        tracing_enabled = os.getenv("TRACING_ENABLED")
+        self.tracing = TracingConfig(
+            ENABLED=(tracing_enabled.lower() in ("1", "true", "yes")) if tracing_enabled else bool(trace_cfg.get("enabled", True)),
+            FILE=str(trace_cfg.get("file", "logs/traces.jsonl")),
+            MAX_BYTES=int(trace_cfg.get("max_bytes", 50 * 1024 * 1024)),
+            BACKUP_COUNT=int(trace_cfg.get("backup_count", 5)),
+            SLOW_THRESHOLD_MS=float(trace_cfg.get("slow_threshold_ms", 3000.0)),
+            SAMPLE_RATE=float(trace_cfg.get("sample_rate", 0.01)),
+            ERROR_SAMPLE_RATE=float(trace_cfg.get("error_sample_rate", 1.0)),
+            QUEUE_SIZE=int(trace_cfg.get("queue_size", 1000)),
+            SERVICE_NAME=str(trace_cfg.get("service_name", "seeforme-server")),
+        )
+
+        # 健康检查配置
+        health_cfg = (yaml_config or {}).get("health", {}) or {}
+        self.health = HealthConfig(
+            PROBE_INTERVAL=float(health_cfg.get("probe_interval", 10.0)),
+            PROBE_TIMEOUT=float(health_cfg.get("probe_timeout", 2.0)),
+            REQUIRE_LANGUAGE=bool(health_cfg.get("require_language", False)),
+            WARMUP_REQUIRED=bool(health_cfg.get("warmup_required", True)),
+        )
+
+        # 内存监控配置
+        memory_cfg = (yaml_config or {}).get("memory", {}) or {}
+        self.memory = MemoryConfig(
+            SAMPLE_INTERVAL=float(memory_cfg.get("sample_interval", 30.0)),
+            HISTORY=int(memory_cfg.get("history", 2880)),
+            GROWTH_WINDOW=float(memory_cfg.get("growth_window", 3600.0)),
+            GROWTH_WARN_MB=float(memory_cfg.get("growth_warn_mb", 200.0)),
+            TRACEMALLOC_FRAMES=int(memory_cfg.get("tracemalloc_frames", 10)),
+            TRACEMALLOC_AT_STARTUP=bool(memory_cfg.get("tracemalloc_at_startup", False)),
+            MAX_SNAPSHOTS=int(memory_cfg.get("max_snapshots", 4)),
+        )
+
+        # 安全配置：管理员令牌优先取环境变量 ADMIN_TOKEN，避免写入版本库
+        security_cfg = (yaml_config or {}).get("security", {}) or {}
+        self.security = SecurityConfig(
+            ADMIN_TOKEN=str(os.getenv("ADMIN_TOKEN") or security_cfg.get("admin_token") or ""),
+        )
+
         # 语言配置：不再通过环境变量注入，而是直接从 app.yaml 显式解析
         # 注意：仅在 qwen_cloud 模式下，才使用环境变量 QWEN_API_KEY 覆盖云端 api_key
         lang_cfg = (yaml_config or {}).get("language", {})
@@ -170,6 +462,7 @@ class Settings(BaseSettings):
             q_cloud = lang_cfg.get("qwen_cloud", {}) or {}
 
             prompts_cfg = lang_cfg.get("prompts", {}) or {}
+            breaker_cfg = lang_cfg.get("circuit_breaker", {}) or {}
 
             # api_key 优先级（仅在 qwen_cloud 模式下启用环境变量覆盖）：
             #   1. QWEN_API_KEY 环境变量（仅 mode == qwen_cloud 时）
@@ -217,12 +510,44 @@ class Settings(BaseSettings):
                 RESPONSE_TIMEOUT=float(
                     lang_cfg.get("response_timeout", 20.0)
                 ),
+                BREAKER_FAILURE_THRESHOLD=int(breaker_cfg.get("failure_threshold", 5)),
+                BREAKER_RESET_TIMEOUT=float(breaker_cfg.get("reset_timeout", 30.0)),
+                HTTP_POOL_SIZE=int(lang_cfg.get("http_pool_size", 10)),
                 PROMPTS_DIR=str(prompts_cfg.get("dir")) if prompts_cfg.get("dir") is not None else None,
                 PROMPTS_SCENE=str(prompts_cfg.get("scene", "vision_description")),
                 PROMPTS_TEMPLATE=str(prompts_cfg.get("template", "default")),
+                PROMPT_CACHE_SIZE=int(prompts_cfg.get("cache_size", 256)),
+                PROMPT_BBOX_QUANTUM=int(prompts_cfg.get("bbox_quantum", 8)),
             )
 
 
 settings = Settings()
 
 
+# 支持热重载的配置段：变化后重建对应模型；其余配置段（并发、连接数、日志等）在启动时读取，修改后需重启
+HOT_RELOAD_SECTIONS = ("vision", "language", "model_cache")
+
+# 运行时覆盖的配置项（如预派生启动器按进程设置的线程数），热重载时保留
+_runtime_overrides: Dict[str, Dict[str, Any]] = {}
+
+
+def set_runtime_override(section: str, field: str, value: Any) -> None:
+    """在运行时修改配置项，并在之后的 reload_settings() 中保留该值"""
+    setattr(getattr(settings, section), field, value)
+    _runtime_overrides.setdefault(section, {})[field] = value
+
+
+def reload_settings() -> List[str]:
+    """重新读取 app.yaml，把支持热重载的配置段更新到全局 settings，返回内容发生变化的配置段"""
+    fresh = Settings()
+    changed = []
+    for name in HOT_RELOAD_SECTIONS:
+        section = getattr(fresh, name)
+        for field, value in _runtime_overrides.get(name, {}).items():
+            setattr(section, field, value)
+        if section != getattr(settings, name):
+            setattr(settings, name, section)
+            changed.append(name)
+    if changed:
+        logger.info(f"配置已重新加载，变化的配置段: {', '.join(changed)}")
+    return changed
@@ -0,0 +1,448 @@
+"""
+进程内指标（Prometheus 文本格式）
+
+轻量实现，不依赖 prometheus_client：
+- Histogram：固定分桶，记录各处理阶段耗时，可按分桶估算 p50/p95/p99；
+  可选滚动窗口（rolling_window），按时间分片保存最近一段时间的分桶计数，用于健康检查中的近期 p50/p95
+- Counter / Gauge：计数与瞬时值，支持在抓取时通过回调取值（set_function）
+- 所有指标注册在全局 MetricsRegistry 中，由 /api/v1/metrics 以 Prometheus 文本格式输出
+
+热路径上一次 observe() 只做一次二分查找和一次加锁累加，开销见 app/benchmarks/metrics_overhead.py。
+注意：预派生多进程模式下各工作进程的指标相互独立，每次抓取只返回其中一个进程的数据。
+"""
+
+import bisect
+import contextlib
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# 默认耗时分桶（秒）：覆盖从亚毫秒级的解码到数十秒的 LLM 调用
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{_escape_label(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _bucket_quantile(buckets: Tuple[float, ...], counts: Sequence[int], total: int, q: float) -> Optional[float]:
+    """按分桶线性插值估算分位数（与 Prometheus histogram_quantile 一致）"""
+    if total == 0:
+        return None
+    rank = q * total
+    cumulative = 0
+    for index, count in enumerate(counts):
+        if cumulative + count >= rank and count > 0:
+            if index >= len(buckets):
+                # 落在 +Inf 桶：返回最大的有限上界
+                return buckets[-1]
+            lower = buckets[index - 1] if index > 0 else 0.0
+            upper = buckets[index]
+            return lower + (upper - lower) * (rank - cumulative) / count
+        cumulative += count
+    return buckets[-1]
+
+
+class _RollingCounts:
+    """
+    滚动窗口分桶计数：窗口按时间均分为若干片，每片保存一份分桶计数，
+    过期的片在下次写入时清零复用，内存固定（片数 × 桶数）
+    """
+
+    __slots__ = ("_slot_seconds", "_slots", "_slot_ids", "_counts")
+
+    def __init__(self, num_buckets: int, window: float, slots: int):
+        self._slot_seconds = window / slots
+        self._slots = slots
+        self._slot_ids = [-1] * slots
+        self._counts = [[0] * num_buckets for _ in range(slots)]
+
+    def add(self, index: int, now: float) -> None:
+        slot_id = int(now / self._slot_seconds)
+        position = slot_id % self._slots
+        if self._slot_ids[position] != slot_id:
+            self._slot_ids[position] = slot_id
+            counts = self._counts[position]
+            for i in range(len(counts)):
+                counts[i] = 0
+        self._counts[position][index] += 1
+
+    def merged(self, now: float) -> List[int]:
+        current = int(now / self._slot_seconds)
+        merged = [0] * len(self._counts[0])
+        for slot_id, counts in zip(self._slot_ids, self._counts):
+            if current - self._slots < slot_id <= current:
+                for i, count in enumerate(counts):
+                    merged[i] += count
+        return merged
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_counts", "_sum", "_count", "_lock", "_rolling")
+
+    def __init__(self, buckets: Tuple[float, ...], rolling_window: Optional[float] = None, rolling_slots: int = 6):
+        self._buckets = buckets
+        # 最后一个位置对应 +Inf
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+        self._rolling = _RollingCounts(len(buckets) + 1, rolling_window, rolling_slots) if rolling_window else None
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            if self._rolling is not None:
+                self._rolling.add(index, time.monotonic())
+
+    @contextlib.contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            return list(self._counts), self._sum, self._count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按分桶线性插值估算分位数（进程启动以来的全部观测）"""
+        counts, _, total = self.snapshot()
+        return _bucket_quantile(self._buckets, counts, total, q)
+
+    def rolling_summary(self) -> Optional[Dict[str, Optional[float]]]:
+        """滚动窗口内的计数与 p50/p95（未启用滚动窗口时返回 None）"""
+        if self._rolling is None:
+            return None
+        with self._lock:
+            counts = self._rolling.merged(time.monotonic())
+        total = sum(counts)
+        return {
+            "count": total,
+            "p50": _bucket_quantile(self._buckets, counts, total, 0.5),
+            "p95": _bucket_quantile(self._buckets, counts, total, 0.95),
+        }
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        _, total_sum, total = self.snapshot()
+        return {
+            "count": total,
+            "mean": total_sum / total if total else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _GaugeChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _Metric:
+    """指标族：按标签值区分子指标；无标签时直接在指标族上调用"""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._function: Optional[Callable] = None
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """获取（或创建）指定标签值的子指标；热路径上建议在模块级缓存返回值"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际传入 {values}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def set_function(self, function: Callable) -> None:
+        """
+        抓取时通过回调取值，替代手动更新：
+        无标签时返回数值，有标签时返回 {标签值元组: 数值}
+        """
+        self._function = function
+
+    def _samples(self) -> List[Tuple[Tuple[str, ...], float]]:
+        if self._function is not None:
+            result = self._function()
+            if self.labelnames:
+                return [(tuple(str(v) for v in key), float(value)) for key, value in result.items()]
+            return [((), float(result))]
+        return [(key, child.value) for key, child in list(self._children.items())]
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        for key, value in self._samples():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._children[()].set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._children[()].dec(amount)
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        rolling_window: Optional[float] = None,
+    ):
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        self.rolling_window = rolling_window
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets, self.rolling_window)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def time(self):
+        return self._children[()].time()
+
+    def summaries(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """各子指标的计数、均值与 p50/p95/p99（JSON 友好）"""
+        return {
+            ",".join(key) or self.name: child.summary()
+            for key, child in list(self._children.items())
+        }
+
+    def rolling_summaries(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """各子指标在滚动窗口内的计数与 p50/p95（需创建时指定 rolling_window）"""
+        summaries = {}
+        for key, child in list(self._children.items()):
+            summary = child.rolling_summary()
+            if summary is not None:
+                summaries[",".join(key) or self.name] = summary
+        return summaries
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for key, child in list(self._children.items()):
+            counts, total_sum, total = child.snapshot()
+            cumulative = 0
+            for upper, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(upper)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表：同名指标只创建一次，可在任意模块中重复获取"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, *args, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls):
+                raise ValueError(f"指标 {name} 已注册为 {metric.metric_type}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        rolling_window: Optional[float] = None,
+    ) -> Histogram:
+        return self._get_or_create(
+            Histogram, name, documentation, labelnames, buckets=buckets, rolling_window=rolling_window
+        )
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Prometheus 文本格式（text/plain; version=0.0.4）"""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # 单个回调失败不影响其他指标输出
+                lines.append(f"# {metric.name} 采集失败: {e}")
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表实例
+_registry: Optional[MetricsRegistry] = None
+
+
+def get_metrics_registry() -> MetricsRegistry:
+    """获取全局指标注册表（单例模式）"""
+    global _registry
+    if _registry is None:
+        _registry = MetricsRegistry()
+    return _registry
+
+
+# ---------------- 业务指标 ----------------
+
+# 处理阶段：
+#   receive        解析一条客户端消息（JSON）
+#   base64_decode  base64 图像解码
+#   jpeg_decode    图像字节 -> 像素（cv2.imdecode + 颜色转换）
+#   letterbox      缩放/填充为模型输入张量
+#   ort_run        ONNX Runtime 推理
+#   postprocess    输出解码与 NMS
+#   track          会话级多目标跟踪（开启跟踪的会话）
+#   llm_ttfb       LLM 请求发出到收到首字节
+#   llm_total      LLM 调用总耗时
+#   sentence_emit  语言结果拆句并逐句推送
+#   send           单条 WebSocket 消息写入
+#   pipeline_total 单帧视觉到文本的端到端耗时
+STAGES = (
+    "receive", "base64_decode", "jpeg_decode", "letterbox", "ort_run", "postprocess", "track",
+    "llm_ttfb", "llm_total", "sentence_emit", "send", "pipeline_total",
+)
+
+# 各阶段额外保留最近 60 秒的分桶计数（6 片 × 10 秒），供健康检查报告近期 p50/p95
+STAGE_ROLLING_WINDOW = 60.0
+
+STAGE_SECONDS = get_metrics_registry().histogram(
+    "seeforme_stage_seconds", "各处理阶段耗时（秒）", ["stage"], rolling_window=STAGE_ROLLING_WINDOW
+)
+LANGUAGE_FALLBACKS = get_metrics_registry().counter(
+    "seeforme_language_fallbacks_total", "语言生成回退到模板的次数", ["reason"]
+)
+CACHE_LOOKUPS = get_metrics_registry().counter(
+    "seeforme_cache_lookups_total", "缓存查询次数", ["cache", "result"]
+)
+
+_stage_children = {stage: STAGE_SECONDS.labels(stage) for stage in STAGES}
+
+
+def stage(name: str) -> _HistogramChild:
+    """获取某个处理阶段的耗时直方图（已预先创建，热路径上直接调用 observe / time）"""
+    return _stage_children.get(name) or STAGE_SECONDS.labels(name)
+
+
+def record_fallback(reason: str) -> None:
+    LANGUAGE_FALLBACKS.labels(reason).inc()
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
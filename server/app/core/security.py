@@ -1,3 +1,26 @@
-"""安全认证相关占位模块。"""
+"""安全认证相关逻辑。"""
 
+import hmac
+from typing import Optional
 
+
+def admin_enabled(admin_token: Optional[str]) -> bool:
+    """未配置管理员令牌时，管理接口整体关闭"""
+    return bool(admin_token)
+
+
+def verify_admin_token(provided: Optional[str], admin_token: Optional[str]) -> bool:
+    """常量时间比较管理员令牌，避免通过响应时间逐字节猜测"""
+    if not admin_token or not provided:
+        return False
+    return hmac.compare_digest(provided.encode("utf-8"), admin_token.encode("utf-8"))
+
+
+def extract_bearer_token(authorization: Optional[str]) -> Optional[str]:
+    """从 Authorization: Bearer <token> 头中取出令牌"""
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
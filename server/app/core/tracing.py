@@ -0,0 +1,497 @@
+"""
+逐帧链路追踪（轻量实现，不依赖 OpenTelemetry SDK）
+
+每帧图像在收到时创建一条 trace（根 span），处理过程中各阶段（解码、排队、推理、LLM 等待、发送）记录为子 span。
+当前 span 通过 contextvars 传递：asyncio.create_task / asyncio.to_thread 会复制上下文，子任务与线程池中的 span 自动挂到正确的父 span 下；
+loop.run_in_executor 不复制上下文，需要自行用 contextvars.copy_context().run 包装。
+
+采样在 trace 结束后决定（尾部采样）：
+- 根 span 耗时超过 slow_threshold_ms 的慢 trace 全部保留
+- 出错的 trace 按 error_sample_rate 保留
+- 其余按 sample_rate 随机保留
+保留的 trace 放入有界队列，由后台线程以 OTLP/JSON 格式（每行一个 ExportTraceServiceRequest，
+与 OpenTelemetry Collector 的 file exporter / otlpjsonfile receiver 相同）写入按大小轮转的 JSONL 文件，请求处理路径上不做序列化与文件 IO。
+
+用法：
+    root = tracing.start_trace("frame", session_id=session_id, endpoint="/ws/vision")
+    with tracing.span("ort_run"):
+        ...
+    root.end()
+
+注意：async generator 内的 span 不能跨越 yield（yield 期间执行的是调用方代码），跨 yield 的阶段请用
+start_span() / span.end()，或用 traced_stream() 包装整个生成器。
+"""
+
+import asyncio
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncGenerator, Dict, List, Optional, TypeVar
+
+from .metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_TRACES = get_metrics_registry().counter(
+    "seeforme_traces_total", "结束的 trace 数（按采样结果）", ["decision"]
+)
+_TRACES_DROPPED = get_metrics_registry().counter(
+    "seeforme_traces_dropped_total", "导出队列已满而丢弃的 trace 数"
+)
+
+# OTLP 枚举值
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("seeforme_current_span", default=None)
+
+
+# 延迟导入配置，避免循环依赖
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class Trace:
+    """一条 trace：收集其下全部 span，根 span 结束时交给 Tracer 做采样决定"""
+
+    __slots__ = ("trace_id", "spans", "finished", "tracer")
+
+    def __init__(self, tracer: "Tracer"):
+        self.trace_id = f"{random.getrandbits(128):032x}"
+        self.spans: List[Span] = []
+        self.finished = False
+        self.tracer = tracer
+
+    def has_error(self) -> bool:
+        return any(span.status_code == STATUS_ERROR for span in self.spans)
+
+
+class Span:
+    """
+    一个处理阶段；可作为上下文管理器使用（进入时设为当前 span，退出时结束并恢复父 span），
+    也可以由 start_span() 创建后手动 end()
+    """
+
+    __slots__ = (
+        "trace", "name", "span_id", "parent_id", "kind", "start_ns", "end_ns",
+        "attributes", "events", "status_code", "status_message", "_previous",
+    )
+
+    def __init__(
+        self,
+        trace: Trace,
+        name: str,
+        parent: Optional["Span"] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        start_ns: Optional[int] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ):
+        self.trace = trace
+        self.name = name
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent is not None else None
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.events: Optional[List[Dict[str, Any]]] = None
+        self.status_code = STATUS_UNSET
+        self.status_message = ""
+        self._previous: Optional[Span] = None
+        trace.spans.append(self)
+
+    @property
+    def trace_id(self) -> Optional[str]:
+        return self.trace.trace_id
+
+    @property
+    def is_root(self) -> bool:
+        return self.parent_id is None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        if self.events is None:
+            self.events = []
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def set_error(self, message: str = "") -> None:
+        self.status_code = STATUS_ERROR
+        self.status_message = message
+
+    def end(self, error: Optional[str] = None) -> None:
+        """结束 span（重复调用无效）；根 span 结束时整条 trace 进入采样"""
+        if self.end_ns is not None:
+            return
+        if error is not None:
+            self.set_error(error)
+        self.end_ns = time.time_ns()
+        if self.is_root:
+            if _current_span.get() is self:
+                _current_span.set(None)
+            self.trace.tracer.finish(self.trace)
+
+    def __enter__(self) -> "Span":
+        self._previous = _current_span.get()
+        _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None and not isinstance(exc, (asyncio.CancelledError, GeneratorExit)):
+            self.set_error(f"{exc_type.__name__}: {exc}")
+        self.end()
+        _current_span.set(self._previous)
+
+
+class _NoopSpan:
+    """未追踪时返回的空 span，所有操作为空操作"""
+
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        pass
+
+    def set_error(self, message: str = "") -> None:
+        pass
+
+    def end(self, error: Optional[str] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Activation:
+    """把已有 span 设为当前 span（不结束它），用于跨 yield 的 span 或让子任务继承"""
+
+    __slots__ = ("span", "_previous")
+
+    def __init__(self, span):
+        self.span = span
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = _current_span.get()
+        if isinstance(self.span, Span):
+            _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _current_span.set(self._previous)
+
+
+# ---------------- 导出 ----------------
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+def _otlp_span(span: Span) -> Dict[str, Any]:
+    data: Dict[str, Any] = {
+        "traceId": span.trace.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+        "attributes": _otlp_attributes(span.attributes),
+        "status": {"code": span.status_code},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    if span.status_message:
+        data["status"]["message"] = span.status_message
+    if span.events:
+        data["events"] = [
+            {"timeUnixNano": str(event["time_ns"]), "name": event["name"], "attributes": _otlp_attributes(event["attributes"])}
+            for event in span.events
+        ]
+    return data
+
+
+def to_otlp(trace: Trace, service_name: str) -> Dict[str, Any]:
+    """trace -> OTLP/JSON ExportTraceServiceRequest"""
+    resource = {"service.name": service_name, "process.pid": os.getpid()}
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes(resource)},
+            "scopeSpans": [{
+                "scope": {"name": "seeforme.tracing"},
+                # 未结束的 span（如客户端断开后被丢弃的生成器阶段）不导出
+                "spans": [_otlp_span(span) for span in trace.spans if span.end_ns is not None],
+            }],
+        }]
+    }
+
+
+class JsonlSpanExporter:
+    """后台线程把 trace 写入按大小轮转的 JSONL 文件（traces.jsonl -> traces.jsonl.1 -> ...）"""
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int, queue_size: int, service_name: str):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.service_name = service_name
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace) -> None:
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            _TRACES_DROPPED.inc()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        stream = None
+        try:
+            while True:
+                trace = self._queue.get()
+                if trace is None:
+                    break
+                try:
+                    if stream is None:
+                        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+                        stream = open(self.path, "a", encoding="utf-8")
+                    stream.write(json.dumps(to_otlp(trace, self.service_name), ensure_ascii=False, separators=(",", ":")))
+                    stream.write("\n")
+                    if self.max_bytes > 0 and stream.tell() >= self.max_bytes:
+                        stream.close()
+                        stream = None
+                        self._rotate()
+                    elif self._queue.empty():
+                        stream.flush()
+                except Exception as e:
+                    logger.warning(f"写入 trace 失败: {e}")
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def _rotate(self) -> None:
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def shutdown(self, timeout: float = 2.0) -> None:
+        """写完队列中剩余的 trace 后停止后台线程"""
+        thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+        self._thread = None
+
+    def reinit_after_fork(self, path: str) -> None:
+        """子进程中没有父进程的后台线程：换用新队列，写入各自的文件"""
+        self.path = path
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+
+# ---------------- Tracer ----------------
+
+class Tracer:
+    """创建 trace 并在结束时按采样策略决定是否导出"""
+
+    def __init__(self, config=None):
+        config = config or _get_settings().tracing
+        self.enabled = config.ENABLED
+        self.slow_threshold_ns = int(config.SLOW_THRESHOLD_MS * 1_000_000)
+        self.sample_rate = config.SAMPLE_RATE
+        self.error_sample_rate = config.ERROR_SAMPLE_RATE
+        self.base_path = self._resolve_path(config.FILE)
+        self.exporter = JsonlSpanExporter(
+            self._worker_path() if _forked else self.base_path, config.MAX_BYTES, config.BACKUP_COUNT, config.QUEUE_SIZE, config.SERVICE_NAME,
+        )
+        self._random = random.random
+
+    @staticmethod
+    def _resolve_path(path: str) -> str:
+        # 相对路径相对于 server 目录
+        resolved = Path(path)
+        if not resolved.is_absolute():
+            resolved = Path(__file__).resolve().parent.parent.parent / resolved
+        return str(resolved)
+
+    def decide(self, trace: Trace) -> str:
+        root = trace.spans[0]
+        if trace.has_error():
+            return "error" if self._random() < self.error_sample_rate else "discarded"
+        if root.end_ns - root.start_ns >= self.slow_threshold_ns:
+            return "slow"
+        return "sampled" if self._random() < self.sample_rate else "discarded"
+
+    def finish(self, trace: Trace) -> None:
+        if trace.finished:
+            return
+        trace.finished = True
+        decision = self.decide(trace)
+        _TRACES.labels(decision).inc()
+        if decision != "discarded":
+            trace.spans[0].attributes["sampling.decision"] = decision
+            self.exporter.export(trace)
+
+    def _worker_path(self) -> str:
+        stem, ext = os.path.splitext(self.base_path)
+        return f"{stem}.{os.getpid()}{ext}"
+
+    def reinit_after_fork(self) -> None:
+        self.exporter.reinit_after_fork(self._worker_path())
+
+
+_tracer: Optional[Tracer] = None
+# 是否为 fork 出的子进程（预派生多进程模式），子进程各自写入带 pid 后缀的文件
+_forked = False
+
+
+def get_tracer() -> Tracer:
+    """获取全局 Tracer（单例模式）"""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+# ---------------- 调用接口 ----------------
+
+def start_trace(name: str, session_id: Optional[str] = None, start_ns: Optional[int] = None, **attributes: Any):
+    """
+    开始一条新 trace 并把根 span 设为当前 span（调用方负责 root.end()）
+    未启用追踪时返回空 span，trace_id 为 None
+    """
+    tracer = get_tracer()
+    if not tracer.enabled:
+        return NOOP_SPAN
+    if session_id is not None:
+        attributes["session_id"] = session_id
+    root = Span(Trace(tracer), name, kind=SPAN_KIND_SERVER, start_ns=start_ns, attributes=attributes)
+    _current_span.set(root)
+    return root
+
+
+def start_span(name: str, **attributes: Any):
+    """在当前 span 下创建子 span（不设为当前 span），调用方负责 end()；没有进行中的 trace 时返回空 span"""
+    parent = _current_span.get()
+    if parent is None or parent.trace.finished:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent=parent, attributes=attributes)
+
+
+def span(name: str, **attributes: Any):
+    """
+    子 span 上下文管理器：with tracing.span("ort_run"): ...
+    没有进行中的 trace 时返回空 span（开销只有一次 ContextVar 读取）
+    """
+    return start_span(name, **attributes)
+
+
+def use_span(span_obj) -> _Activation:
+    """把已有 span 设为当前 span（不结束它），例如让 create_task 创建的子任务继承该 span"""
+    return _Activation(span_obj)
+
+
+def current_span():
+    return _current_span.get() or NOOP_SPAN
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace.trace_id if current is not None else None
+
+
+def traced_stream(name: str, stream: AsyncGenerator[T, None], **attributes: Any) -> AsyncGenerator[T, None]:
+    """
+    用一个 span 包住整个异步生成器：只在生成器自身执行期间（每次 __anext__）设为当前 span，
+    yield 出去后调用方的代码（如发送消息）仍挂在调用方的 span 下。没有进行中的 trace 时原样返回
+    """
+    stream_span = start_span(name, **attributes)
+    if stream_span is NOOP_SPAN:
+        return stream
+    return _traced_stream(stream_span, stream)
+
+
+async def _traced_stream(stream_span: Span, stream: AsyncGenerator[T, None]) -> AsyncGenerator[T, None]:
+    try:
+        while True:
+            with use_span(stream_span):
+                try:
+                    item = await stream.__anext__()
+                except StopAsyncIteration:
+                    break
+            yield item
+    except BaseException as e:
+        if not isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+            stream_span.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        stream_span.end()
+        await stream.aclose()
+
+
+def shutdown_tracing() -> None:
+    if _tracer is not None:
+        _tracer.exporter.shutdown()
+
+
+def _reinit_after_fork() -> None:
+    global _forked
+    _forked = True
+    if _tracer is not None:
+        _tracer.reinit_after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+atexit.register(shutdown_tracing)
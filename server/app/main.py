@@ -2,16 +2,20 @@ import logging
 import os
 import asyncio
 from fastapi import FastAPI
-from .api.v1.endpoints import health
-from .api.v1.websockets import main as ws_main, vision as ws_vision
+from .api.v1.endpoints import admin, health, metrics as metrics_endpoints, vision as vision_endpoints
+from .api.v1.websockets import main as ws_main, vision as ws_vision, stream as ws_stream
 from .core.config import settings
 from .core.middleware import setup_middleware
+from .utils.logger import setup_logging
 
 logger = logging.getLogger(__name__)
 
 
 def create_app() -> FastAPI:
   """FastAPI 应用工厂。"""
+  # 日志（后台线程写出，逐帧日志按配置采样）
+  setup_logging(settings.logging)
+
   app = FastAPI(title="SeeForMe Server", version="0.1.0")
 
   # 配置中间件（CORS等）
@@ -19,16 +23,20 @@ def create_app() -> FastAPI:
 
   # HTTP 路由注册
   app.include_router(health.router, prefix="/api/v1")
+  app.include_router(vision_endpoints.router, prefix="/api/v1")
+  app.include_router(metrics_endpoints.router, prefix="/api/v1")
+  app.include_router(admin.router, prefix="/api/v1")
   
   # WebSocket 路由注册（不使用 prefix，直接挂载）
   app.include_router(ws_main.router)
   app.include_router(ws_vision.router)
+  app.include_router(ws_stream.router)
   
   print("\n" + "=" * 60)
   print("🚀 SeeForMe Server 正在启动...")
   print("=" * 60)
 
-  # 启动时预热模型（可选）
+  # 启动时在后台加载并预热模型
   @app.on_event("startup")
   async def startup_event():
     """应用启动时的初始化"""
@@ -42,126 +50,68 @@ def create_app() -> FastAPI:
     print(f"   WebSocket 端点:")
     print(f"     - ws://{settings.host}:{settings.port}/ws")
     print(f"     - ws://{settings.host}:{settings.port}/ws/vision/{{session_id}}")
+    print(f"     - ws://{settings.host}:{settings.port}/ws/vision/stream/{{session_id}}（连续视频流）")
     print(f"   HTTP 健康检查: http://{settings.host}:{settings.port}/api/v1/health")
+    print(f"   HTTP 就绪检查: http://{settings.host}:{settings.port}/api/v1/health/ready")
+    print(f"   HTTP 批量描述: POST http://{settings.host}:{settings.port}/api/v1/vision/describe")
+    print(f"   HTTP 指标: http://{settings.host}:{settings.port}/api/v1/metrics")
     print("=" * 60)
     
-    # 加载并显示模型信息
+    # 后台内存采样（RSS/堆），供 /api/v1/admin/memory 与泄漏告警使用；
+    # 与模型加载无关，加载一直失败重试时也在运行（模型加载完成后重新计算增长窗口）
+    from .services.memory import get_memory_monitor
+    get_memory_monitor().start()
+    
+    # 热重载：记录 config/、prompts/ 与模型文件的基准，开启 hot_reload.watch 时轮询变化；
+    # 模型仍在加载时修改配置（如改正模型路径）只刷新配置，下一次加载尝试即使用新配置
+    from .services.hot_reload import get_hot_reloader
+    get_hot_reloader().start()
+    
+    # 模型在后台加载：服务立即开始监听，就绪前 /health/ready 返回 503，图像请求短暂等待后回复 WARMING_UP
+    from .services.model_registry import get_model_registry
+    registry = get_model_registry()
+    mode = getattr(settings.language, "MODE", "template").lower()
+    print(f"\n📦 加载视觉模型与语言模型（语言模式: {mode}）...")
+    load_task = asyncio.create_task(_load_models(registry))
+    app.state.model_loader = load_task
+    if settings.model_loading.BACKGROUND:
+      print("   后台加载中，就绪后 /api/v1/health/ready 返回 200")
+    else:
+      await load_task
+  
+  async def _load_models(registry) -> None:
+    """后台加载并预热模型（各模型失败后按退避重试），完成后显示模型信息"""
+    try:
+      await registry.start()
+    except asyncio.CancelledError:
+      raise
+    except Exception as e:
+      logger.error(f"模型加载失败: {e}", exc_info=True)
+    
     print("\n" + "=" * 60)
     print("🤖 AI 模型状态")
     print("=" * 60)
-    
-    try:
-      # 加载视觉模型
-      print("\n📦 加载视觉模型...")
-      from .services.ai_models.vision import YOLOv8nAdapter
-      # 使用配置的模型路径，避免默认路径找不到文件触发导出
-      vision_model = YOLOv8nAdapter(
-          model_path=settings.vision.YOLO_MODEL_PATH,
-          use_onnx=settings.vision.YOLO_USE_ONNX,
-          confidence_threshold=settings.vision.YOLO_CONFIDENCE_THRESHOLD,
-          iou_threshold=settings.vision.YOLO_IOU_THRESHOLD,
-      )
-      vision_model._print_model_info()  # 显式打印模型信息
-      
-      # 加载语言模型（根据 LANGUAGE_MODE）
-      print("\n📦 加载语言模型...")
-      from .services.ai_models.language import QwenChatAdapter, TemplateLanguageAdapter
-      mode = getattr(settings.language, "MODE", "template").lower()
-      print(f"   使用语言模式: {mode}")
-
-      if mode == "template":
-          print("   ℹ️ 已配置为模板模式（mode=template），不依赖外部语言模型服务。")
-          language_model = TemplateLanguageAdapter(
-              prompts_scene=settings.language.PROMPTS_SCENE,
-              prompts_template=settings.language.PROMPTS_TEMPLATE,
-              prompts_dir=settings.language.PROMPTS_DIR,
-          )
-          language_model_name = "Template"
-      elif mode == "qwen_local":
-          base_url = settings.language.QWEN_BASE_URL
-          api_key = settings.language.QWEN_API_KEY or "dummy"
-          print(f"   ℹ️ 使用本地 Qwen 模式（来自 app.yaml）: base_url={base_url}, model={settings.language.QWEN_MODEL_NAME}")
-          # 使用配置的 RESPONSE_TIMEOUT 作为 API 调用超时
-          api_timeout = settings.language.RESPONSE_TIMEOUT
-          language_model = QwenChatAdapter(
-              model_name=settings.language.QWEN_MODEL_NAME,
-              max_tokens=settings.language.QWEN_MAX_TOKENS,
-              temperature=settings.language.QWEN_TEMPERATURE,
-              base_url=base_url,
-              api_key=api_key,
-              prompts_scene=settings.language.PROMPTS_SCENE,
-              prompts_template=settings.language.PROMPTS_TEMPLATE,
-              prompts_dir=settings.language.PROMPTS_DIR,
-              timeout=api_timeout,  # 使用配置的超时时间（本地 LLM 通常需要 20 秒）
-          )
-          language_model_name = "Qwen (local)"
-      elif mode == "qwen_cloud":
-          base_url = settings.language.QWEN_BASE_URL
-          api_key = settings.language.QWEN_API_KEY
-          if not api_key:
-              raise RuntimeError(
-                  "LANGUAGE_MODE=qwen_cloud 但未配置 QWEN_API_KEY，请在 app.yaml.language.qwen_cloud.api_key 中设置。"
-              )
-          print(f"   ℹ️ 使用云端 Qwen 模式（来自 app.yaml）: base_url={base_url}, model={settings.language.QWEN_MODEL_NAME}")
-          language_model = QwenChatAdapter(
-              model_name=settings.language.QWEN_MODEL_NAME,
-              max_tokens=settings.language.QWEN_MAX_TOKENS,
-              temperature=settings.language.QWEN_TEMPERATURE,
-              base_url=base_url,
-              api_key=api_key,
-              prompts_scene=settings.language.PROMPTS_SCENE,
-              prompts_template=settings.language.PROMPTS_TEMPLATE,
-              prompts_dir=settings.language.PROMPTS_DIR,
-          )
-          language_model_name = "Qwen (cloud)"
-      else:
-          print(f"   ⚠️ 未知 LANGUAGE_MODE={mode}，回退为模板模式。")
-          language_model = TemplateLanguageAdapter(
-              prompts_scene=settings.language.PROMPTS_SCENE,
-              prompts_template=settings.language.PROMPTS_TEMPLATE,
-              prompts_dir=settings.language.PROMPTS_DIR,
-          )
-          language_model_name = "Template"
-      
-      # 模型预热（如果启用）
-      if settings.vision.MODEL_WARMUP:
-        print("\n🔥 开始预热模型...")
-        logger.info("开始预热模型...")
-        try:
-          # 预热视觉模型
-          print("   [1/2] 预热视觉模型 (YOLOv8n)...")
-          import numpy as np
-          import cv2
-          
-          # 创建一个虚拟图像进行预热（使用 cv2 编码为有效的 JPEG 格式）
-          dummy_image = np.zeros((640, 640, 3), dtype=np.uint8)
-          # 填充一些内容，避免完全空白
-          dummy_image[:] = (128, 128, 128)  # 灰色
-          # 编码为 JPEG 字节流
-          _, dummy_bytes = cv2.imencode('.jpg', dummy_image)
-          dummy_bytes = dummy_bytes.tobytes()
-          await vision_model.describe(dummy_bytes)
-          print("   ✅ 视觉模型预热完成")
-          logger.info("视觉模型预热完成")
-          
-          # 预热语言模型
-          print(f"   [2/2] 预热语言模型 ({language_model_name})...")
-          await language_model.generate_description([])
-          print("   ✅ 语言模型预热完成")
-          logger.info("语言模型预热完成")
-        except Exception as e:
-          print(f"   ⚠️  模型预热失败（不影响正常使用）: {e}")
-          logger.warning(f"模型预热失败（不影响正常使用）: {e}")
-      
+    for name, slot in registry.snapshot().items():
+      detail = f"加载 {slot['load_seconds']}s" if "load_seconds" in slot else slot.get("error", "")
+      if "warmup_seconds" in slot:
+        detail += f"，预热 {slot['warmup_seconds']}s"
+      if "warmup_error" in slot:
+        detail += f"（预热失败，不影响正常使用: {slot['warmup_error']}）"
+      print(f"   {name}: {slot['state']} ({slot['attempts']} 次) {detail}")
+    if registry.loaded:
+      from .services.memory import get_memory_monitor
+      get_memory_monitor().restart_growth_window()
+      # 立即探测一次语言后端，就绪检查不必等到下一次才有可达性结果
+      from .services.health import get_health_service
+      get_health_service().refresh_probe()
+      print(f"   语言模型: {registry.language_display_name}")
+      registry.vision_model._print_model_info()  # 显式打印模型信息
       print("\n" + "=" * 60)
-      print("✅ 服务器启动完成，等待客户端连接...")
+      print("✅ 模型就绪，开始处理图像")
       print("=" * 60 + "\n")
-      
-    except Exception as e:
-      print(f"\n⚠️  模型加载失败: {e}")
-      logger.error(f"模型加载失败: {e}", exc_info=True)
+    else:
       print("\n" + "=" * 60)
-      print("⚠️  服务器启动完成（部分功能可能受限）")
+      print(f"⚠️  模型加载失败（图像请求将回复 MODELS_UNAVAILABLE）: {registry.load_error}")
       print("=" * 60 + "\n")
   
   # 关闭时的清理
@@ -174,21 +124,33 @@ def create_app() -> FastAPI:
     logger.info("服务器正在关闭，清理资源...")
     
     try:
-      # 清理 WebSocket 连接
-      from .api.v1.websockets.main import ws_manager
+      # 清理 WebSocket 连接（所有 WebSocket 端点共用同一个管理器）
+      from .services.websocket_manager import get_ws_manager
+      ws_manager = get_ws_manager()
       active_count = len(ws_manager.active_connections)
       if active_count > 0:
         print(f"   关闭 {active_count} 个活跃的 WebSocket 连接...")
         logger.info(f"关闭 {active_count} 个活跃的 WebSocket 连接")
-        # 断开所有连接
-        for client_id in list(ws_manager.active_connections.keys()):
-          try:
-            await ws_manager.disconnect(client_id)
-          except (asyncio.CancelledError, KeyboardInterrupt):
-            # 忽略取消错误，这是正常的关闭流程
-            pass
-          except Exception as e:
-            logger.debug(f"关闭连接 {client_id} 时出错: {e}")
+      # 断开所有连接并停止空闲巡检任务
+      try:
+        await ws_manager.close_all()
+      except (asyncio.CancelledError, KeyboardInterrupt):
+        # 忽略取消错误，这是正常的关闭流程
+        pass
+      except Exception as e:
+        logger.debug(f"关闭 WebSocket 连接时出错: {e}")
+      
+      from .services.hot_reload import get_hot_reloader
+      await get_hot_reloader().stop()
+      
+      from .services.model_registry import get_model_registry
+      await get_model_registry().stop()
+      loader = getattr(app.state, "model_loader", None)
+      if loader is not None and not loader.done():
+        loader.cancel()
+      
+      from .services.memory import get_memory_monitor
+      await get_memory_monitor().stop()
       
       print("   资源清理完成")
       print("=" * 60)
@@ -0,0 +1,464 @@
+"""
+预派生（prefork）多进程启动器
+
+直接使用 `uvicorn --workers N` 时，每个工作进程都会在 startup 事件中各自加载并预热模型，
+内存占用和启动时间都随进程数线性增长。本启动器改为：
+
+1. 父进程加载并预热模型（YOLOv8n ONNX 会话、语言模型、流水线），随后 gc.freeze()；
+2. fork 出 N 个工作进程，模型权重等只读内存以写时复制（copy-on-write）方式共享；
+3. 每个工作进程各自绑定同一端口（SO_REUSEPORT，由内核分配连接），
+   平台不支持时退化为继承父进程已监听的套接字；
+4. 父进程通过共享内存中的心跳监控工作进程，进程退出或事件循环卡死时自动重启，
+   并定期输出每个工作进程的启动耗时与内存占用（RSS / PSS / 私有内存）。
+
+ONNX Runtime 的线程池在 fork 后不可用，因此父进程以 intra_op_num_threads=1 创建会话，
+推理在调用线程内完成；多进程并行取代进程内多线程。
+
+用法（在 server 目录下执行）：
+    python -m app.prefork                       # 进程数取 app.yaml 的 server.workers
+    python -m app.prefork --workers 4 --port 8000
+"""
+
+import argparse
+import asyncio
+import errno
+import gc
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("app.prefork")
+
+# 工作进程异常退出后的重启退避（秒）
+RESPAWN_BACKOFF_MIN = 1.0
+RESPAWN_BACKOFF_MAX = 30.0
+# 存活不足该时长即退出视为“启动即崩溃”，触发退避
+CRASH_LOOP_WINDOW = 10.0
+
+
+def _pick_loop() -> str:
+    try:
+        import uvloop  # noqa: F401
+        return "uvloop"
+    except ImportError:
+        return "asyncio"
+
+
+def _pick_http() -> str:
+    try:
+        import httptools  # noqa: F401
+        return "httptools"
+    except ImportError:
+        return "h11"
+
+
+def _create_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def read_memory(pid: int) -> Dict[str, int]:
+    """读取进程内存占用（KB）：rss，以及 smaps_rollup 提供的 pss / shared / private"""
+    result: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    result["rss"] = int(line.split()[1])
+                    break
+    except OSError:
+        return result
+
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+        result["pss"] = fields.get("Pss", 0)
+        result["shared"] = fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0)
+        result["private"] = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    except OSError:
+        pass
+    return result
+
+
+def _format_memory(mem: Dict[str, int]) -> str:
+    if not mem:
+        return "内存: 未知"
+    text = f"RSS {mem.get('rss', 0) / 1024:.1f}MB"
+    if "pss" in mem:
+        text += (
+            f" | PSS {mem['pss'] / 1024:.1f}MB"
+            f" | 共享 {mem['shared'] / 1024:.1f}MB"
+            f" | 私有 {mem['private'] / 1024:.1f}MB"
+        )
+    return text
+
+
+class WorkerSlot:
+    """一个工作进程槽位（重启后沿用同一槽位与共享内存下标）"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.pid: Optional[int] = None
+        self.spawned_at = 0.0
+        self.restarts = 0
+        self.backoff = 0.0
+        self.next_spawn_at = 0.0
+        self.startup_reported = False
+
+
+class PreforkSupervisor:
+    """父进程：预加载模型、派生并监控工作进程"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        workers: int,
+        threads_per_worker: int = 1,
+        log_level: str = "info",
+        heartbeat_interval: float = 1.0,
+        heartbeat_timeout: float = 30.0,
+        startup_timeout: float = 120.0,
+        graceful_timeout: float = 20.0,
+        report_interval: float = 60.0,
+    ):
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.threads_per_worker = max(1, threads_per_worker)
+        self.log_level = log_level
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.startup_timeout = startup_timeout
+        self.graceful_timeout = graceful_timeout
+        self.report_interval = report_interval
+
+        self.reuse_port = hasattr(socket, "SO_REUSEPORT")
+        self.loop_impl = _pick_loop()
+        self.http_impl = _pick_http()
+
+        # 共享内存（匿名 mmap，fork 后父子进程可见）：
+        # heartbeats[i] 为工作进程 i 最近一次心跳的 monotonic 时间，ready_at[i] 为其完成启动的时间
+        self.heartbeats = multiprocessing.Array("d", self.workers, lock=False)
+        self.ready_at = multiprocessing.Array("d", self.workers, lock=False)
+
+        self.slots: List[WorkerSlot] = [WorkerSlot(i) for i in range(self.workers)]
+        self.preload_time = 0.0
+        self._app = None
+        self._listen_socket: Optional[socket.socket] = None
+        self._stopping = False
+
+    # ---------------- 父进程 ----------------
+
+    def preload(self) -> None:
+        """在父进程中加载并预热模型"""
+        from .core.config import set_runtime_override, settings
+
+        start = time.monotonic()
+        # 线程池在 fork 后不可用：每个工作进程的 ORT 会话只在调用线程内推理（热重载时保留）
+        set_runtime_override("vision", "ORT_INTRA_OP_THREADS", self.threads_per_worker)
+        if self.threads_per_worker > 1:
+            logger.warning(
+                f"threads_per_worker={self.threads_per_worker}：ONNX Runtime 线程池在 fork 后不可用，"
+                f"推理可能卡死，建议保持为 1 并增加进程数"
+            )
+
+        from .main import app
+        from .services.model_registry import get_model_registry
+
+        registry = get_model_registry()
+        registry.load()
+        if settings.vision.MODEL_WARMUP:
+            async def _warmup() -> None:
+                await registry.warmup_vision()
+                await registry.warmup_language()
+
+            try:
+                asyncio.run(_warmup())
+            except Exception as e:
+                logger.warning(f"父进程模型预热失败（工作进程启动时将重试）: {e}")
+
+        self._app = app
+        self.preload_time = time.monotonic() - start
+        logger.info(f"父进程模型加载完成，耗时 {self.preload_time:.2f}s | {_format_memory(read_memory(os.getpid()))}")
+
+        # 把现存对象移出 GC 跟踪，避免子进程的垃圾回收扫描触碰（并复制）共享页
+        gc.collect()
+        gc.freeze()
+
+    def run(self) -> int:
+        self.preload()
+        if not self.reuse_port:
+            # 不支持 SO_REUSEPORT 时由父进程监听，工作进程继承同一个套接字
+            self._listen_socket = _create_socket(self.host, self.port, reuse_port=False)
+
+        print("\n" + "=" * 60)
+        print("🚀 SeeForMe 预派生启动器")
+        print("=" * 60)
+        print(f"   地址: http://{self.host}:{self.port}")
+        print(f"   工作进程: {self.workers}（每进程推理线程 {self.threads_per_worker}）")
+        print(f"   端口共享: {'SO_REUSEPORT' if self.reuse_port else '继承父进程套接字'}")
+        print(f"   事件循环: {self.loop_impl} | HTTP 解析: {self.http_impl}")
+        print(f"   父进程模型加载: {self.preload_time:.2f}s")
+        print("=" * 60 + "\n")
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        for slot in self.slots:
+            self._spawn(slot)
+
+        last_report = time.monotonic()
+        try:
+            while not self._stopping:
+                time.sleep(self.heartbeat_interval)
+                self._reap()
+                self._check_workers()
+                now = time.monotonic()
+                if self.report_interval > 0 and now - last_report >= self.report_interval:
+                    self.report()
+                    last_report = now
+        finally:
+            self._shutdown()
+        return 0
+
+    def _handle_stop(self, signum, frame) -> None:
+        logger.info(f"收到信号 {signal.Signals(signum).name}，开始关闭工作进程")
+        self._stopping = True
+
+    def _spawn(self, slot: WorkerSlot) -> None:
+        self.heartbeats[slot.index] = 0.0
+        self.ready_at[slot.index] = 0.0
+        slot.spawned_at = time.monotonic()
+        slot.startup_reported = False
+
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self._worker_main(slot.index)
+                code = 0
+            except BaseException:
+                logger.exception(f"工作进程 #{slot.index} 异常退出")
+            finally:
+                os._exit(code)
+
+        slot.pid = pid
+        logger.info(f"启动工作进程 #{slot.index} (pid={pid})")
+
+    def _reap(self) -> None:
+        """回收已退出的工作进程，并按退避策略安排重启"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            slot = next((s for s in self.slots if s.pid == pid), None)
+            if slot is None:
+                continue
+            slot.pid = None
+            if self._stopping:
+                continue
+
+            lifetime = time.monotonic() - slot.spawned_at
+            if lifetime < CRASH_LOOP_WINDOW:
+                slot.backoff = min(RESPAWN_BACKOFF_MAX, max(RESPAWN_BACKOFF_MIN, slot.backoff * 2))
+            else:
+                slot.backoff = 0.0
+            slot.next_spawn_at = time.monotonic() + slot.backoff
+            logger.warning(
+                f"工作进程 #{slot.index} (pid={pid}) 已退出（{self._describe_status(status)}，"
+                f"存活 {lifetime:.1f}s），{slot.backoff:.0f}s 后重启"
+            )
+
+    def _check_workers(self) -> None:
+        now = time.monotonic()
+        for slot in self.slots:
+            if slot.pid is None:
+                if not self._stopping and now >= slot.next_spawn_at:
+                    slot.restarts += 1
+                    self._spawn(slot)
+                continue
+
+            ready_at = self.ready_at[slot.index]
+            if ready_at <= 0:
+                if now - slot.spawned_at > self.startup_timeout:
+                    logger.error(f"工作进程 #{slot.index} (pid={slot.pid}) 启动超时，强制重启")
+                    self._kill(slot)
+                continue
+
+            if not slot.startup_reported:
+                slot.startup_reported = True
+                logger.info(
+                    f"工作进程 #{slot.index} (pid={slot.pid}) 就绪，启动耗时 {ready_at - slot.spawned_at:.3f}s | "
+                    f"{_format_memory(read_memory(slot.pid))}"
+                )
+
+            stale = now - self.heartbeats[slot.index]
+            if stale > self.heartbeat_timeout:
+                logger.error(
+                    f"工作进程 #{slot.index} (pid={slot.pid}) 心跳超时 {stale:.1f}s（事件循环可能被阻塞），强制重启"
+                )
+                self._kill(slot)
+
+    def _kill(self, slot: WorkerSlot) -> None:
+        try:
+            os.kill(slot.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _shutdown(self) -> None:
+        for slot in self.slots:
+            if slot.pid is not None:
+                try:
+                    os.kill(slot.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+        deadline = time.monotonic() + self.graceful_timeout
+        while any(slot.pid is not None for slot in self.slots) and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+
+        for slot in self.slots:
+            if slot.pid is not None:
+                logger.warning(f"工作进程 #{slot.index} (pid={slot.pid}) 未在 {self.graceful_timeout:.0f}s 内退出，强制结束")
+                self._kill(slot)
+        self._reap()
+        if self._listen_socket is not None:
+            self._listen_socket.close()
+        logger.info("所有工作进程已退出")
+
+    def report(self) -> None:
+        """输出各工作进程的启动耗时、心跳与内存占用"""
+        now = time.monotonic()
+        lines = [f"父进程 (pid={os.getpid()}) | {_format_memory(read_memory(os.getpid()))}"]
+        for slot in self.slots:
+            if slot.pid is None:
+                lines.append(f"  #{slot.index}: 未运行（重启 {slot.restarts} 次）")
+                continue
+            ready_at = self.ready_at[slot.index]
+            startup = f"{ready_at - slot.spawned_at:.3f}s" if ready_at > 0 else "启动中"
+            heartbeat = now - self.heartbeats[slot.index] if self.heartbeats[slot.index] > 0 else float("nan")
+            lines.append(
+                f"  #{slot.index} pid={slot.pid} | 启动 {startup} | 心跳 {heartbeat:.1f}s 前 | "
+                f"重启 {slot.restarts} 次 | {_format_memory(read_memory(slot.pid))}"
+            )
+        logger.info("工作进程状态:\n" + "\n".join(lines))
+
+    @staticmethod
+    def _describe_status(status: int) -> str:
+        if os.WIFSIGNALED(status):
+            return f"信号 {signal.Signals(os.WTERMSIG(status)).name}"
+        return f"退出码 {os.WEXITSTATUS(status)}"
+
+    # ---------------- 工作进程 ----------------
+
+    def _worker_main(self, index: int) -> None:
+        import uvicorn
+
+        # 恢复默认信号处理，由 uvicorn 接管 SIGINT / SIGTERM 实现优雅退出
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        # 各进程使用不同的随机序列（提示词/话术随机选择）
+        random.seed()
+
+        if self.reuse_port:
+            try:
+                sock = _create_socket(self.host, self.port, reuse_port=True)
+            except OSError as e:
+                if e.errno == errno.EADDRINUSE:
+                    logger.error(f"端口 {self.port} 已被其他程序占用（未开启 SO_REUSEPORT）")
+                raise
+        else:
+            sock = self._listen_socket
+
+        app = self._app
+        heartbeats = self.heartbeats
+        ready_at = self.ready_at
+        interval = self.heartbeat_interval
+
+        async def _heartbeat() -> None:
+            while True:
+                heartbeats[index] = time.monotonic()
+                await asyncio.sleep(interval)
+
+        async def _mark_ready() -> None:
+            # 注册在应用自身 startup 事件之后，执行到这里说明启动流程已完成
+            heartbeats[index] = time.monotonic()
+            ready_at[index] = time.monotonic()
+            app.state.prefork_heartbeat = asyncio.create_task(_heartbeat())
+
+        app.router.on_startup.append(_mark_ready)
+        app.state.prefork_worker = index
+
+        config = uvicorn.Config(
+            app,
+            loop=self.loop_impl,
+            http=self.http_impl,
+            log_level=self.log_level,
+            # 日志已由 app.utils.logger 配置（后台线程写出），不让 uvicorn 重新挂同步输出的 handler
+            log_config=None,
+            lifespan="on",
+        )
+        uvicorn.Server(config).run(sockets=[sock])
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    from .core.config import settings
+
+    parser = argparse.ArgumentParser(description="SeeForMe 预派生多进程启动器（模型只加载一次，各进程共享）")
+    parser.add_argument("--host", default=settings.host, help=f"监听地址（默认 {settings.host}）")
+    parser.add_argument("--port", type=int, default=settings.port, help=f"监听端口（默认 {settings.port}）")
+    parser.add_argument("--workers", type=int, default=settings.workers, help=f"工作进程数（默认 {settings.workers}）")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="每个进程的 ONNX Runtime 推理线程数（默认 1）")
+    parser.add_argument("--log-level", default="info", help="uvicorn 日志级别（默认 info）")
+    parser.add_argument("--heartbeat-timeout", type=float, default=30.0, help="心跳超时（秒），超时的工作进程会被重启")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="工作进程启动超时（秒）")
+    parser.add_argument("--graceful-timeout", type=float, default=20.0, help="关闭时等待工作进程退出的时长（秒）")
+    parser.add_argument("--report-interval", type=float, default=60.0, help="状态报告间隔（秒），0 表示不定期报告")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    if not hasattr(os, "fork"):
+        print("预派生启动器依赖 os.fork，当前平台请直接使用 uvicorn 启动", file=sys.stderr)
+        return 1
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+    args = parse_args(argv)
+    supervisor = PreforkSupervisor(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        log_level=args.log_level,
+        heartbeat_timeout=args.heartbeat_timeout,
+        startup_timeout=args.startup_timeout,
+        graceful_timeout=args.graceful_timeout,
+        report_interval=args.report_interval,
+    )
+    return supervisor.run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
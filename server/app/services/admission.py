@@ -0,0 +1,124 @@
+"""
+请求准入控制
+限制同时处理的图像数量（vision.max_concurrent_requests）与排队长度，
+WebSocket 与 HTTP 批量接口共用同一个控制器，超出上限的请求被快速拒绝（削峰）。
+"""
+
+import asyncio
+import contextlib
+import logging
+from typing import AsyncIterator, Optional
+
+from ..core import tracing
+
+logger = logging.getLogger(__name__)
+
+
+# 延迟导入配置，避免循环依赖
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class AdmissionRejected(Exception):
+    """请求未获准入（排队已满或等待超时）"""
+
+
+class AdmissionController:
+    """基于计数的准入控制器，支持按权重（如一个批次包含多张图像）申请名额"""
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        vision_cfg = _get_settings().vision
+        self.max_concurrent = max(1, max_concurrent if max_concurrent is not None else vision_cfg.MAX_CONCURRENT_REQUESTS)
+        self.max_queued = max(0, max_queued if max_queued is not None else vision_cfg.MAX_QUEUED_REQUESTS)
+        self.timeout = timeout if timeout is not None else vision_cfg.ADMISSION_TIMEOUT
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.total_admitted = 0
+        self.total_rejected = 0
+        self._cond: Optional[asyncio.Condition] = None
+
+    def _condition(self) -> asyncio.Condition:
+        # Condition 需在事件循环内创建
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    def is_saturated(self) -> bool:
+        """并发已满且排队已满，新请求必然被拒绝"""
+        return self.in_flight >= self.max_concurrent and self.waiting >= self.max_queued
+
+    @contextlib.asynccontextmanager
+    async def slot(self, weight: int = 1, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        申请 weight 个处理名额，退出上下文时归还
+
+        Raises:
+            AdmissionRejected: 排队已满或在 timeout 内未获得名额
+        """
+        weight = max(1, min(weight, self.max_concurrent))
+        timeout = self.timeout if timeout is None else timeout
+        cond = self._condition()
+
+        # 排队等待计入 trace（admission_wait），便于区分慢在排队还是慢在处理；
+        # 拒绝是正常的削峰行为，记为属性而不是错误，是否算错误由调用方决定
+        wait_span = tracing.start_span("admission_wait", weight=weight, in_flight=self.in_flight, waiting=self.waiting)
+        try:
+            async with cond:
+                if self.in_flight + weight > self.max_concurrent:
+                    if self.waiting >= self.max_queued:
+                        self.total_rejected += 1
+                        raise AdmissionRejected("服务器繁忙：处理队列已满")
+                    self.waiting += 1
+                    try:
+                        await asyncio.wait_for(
+                            cond.wait_for(lambda: self.in_flight + weight <= self.max_concurrent),
+                            timeout=timeout,
+                        )
+                    except asyncio.TimeoutError:
+                        self.total_rejected += 1
+                        raise AdmissionRejected(f"服务器繁忙：等待处理名额超过 {timeout:.1f}s")
+                    finally:
+                        self.waiting -= 1
+                self.in_flight += weight
+                self.total_admitted += 1
+        except AdmissionRejected:
+            wait_span.set_attribute("rejected", True)
+            raise
+        finally:
+            wait_span.end()
+
+        try:
+            yield
+        finally:
+            async with cond:
+                self.in_flight -= weight
+                cond.notify_all()
+
+    def snapshot(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "total_admitted": self.total_admitted,
+            "total_rejected": self.total_rejected,
+        }
+
+
+# 全局准入控制器实例
+_admission: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取全局准入控制器（单例模式）"""
+    global _admission
+    if _admission is None:
+        _admission = AdmissionController()
+    return _admission
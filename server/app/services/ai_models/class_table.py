@@ -0,0 +1,183 @@
+"""
+类别表
+视觉层与语言层共用的不可变类别表：类别 id -> (英文名, 中文名)，名称在加载时一次算好。
+
+- 映射文件（默认 server/config/coco_classes_zh_en.yaml）按路径只解析一次，所有适配器共用同一个实例；
+  文件变化（mtime / 大小）后下次获取时重新解析，热重载更换映射文件后新建的模型自然使用新表
+- 视觉解码只产出 class_id，名称在生成检测结果时按下标取出，不再逐个检测做字典查找与 str.format 回退
+- 提示词与回退模板按 class_id 取中文名；没有 class_id 的检测（如外部传入）才按名称翻译
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+MAPPING_FILE_NAME = "coco_classes_zh_en.yaml"
+UNKNOWN_ZH = "未知物体"
+
+
+def default_mapping_path() -> Path:
+    """默认映射文件路径：向上查找 server/config/coco_classes_zh_en.yaml"""
+    current_file = Path(__file__).resolve()
+    for parent in current_file.parents:
+        candidate = parent / "config" / MAPPING_FILE_NAME
+        if candidate.exists():
+            return candidate
+        # 遇到项目根标志（包含 app 和 requirements.txt）即停止
+        if (parent / "app").exists() and (parent / "requirements.txt").exists():
+            return candidate
+    # 最后兜底：按预期层级拼接（app/services/ai_models -> server）
+    return current_file.parent.parent.parent.parent / "config" / MAPPING_FILE_NAME
+
+
+def _contains_chinese(text: str) -> bool:
+    return any("\u4e00" <= ch <= "\u9fff" for ch in text)
+
+
+@dataclass(frozen=True)
+class ClassTable:
+    """类别 id -> 英文名 / 中文名（元组按 id 下标访问），以及映射中未收录名称的回退格式"""
+    names_en: Tuple[str, ...] = ()
+    names_zh: Tuple[str, ...] = ()
+    fallback_format: str = "{en}"
+    unknown_zh: str = UNKNOWN_ZH
+    source: Optional[str] = None
+    _en_to_zh: Dict[str, str] = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def from_config(
+        cls,
+        mapping: Dict[str, str],
+        defaults: Optional[Dict[str, str]] = None,
+        names: Optional[Sequence[str]] = None,
+        source: Optional[str] = None,
+    ) -> "ClassTable":
+        """
+        由映射文件内容构建
+
+        Args:
+            mapping: 英文名 -> 中文名（按类别 id 顺序）
+            defaults: fallback_format / unknown_zh
+            names: 模型自带的类别名（按 id 顺序），None 表示使用 mapping 的键
+        """
+        defaults = defaults or {}
+        fallback_format = str(defaults.get("fallback_format", "{en}"))
+        unknown_zh = str(defaults.get("unknown_zh", UNKNOWN_ZH))
+        mapping = mapping or {}
+        en_to_zh = {str(en): str(zh) for en, zh in mapping.items() if zh}
+        names_en = tuple(str(name) for name in (names if names is not None else mapping.keys()))
+        names_zh = tuple(
+            en_to_zh.get(name) or fallback_format.format(en=name, zh=unknown_zh) for name in names_en
+        )
+        return cls(names_en, names_zh, fallback_format, unknown_zh, source, en_to_zh)
+
+    def __len__(self) -> int:
+        return len(self.names_en)
+
+    def names(self, use_chinese: bool = True) -> Tuple[str, ...]:
+        """按 id 下标访问的展示名称"""
+        return self.names_zh if use_chinese else self.names_en
+
+    def name(self, class_id: int, use_chinese: bool = True) -> str:
+        names = self.names(use_chinese)
+        if 0 <= class_id < len(names):
+            return names[class_id]
+        return self.unknown_zh if use_chinese else f"class_{class_id}"
+
+    def translate(self, english_name: str) -> str:
+        """按英文名翻译（已是中文的名称原样返回），映射中没有时使用回退格式"""
+        if not english_name:
+            return self.unknown_zh
+        if _contains_chinese(english_name):
+            return english_name
+        return self._en_to_zh.get(english_name) or self.fallback_format.format(en=english_name, zh=self.unknown_zh)
+
+    def with_names(self, names: Sequence[str]) -> "ClassTable":
+        """使用模型自带的类别名（PyTorch 模型的 names）重新编号，翻译沿用本表的映射"""
+        names = tuple(str(name) for name in names)
+        if names == self.names_en:
+            return self
+        return ClassTable.from_config(
+            self._en_to_zh,
+            {"fallback_format": self.fallback_format, "unknown_zh": self.unknown_zh},
+            names=names,
+            source=self.source,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化（编译产物缓存的 classes.json 格式）"""
+        return {
+            "names": list(self.names_en),
+            "mapping": dict(self._en_to_zh),
+            "defaults": {"fallback_format": self.fallback_format, "unknown_zh": self.unknown_zh},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], source: Optional[str] = None) -> "ClassTable":
+        return cls.from_config(data.get("mapping") or {}, data.get("defaults"), names=data.get("names"), source=source)
+
+
+EMPTY_TABLE = ClassTable()
+
+# 映射文件路径 -> (文件签名, 类别表)
+_tables: Dict[str, Tuple[Optional[Tuple[int, int]], ClassTable]] = {}
+_tables_lock = threading.Lock()
+
+
+def _signature(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _parse(path: Path) -> ClassTable:
+    if not path.exists():
+        logger.warning(f"中英文对照配置文件不存在: {path}，将只使用英文名称")
+        return EMPTY_TABLE
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        table = ClassTable.from_config(config.get("mapping") or {}, config.get("defaults"), source=str(path))
+    except Exception as e:
+        logger.warning(f"加载中英文对照配置失败: {e}，将只使用英文名称")
+        return EMPTY_TABLE
+    logger.info(f"成功加载中英文对照配置: {path}，共 {len(table)} 个类别")
+    return table
+
+
+def get_class_table(mapping_file: Optional[str] = None) -> ClassTable:
+    """
+    获取类别表（同一映射文件只解析一次，文件变化后重新解析）
+
+    Args:
+        mapping_file: 映射文件路径，None 表示默认路径
+    """
+    path = Path(mapping_file) if mapping_file else default_mapping_path()
+    signature = _signature(path)
+    key = str(path.resolve())
+    with _tables_lock:
+        cached = _tables.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        table = _parse(path)
+        _tables[key] = (signature, table)
+        return table
+
+
+def register_class_table(table: ClassTable, mapping_file: Optional[str] = None) -> None:
+    """
+    登记从其他来源（编译产物缓存）得到的类别表，之后 get_class_table 直接返回它而不再解析映射文件
+
+    调用方需保证 table 与映射文件当前内容一致（编译产物缓存键包含映射文件哈希）。
+    """
+    path = Path(mapping_file) if mapping_file else default_mapping_path()
+    with _tables_lock:
+        _tables[str(path.resolve())] = (_signature(path), table)
@@ -1,22 +1,51 @@
 """语言模型基类"""
 
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Tuple
 
 
 class BaseLanguageModel(ABC):
     """语言模型通用接口"""
     
     @abstractmethod
-    async def generate_description(self, detections: List[Dict]) -> str:
+    async def generate_description(
+        self,
+        detections: List[Dict],
+        template: Optional[str] = None,
+        image_shape: Optional[Tuple[int, ...]] = None,
+    ) -> str:
         """
         根据检测结果生成自然语言描述
         
         Args:
             detections: 视觉检测结果列表
+            template: 提示词模板名称（会话协商），None 使用适配器配置的模板
+            image_shape: 画面尺寸 (高, 宽)，用于把检测框换算成方位；None 表示未知
             
         Returns:
             自然语言描述文本
         """
         raise NotImplementedError
 
+    async def probe(self, timeout: float = 2.0) -> Optional[Dict[str, Any]]:
+        """
+        探测外部后端是否可达（供健康检查使用）
+
+        Returns:
+            {"reachable": bool, ...}；不依赖外部后端的实现返回 None
+        """
+        return None
+
+    async def warmup(self, connections: int = 1, timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+        """
+        预热外部后端：建立 connections 个长连接并完成一次极短的真实请求
+
+        Returns:
+            预热结果；不依赖外部后端的实现返回 None
+        """
+        return None
+
+    def describe_backend(self) -> Dict[str, Any]:
+        """后端信息（供健康检查展示）"""
+        return {"backend": type(self).__name__}
+
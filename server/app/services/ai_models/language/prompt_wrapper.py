@@ -1,12 +1,25 @@
 import logging
 import re
-from pathlib import Path
-from typing import Dict, List, Optional
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 
-import yaml
+from ..class_table import ClassTable, get_class_table
+from .spatial import analyze_layout
+from ....core.metrics import record_cache
 
 logger = logging.getLogger(__name__)
 
+# 参与提示词的最大检测数（按置信度取前 N）
+PROMPT_TOP_K = 5
+# 模板找不到时使用内置提示词，只需要 objects
+_DEFAULT_PROMPT_FIELDS: FrozenSet[str] = frozenset({"objects"})
+_POSITION_FIELDS = frozenset({"positions", "objects_with_positions", "spatial_relations"})
+
+
+def _confidence(det: Dict) -> float:
+    return det.get("confidence", 0)
+
 
 class PromptWrapper:
     """封装提示词构建、类别翻译、输出清洗与回退模板的通用逻辑。"""
@@ -18,74 +31,41 @@ class PromptWrapper:
         prompts_template: str = "default",
         class_mapping_file: Optional[str] = None,
         use_chinese: bool = True,
+        cache_size: int = 256,
+        bbox_quantum: int = 8,
     ):
         self.prompts_manager = prompts_manager
         self.prompts_scene = prompts_scene
         self.prompts_template = prompts_template
         self.class_mapping_file = class_mapping_file
         self.use_chinese = use_chinese
-        self.class_mapping: Dict[str, str] = {}
-        self.mapping_defaults: Dict[str, str] = {}
-        self._load_class_mapping()
+        # 与视觉层共用的类别表（同一映射文件只解析一次）
+        self.class_table: ClassTable = get_class_table(class_mapping_file)
+        # 提示词缓存：量化后的检测键 -> 组装好的提示词（LRU，0 表示关闭）
+        self.cache_size = max(0, int(cache_size))
+        # 坐标量化步长（像素），提示词中的坐标按该步长取整，1 表示与原始坐标取整一致
+        self.bbox_quantum = max(1, int(bbox_quantum))
+        self._prompt_cache: "OrderedDict[Tuple, str]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
 
     # ========= 类别处理 =========
-    def _load_class_mapping(self):
-        """加载中英文类别映射，供回退模板翻译使用"""
-        try:
-            if self.class_mapping_file:
-                mapping_path = Path(self.class_mapping_file)
-            else:
-                current_file = Path(__file__).resolve()
-                mapping_path = None
-                for parent in current_file.parents:
-                    candidate = parent / "config" / "coco_classes_zh_en.yaml"
-                    if candidate.exists():
-                        mapping_path = candidate
-                        break
-                    if (parent / "app").exists() and (parent / "requirements.txt").exists():
-                        mapping_path = candidate
-                        break
-                if mapping_path is None:
-                    mapping_path = current_file.parent.parent.parent.parent / "config" / "coco_classes_zh_en.yaml"
-
-            if mapping_path.exists():
-                with open(mapping_path, "r", encoding="utf-8") as f:
-                    config = yaml.safe_load(f)
-                    self.class_mapping = config.get("mapping", {})
-                    self.mapping_defaults = config.get("defaults", {})
-                logger.info(f"语言模型加载中英文映射成功: {mapping_path}，共 {len(self.class_mapping)} 条")
-            else:
-                logger.warning(f"语言模型未找到中英文映射文件: {mapping_path}，将直接使用原始类别名称")
-                self.class_mapping = {}
-                self.mapping_defaults = {}
-        except Exception as e:
-            logger.warning(f"语言模型加载中英文映射失败: {e}，将直接使用原始类别名称")
-            self.class_mapping = {}
-            self.mapping_defaults = {}
-
     def translate_class_name(self, english_name: str) -> str:
-        """将英文类别名转换为中文，找不到映射则使用回退格式"""
+        """将英文类别名转换为中文（已是中文的原样返回），找不到映射则使用回退格式"""
         if not self.use_chinese:
             return english_name
-        if not english_name:
-            return self.mapping_defaults.get("unknown_zh", "未知物体")
-
-        # 如果输入已经是中文或包含中文，直接返回，避免重复加“未知物体”
-        if any("\u4e00" <= ch <= "\u9fff" for ch in english_name):
-            return english_name
-
-        chinese_name = self.class_mapping.get(english_name)
-        if chinese_name:
-            return chinese_name
-
-        fallback_format = self.mapping_defaults.get("fallback_format", "{en}")
-        return fallback_format.format(en=english_name, zh=self.mapping_defaults.get("unknown_zh", "未知"))
+        return self.class_table.translate(english_name)
 
     def get_display_name(self, det: Dict) -> str:
         """
-        优先使用视觉模块已提供的中文名称，避免重复翻译。
-        退化顺序：class(中文优先) -> class_en -> '未知物体'
+        按 class_id 从类别表取展示名称（名称已预先算好）；
+        没有 class_id 或与类别表不一致（如自定义类别的模型）时退化为：class(中文优先) -> class_en -> '未知物体'
         """
+        class_id = det.get("class_id")
+        names_en = self.class_table.names_en
+        if isinstance(class_id, int) and 0 <= class_id < len(names_en) and det.get("class_en", names_en[class_id]) == names_en[class_id]:
+            return self.class_table.names(self.use_chinese)[class_id]
         name_cn = det.get("class")
         if name_cn and name_cn.strip():
             return name_cn
@@ -95,8 +75,19 @@ class PromptWrapper:
         return "未知物体"
 
     # ========= 提示词构建与回退 =========
-    def build_prompt(self, detections: List[Dict]) -> str:
-        """构建给语言模型的提示词"""
+    def build_prompt(
+        self,
+        detections: List[Dict],
+        template_name: Optional[str] = None,
+        image_shape: Optional[Tuple[int, ...]] = None,
+    ) -> str:
+        """
+        构建给语言模型的提示词（template_name 为 None 时使用配置的模板）
+        image_shape 为画面尺寸 (高, 宽)，用于 {spatial_relations} 的方位划分，None 时以检测框外接范围近似。
+
+        只计算模板实际用到的占位符字段；组装结果按「模板 + 量化后的检测」缓存，
+        画面基本不变的连续帧直接复用上一次的提示词。
+        """
         if not detections:
             no_detection_prompt = self.prompts_manager.get_prompt(
                 self.prompts_scene,
@@ -106,59 +97,128 @@ class PromptWrapper:
                 return no_detection_prompt
             return "目前没有检测到明显的物体。这可能是一个比较空旷的场景，或者物体距离较远。请稍后再试，或者告诉我你想了解的场景，我会尽力帮助你。"
 
-        sorted_detections = sorted(
-            detections,
-            key=lambda x: x.get("confidence", 0),
-            reverse=True
-        )[:5]
+        template_name = template_name or self.prompts_template
+        compiled = self.prompts_manager.get_compiled(self.prompts_scene, template_name)
+        fields = compiled.fields if compiled is not None else _DEFAULT_PROMPT_FIELDS
 
-        objects = []
-        objects_with_confidence = []
-        positions = []
-        objects_with_positions = []
-        for det in sorted_detections:
-            obj_name = self.get_display_name(det)
-            confidence = det.get("confidence", 0)
-            bbox = det.get("bbox")
-            objects.append(obj_name)
-            objects_with_confidence.append(f"{obj_name}({confidence:.0%})")
-            if bbox and isinstance(bbox, (list, tuple)) and len(bbox) == 4:
-                x1, y1, x2, y2 = bbox
-                bbox_str = f"[{x1:.0f}, {y1:.0f}, {x2:.0f}, {y2:.0f}]"
-                positions.append(f"{obj_name}: {bbox_str}")
-                objects_with_positions.append(f"{obj_name}{bbox_str}")
-            else:
-                objects_with_positions.append(obj_name)
-
-        objects_str = "、".join(objects)
-        objects_with_confidence_str = "、".join(objects_with_confidence)
-        positions_str = "；".join(positions) if positions else "无位置信息"
-        objects_with_positions_str = "；".join(objects_with_positions) if objects_with_positions else "无物体信息"
-
-        prompt = self.prompts_manager.format_prompt(
-            scene=self.prompts_scene,
-            template_name=self.prompts_template,
-            objects=objects_str,
-            objects_with_confidence=objects_with_confidence_str,
-            object_count=len(detections),
-            positions=positions_str,
-            objects_with_positions=objects_with_positions_str
+        top = sorted(detections, key=_confidence, reverse=True)[:PROMPT_TOP_K]
+        entries = self._quantize(top, fields)
+        key = (
+            self.prompts_manager.generation,
+            template_name,
+            compiled is not None,
+            entries,
+            len(detections) if "object_count" in fields else None,
+            tuple(image_shape[:2]) if image_shape is not None and "spatial_relations" in fields else None,
         )
 
-        if not prompt:
+        if self.cache_size:
+            with self._cache_lock:
+                prompt = self._prompt_cache.get(key)
+                if prompt is not None:
+                    self._prompt_cache.move_to_end(key)
+                    self._cache_hits += 1
+                else:
+                    self._cache_misses += 1
+            record_cache("prompt_build", hit=prompt is not None)
+            if prompt is not None:
+                return prompt
+
+        values = self._build_fields(entries, fields, len(detections), image_shape)
+        if compiled is not None:
+            prompt = compiled.render(values)
+        else:
             logger.warning(
                 f"未找到提示词模板 (scene={self.prompts_scene}, "
-                f"template={self.prompts_template})，使用默认模板"
+                f"template={template_name})，使用默认模板"
             )
             prompt = (
                 f"请用温暖、友好、有人情味的中文描述这张图片，就像在向一位视障朋友介绍你看到的世界："
-                f"图片中有{objects_str}。请用自然流畅的语言，帮助用户理解场景，描述要具体生动，适合语音播报。"
+                f"图片中有{values['objects']}。请用自然流畅的语言，帮助用户理解场景，描述要具体生动，适合语音播报。"
             )
 
+        if self.cache_size:
+            with self._cache_lock:
+                self._prompt_cache[key] = prompt
+                if len(self._prompt_cache) > self.cache_size:
+                    self._prompt_cache.popitem(last=False)
         return prompt
 
-    def fallback_template(self, detections: List[Dict]) -> str:
-        """超时时或生成失败时的回退模板"""
+    def _quantize(self, detections: List[Dict], fields: FrozenSet[str]) -> Tuple:
+        """
+        提取模板所需的检测信息作为缓存键：(名称, 置信度百分数, 量化坐标)，模板用不到的部分为 None。
+        提示词由量化后的值生成，因此同一个键总是对应同一个提示词。
+        """
+        need_confidence = "objects_with_confidence" in fields
+        need_position = not fields.isdisjoint(_POSITION_FIELDS)
+        q = self.bbox_quantum
+        entries = []
+        for det in detections:
+            confidence = round(det.get("confidence", 0) * 100) if need_confidence else None
+            bbox = det.get("bbox") if need_position else None
+            if bbox and isinstance(bbox, (list, tuple)) and len(bbox) == 4:
+                x1, y1, x2, y2 = bbox
+                bbox = (int(round(x1 / q)) * q, int(round(y1 / q)) * q, int(round(x2 / q)) * q, int(round(y2 / q)) * q)
+            else:
+                bbox = None
+            entries.append((self.get_display_name(det), confidence, bbox))
+        return tuple(entries)
+
+    @staticmethod
+    def _build_fields(
+        entries: Tuple,
+        fields: FrozenSet[str],
+        object_count: int,
+        image_shape: Optional[Tuple[int, ...]] = None,
+    ) -> Dict[str, Any]:
+        """只计算模板用到的占位符字段"""
+        values: Dict[str, Any] = {}
+        if "objects" in fields:
+            values["objects"] = "、".join(name for name, _, _ in entries)
+        if "objects_with_confidence" in fields:
+            values["objects_with_confidence"] = "、".join(f"{name}({confidence}%)" for name, confidence, _ in entries)
+        if "object_count" in fields:
+            values["object_count"] = object_count
+        if "positions" in fields:
+            positions = [
+                f"{name}: [{bbox[0]}, {bbox[1]}, {bbox[2]}, {bbox[3]}]"
+                for name, _, bbox in entries if bbox is not None
+            ]
+            values["positions"] = "；".join(positions) if positions else "无位置信息"
+        if "objects_with_positions" in fields:
+            values["objects_with_positions"] = "；".join(
+                f"{name}[{bbox[0]}, {bbox[1]}, {bbox[2]}, {bbox[3]}]" if bbox is not None else name
+                for name, _, bbox in entries
+            ) or "无物体信息"
+        if "spatial_relations" in fields:
+            located = [(name, bbox) for name, _, bbox in entries if bbox is not None]
+            parts = []
+            if located:
+                names, boxes = zip(*located)
+                parts.append(analyze_layout(names, boxes, image_shape).facts())
+            parts.extend(name for name, _, bbox in entries if bbox is None)
+            values["spatial_relations"] = "；".join(parts) or "无物体信息"
+        return values
+
+    def cache_info(self) -> Dict[str, Any]:
+        """提示词缓存命中情况（供健康检查展示）"""
+        with self._cache_lock:
+            hits, misses, size = self._cache_hits, self._cache_misses, len(self._prompt_cache)
+        total = hits + misses
+        return {
+            "size": size,
+            "max_size": self.cache_size,
+            "bbox_quantum": self.bbox_quantum,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else None,
+        }
+
+    def fallback_template(self, detections: List[Dict], image_shape: Optional[Tuple[int, ...]] = None) -> str:
+        """
+        超时时或生成失败时的回退模板：置信度最高的 3 个物体；都有检测框时按方位分组说明位置与前后左右关系，
+        如「我看到左侧近处有一个人，正前方有一个椅子。人在椅子前面。」
+        """
         if not detections:
             no_detection_prompt = self.prompts_manager.get_prompt(
                 self.prompts_scene,
@@ -174,10 +234,13 @@ class PromptWrapper:
             reverse=True
         )[:3]
 
+        names = [self.translate_class_name(self.get_display_name(det)) for det in sorted_detections]
+        boxes = [det.get("bbox") for det in sorted_detections]
+        if all(isinstance(bbox, (list, tuple)) and len(bbox) == 4 for bbox in boxes):
+            return "我看到" + analyze_layout(names, boxes, image_shape).sentence()
+
         counted_objects: Dict[str, int] = {}
-        for det in sorted_detections:
-            raw_name = det.get("class") or det.get("class_en") or "未知物体"
-            obj_name_cn = self.translate_class_name(raw_name)
+        for obj_name_cn in names:
             counted_objects[obj_name_cn] = counted_objects.get(obj_name_cn, 0) + 1
 
         objects = []
@@ -188,12 +251,25 @@ class PromptWrapper:
         if len(objects) == 0:
             return "目前没有检测到明显的物体。这可能是一个比较空旷的场景，或者物体距离较远。请稍后再试。"
         elif len(objects) == 1:
-            return f"我看到图片中有一个{objects[0]}。"
+            return f"我看到图片中有{objects[0]}。"
         elif len(objects) == 2:
             return f"我看到图片中有{objects[0]}和{objects[1]}。"
         else:
             return f"我看到图片中有{objects[0]}、{objects[1]}和{objects[2]}等物体。"
 
+    def departure_template(self, departed: List[Dict]) -> str:
+        """跟踪模式下离开画面的物体，如「2个人和椅子离开了画面。」"""
+        counted_objects: Dict[str, int] = {}
+        for det in departed:
+            obj_name_cn = self.translate_class_name(self.get_display_name(det))
+            counted_objects[obj_name_cn] = counted_objects.get(obj_name_cn, 0) + 1
+        if not counted_objects:
+            return ""
+        objects = [f"{count}个{name}" if count > 1 else name for name, count in counted_objects.items()]
+        if len(objects) == 1:
+            return f"{objects[0]}离开了画面。"
+        return f"{'、'.join(objects[:-1])}和{objects[-1]}离开了画面。"
+
     # ========= 输出清洗与校验 =========
     @staticmethod
     def clean_response(text: str) -> str:
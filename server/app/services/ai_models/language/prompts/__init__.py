@@ -1,6 +1,6 @@
 """提示词配置模块"""
 
-from .prompts_manager import PromptsManager, get_prompts_manager
+from .prompts_manager import CompiledTemplate, PromptsManager, get_prompts_manager
 
-__all__ = ["PromptsManager", "get_prompts_manager"]
+__all__ = ["CompiledTemplate", "PromptsManager", "get_prompts_manager"]
 
@@ -1,13 +1,20 @@
 """
 提示词管理器
 统一管理和加载不同场景的提示词配置
+
+模板在加载时编译（CompiledTemplate）：解析一次占位符，记录每个模板需要的字段，
+调用方据此只计算用到的变量；每次加载递增 generation，供调用方的缓存失效。
 """
 
 import os
 import logging
-from typing import Dict, Optional
+import string
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Mapping, Optional
 from pathlib import Path
 
+from .....core.metrics import record_cache
+
 try:
     import yaml
     YAML_AVAILABLE = True
@@ -19,6 +26,47 @@ logger = logging.getLogger(__name__)
 if not YAML_AVAILABLE:
     logger.warning("PyYAML not available, prompts will use fallback")
 
+_FORMATTER = string.Formatter()
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """加载时编译的提示词模板：原文与其需要的占位符字段"""
+    text: str
+    fields: FrozenSet[str] = frozenset()
+    valid: bool = True  # 占位符语法错误时为 False，渲染时原样返回模板
+    literal: Optional[str] = None  # 没有占位符时预先格式化好的结果（{{ }} 已转义）
+
+    @classmethod
+    def compile(cls, text: str) -> "CompiledTemplate":
+        text = str(text)
+        try:
+            fields = set()
+            for _, field_name, _, _ in _FORMATTER.parse(text):
+                if field_name is None:
+                    continue
+                # {obj.attr} / {obj[0]} 只需要根变量；位置参数（{} / {0}）无法按名称提供
+                root = field_name.split(".", 1)[0].split("[", 1)[0]
+                if not root or root.isdigit():
+                    raise ValueError(f"不支持位置占位符: {{{field_name}}}")
+                fields.add(root)
+        except ValueError as e:
+            logger.error(f"提示词模板占位符解析失败，将原样使用: {e}")
+            return cls(text, frozenset(), valid=False)
+        return cls(text, frozenset(fields), literal=None if fields else text.format())
+
+    def render(self, values: Mapping[str, Any]) -> str:
+        """填充占位符（没有占位符的模板直接返回预先格式化的结果，缺少变量时返回未格式化的模板）"""
+        if not self.valid:
+            return self.text
+        if self.literal is not None:
+            return self.literal
+        try:
+            return self.text.format_map(values)
+        except KeyError as e:
+            logger.error(f"提示词模板格式化失败，缺少变量: {e}")
+            return self.text
+
 
 class PromptsManager:
     """提示词管理器，负责加载和管理不同场景的提示词"""
@@ -67,14 +115,25 @@ class PromptsManager:
                     logger.warning(f"使用回退目录: {self.prompts_dir}")
         
         self.prompts_cache: Dict[str, Dict] = {}
+        # 场景 -> 模板名 -> 编译后的模板
+        self.compiled: Dict[str, Dict[str, CompiledTemplate]] = {}
+        # 每次（重新）加载递增，调用方用于使依赖模板内容的缓存失效
+        self.generation = 0
         self._load_all_prompts()
     
     def _load_all_prompts(self):
-        """加载所有提示词配置文件"""
+        """
+        加载所有提示词配置文件
+        
+        先读入新字典再整体替换 prompts_cache / compiled，并发读取的请求只会看到完整的旧配置或新配置；
+        重新加载时某个文件解析失败，该场景保留旧配置
+        """
         if not YAML_AVAILABLE:
             logger.error("PyYAML 未安装，无法加载提示词配置文件")
             return
         
+        previous = self.prompts_cache
+        prompts_cache: Dict[str, Dict] = {}
         try:
             # 查找所有 YAML 配置文件
             yaml_files = list(self.prompts_dir.glob("*.yaml")) + list(self.prompts_dir.glob("*.yml"))
@@ -89,13 +148,26 @@ class PromptsManager:
                         if prompts_data:
                             # 使用文件名（不含扩展名）作为场景名
                             scene_name = yaml_file.stem
-                            self.prompts_cache[scene_name] = prompts_data
+                            prompts_cache[scene_name] = prompts_data
                             logger.info(f"加载提示词配置: {scene_name} ({yaml_file.name})")
                 except Exception as e:
                     logger.error(f"加载提示词文件失败 {yaml_file}: {e}")
+                    if yaml_file.stem in previous:
+                        prompts_cache[yaml_file.stem] = previous[yaml_file.stem]
             
-            if not self.prompts_cache:
+            if not prompts_cache:
                 logger.warning(f"未找到任何提示词配置文件，目录: {self.prompts_dir}")
+            compiled = {
+                scene: {
+                    name: CompiledTemplate.compile(text)
+                    for name, text in ((data or {}).get("templates") or {}).items()
+                    if text
+                }
+                for scene, data in prompts_cache.items()
+            }
+            self.compiled = compiled
+            self.prompts_cache = prompts_cache
+            self.generation += 1
         
         except Exception as e:
             logger.error(f"加载提示词配置失败: {e}", exc_info=True)
@@ -111,19 +183,30 @@ class PromptsManager:
         Returns:
             提示词模板字符串，如果不存在则返回 None
         """
-        scene_prompts = self.prompts_cache.get(scene)
-        if not scene_prompts:
+        compiled = self.get_compiled(scene, template_name)
+        return compiled.text if compiled else None
+    
+    def get_compiled(self, scene: str, template_name: str = "default") -> Optional[CompiledTemplate]:
+        """
+        获取编译后的提示词模板（含所需占位符字段）
+        
+        Returns:
+            CompiledTemplate，如果不存在则返回 None
+        """
+        scene_templates = self.compiled.get(scene)
+        if scene_templates is None:
             logger.warning(f"未找到场景 '{scene}' 的提示词配置")
+            record_cache("prompts", hit=False)
             return None
         
-        templates = scene_prompts.get("templates", {})
-        prompt_template = templates.get(template_name)
-        
-        if not prompt_template:
+        compiled = scene_templates.get(template_name)
+        if compiled is None:
             logger.warning(f"场景 '{scene}' 中未找到模板 '{template_name}'")
+            record_cache("prompts", hit=False)
             return None
         
-        return prompt_template
+        record_cache("prompts", hit=True)
+        return compiled
     
     def format_prompt(self, scene: str, template_name: str = "default", **kwargs) -> Optional[str]:
         """
@@ -137,23 +220,17 @@ class PromptsManager:
         Returns:
             格式化后的提示词字符串
         """
-        template = self.get_prompt(scene, template_name)
-        if not template:
+        compiled = self.get_compiled(scene, template_name)
+        if compiled is None:
             return None
-        
-        try:
-            return template.format(**kwargs)
-        except KeyError as e:
-            logger.error(f"提示词模板格式化失败，缺少变量: {e}")
-            return template  # 返回未格式化的模板
+        return compiled.render(kwargs)
     
     def get_all_scenes(self) -> list:
         """获取所有可用的场景名称"""
         return list(self.prompts_cache.keys())
     
     def reload(self):
-        """重新加载所有提示词配置"""
-        self.prompts_cache.clear()
+        """重新加载所有提示词配置（原子替换，重新加载期间的请求继续使用旧配置）"""
         self._load_all_prompts()
         logger.info("提示词配置已重新加载")
 
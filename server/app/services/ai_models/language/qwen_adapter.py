@@ -3,17 +3,37 @@ Qwen Chat 语言模型适配器（OpenAI 兼容接口）
 适用于 Qwen 官方 DashScope 兼容端点或自建 vLLM/OpenAI-proxy。
 """
 
+import asyncio
+import contextvars
 import logging
-from typing import List, Dict, Optional
+import os
+import time
+import weakref
+from typing import Any, List, Dict, Optional, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from ....core import tracing
+from ....core.metrics import stage, record_fallback
+from ....utils.logger import log_extra
+from ...circuit_breaker import get_breaker
 from .base import BaseLanguageModel
 from .prompts import get_prompts_manager
 from .prompt_wrapper import PromptWrapper
 
 logger = logging.getLogger(__name__)
 
+_LLM_TTFB = stage("llm_ttfb")
+_LLM_TOTAL = stage("llm_total")
+
+_SYSTEM_PROMPT = "你是一个友好、简洁的中文描述助手。"
+# 预热请求：只生成 1 个 token，用于建立连接并让后端完成首次请求的初始化
+_WARMUP_PROMPT = "你好"
+
+# 已创建的适配器（fork 后为子进程重建连接池）
+_adapters: "weakref.WeakSet[QwenChatAdapter]" = weakref.WeakSet()
+
 
 class QwenChatAdapter(BaseLanguageModel):
     """
@@ -34,6 +54,11 @@ class QwenChatAdapter(BaseLanguageModel):
         class_mapping_file: Optional[str] = None,
         use_chinese: bool = True,
         timeout: float = 12.0,
+        breaker_failure_threshold: int = 5,
+        breaker_reset_timeout: float = 30.0,
+        prompt_cache_size: int = 256,
+        prompt_bbox_quantum: int = 8,
+        http_pool_size: int = 10,
     ):
         self.model_name = model_name
         self.max_tokens = max_tokens
@@ -42,6 +67,12 @@ class QwenChatAdapter(BaseLanguageModel):
         self.base_url = base_url or "https://dashscope.aliyuncs.com/compatible-mode"
         self.api_key = api_key
         self.timeout = timeout
+        # 后端连续失败后熔断，熔断期间直接模板回退（见 circuit_breaker.py）
+        self.breaker = get_breaker("llm", breaker_failure_threshold, breaker_reset_timeout)
+        # 长连接池：各请求复用到后端的 TCP/TLS 连接，避免每次调用重新握手
+        self.http_pool_size = max(1, int(http_pool_size))
+        self._session = self._new_session()
+        _adapters.add(self)
 
         self.prompts_manager = get_prompts_manager(prompts_dir)
         self.prompts_scene = prompts_scene
@@ -52,51 +83,168 @@ class QwenChatAdapter(BaseLanguageModel):
             prompts_template=self.prompts_template,
             class_mapping_file=class_mapping_file,
             use_chinese=use_chinese,
+            cache_size=prompt_cache_size,
+            bbox_quantum=prompt_bbox_quantum,
         )
 
-    async def generate_description(self, detections: List[Dict]) -> str:
-        import time
-        
+    async def generate_description(
+        self,
+        detections: List[Dict],
+        template: Optional[str] = None,
+        image_shape: Optional[Tuple[int, ...]] = None,
+    ) -> str:
         if not self.api_key:
             logger.warning("缺少 QWEN_API_KEY，使用模板回退")
-            return self.prompt_wrapper.fallback_template(detections)
+            record_fallback("no_api_key")
+            return self.prompt_wrapper.fallback_template(detections, image_shape)
 
-        prompt = self.prompt_wrapper.build_prompt(detections)
+        if not self.breaker.allow():
+            record_fallback("breaker_open")
+            return self.prompt_wrapper.fallback_template(detections, image_shape)
+
+        prompt = self.prompt_wrapper.build_prompt(detections, template, image_shape)
         logger.debug(f"语言模型 Prompt: {prompt[:200]}...")
         
         call_start_time = time.time()
-        logger.info(f"开始调用 Qwen API: base_url={self.base_url}, model={self.model_name}, timeout={self.timeout}s")
+        logger.info(
+            f"开始调用 Qwen API: base_url={self.base_url}, model={self.model_name}, timeout={self.timeout}s",
+            extra=log_extra(per_frame=True),
+        )
+
+        with tracing.span("llm_call", model=self.model_name, prompt_chars=len(prompt)) as llm_span:
+            try:
+                response_text = await self._call_api(prompt)
+                call_duration = time.time() - call_start_time
+                _LLM_TOTAL.observe(call_duration)
+                # 后端有正常响应即视为可用（输出内容无效不计入熔断）
+                self.breaker.record_success()
+                logger.info(f"Qwen API 调用成功，耗时 {call_duration:.2f}s", extra=log_extra(per_frame=True, llm_time=call_duration))
+                cleaned = self.prompt_wrapper.clean_response(response_text)
+                logger.debug(f"清洗后输出: {cleaned[:200]}")
+                llm_span.set_attribute("response_chars", len(cleaned))
+                if self.prompt_wrapper.looks_valid_response(cleaned):
+                    return cleaned
+                logger.warning("Qwen 输出为空/无中文/疑似无效，使用模板回退")
+                record_fallback("invalid_response")
+                llm_span.set_error("invalid_response")
+            except Exception as e:
+                call_duration = time.time() - call_start_time
+                _LLM_TOTAL.observe(call_duration)
+                logger.error(f"Qwen 调用失败（耗时 {call_duration:.2f}s）: {e}", exc_info=True)
+                record_fallback("api_error")
+                self.breaker.record_failure(f"{type(e).__name__}: {e}")
+                llm_span.set_error(f"api_error: {type(e).__name__}")
 
+        return self.prompt_wrapper.fallback_template(detections, image_shape)
+
+    async def probe(self, timeout: float = 2.0) -> Dict[str, Any]:
+        """
+        探测语言后端是否可达（GET /v1/models，不消耗推理资源）
+        收到任何 HTTP 响应即视为可达，状态码一并返回（云端未授权时为 401）
+        """
+        url = f"{self.base_url.rstrip('/')}/v1/models"
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        start = time.perf_counter()
         try:
-            response_text = await self._call_api(prompt)
-            call_duration = time.time() - call_start_time
-            logger.info(f"Qwen API 调用成功，耗时 {call_duration:.2f}s")
-            cleaned = self.prompt_wrapper.clean_response(response_text)
-            logger.debug(f"清洗后输出: {cleaned[:200]}")
-            if self.prompt_wrapper.looks_valid_response(cleaned):
-                return cleaned
-            logger.warning("Qwen 输出为空/无中文/疑似无效，使用模板回退")
+            resp = await asyncio.to_thread(self._session.get, url, headers=headers, timeout=timeout)
+            return {
+                "reachable": True,
+                "status_code": resp.status_code,
+                "latency": round(time.perf_counter() - start, 4),
+            }
         except Exception as e:
-            call_duration = time.time() - call_start_time
-            logger.error(f"Qwen 调用失败（耗时 {call_duration:.2f}s）: {e}", exc_info=True)
+            return {
+                "reachable": False,
+                "error": f"{type(e).__name__}: {e}",
+                "latency": round(time.perf_counter() - start, 4),
+            }
 
-        return self.prompt_wrapper.fallback_template(detections)
+    def describe_backend(self) -> Dict[str, Any]:
+        return {
+            "backend": "qwen",
+            "base_url": self.base_url,
+            "model": self.model_name,
+            "http_pool_size": self.http_pool_size,
+            "prompt_cache": self.prompt_wrapper.cache_info(),
+        }
 
-    async def _call_api(self, prompt: str) -> str:
-        import asyncio
+    async def warmup(self, connections: int = 1, timeout: float = 10.0) -> Optional[Dict[str, Any]]:
+        """
+        并发发送 connections 个 max_tokens=1 的请求，在连接池中建立长连接，并让后端完成首次请求的初始化
+        （不计入熔断与耗时指标；后端不可达时返回错误信息而不抛出）
+        """
+        connections = min(max(0, connections), self.http_pool_size)
+        if connections == 0:
+            return None
+        # 与正式请求相同的系统提示词，后端开启前缀缓存时一并预热
+        messages = [{"role": "system", "content": _SYSTEM_PROMPT}, {"role": "user", "content": _WARMUP_PROMPT}]
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._post_chat, messages, 1, (min(5.0, timeout), timeout)) for _ in range(connections)),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, BaseException)]
+        report: Dict[str, Any] = {
+            "connections": connections,
+            "ok": connections - len(errors),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+        if errors:
+            report["error"] = f"{type(errors[0]).__name__}: {errors[0]}"
+            logger.warning(f"语言后端预热请求失败 {len(errors)}/{connections}（首个请求将重新建立连接）: {report['error']}")
+        return report
 
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(None, self._call_api_sync, prompt)
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.http_pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
 
-    def _call_api_sync(self, prompt: str) -> str:
-        headers = {
+    def _reset_session(self) -> None:
+        """fork 后调用：子进程不能与父进程共用已建立的连接，丢弃（不关闭）继承的连接池"""
+        self._session = self._new_session()
+
+    def _post_chat(self, messages: List[Dict[str, str]], max_tokens: int, timeout: Tuple[float, float]) -> str:
+        """发送一次 chat/completions 请求（同步阻塞），返回生成的文本"""
+        payload = {
+            "model": self.model_name,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": self.temperature,
+        }
+        resp = self._session.post(
+            f"{self.base_url.rstrip('/')}/v1/chat/completions",
+            json=payload,
+            headers=self._headers(),
+            timeout=timeout,
+        )
+        resp.raise_for_status()
+        return self._extract_content(resp.json())
+
+    def _headers(self) -> Dict[str, str]:
+        return {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.api_key}",
         }
+
+    @staticmethod
+    def _extract_content(data: Dict[str, Any]) -> str:
+        choice = data.get("choices", [{}])[0]
+        message = choice.get("message") or {}
+        return message.get("content", "") or ""
+
+    async def _call_api(self, prompt: str) -> str:
+        loop = asyncio.get_event_loop()
+        # run_in_executor 不会复制 contextvars，显式带上当前上下文，使线程中的 span 挂在 llm_call 下
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(None, context.run, self._call_api_sync, prompt)
+
+    def _call_api_sync(self, prompt: str) -> str:
         payload = {
             "model": self.model_name,
             "messages": [
-                {"role": "system", "content": "你是一个友好、简洁的中文描述助手。"},
+                {"role": "system", "content": _SYSTEM_PROMPT},
                 {"role": "user", "content": prompt},
             ],
             "max_tokens": self.max_tokens,
@@ -116,11 +264,24 @@ class QwenChatAdapter(BaseLanguageModel):
         # 使用元组来分别设置连接和读取超时
         timeout_tuple = (connect_timeout, read_timeout)
         
-        resp = requests.post(url, json=payload, headers=headers, timeout=timeout_tuple)
-        resp.raise_for_status()
-        data = resp.json()
-        choice = data.get("choices", [{}])[0]
-        message = choice.get("message") or {}
-        content = message.get("content", "")
-        return content or ""
+        # stream=True：收到响应头即返回，据此记录首字节时间（TTFB），随后再读取响应体；
+        # 连接来自长连接池，预热后的首个请求也不需要重新握手
+        request_start = time.perf_counter()
+        with tracing.span("llm_ttfb", url=url):
+            resp = self._session.post(url, json=payload, headers=self._headers(), timeout=timeout_tuple, stream=True)
+        _LLM_TTFB.observe(time.perf_counter() - request_start)
+        # 流式响应须显式关闭：raise_for_status 抛错时响应体未读，不关闭则连接要等 GC 才归还连接池
+        with resp:
+            resp.raise_for_status()
+            with tracing.span("llm_read"):
+                data = resp.json()
+        return self._extract_content(data)
+
+
+def _reset_sessions_after_fork() -> None:
+    for adapter in list(_adapters):
+        adapter._reset_session()
+
 
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_sessions_after_fork)
@@ -0,0 +1,137 @@
+"""
+空间关系引擎
+把检测框换算成紧凑的方位事实，代替提示词中的像素坐标（LLM 不再需要自己把坐标换算成「左边 / 近处」）：
+
+- 方位：框中心所在的水平三分区（左 / 中 / 右）与垂直三分区（上 / 中 / 下）组合成九宫格，如「左侧」「右下方」「正前方」
+- 远近：框面积占画面比例的平方根（线性尺寸）作为距离代理，分为近处 / 中距离 / 远处（中距离不输出）
+- 两两关系：水平方向基本不重叠时按中心判断左右（只输出水平顺序相邻、且方位区相同即方位词区分不了的一对）；
+  水平方向重叠且底边明显更低（更靠近镜头）时为「在前面」（一个框基本包含另一个时不判断）
+
+全部关系按 (N, N) 矩阵一次算出。画面尺寸未知时（如外部传入的检测）方位与远近无从判断，只输出两两关系
+（以检测框的外接范围归一化）。
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 九宫格方位词：行（上 / 中 / 下）× 列（左 / 中 / 右）
+ZONES = ("左上方", "上方", "右上方", "左侧", "正前方", "右侧", "左下方", "下方", "右下方")
+# 距离代理：线性尺寸（sqrt(框面积 / 画面面积)）不小于 NEAR_SIZE 为近处，小于 FAR_SIZE 为远处
+NEAR_SIZE = 0.35
+FAR_SIZE = 0.12
+DISTANCES = ("近处", "", "远处")
+# 水平重叠（占较窄框宽度的比例）小于该值时判断左右，不小于时判断前后
+OVERLAP_X = 0.3
+# 判断前后所需的底边高度差（占画面高度的比例）
+FRONT_GAP = 0.05
+# 交集占较小框面积的比例超过该值视为包含（如桌上的杯子），不判断前后
+CONTAIN = 0.8
+# 输出的两两关系条数上限（按检测顺序，即置信度从高到低）
+MAX_RELATIONS = 3
+
+_EPS = 1e-9
+
+
+@dataclass(frozen=True)
+class SpatialLayout:
+    """一组检测的方位事实（与输入顺序一致）"""
+    names: Tuple[str, ...]
+    zones: Tuple[str, ...]
+    distances: Tuple[str, ...]
+    # (i, j, 关系)：names[i] 在 names[j] 的「左边」/「前面」
+    relations: Tuple[Tuple[int, int, str], ...]
+
+    def _groups(self) -> List[Tuple[str, Dict[str, int]]]:
+        """按「方位 + 远近」分组（保持首次出现的顺序），组内按名称计数"""
+        groups: Dict[str, Dict[str, int]] = {}
+        for name, zone, distance in zip(self.names, self.zones, self.distances):
+            counts = groups.setdefault(f"{zone}{distance}", {})
+            counts[name] = counts.get(name, 0) + 1
+        return list(groups.items())
+
+    def _relation_phrases(self) -> List[str]:
+        return [f"{self.names[i]}在{self.names[j]}{relation}" for i, j, relation in self.relations]
+
+    def facts(self) -> str:
+        """提示词用的紧凑事实，如「左侧近处：人；正前方：椅子、2个杯子；人在椅子前面」"""
+        parts = []
+        for where, counts in self._groups():
+            listed = "、".join(f"{count}个{name}" if count > 1 else name for name, count in counts.items())
+            parts.append(f"{where}：{listed}" if where else listed)
+        return "；".join(parts + self._relation_phrases())
+
+    def sentence(self) -> str:
+        """回退模板用的口语描述，如「左侧近处有一个人，正前方有一个椅子和2个杯子。人在椅子前面。」"""
+        clauses = []
+        for where, counts in self._groups():
+            objects = [f"{count}个{name}" if count > 1 else f"一个{name}" for name, count in counts.items()]
+            listed = objects[0] if len(objects) == 1 else f"{'、'.join(objects[:-1])}和{objects[-1]}"
+            clauses.append(f"{where or '图片中'}有{listed}")
+        text = "，".join(clauses) + "。"
+        relations = self._relation_phrases()
+        if relations:
+            text += "，".join(relations) + "。"
+        return text
+
+
+def analyze_layout(
+    names: Sequence[str],
+    boxes: Sequence[Sequence[float]],
+    image_shape: Optional[Sequence[int]] = None,
+) -> SpatialLayout:
+    """
+    计算检测集合的方位事实
+
+    Args:
+        names: 展示名称（与 boxes 一一对应，建议按置信度从高到低）
+        boxes: [x1, y1, x2, y2] 像素坐标
+        image_shape: 画面尺寸 (高, 宽, ...)，None 时不判断方位与远近
+
+    Returns:
+        SpatialLayout
+    """
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    known = image_shape is not None and len(image_shape) >= 2 and image_shape[0] > 0 and image_shape[1] > 0
+    if known:
+        height, width = float(image_shape[0]), float(image_shape[1])
+    else:
+        width = max(float(b[:, 2].max(initial=0.0)), 1.0)
+        height = max(float(b[:, 3].max(initial=0.0)), 1.0)
+    b = b / (width, height, width, height)
+    wh = np.maximum(b[:, 2:] - b[:, :2], 0.0)
+    center = (b[:, :2] + b[:, 2:]) * 0.5
+    cx, y2 = center[:, 0], b[:, 3]
+
+    # 三分区下标（0 / 1 / 2）与距离档位（0 近处 / 1 中距离 / 2 远处），比较相加即可，无需取整与截断
+    col, row = ((center >= 1 / 3).astype(np.int64) + (center >= 2 / 3)).T
+    area = wh[:, 0] * wh[:, 1]
+    size = np.sqrt(area)
+    distance = (size < NEAR_SIZE).astype(np.int64) + (size < FAR_SIZE)
+
+    # 两两交集的宽高 (N, N, 2)：水平重叠占较窄框的比例、交集占较小框的比例
+    overlap = np.maximum(
+        np.minimum(b[:, None, 2:], b[None, :, 2:]) - np.maximum(b[:, None, :2], b[None, :, :2]), 0.0
+    )
+    overlap_x = overlap[..., 0] / (np.minimum(wh[:, None, 0], wh[None, :, 0]) + _EPS)
+    contained = overlap[..., 0] * overlap[..., 1] > CONTAIN * (np.minimum(area[:, None], area[None, :]) + _EPS)
+    # 同名物体之间不输出关系；左右只在水平顺序相邻的一对之间输出，且方位区已经说明左右（列不同）时省略
+    distinct = np.asarray(names, dtype=object)
+    distinct = distinct[:, None] != distinct[None, :]
+    rank = np.argsort(np.argsort(cx, kind="stable"), kind="stable")
+    left_of = (rank[None, :] - rank[:, None] == 1) & (overlap_x < OVERLAP_X) & distinct
+    if known:
+        left_of &= col[:, None] == col[None, :]
+    in_front = (overlap_x >= OVERLAP_X) & (y2[:, None] - y2[None, :] > FRONT_GAP) & ~contained & distinct
+
+    relations = [(i, j, "前面") for i, j in zip(*(axis.tolist() for axis in np.nonzero(in_front)))]
+    relations += [(i, j, "左边") for i, j in zip(*(axis.tolist() for axis in np.nonzero(left_of)))]
+    relations.sort(key=lambda r: (min(r[0], r[1]), max(r[0], r[1])))
+    count = len(b)
+    return SpatialLayout(
+        names=tuple(names),
+        zones=tuple(ZONES[k] for k in (row * 3 + col).tolist()) if known else ("",) * count,
+        distances=tuple(DISTANCES[k] for k in distance.tolist()) if known else ("",) * count,
+        relations=tuple(relations[:MAX_RELATIONS]),
+    )
@@ -4,7 +4,7 @@
 """
 
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 from .base import BaseLanguageModel
 from .prompts import get_prompts_manager
@@ -38,7 +38,12 @@ class TemplateLanguageAdapter(BaseLanguageModel):
             f"TemplateLanguageAdapter 启用 (scene={self.prompts_scene}, template={self.prompts_template})"
         )
 
-    async def generate_description(self, detections: List[Dict]) -> str:
-        """直接使用回退模板生成描述"""
-        return self.prompt_wrapper.fallback_template(detections)
+    async def generate_description(
+        self,
+        detections: List[Dict],
+        template: Optional[str] = None,
+        image_shape: Optional[Tuple[int, ...]] = None,
+    ) -> str:
+        """直接使用回退模板生成描述（回退模板与提示词模板无关，忽略 template）"""
+        return self.prompt_wrapper.fallback_template(detections, image_shape)
 
@@ -9,22 +9,116 @@ import time
 import logging
 import contextlib
 import random
-from typing import AsyncGenerator, Dict, Any, List
+from typing import AsyncGenerator, Dict, Any, List, Optional, Tuple
 import re
 
 from ..vision.yolov8_adapter import YOLOv8nAdapter
+from ..vision.tracker import ObjectTracker
 from ..language.qwen_adapter import QwenChatAdapter
 from ..language.template_adapter import TemplateLanguageAdapter
 from ..language.base import BaseLanguageModel
+from ...session_options import DEFAULT_OPTIONS, SessionOptions
+from ....core import tracing
+from ....core.metrics import stage, record_fallback
+from ....utils.logger import log_extra
 
 logger = logging.getLogger(__name__)
 
+_SENTENCE_EMIT = stage("sentence_emit")
+_PIPELINE_TOTAL = stage("pipeline_total")
+_TRACK = stage("track")
+
 # 延迟导入配置，避免循环依赖
 def _get_settings():
     from app.core.config import settings
     return settings
 
 
+def create_language_model(
+    prompts_scene: Optional[str] = None,
+    prompts_template: Optional[str] = None,
+) -> Tuple[BaseLanguageModel, str]:
+    """
+    按 LANGUAGE_MODE 创建语言模型
+    
+    Returns:
+        (语言模型实例, 语言来源：template_default / model_local / model_cloud)
+    """
+    settings = _get_settings()
+    mode = getattr(settings.language, "MODE", "template").lower()
+    logger.info(f"初始化语言模型，LANGUAGE_MODE={mode}")
+    
+    if mode == "template":
+        # 纯模板模式，不依赖任何外部 LLM 服务
+        language_model = TemplateLanguageAdapter(
+            prompts_scene=prompts_scene or settings.language.PROMPTS_SCENE,
+            prompts_template=prompts_template or settings.language.PROMPTS_TEMPLATE,
+            prompts_dir=settings.language.PROMPTS_DIR,
+        )
+        return language_model, "template_default"
+    elif mode == "qwen_local":
+        # 本地 Qwen / OpenAI 兼容服务，完全由 app.yaml 配置提供
+        base_url = settings.language.QWEN_BASE_URL
+        api_key = settings.language.QWEN_API_KEY or "dummy"
+        logger.info(f"使用本地 Qwen 模式: base_url={base_url}, model={settings.language.QWEN_MODEL_NAME}")
+        # 使用配置的 RESPONSE_TIMEOUT 作为 API 调用超时
+        # 本地 LLM 通常需要更长的响应时间（10-20秒）
+        api_timeout = settings.language.RESPONSE_TIMEOUT
+        language_model = QwenChatAdapter(
+            model_name=settings.language.QWEN_MODEL_NAME,
+            max_tokens=settings.language.QWEN_MAX_TOKENS,
+            temperature=settings.language.QWEN_TEMPERATURE,
+            base_url=base_url,
+            api_key=api_key,
+            prompts_scene=prompts_scene or settings.language.PROMPTS_SCENE,
+            prompts_template=prompts_template or settings.language.PROMPTS_TEMPLATE,
+            prompts_dir=settings.language.PROMPTS_DIR,
+            timeout=api_timeout,  # 使用配置的超时时间
+            breaker_failure_threshold=settings.language.BREAKER_FAILURE_THRESHOLD,
+            breaker_reset_timeout=settings.language.BREAKER_RESET_TIMEOUT,
+            prompt_cache_size=settings.language.PROMPT_CACHE_SIZE,
+            prompt_bbox_quantum=settings.language.PROMPT_BBOX_QUANTUM,
+            http_pool_size=settings.language.HTTP_POOL_SIZE,
+        )
+        return language_model, "model_local"
+    elif mode == "qwen_cloud":
+        # 云端 Qwen，强制要求可用的 API Key，完全由 app.yaml 配置提供
+        base_url = settings.language.QWEN_BASE_URL
+        api_key = settings.language.QWEN_API_KEY
+        if not api_key:
+            raise RuntimeError(
+                "LANGUAGE_MODE=qwen_cloud 但未配置 QWEN_API_KEY，请在 app.yaml.language.qwen_cloud.api_key 中设置。"
+            )
+        logger.info(f"使用云端 Qwen 模式: base_url={base_url}, model={settings.language.QWEN_MODEL_NAME}")
+        # 云端 API 通常响应更快，但也可以使用配置的超时时间
+        api_timeout = settings.language.RESPONSE_TIMEOUT
+        language_model = QwenChatAdapter(
+            model_name=settings.language.QWEN_MODEL_NAME,
+            max_tokens=settings.language.QWEN_MAX_TOKENS,
+            temperature=settings.language.QWEN_TEMPERATURE,
+            base_url=base_url,
+            api_key=api_key,
+            prompts_scene=prompts_scene or settings.language.PROMPTS_SCENE,
+            prompts_template=prompts_template or settings.language.PROMPTS_TEMPLATE,
+            prompts_dir=settings.language.PROMPTS_DIR,
+            timeout=api_timeout,  # 使用配置的超时时间
+            breaker_failure_threshold=settings.language.BREAKER_FAILURE_THRESHOLD,
+            breaker_reset_timeout=settings.language.BREAKER_RESET_TIMEOUT,
+            prompt_cache_size=settings.language.PROMPT_CACHE_SIZE,
+            prompt_bbox_quantum=settings.language.PROMPT_BBOX_QUANTUM,
+            http_pool_size=settings.language.HTTP_POOL_SIZE,
+        )
+        return language_model, "model_cloud"
+    else:
+        logger.warning(f"未知的 LANGUAGE_MODE={mode}，回退到模板模式")
+        language_model = TemplateLanguageAdapter(
+            prompts_scene=prompts_scene or settings.language.PROMPTS_SCENE,
+            prompts_template=prompts_template or settings.language.PROMPTS_TEMPLATE,
+            prompts_dir=settings.language.PROMPTS_DIR,
+        )
+        return language_model, "template_default"
+
+
 class VisionToTextPipeline:
     """视觉到文本的完整处理流程"""
     
@@ -33,7 +127,8 @@ class VisionToTextPipeline:
         vision_model: YOLOv8nAdapter = None,
         language_model: BaseLanguageModel = None,
         prompts_scene: str = None,
-        prompts_template: str = None
+        prompts_template: str = None,
+        language_source_base: Optional[str] = None
     ):
         """
         初始化流水线
@@ -43,6 +138,7 @@ class VisionToTextPipeline:
             language_model: 语言模型实例，如果为 None 则自动创建
             prompts_scene: 提示词场景名称，如果为 None 则使用默认配置
             prompts_template: 提示词模板名称，如果为 None 则使用默认配置
+            language_source_base: 传入 language_model 时的语言来源（create_language_model 的返回值）
         """
         # 先获取 settings，避免在定义前使用
         settings = _get_settings()
@@ -55,80 +151,21 @@ class VisionToTextPipeline:
         )
         if language_model:
             self.language_model = language_model
-            self.language_source_base = (
+            self.language_source_base = language_source_base or (
                 "template_default" if isinstance(language_model, TemplateLanguageAdapter) else "model"
             )
         else:
-            # 根据 LANGUAGE_MODE 决定语言模型来源
-            mode = getattr(settings.language, "MODE", "template").lower()
-            logger.info(f"初始化语言模型，LANGUAGE_MODE={mode}")
-            
-            if mode == "template":
-                # 纯模板模式，不依赖任何外部 LLM 服务
-                self.language_model = TemplateLanguageAdapter(
-                    prompts_scene=prompts_scene or settings.language.PROMPTS_SCENE,
-                    prompts_template=prompts_template or settings.language.PROMPTS_TEMPLATE,
-                    prompts_dir=settings.language.PROMPTS_DIR,
-                )
-                self.language_source_base = "template_default"
-            elif mode == "qwen_local":
-                # 本地 Qwen / OpenAI 兼容服务，完全由 app.yaml 配置提供
-                base_url = settings.language.QWEN_BASE_URL
-                api_key = settings.language.QWEN_API_KEY or "dummy"
-                logger.info(f"使用本地 Qwen 模式: base_url={base_url}, model={settings.language.QWEN_MODEL_NAME}")
-                # 使用配置的 RESPONSE_TIMEOUT 作为 API 调用超时
-                # 本地 LLM 通常需要更长的响应时间（10-20秒）
-                api_timeout = settings.language.RESPONSE_TIMEOUT
-                self.language_model = QwenChatAdapter(
-                    model_name=settings.language.QWEN_MODEL_NAME,
-                    max_tokens=settings.language.QWEN_MAX_TOKENS,
-                    temperature=settings.language.QWEN_TEMPERATURE,
-                    base_url=base_url,
-                    api_key=api_key,
-                    prompts_scene=prompts_scene or settings.language.PROMPTS_SCENE,
-                    prompts_template=prompts_template or settings.language.PROMPTS_TEMPLATE,
-                    prompts_dir=settings.language.PROMPTS_DIR,
-                    timeout=api_timeout,  # 使用配置的超时时间
-                )
-                self.language_source_base = "model_local"
-            elif mode == "qwen_cloud":
-                # 云端 Qwen，强制要求可用的 API Key，完全由 app.yaml 配置提供
-                base_url = settings.language.QWEN_BASE_URL
-                api_key = settings.language.QWEN_API_KEY
-                if not api_key:
-                    raise RuntimeError(
-                        "LANGUAGE_MODE=qwen_cloud 但未配置 QWEN_API_KEY，请在 app.yaml.language.qwen_cloud.api_key 中设置。"
-                    )
-                logger.info(f"使用云端 Qwen 模式: base_url={base_url}, model={settings.language.QWEN_MODEL_NAME}")
-                # 云端 API 通常响应更快，但也可以使用配置的超时时间
-                api_timeout = settings.language.RESPONSE_TIMEOUT
-                self.language_model = QwenChatAdapter(
-                    model_name=settings.language.QWEN_MODEL_NAME,
-                    max_tokens=settings.language.QWEN_MAX_TOKENS,
-                    temperature=settings.language.QWEN_TEMPERATURE,
-                    base_url=base_url,
-                    api_key=api_key,
-                    prompts_scene=prompts_scene or settings.language.PROMPTS_SCENE,
-                    prompts_template=prompts_template or settings.language.PROMPTS_TEMPLATE,
-                    prompts_dir=settings.language.PROMPTS_DIR,
-                    timeout=api_timeout,  # 使用配置的超时时间
-                )
-                self.language_source_base = "model_cloud"
-            else:
-                logger.warning(f"未知的 LANGUAGE_MODE={mode}，回退到模板模式")
-                self.language_model = TemplateLanguageAdapter(
-                    prompts_scene=prompts_scene or settings.language.PROMPTS_SCENE,
-                    prompts_template=prompts_template or settings.language.PROMPTS_TEMPLATE,
-                    prompts_dir=settings.language.PROMPTS_DIR,
-                )
-                self.language_source_base = "template_default"
+            self.language_model, self.language_source_base = create_language_model(prompts_scene, prompts_template)
         
         logger.info("视觉到文本流水线初始化完成")
     
     async def process_image_stream(
         self,
         image_data: bytes,
-        session_id: str
+        session_id: str,
+        vision_results: Optional[Dict[str, Any]] = None,
+        options: Optional[SessionOptions] = None,
+        tracker: Optional[ObjectTracker] = None
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """
         处理图像并流式返回文本结果
@@ -136,62 +173,108 @@ class VisionToTextPipeline:
         Args:
             image_data: 图像字节数据
             session_id: 会话 ID
+            vision_results: 已完成的视觉检测结果（如批量推理产生），提供时跳过视觉检测
+            options: 会话协商的参数（模板、最大检测数、输入分辨率、是否调用语言模型、推送偏好），None 使用默认值
+            tracker: 会话的多目标跟踪器，提供时检测带 track_id 等字段；options.changes_only 时只描述新出现 / 离开的物体
             
         Yields:
             处理结果字典，包含不同类型的结果
         """
         pipeline_start = time.time()
+        options = options or DEFAULT_OPTIONS
         
         try:
             # 1. 视觉检测
-            logger.info(f"[{session_id}] 开始视觉检测")
+            logger.debug(f"[{session_id}] 开始视觉检测", extra=log_extra(session_id, per_frame=True))
             vision_start = time.time()
             
-            vision_results = await self.vision_model.describe(image_data)
-            vision_time = time.time() - vision_start
+            if vision_results is None:
+                with tracing.span("vision_detect", image_bytes=len(image_data)):
+                    vision_results = await self.vision_model.describe(image_data, input_size=options.input_size)
+                vision_time = time.time() - vision_start
+            else:
+                vision_time = vision_results.get("inference_time", 0.0)
             
             detections = vision_results.get("detections", [])
+            image_shape = vision_results.get("image_shape")
+            tracked = None
+            if tracker is not None:
+                # 会话级跟踪：稳定编号、按预测位置补上短暂漏检，并得到新出现 / 离开的物体
+                track_start = time.perf_counter()
+                with tracing.span("track", detection_count=len(detections)):
+                    tracked = tracker.update(detections)
+                _TRACK.observe(time.perf_counter() - track_start)
+                detections = tracked.detections
+            if options.max_detections and len(detections) > options.max_detections:
+                # 只保留置信度最高的前 N 个，缩短提示词与结果消息
+                detections = sorted(detections, key=lambda d: d.get("confidence", 0), reverse=True)[:options.max_detections]
             
             logger.info(
-                f"[{session_id}] 视觉检测完成: {len(detections)} 个检测, "
-                f"耗时 {vision_time:.3f}s"
+                f"[{session_id}] 视觉检测完成: {len(detections)} 个检测, 耗时 {vision_time:.3f}s",
+                extra=log_extra(session_id, per_frame=True, detection_count=len(detections), vision_time=vision_time),
             )
-            if detections:
-                logger.info(f"[{session_id}] 检测示例: {detections[:3]}")
-            else:
-                logger.info(f"[{session_id}] 无检测结果")
+            if detections and logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"[{session_id}] 检测示例: {detections[:3]}", extra=log_extra(session_id, per_frame=True))
             
             # 返回视觉检测结果（可选，用于调试）
-            yield {
-                "type": "vision_result",
-                "session_id": session_id,
-                "data": {
-                    "detections": detections,
-                    "inference_time": vision_results.get("inference_time", vision_time),
-                    "detection_count": len(detections)
-                },
-                "timestamp": time.time()
-            }
+            if options.vision_result:
+                yield {
+                    "type": "vision_result",
+                    "session_id": session_id,
+                    "data": {
+                        "detections": detections,
+                        "inference_time": vision_results.get("inference_time", vision_time),
+                        "detection_count": len(detections)
+                    },
+                    "timestamp": time.time()
+                }
+            
+            # 只描述变化：新出现的物体交给语言模型，离开的物体用模板句；会话首帧照常描述整个画面
+            described = detections
+            departure_text = ""
+            unchanged = False
+            if tracked is not None and options.changes_only:
+                kept = {det["track_id"] for det in detections}
+                described = [det for det in tracked.appeared if det["track_id"] in kept]
+                departure_text = self._departure_description(tracked.departed)
+                unchanged = not described and not departure_text and tracker.frame_count > 1
             
             # 2. 语言生成（流式）
             language_time = 0.0
-            if detections:
-                logger.info(f"[{session_id}] 开始语言生成")
-                print(f"[{session_id}] 开始语言生成，检测数: {len(detections)}")
+            if described and not options.language:
+                # 会话关闭了语言模型：直接使用模板描述，不等待 LLM
+                language_start = time.time()
+                description = await self._fallback_description(described, image_shape) + departure_text
+                language_source = "template_default"
+                language_time = time.time() - language_start
+                if options.stream_text:
+                    async for chunk in self._stream_sentences(description, session_id, language_source):
+                        yield chunk
+                final_content = description
+            elif described:
+                logger.debug(f"[{session_id}] 开始语言生成，检测数: {len(described)}", extra=log_extra(session_id, per_frame=True))
                 language_start = time.time()
                 settings = _get_settings()
                 initial_warn_delay = settings.language.RESPONSE_INITIAL_WARN_DELAY
                 warn_threshold = settings.language.RESPONSE_WARN_THRESHOLD
                 hard_timeout = settings.language.RESPONSE_TIMEOUT
-                logger.debug(f"[{session_id}] 语言生成超时配置: initial_warn_delay={initial_warn_delay}s, warn_threshold={warn_threshold}s, hard_timeout={hard_timeout}s")
-                print(f"[{session_id}] 语言生成超时配置: initial_warn_delay={initial_warn_delay}s, warn_threshold={warn_threshold}s, hard_timeout={hard_timeout}s")
+                logger.debug(
+                    f"[{session_id}] 语言生成超时配置: initial_warn_delay={initial_warn_delay}s, "
+                    f"warn_threshold={warn_threshold}s, hard_timeout={hard_timeout}s",
+                    extra=log_extra(session_id, per_frame=True),
+                )
                 
                 warn_sent = False
                 description = None
                 language_source = self.language_source_base
                 
-                # 先创建生成任务
-                gen_task = asyncio.create_task(self.language_model.generate_description(detections))
+                # 先创建生成任务；LLM 等待期间会 yield「稍等」提示，因此 span 手动结束，
+                # 并在创建任务时设为当前 span，使语言模型内部的 span 挂在它下面
+                llm_span = tracing.start_span("llm_wait", detection_count=len(described))
+                with tracing.use_span(llm_span):
+                    gen_task = asyncio.create_task(
+                        self.language_model.generate_description(described, template=options.template, image_shape=image_shape)
+                    )
                 
                 # 延迟发送第一次"稍等"提示（如果在此时间内完成则不发送）
                 last_warn_time = time.time()
@@ -216,12 +299,9 @@ class VisionToTextPipeline:
                         except Exception as e:
                             # 任务执行出错，使用模板回退
                             logger.error(f"[{session_id}] 语言生成任务执行失败: {e}", exc_info=True)
-                            if hasattr(self.language_model, 'prompt_wrapper'):
-                                description = self.language_model.prompt_wrapper.fallback_template(detections)
-                            else:
-                                from ..language.template_adapter import TemplateLanguageAdapter
-                                temp_adapter = TemplateLanguageAdapter()
-                                description = await temp_adapter.generate_description(detections)
+                            record_fallback("error")
+                            llm_span.set_error(f"{type(e).__name__}: {e}")
+                            description = await self._fallback_description(described, image_shape)
                             language_source = "template_fallback"
                             elapsed = time.time() - language_start
                             break
@@ -231,16 +311,18 @@ class VisionToTextPipeline:
                     
                     # 检查是否超过硬超时
                     if elapsed >= hard_timeout:
-                        logger.warning(f"[{session_id}] 语言生成超过硬超时 {hard_timeout}s，使用模板回退")
-                        print(f"[{session_id}] 语言生成超过硬超时 {hard_timeout}s（实际等待 {elapsed:.2f}s），使用模板回退")
+                        logger.warning(
+                            f"[{session_id}] 语言生成超过硬超时 {hard_timeout}s（实际等待 {elapsed:.2f}s），使用模板回退",
+                            extra=log_extra(session_id, language_time=elapsed),
+                        )
                         # 使用统一的回退方法（通过 prompt_wrapper）
-                        if hasattr(self.language_model, 'prompt_wrapper'):
-                            description = self.language_model.prompt_wrapper.fallback_template(detections)
-                        else:
-                            # 如果语言模型没有 prompt_wrapper，创建一个临时模板适配器
-                            from ..language.template_adapter import TemplateLanguageAdapter
-                            temp_adapter = TemplateLanguageAdapter()
-                            description = await temp_adapter.generate_description(detections)
+                        record_fallback("timeout")
+                        llm_span.set_error(f"timeout after {elapsed:.2f}s")
+                        # 超时的调用会被取消，适配器内部不会记录结果，由这里计入熔断
+                        breaker = getattr(self.language_model, "breaker", None)
+                        if breaker is not None:
+                            breaker.record_failure(f"timeout after {elapsed:.2f}s")
+                        description = await self._fallback_description(described, image_shape)
                         language_source = "template_fallback"
                         # 取消任务
                         gen_task.cancel()
@@ -248,13 +330,12 @@ class VisionToTextPipeline:
                             await gen_task
                         break
                     
-                    # 如果还没发送第一次提示，且已超过初始延迟，则发送提示
-                    if not initial_warn_sent and elapsed >= initial_warn_delay:
+                    # 如果还没发送第一次提示，且已超过初始延迟，则发送提示（会话关闭流式推送时不发送）
+                    if options.stream_text and not initial_warn_sent and elapsed >= initial_warn_delay:
                         initial_warn_sent = True
                         warn_sent = True
                         last_warn_time = time.time()
-                        logger.debug(f"[{session_id}] 延迟 {elapsed:.2f}s 后发送第一次'稍等'提示")
-                        print(f"[{session_id}] 延迟 {elapsed:.2f}s 后发送第一次'稍等'提示")
+                        logger.debug(f"[{session_id}] 延迟 {elapsed:.2f}s 后发送第一次'稍等'提示", extra=log_extra(session_id, per_frame=True))
                         yield {
                             "type": "text_stream",
                             "session_id": session_id,
@@ -276,55 +357,57 @@ class VisionToTextPipeline:
                         }
                         last_warn_time = current_time
                         warn_sent = True
-                        logger.debug(f"[{session_id}] 已等待 {elapsed:.1f}s，发送后续'稍等'提示（距离上次提示 {min_warn_interval:.1f}s）")
-                        print(f"[{session_id}] 已等待 {elapsed:.1f}s，继续生成中")
+                        logger.debug(
+                            f"[{session_id}] 已等待 {elapsed:.1f}s，发送后续'稍等'提示（距离上次提示 {min_warn_interval:.1f}s）",
+                            extra=log_extra(session_id, per_frame=True),
+                        )
                     
                     # 等待一小段时间后再次检查任务状态
-                    logger.debug(f"[{session_id}] 语言生成等待中，已等待 {elapsed:.2f}s / {hard_timeout}s")
+                    logger.debug(f"[{session_id}] 语言生成等待中，已等待 {elapsed:.2f}s / {hard_timeout}s", extra=log_extra(session_id, per_frame=True))
                     await asyncio.sleep(interval)
                 
+                description += departure_text
                 language_time = time.time() - language_start
+                llm_span.set_attribute("source", language_source)
+                llm_span.set_attribute("warn_sent", warn_sent)
+                llm_span.end()
                 
                 logger.info(
-                    f"[{session_id}] 语言生成完成: {description[:80]}... "
-                    f"(耗时 {language_time:.3f}s, warn_sent={warn_sent}, source={language_source})"
-                )
-                print(
-                    f"[{session_id}] 语言生成完成，耗时 {language_time:.3f}s，内容预览: {description[:80]}..., "
-                    f"source={language_source}"
+                    f"[{session_id}] 语言生成完成: {description[:80]}...",
+                    extra=log_extra(
+                        session_id, per_frame=True,
+                        language_time=language_time, warn_sent=warn_sent, source=language_source,
+                    ),
                 )
                 
                 # 按句子拆分进行流式返回
-                sentences = self._split_into_sentences(description)
-                
-                for i, sentence in enumerate(sentences):
-                    if sentence.strip():
-                        is_final = i == len(sentences) - 1
-                        
-                        yield {
-                            "type": "text_stream",
-                            "session_id": session_id,
-                            "content": sentence,
-                            "is_final": is_final,
-                            "source": language_source,
-                            "timestamp": time.time()
-                        }
-                        
-                        # 控制推送间隔，模拟流式效果
-                        if not is_final:
-                            await asyncio.sleep(0.05)
+                if options.stream_text:
+                    async for chunk in self._stream_sentences(description, session_id, language_source):
+                        yield chunk
                 
                 final_content = description
+            elif departure_text:
+                # 只有物体离开：模板句，不调用语言模型
+                language_source = "template_default"
+                if options.stream_text:
+                    async for chunk in self._stream_sentences(departure_text, session_id, language_source):
+                        yield chunk
+                final_content = departure_text
+            elif unchanged:
+                # 画面内物体没有变化：不重复描述，final_result 内容为空
+                final_content = ""
+                logger.debug(f"[{session_id}] 画面内物体没有变化，跳过语言生成", extra=log_extra(session_id, per_frame=True))
+                language_source = self.language_source_base
             else:
                 final_content = "图像识别完成，未发现显著物体。"
-                logger.info(f"[{session_id}] 未检测到物体")
-                print(f"[{session_id}] 未检测到物体，跳过语言生成")
+                logger.info(f"[{session_id}] 未检测到物体，跳过语言生成", extra=log_extra(session_id, per_frame=True))
                 language_source = self.language_source_base
             
             # 3. 最终结果
             total_time = time.time() - pipeline_start
+            _PIPELINE_TOTAL.observe(total_time)
             
-            yield {
+            final_result = {
                 "type": "final_result",
                 "session_id": session_id,
                 "content": final_content,
@@ -335,9 +418,21 @@ class VisionToTextPipeline:
                 "source": language_source,
                 "timestamp": time.time()
             }
+            if tracked is not None:
+                final_result["unchanged"] = unchanged
+                final_result["changes"] = {
+                    "appeared": [det["track_id"] for det in tracked.appeared],
+                    "departed": [det["track_id"] for det in tracked.departed],
+                }
+            yield final_result
             
             logger.info(
-                f"[{session_id}] 流水线处理完成，总耗时 {total_time:.3f}s"
+                f"[{session_id}] 流水线处理完成，总耗时 {total_time:.3f}s",
+                extra=log_extra(
+                    session_id, per_frame=True,
+                    vision_time=vision_time, language_time=language_time, total_time=total_time,
+                    detection_count=len(detections), source=language_source,
+                ),
             )
             
         except Exception as e:
@@ -352,6 +447,104 @@ class VisionToTextPipeline:
                 "timestamp": time.time()
             }
     
+    async def _stream_sentences(
+        self,
+        description: str,
+        session_id: str,
+        language_source: str
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """按句子拆分描述，逐句返回 text_stream"""
+        emit_start = time.perf_counter()
+        emit_span = tracing.start_span("sentence_emit")
+        sentences = self._split_into_sentences(description)
+        
+        for i, sentence in enumerate(sentences):
+            if sentence.strip():
+                is_final = i == len(sentences) - 1
+                
+                yield {
+                    "type": "text_stream",
+                    "session_id": session_id,
+                    "content": sentence,
+                    "is_final": is_final,
+                    "source": language_source,
+                    "timestamp": time.time()
+                }
+                
+                # 控制推送间隔，模拟流式效果
+                if not is_final:
+                    await asyncio.sleep(0.05)
+        _SENTENCE_EMIT.observe(time.perf_counter() - emit_start)
+        emit_span.set_attribute("sentences", len(sentences))
+        emit_span.end()
+    
+    async def generate_text(
+        self,
+        detections: List[Dict],
+        session_id: str,
+        image_shape: Optional[Tuple[int, ...]] = None
+    ) -> Dict[str, Any]:
+        """
+        非流式生成描述（批量/离线场景使用）：不发送「稍等」提示，超时或失败时使用模板回退
+        
+        Args:
+            detections: 视觉检测结果
+            session_id: 会话 ID
+            image_shape: 画面尺寸 (高, 宽)，None 表示未知（不判断物体方位）
+            
+        Returns:
+            {"content": 描述文本, "source": 语言来源, "language_time": 耗时}
+        """
+        if not detections:
+            return {
+                "content": "图像识别完成，未发现显著物体。",
+                "source": self.language_source_base,
+                "language_time": 0.0,
+            }
+        
+        language_start = time.time()
+        hard_timeout = _get_settings().language.RESPONSE_TIMEOUT
+        source = self.language_source_base
+        try:
+            content = await asyncio.wait_for(
+                self.language_model.generate_description(detections, image_shape=image_shape),
+                timeout=hard_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"[{session_id}] 语言生成超过硬超时 {hard_timeout}s，使用模板回退")
+            record_fallback("timeout")
+            breaker = getattr(self.language_model, "breaker", None)
+            if breaker is not None:
+                breaker.record_failure(f"timeout after {hard_timeout}s")
+            content = await self._fallback_description(detections, image_shape)
+            source = "template_fallback"
+        except Exception as e:
+            logger.error(f"[{session_id}] 语言生成失败: {e}", exc_info=True)
+            record_fallback("error")
+            content = await self._fallback_description(detections, image_shape)
+            source = "template_fallback"
+        
+        return {
+            "content": content,
+            "source": source,
+            "language_time": time.time() - language_start,
+        }
+    
+    async def _fallback_description(self, detections: List[Dict], image_shape: Optional[Tuple[int, ...]] = None) -> str:
+        """模板回退：优先使用语言模型自带的 prompt_wrapper"""
+        if hasattr(self.language_model, 'prompt_wrapper'):
+            return self.language_model.prompt_wrapper.fallback_template(detections, image_shape)
+        # 如果语言模型没有 prompt_wrapper，创建一个临时模板适配器
+        temp_adapter = TemplateLanguageAdapter()
+        return await temp_adapter.generate_description(detections, image_shape=image_shape)
+    
+    def _departure_description(self, departed: List[Dict]) -> str:
+        """离开画面的物体（模板句，没有离开的物体时为空字符串）"""
+        if not departed:
+            return ""
+        prompt_wrapper = getattr(self.language_model, "prompt_wrapper", None) or TemplateLanguageAdapter().prompt_wrapper
+        return prompt_wrapper.departure_template(departed)
+    
     def _split_into_sentences(self, text: str) -> List[str]:
         """
         将文本按句子拆分
@@ -0,0 +1,142 @@
+"""
+编译产物缓存
+把 ONNX Runtime 优化后的模型（ORT 格式）与解析好的类别表持久化到磁盘，重启时直接加载，跳过图优化与配置解析。
+
+缓存键 = 源模型文件内容哈希 + 指纹（ORT 版本、执行提供者、会话选项、CPU 架构与指令集、类别映射文件哈希），
+任一项变化都会得到新的键，旧条目在写入新条目时自动清理；条目加载失败时删除后回退到源模型。
+
+目录结构：
+    <root>/<key>/model.ort      优化后的模型
+    <root>/<key>/classes.json   类别表（索引 -> 英文名）与中英文映射
+    <root>/<key>/meta.json      源文件、指纹与创建时间
+"""
+
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = "model.ort"
+CLASSES_FILE = "classes.json"
+META_FILE = "meta.json"
+
+# 缓存格式版本：条目结构变化时递增，使旧条目全部失效
+FORMAT_VERSION = 1
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cpu_fingerprint() -> str:
+    """CPU 架构与指令集标志：ORT_ENABLE_ALL 的布局优化与硬件相关，镜像迁移到不同 CPU 后需要重新生成"""
+    flags = ""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                if line.startswith(("flags", "Features")):
+                    flags = " ".join(sorted(line.split(":", 1)[1].split()))
+                    break
+    except OSError:
+        flags = platform.processor()
+    return f"{platform.machine()}:{hashlib.sha256(flags.encode()).hexdigest()[:16]}"
+
+
+class ArtifactCache:
+    """按模型哈希与会话指纹索引的磁盘缓存（多进程并发写入安全：先写临时目录再原子重命名）"""
+
+    def __init__(self, root: str, max_entries: int = 4):
+        self.root = Path(root)
+        self.max_entries = max_entries
+
+    def key(self, source_path: str, fingerprint: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            {"format": FORMAT_VERSION, "source_sha256": file_sha256(source_path), **fingerprint},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """返回完整条目的目录，缺失或不完整时返回 None"""
+        entry = self.root / key
+        if not all((entry / name).exists() for name in (MODEL_FILE, CLASSES_FILE, META_FILE)):
+            return None
+        # 更新访问时间，超出条目上限时按最近使用清理
+        try:
+            os.utime(entry / META_FILE)
+        except OSError:
+            pass
+        return entry
+
+    def read_classes(self, entry: Path) -> Dict[str, Any]:
+        with open(entry / CLASSES_FILE, encoding="utf-8") as f:
+            return json.load(f)
+
+    def staging_dir(self) -> Path:
+        """新条目的临时目录，写完后交给 commit()"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        return Path(tempfile.mkdtemp(prefix=".tmp-", dir=self.root))
+
+    def commit(self, key: str, staging: Path, classes: Dict[str, Any], meta: Dict[str, Any]) -> Optional[Path]:
+        """写入类别表与元数据并原子地发布条目，随后清理同一源模型的旧条目"""
+        try:
+            with open(staging / CLASSES_FILE, "w", encoding="utf-8") as f:
+                json.dump(classes, f, ensure_ascii=False)
+            with open(staging / META_FILE, "w", encoding="utf-8") as f:
+                json.dump({**meta, "key": key, "format": FORMAT_VERSION, "created_at": time.time()}, f, ensure_ascii=False, indent=2)
+            entry = self.root / key
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # 其他进程已写入同一条目
+                shutil.rmtree(staging, ignore_errors=True)
+                if self.lookup(key) is None:
+                    return None
+            self.prune(keep=key, source=meta.get("source"))
+            return entry
+        except Exception as e:
+            logger.warning(f"写入模型缓存失败: {e}")
+            shutil.rmtree(staging, ignore_errors=True)
+            return None
+
+    def invalidate(self, key: str) -> None:
+        shutil.rmtree(self.root / key, ignore_errors=True)
+
+    def prune(self, keep: str, source: Optional[str] = None) -> None:
+        """删除同一源模型的其他条目（已过期）、残留的临时目录，以及超出条目上限的最久未用条目"""
+        entries = []
+        for path in self.root.iterdir():
+            if path.name == keep or not path.is_dir():
+                continue
+            if path.name.startswith(".tmp-"):
+                # 只清理明显中断的写入，避免误删其他进程正在写的目录
+                if time.time() - path.stat().st_mtime > 3600:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            try:
+                with open(path / META_FILE, encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            if (source is not None and meta.get("source") == source) or meta.get("format") != FORMAT_VERSION:
+                logger.info(f"清理过期的模型缓存: {path.name}")
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            entries.append(((path / META_FILE).stat().st_mtime, path))
+        if self.max_entries > 0:
+            for _, path in sorted(entries, reverse=True)[max(0, self.max_entries - 1):]:
+                logger.info(f"模型缓存超出 {self.max_entries} 个条目，清理: {path.name}")
+                shutil.rmtree(path, ignore_errors=True)
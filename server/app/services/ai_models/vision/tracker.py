@@ -0,0 +1,327 @@
+"""
+多目标跟踪（ByteTrack 风格）
+接在视觉后处理（_postprocess_onnx）之后、按会话保存状态：同一物体跨帧保持稳定的 track_id，并给出存在帧数与速度，
+流水线据此只描述新出现 / 离开的物体，并平滑低置信度的漏检。
+
+- 运动模型：匀速卡尔曼滤波，状态 (cx, cy, w, h, vx, vy, vw, vh)，过程与观测噪声随框大小缩放（取值同 ByteTrack）。
+  初始协方差、过程噪声与观测噪声都是对角阵，状态转移只把每个坐标与自己的速度相连，协方差在 4 个坐标之间始终解耦，
+  8×8 滤波等价于 4 个独立的「位置 + 速度」二维滤波：每条轨迹只保存位置方差、位置-速度协方差、速度方差 3×4 个数，
+  全部轨迹放在 (N, 8) / (N, 3, 4) 数组中用逐元素运算批量预测与更新（不做批量 8×8 矩阵乘法与求逆）
+- 关联：同类别才计算 IoU，按 IoU 从高到低贪心匹配（单帧目标数通常只有几个到几十个，与匈牙利算法结果基本一致）
+  - 第一轮：高置信度检测（>= high_threshold）与全部轨迹匹配
+  - 第二轮：低置信度检测只与上一帧仍被跟踪、第一轮未匹配的轨迹匹配（延续被遮挡或模糊的物体，不新建轨迹）
+  - 未匹配的高置信度检测新建轨迹：会话首帧直接确认，之后需累计命中 min_hits 帧才确认（过滤单帧误检）
+- 生命周期：未确认的轨迹一旦漏检即删除；已确认的轨迹漏检后转为 lost，前 coast_frames 帧仍按预测位置输出，
+  连续漏检超过 max_lost 帧后删除并报告离开
+
+输出检测保留原字段，bbox 换成滤波后的位置，并增加 track_id / track_age（轨迹存在的帧数）/ track_hits /
+velocity（中心点速度，像素/帧）/ track_state（tracked / lost）。
+单帧耗时见 python -m app.benchmarks.vision_hot_path --only track（20 个目标约 0.2 ms）。
+"""
+
+import itertools
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRACKED = "tracked"
+LOST = "lost"
+
+# 过程与观测噪声相对框宽高的比例（ByteTrack 取值）
+_STD_POSITION = 1.0 / 20
+_STD_VELOCITY = 1.0 / 160
+# 噪声按 (w, h, w, h) 缩放：状态与观测（xywh）中宽高所在的列
+_NOISE_SCALE_COLUMNS = np.array([2, 3, 2, 3])
+
+# 卡尔曼状态之外每条轨迹的大致内存（检测字典与簿记字段），用于会话内存统计
+_TRACK_OVERHEAD_BYTES = 1024
+
+
+def _confidence(det: Dict[str, Any]) -> float:
+    try:
+        return float(det.get("confidence", 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _class_key(det: Dict[str, Any]) -> int:
+    """关联时的类别键：优先 class_id，外部传入的检测没有 class_id 时按名称"""
+    class_id = det.get("class_id")
+    if class_id is not None:
+        return int(class_id)
+    return hash(det.get("class_en") or det.get("class"))
+
+
+def _xyxy_to_xywh(boxes: np.ndarray) -> np.ndarray:
+    wh = boxes[:, 2:4] - boxes[:, 0:2]
+    return np.concatenate([boxes[:, 0:2] + wh / 2, wh], axis=1)
+
+
+def _xywh_to_xyxy(boxes: np.ndarray) -> np.ndarray:
+    half = boxes[:, 2:4] / 2
+    return np.concatenate([boxes[:, 0:2] - half, boxes[:, 0:2] + half], axis=1)
+
+
+def _iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """两组 xyxy 框的 IoU 矩阵 [len(a), len(b)]"""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def _greedy_match(iou: np.ndarray, rows: np.ndarray, cols: np.ndarray, threshold: float) -> List[Tuple[int, int]]:
+    """在 iou[rows][:, cols] 上按 IoU 从高到低贪心匹配，返回 (行, 列) 原始下标对"""
+    if not len(rows) or not len(cols):
+        return []
+    sub = iou[rows][:, cols]
+    r, c = np.nonzero(sub >= threshold)
+    if not len(r):
+        return []
+    order = np.argsort(-sub[r, c], kind="stable")
+    rows_list, cols_list = rows.tolist(), cols.tolist()
+    used_rows, used_cols = set(), set()
+    pairs = []
+    for ri, ci in zip(r[order].tolist(), c[order].tolist()):
+        if ri in used_rows or ci in used_cols:
+            continue
+        used_rows.add(ri)
+        used_cols.add(ci)
+        pairs.append((rows_list[ri], cols_list[ci]))
+    return pairs
+
+
+@dataclass
+class Track:
+    """单条轨迹的簿记信息（卡尔曼状态保存在跟踪器的批量数组中）"""
+    track_id: int
+    detection: Dict[str, Any]    # 最近一次匹配到的检测
+    class_key: int
+    hits: int = 1                # 累计匹配帧数
+    age: int = 1                 # 轨迹存在的帧数
+    lost: int = 0                # 连续漏检帧数
+    confirmed: bool = False
+
+
+@dataclass
+class TrackingResult:
+    """单帧跟踪结果"""
+    detections: List[Dict[str, Any]]                               # 当前帧输出的检测（含滑行中的 lost 轨迹）
+    appeared: List[Dict[str, Any]] = field(default_factory=list)   # 本帧新确认的物体
+    departed: List[Dict[str, Any]] = field(default_factory=list)   # 本帧删除的已确认物体（最后一次的状态）
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.appeared or self.departed)
+
+
+class ObjectTracker:
+    """单个会话的多目标跟踪器（非线程安全：同一会话的帧按顺序处理）"""
+
+    def __init__(
+        self,
+        high_threshold: float = 0.5,
+        match_iou: float = 0.3,
+        low_match_iou: float = 0.5,
+        min_hits: int = 2,
+        max_lost: int = 8,
+        coast_frames: int = 2,
+    ):
+        """
+        Args:
+            high_threshold: 高置信度检测阈值，低于该值的检测只用于延续已有轨迹
+            match_iou: 第一轮（高置信度检测）匹配所需的最小 IoU
+            low_match_iou: 第二轮（低置信度检测）匹配所需的最小 IoU
+            min_hits: 新轨迹累计命中该帧数后确认（会话首帧除外）
+            max_lost: 已确认的轨迹连续漏检超过该帧数后删除
+            coast_frames: 漏检后仍按预测位置输出的帧数（平滑短暂漏检）
+        """
+        self.high_threshold = high_threshold
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.min_hits = max(1, min_hits)
+        self.max_lost = max(0, max_lost)
+        self.coast_frames = min(max(0, coast_frames), self.max_lost)
+        self._ids = itertools.count(1)
+        self.reset()
+
+    def reset(self) -> None:
+        """清空全部轨迹（编号继续递增，避免客户端把新物体当成旧物体）"""
+        self._tracks: List[Track] = []
+        self._mean = np.zeros((0, 8))
+        # 每个坐标的 [位置方差, 位置-速度协方差, 速度方差]
+        self._covariance = np.zeros((0, 3, 4))
+        self.frame_count = 0
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    # ========= 卡尔曼滤波（批量，按坐标解耦） =========
+    def _predict(self) -> None:
+        # 噪声按 (w, h, w, h) 缩放，使用预测前的宽高
+        scale = self._mean[:, _NOISE_SCALE_COLUMNS]
+        position_var, cross, velocity_var = self._covariance[:, 0], self._covariance[:, 1], self._covariance[:, 2]
+        # P' = F P Fᵀ + Q：先更新依赖旧值的位置方差，再更新协方差与速度方差
+        position_var += 2 * cross + velocity_var + (_STD_POSITION * scale) ** 2
+        cross += velocity_var
+        velocity_var += (_STD_VELOCITY * scale) ** 2
+        self._mean[:, :4] += self._mean[:, 4:]
+        # 宽高不能因速度外推变成负数
+        np.maximum(self._mean[:, 2:4], 1.0, out=self._mean[:, 2:4])
+
+    def _correct(self, index: np.ndarray, measurement: np.ndarray) -> None:
+        """用观测（xywh）更新 index 对应轨迹的状态"""
+        mean = self._mean[index]
+        covariance = self._covariance[index]
+        position_var, cross, velocity_var = covariance[:, 0], covariance[:, 1], covariance[:, 2]
+        innovation_var = position_var + (_STD_POSITION * mean[:, _NOISE_SCALE_COLUMNS]) ** 2
+        position_gain = position_var / innovation_var
+        velocity_gain = cross / innovation_var
+        innovation = measurement - mean[:, :4]
+        mean[:, :4] += position_gain * innovation
+        mean[:, 4:] += velocity_gain * innovation
+        # P' = (I - K H) P：速度方差依赖旧的协方差，先更新
+        velocity_var -= velocity_gain * cross
+        cross *= 1 - position_gain
+        position_var *= 1 - position_gain
+        self._mean[index] = mean
+        self._covariance[index] = covariance
+
+    def _initiate(self, measurement: np.ndarray) -> None:
+        scale = measurement[:, _NOISE_SCALE_COLUMNS]
+        mean = np.zeros((len(measurement), 8))
+        mean[:, :4] = measurement
+        covariance = np.stack([
+            (2 * _STD_POSITION * scale) ** 2,
+            np.zeros_like(scale),
+            (10 * _STD_VELOCITY * scale) ** 2,
+        ], axis=1)
+        self._mean = np.concatenate([self._mean, mean])
+        self._covariance = np.concatenate([self._covariance, covariance])
+
+    # ========= 逐帧更新 =========
+    def update(self, detections: Sequence[Dict[str, Any]]) -> TrackingResult:
+        """
+        输入当前帧的检测结果（视觉层格式，bbox 为 xyxy 像素坐标），返回跟踪后的检测与出现 / 离开事件
+        """
+        self.frame_count += 1
+        tracks = self._tracks
+        if tracks:
+            self._predict()
+
+        count = len(detections)
+        boxes = np.array([det["bbox"] for det in detections], dtype=np.float64).reshape(count, 4)
+        measurement = _xyxy_to_xywh(boxes)
+        scores = np.array([_confidence(det) for det in detections])
+        class_keys = np.array([_class_key(det) for det in detections], dtype=np.int64)
+        high = scores >= self.high_threshold
+
+        pairs: List[Tuple[int, int]] = []
+        if tracks and count:
+            iou = _iou_matrix(boxes, _xywh_to_xyxy(self._mean[:, :4]))
+            iou[class_keys[:, None] != np.array([t.class_key for t in tracks], dtype=np.int64)[None, :]] = 0.0
+            all_tracks = np.arange(len(tracks))
+            pairs = _greedy_match(iou, np.nonzero(high)[0], all_tracks, self.match_iou)
+            # 第二轮：低置信度检测只延续上一帧仍被跟踪的轨迹
+            matched_tracks = {t for _, t in pairs}
+            candidates = np.array(
+                [i for i, track in enumerate(tracks) if i not in matched_tracks and track.lost == 0], dtype=np.int64
+            )
+            pairs += _greedy_match(iou, np.nonzero(~high)[0], candidates, self.low_match_iou)
+
+        appeared: List[Track] = []
+        departed: List[Dict[str, Any]] = []
+        matched = np.zeros(len(tracks), dtype=bool)
+        if pairs:
+            det_index = np.array([d for d, _ in pairs], dtype=np.int64)
+            track_index = np.array([t for _, t in pairs], dtype=np.int64)
+            self._correct(track_index, measurement[det_index])
+            matched[track_index] = True
+            for d, t in pairs:
+                track = tracks[t]
+                track.detection = detections[d]
+                track.hits += 1
+                track.lost = 0
+                if not track.confirmed and track.hits >= self.min_hits:
+                    track.confirmed = True
+                    appeared.append(track)
+
+        # 未匹配的轨迹：未确认的直接删除，已确认的超过 max_lost 后删除并报告离开
+        keep = np.ones(len(tracks), dtype=bool)
+        for i, track in enumerate(tracks):
+            track.age += 1
+            if matched[i]:
+                continue
+            track.lost += 1
+            if not track.confirmed or track.lost > self.max_lost:
+                keep[i] = False
+                if track.confirmed:
+                    departed.append(self._output(track, self._mean[i, :6].tolist(), LOST))
+        if not keep.all():
+            self._tracks = tracks = [track for track, kept in zip(tracks, keep) if kept]
+            self._mean = self._mean[keep]
+            self._covariance = self._covariance[keep]
+
+        # 未匹配的高置信度检测新建轨迹（会话首帧直接确认）
+        matched_dets = {d for d, _ in pairs}
+        new_dets = [d for d in np.nonzero(high)[0].tolist() if d not in matched_dets]
+        if new_dets:
+            self._initiate(measurement[new_dets])
+            confirmed = self.frame_count == 1 or self.min_hits <= 1
+            for d in new_dets:
+                track = Track(next(self._ids), detections[d], int(class_keys[d]), confirmed=confirmed)
+                tracks.append(track)
+                if confirmed:
+                    appeared.append(track)
+
+        # 输出：已确认且本帧命中或仍在滑行期内的轨迹
+        outputs: List[Dict[str, Any]] = []
+        by_id: Dict[int, Dict[str, Any]] = {}
+        if tracks:
+            states = self._mean[:, :6].tolist()
+            for i, track in enumerate(tracks):
+                if not track.confirmed or track.lost > self.coast_frames:
+                    continue
+                output = self._output(track, states[i], LOST if track.lost else TRACKED)
+                outputs.append(output)
+                by_id[track.track_id] = output
+        return TrackingResult(
+            detections=outputs,
+            appeared=[by_id[track.track_id] for track in appeared if track.track_id in by_id],
+            departed=departed,
+        )
+
+    @staticmethod
+    def _output(track: Track, state: List[float], track_state: str) -> Dict[str, Any]:
+        cx, cy, w, h, vx, vy = state
+        output = dict(track.detection)
+        output["bbox"] = [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+        output["track_id"] = track.track_id
+        output["track_age"] = track.age
+        output["track_hits"] = track.hits
+        output["velocity"] = [vx, vy]
+        output["track_state"] = track_state
+        return output
+
+    # ========= 状态 =========
+    def memory_usage(self) -> int:
+        """会话内存统计：卡尔曼状态数组 + 每条轨迹的簿记开销（估算）"""
+        return self._mean.nbytes + self._covariance.nbytes + _TRACK_OVERHEAD_BYTES * len(self._tracks)
+
+    def snapshot(self) -> Dict[str, Any]:
+        confirmed = sum(1 for track in self._tracks if track.confirmed)
+        return {
+            "frames": self.frame_count,
+            "tracks": len(self._tracks),
+            "confirmed": confirmed,
+            "lost": sum(1 for track in self._tracks if track.confirmed and track.lost),
+        }
@@ -3,55 +3,56 @@ YOLOv8n 模型适配器
 支持 ONNX 优化推理，目标推理时间 ≤200ms
 """
 
+import contextlib
+import functools
+import importlib.util
 import os
 import cv2
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import shutil
 import time
 import logging
 from pathlib import Path
-import yaml
 
-try:
+# torch / ultralytics 只在 PyTorch 推理或 ONNX 导出时才导入（导入耗时数秒、常驻内存数百 MB），
+# ONNX 模式下启动不加载它们；这里只检查是否已安装
+TORCH_AVAILABLE = importlib.util.find_spec("torch") is not None
+ULTRALYTICS_AVAILABLE = importlib.util.find_spec("ultralytics") is not None
+if not ULTRALYTICS_AVAILABLE:
+    logging.warning("ultralytics not available, ONNX mode will be used")
+
+
+@contextlib.contextmanager
+def _torch_load_compat():
+    """
+    ultralytics 加载 .pt 期间临时让 torch.load 默认 weights_only=False
+    （PyTorch 2.6+ 默认 weights_only=True，无法反序列化 ultralytics 的自定义类）；
+    退出后恢复原函数，不影响其他模块
+    """
     import torch
-    TORCH_AVAILABLE = True
-    # 修复 PyTorch 2.6+ 兼容性问题：全局替换 torch.load
-    # PyTorch 2.6 默认 weights_only=True，但 ultralytics 需要加载自定义类
-    if hasattr(torch, 'load'):
-        import functools
-        import inspect
-        _original_torch_load = torch.load
-        
-        @functools.wraps(_original_torch_load)
-        def _patched_torch_load(*args, **kwargs):
-            # 对于 ultralytics 模型文件，自动设置 weights_only=False
-            if 'weights_only' not in kwargs:
-                # 检查调用栈中是否有 ultralytics 模块
-                stack = inspect.stack()
-                is_ultralytics_call = any(
-                    'ultralytics' in str(frame.filename) for frame in stack[1:]
-                )
-                # 或者检查文件路径是否包含 .pt（PyTorch 模型文件）
-                is_pt_file = (
-                    args and 
-                    isinstance(args[0], (str, bytes)) and 
-                    str(args[0]).endswith('.pt')
-                )
-                if is_ultralytics_call or is_pt_file:
-                    kwargs['weights_only'] = False
-            return _original_torch_load(*args, **kwargs)
-        
-        # 全局替换 torch.load（影响所有模块，包括 ultralytics）
-        torch.load = _patched_torch_load
-except ImportError:
-    TORCH_AVAILABLE = False
 
-try:
+    original_load = torch.load
+
+    @functools.wraps(original_load)
+    def _load(*args, **kwargs):
+        kwargs.setdefault("weights_only", False)
+        return original_load(*args, **kwargs)
+
+    torch.load = _load
+    try:
+        yield
+    finally:
+        torch.load = original_load
+
+
+def _load_yolo(source: str):
+    """导入 ultralytics 并加载 YOLO 模型（仅 PyTorch 模式与 ONNX 导出使用）"""
     from ultralytics import YOLO
-    ULTRALYTICS_AVAILABLE = True
-except ImportError:
-    ULTRALYTICS_AVAILABLE = False
-    logging.warning("ultralytics not available, ONNX mode will be used")
+
+    with _torch_load_compat():
+        return YOLO(source)
+
 
 try:
     import onnxruntime as ort
@@ -80,10 +81,22 @@ except ImportError:
     ONNXRUNTIME_AVAILABLE = False
     logging.warning("onnxruntime not available, falling back to PyTorch")
 
+from .artifact_cache import CLASSES_FILE, MODEL_FILE, ArtifactCache, cpu_fingerprint, file_sha256
+from ..class_table import EMPTY_TABLE, ClassTable, default_mapping_path, get_class_table, register_class_table
 from .base_vision import BaseVisionModel
+from ....core import tracing
+from ....core.metrics import stage
+from ...memory import note_allocation
+from ....utils.logger import log_extra
 
 logger = logging.getLogger(__name__)
 
+# 各阶段耗时直方图（/api/v1/metrics）
+_JPEG_DECODE = stage("jpeg_decode")
+_LETTERBOX = stage("letterbox")
+_ORT_RUN = stage("ort_run")
+_POSTPROCESS = stage("postprocess")
+
 
 class YOLOv8nAdapter(BaseVisionModel):
     """YOLOv8n 模型适配器，支持 ONNX 优化推理"""
@@ -95,7 +108,10 @@ class YOLOv8nAdapter(BaseVisionModel):
         confidence_threshold: float = 0.25,
         iou_threshold: float = 0.45,
         class_mapping_file: Optional[str] = None,
-        use_chinese: bool = True
+        use_chinese: bool = True,
+        intra_op_num_threads: int = 0,
+        artifact_cache_dir: Optional[str] = None,
+        artifact_cache_max_entries: int = 4
     ):
         """
         初始化 YOLOv8n 适配器
@@ -107,6 +123,11 @@ class YOLOv8nAdapter(BaseVisionModel):
             iou_threshold: IOU 阈值
             class_mapping_file: 中英文对照配置文件路径，None 表示使用默认路径
             use_chinese: 是否在返回结果中使用中文名称
+            intra_op_num_threads: ONNX Runtime 算子内线程数，0 表示由 ORT 自动决定；
+                设为 1 时推理在调用线程内完成、不创建线程池，会话可在 fork 后安全使用
+            artifact_cache_dir: 编译产物缓存目录（相对路径相对于 server 目录），None 表示不缓存；
+                启用后 ONNX 模式优先加载缓存的 ORT 格式优化模型与类别表
+            artifact_cache_max_entries: 缓存保留的最大条目数
         """
         self.model_path = model_path or "yolov8n.pt"
         # 保留原始的 use_onnx 值，用于决定是否尝试 ONNX
@@ -116,20 +137,28 @@ class YOLOv8nAdapter(BaseVisionModel):
         self.confidence_threshold = confidence_threshold
         self.iou_threshold = iou_threshold
         self.use_chinese = use_chinese
+        self.intra_op_num_threads = intra_op_num_threads
         
         self.model = None
         self.ort_session = None
         self.input_name = None
         self.output_names = None
-        self.class_names = None
         self.input_shape = None
         self.model_source = None  # 模型来源（文件路径或来源说明）
         self.execution_provider = None  # 执行提供者（CPU/CUDA）
         
-        # 加载中英文对照配置
-        self.class_mapping = {}  # 英文 -> 中文
+        # 编译产物缓存：hit（从缓存加载）/ miss（本次生成）/ disabled
+        self.artifact_cache = None
+        self.artifact_cache_status = "disabled"
+        if artifact_cache_dir:
+            cache_dir = Path(artifact_cache_dir)
+            if not cache_dir.is_absolute():
+                cache_dir = Path(__file__).parent.parent.parent.parent.parent / cache_dir
+            self.artifact_cache = ArtifactCache(str(cache_dir), max_entries=artifact_cache_max_entries)
+        
+        # 类别表在加载模型时获取（与语言层共用；命中编译产物缓存时直接使用缓存的类别表）
+        self.class_table: ClassTable = EMPTY_TABLE
         self.class_mapping_file = class_mapping_file
-        self._load_class_mapping()
         
         self._load_model()
         # 不在初始化时自动打印，由调用者决定是否打印
@@ -153,6 +182,8 @@ class YOLOv8nAdapter(BaseVisionModel):
         
         # 尝试 PyTorch 模式
         if ULTRALYTICS_AVAILABLE:
+            if not len(self.class_table):
+                self._load_class_mapping()
             try:
                 self._load_pytorch_model()
                 self.use_onnx = False
@@ -237,10 +268,6 @@ class YOLOv8nAdapter(BaseVisionModel):
         # 如果系统有 CUDA 支持，可以通过环境变量启用：ORT_USE_CUDA=1
         providers = ['CPUExecutionProvider']
         
-        # 创建 SessionOptions 来抑制日志输出
-        sess_options = ort.SessionOptions()
-        sess_options.log_severity_level = 3  # 3 = ERROR, 只显示错误，不显示警告
-        
         # 检查是否通过环境变量启用了 CUDA
         use_cuda = os.environ.get("ORT_USE_CUDA", "0").lower() in ("1", "true", "yes")
         
@@ -254,12 +281,7 @@ class YOLOv8nAdapter(BaseVisionModel):
             except Exception as e:
                 logger.debug(f"无法检测 CUDA 提供者: {e}")
         
-        # 创建会话（使用 SessionOptions 抑制日志）
-        self.ort_session = ort.InferenceSession(
-            onnx_path,
-            providers=providers,
-            sess_options=sess_options
-        )
+        self.ort_session = self._create_onnx_session(onnx_path, providers)
         
         # 记录实际使用的执行提供者
         actual_providers = self.ort_session.get_providers()
@@ -278,13 +300,99 @@ class YOLOv8nAdapter(BaseVisionModel):
         # 获取类别名称：在 ONNX 模式下，直接依赖配置文件提供的 COCO 类别映射，
         # 不再尝试加载 PyTorch 模型读取 names，避免因 ultralytics 版本差异产生额外报错。
         try:
-            self.class_names = self._get_default_coco_names()
-            logger.info(f"使用配置文件提供的 COCO 类别映射，共 {len(self.class_names)} 个类别")
+            self._require_class_table()
+            logger.info(f"使用配置文件提供的 COCO 类别映射，共 {len(self.class_table)} 个类别")
         except Exception as e:
             # 若映射缺失或配置文件异常，直接抛出错误，提示用户补齐配置
             logger.error(f"加载 COCO 类别映射失败: {e}")
             raise
     
+    def _session_options(self) -> "ort.SessionOptions":
+        """基础会话选项（抑制日志、线程数）"""
+        sess_options = ort.SessionOptions()
+        sess_options.log_severity_level = 3  # 3 = ERROR, 只显示错误，不显示警告
+        if self.intra_op_num_threads > 0:
+            sess_options.intra_op_num_threads = self.intra_op_num_threads
+            sess_options.inter_op_num_threads = 1
+        return sess_options
+    
+    def _create_onnx_session(self, onnx_path: str, providers: List[str]) -> "ort.InferenceSession":
+        """
+        创建 ONNX Runtime 会话并读取类别映射。
+        启用编译产物缓存时：命中则直接加载缓存的 ORT 格式优化模型（跳过图优化）与类别表；
+        未命中则在创建会话的同时保存优化结果，写入缓存供下次启动使用。缓存出错时回退到源模型，不影响加载。
+        """
+        if self.artifact_cache is None:
+            self._load_class_mapping()
+            return ort.InferenceSession(onnx_path, providers=providers, sess_options=self._session_options())
+        
+        cache = self.artifact_cache
+        try:
+            mapping_path = self._class_mapping_path()
+            # 只有影响优化结果的选项进入指纹；线程数不影响图，变化时无需重新生成
+            fingerprint = {
+                "ort_version": ort.__version__,
+                "providers": providers,
+                "graph_optimization_level": str(self._session_options().graph_optimization_level),
+                "cpu": cpu_fingerprint(),
+                "class_mapping_sha256": file_sha256(str(mapping_path)) if mapping_path.exists() else None,
+            }
+            key = cache.key(onnx_path, fingerprint)
+        except Exception as e:
+            logger.warning(f"无法计算模型缓存键，本次不使用缓存: {e}")
+            self.artifact_cache_status = "disabled"
+            self._load_class_mapping()
+            return ort.InferenceSession(onnx_path, providers=providers, sess_options=self._session_options())
+        
+        entry = cache.lookup(key)
+        if entry is not None:
+            try:
+                sess_options = self._session_options()
+                sess_options.add_session_config_entry("session.load_model_format", "ORT")
+                # 缓存的模型已完成全部图优化，加载时不再重复
+                sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+                session = ort.InferenceSession(str(entry / MODEL_FILE), providers=providers, sess_options=sess_options)
+                self.class_table = ClassTable.from_dict(cache.read_classes(entry), source=str(entry / CLASSES_FILE))
+                # 缓存键包含映射文件哈希，缓存的类别表与映射文件一致：登记后语言层不再重复解析
+                register_class_table(self.class_table, self.class_mapping_file)
+                self.artifact_cache_status = "hit"
+                self.model_source = f"{self.model_source}（编译缓存 {key[:8]}）"
+                logger.info(f"从编译产物缓存加载模型: {entry}")
+                return session
+            except Exception as e:
+                logger.warning(f"模型缓存条目不可用，已删除并回退到源模型: {e}")
+                cache.invalidate(key)
+        
+        staging = cache.staging_dir()
+        try:
+            sess_options = self._session_options()
+            sess_options.optimized_model_filepath = str(staging / MODEL_FILE)
+            sess_options.add_session_config_entry("session.save_model_format", "ORT")
+            try:
+                session = ort.InferenceSession(onnx_path, providers=providers, sess_options=sess_options)
+            except Exception as e:
+                # 部分执行提供者不支持保存 ORT 格式，改为不缓存
+                logger.warning(f"保存优化模型失败，本次不写入缓存: {e}")
+                shutil.rmtree(staging, ignore_errors=True)
+                self.artifact_cache_status = "disabled"
+                self._load_class_mapping()
+                return ort.InferenceSession(onnx_path, providers=providers, sess_options=self._session_options())
+            self._load_class_mapping()
+            self._require_class_table()
+            if (staging / MODEL_FILE).exists():
+                cache.commit(
+                    key,
+                    staging,
+                    classes=self.class_table.to_dict(),
+                    meta={"source": os.path.abspath(onnx_path), "fingerprint": fingerprint},
+                )
+                logger.info(f"已写入编译产物缓存: {cache.root / key}")
+            self.artifact_cache_status = "miss"
+            return session
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging, ignore_errors=True)
+    
     def _ensure_model_in_project_dir(self) -> str:
         """
         确保 PyTorch 模型文件在项目目录（server/models）中
@@ -327,7 +435,7 @@ class YOLOv8nAdapter(BaseVisionModel):
                 os.chdir(str(target_path.parent))
                 # 使用相对路径让 ultralytics 下载到当前目录
                 model_name = target_path.name
-                temp_model = YOLO(model_name)
+                _load_yolo(model_name)
                 # 下载完成后，检查文件是否在正确位置
                 if target_path.exists():
                     logger.info(f"模型已下载到: {target_path}")
@@ -381,24 +489,25 @@ class YOLOv8nAdapter(BaseVisionModel):
         # 确保模型文件在正确的位置（server/models 目录）
         target_model_path = self._ensure_model_in_project_dir()
         
-        self.model = YOLO(target_model_path)
-        # 安全获取类别名称，兼容不同版本的 ultralytics
+        self.model = _load_yolo(target_model_path)
+        # 安全获取类别名称，兼容不同版本的 ultralytics；模型自带的类别名按 id 重建类别表，翻译沿用映射
         try:
             names = self.model.names if hasattr(self.model, 'names') else getattr(self.model.model, 'names', None)
             if names is None:
                 # 如果无法获取，使用默认 COCO 类别
                 logger.warning("无法从模型获取类别名称，使用默认 COCO 类别")
-                self.class_names = self._get_default_coco_names()
             elif isinstance(names, dict):
-                self.class_names = {int(k): str(v) for k, v in names.items()}
+                names = {int(k): str(v) for k, v in names.items()}
+                if sorted(names) == list(range(len(names))):
+                    self.class_table = self.class_table.with_names([names[i] for i in range(len(names))])
+                else:
+                    logger.warning("模型类别 id 不连续，使用默认 COCO 类别")
             elif isinstance(names, (list, tuple)):
-                self.class_names = {i: str(name) for i, name in enumerate(names)}
+                self.class_table = self.class_table.with_names(names)
             else:
                 logger.warning(f"未知的类别名称格式: {type(names)}，使用默认 COCO 类别")
-                self.class_names = self._get_default_coco_names()
         except Exception as e:
             logger.warning(f"获取类别名称失败: {e}，使用默认 COCO 类别")
-            self.class_names = self._get_default_coco_names()
         
         # 记录模型来源
         if os.path.exists(target_model_path):
@@ -406,8 +515,9 @@ class YOLOv8nAdapter(BaseVisionModel):
         else:
             self.model_source = f"从 ultralytics 下载: {target_model_path}"
         
-        # 检查是否使用 CUDA
-        if TORCH_AVAILABLE and torch.cuda.is_available():
+        # 检查是否使用 CUDA（ultralytics 已导入 torch）
+        import torch
+        if torch.cuda.is_available():
             self.execution_provider = "CUDA"
         else:
             self.execution_provider = "CPU"
@@ -415,14 +525,15 @@ class YOLOv8nAdapter(BaseVisionModel):
     def _export_to_onnx(self, onnx_path: str):
         """导出 ONNX 模型"""
         try:
-            model = YOLO(self.model_path)
-            model.export(
-                format="onnx",
-                dynamic=True,
-                simplify=True,
-                opset=12,
-                half=False  # 禁用 FP16，避免与 dynamic 参数冲突
-            )
+            model = _load_yolo(self.model_path)
+            with _torch_load_compat():
+                model.export(
+                    format="onnx",
+                    dynamic=True,
+                    simplify=True,
+                    opset=12,
+                    half=False  # 禁用 FP16，避免与 dynamic 参数冲突
+                )
             # ultralytics 会自动生成 onnx 文件，重命名
             exported_path = self.model_path.replace('.pt', '.onnx')
             if os.path.exists(exported_path) and exported_path != onnx_path:
@@ -474,79 +585,24 @@ class YOLOv8nAdapter(BaseVisionModel):
                     f"5. 或者使用 PyTorch 模式（设置 use_onnx=False）"
                 ) from e
     
-    def _load_class_mapping(self):
-        """加载中英文对照配置文件"""
-        try:
-            # 确定配置文件路径
-            if self.class_mapping_file:
-                mapping_path = Path(self.class_mapping_file)
-            else:
-                # 默认路径：server/config/coco_classes_zh_en.yaml
-                # 通过向上查找 config 目录，避免路径层级误判
-                current_file = Path(__file__).resolve()
-                mapping_path = None
-                for parent in current_file.parents:
-                    candidate = parent / "config" / "coco_classes_zh_en.yaml"
-                    if candidate.exists():
-                        mapping_path = candidate
-                        break
-                    # 遇到项目根标志（包含 app 和 requirements.txt）即停止
-                    if (parent / "app").exists() and (parent / "requirements.txt").exists():
-                        mapping_path = candidate
-                        break
-                if mapping_path is None:
-                    # 最后兜底：按预期层级拼接
-                    mapping_path = current_file.parent.parent.parent.parent / "config" / "coco_classes_zh_en.yaml"
-            
-            if mapping_path.exists():
-                with open(mapping_path, 'r', encoding='utf-8') as f:
-                    config = yaml.safe_load(f)
-                    self.class_mapping = config.get('mapping', {})
-                    self.mapping_defaults = config.get('defaults', {})
-                logger.info(f"成功加载中英文对照配置: {mapping_path}，共 {len(self.class_mapping)} 个映射")
-            else:
-                logger.warning(f"中英文对照配置文件不存在: {mapping_path}，将只使用英文名称")
-                self.class_mapping = {}
-                self.mapping_defaults = {}
-        except Exception as e:
-            logger.warning(f"加载中英文对照配置失败: {e}，将只使用英文名称")
-            self.class_mapping = {}
-            self.mapping_defaults = {}
+    def _class_mapping_path(self) -> Path:
+        """中英文对照配置文件路径（默认 server/config/coco_classes_zh_en.yaml）"""
+        if self.class_mapping_file:
+            return Path(self.class_mapping_file)
+        return default_mapping_path()
     
-    def _translate_class_name(self, english_name: str) -> str:
-        """
-        将英文类别名称翻译为中文
-        
-        Args:
-            english_name: 英文类别名称
-            
-        Returns:
-            中文类别名称，如果找不到映射则返回英文名称
-        """
-        if not self.use_chinese:
-            return english_name
-        
-        chinese_name = self.class_mapping.get(english_name)
-        if chinese_name:
-            return chinese_name
-        
-        # 如果找不到映射，使用默认格式
-        fallback_format = self.mapping_defaults.get('fallback_format', '{en}')
-        return fallback_format.format(en=english_name, zh=self.mapping_defaults.get('unknown_zh', '未知'))
+    def _load_class_mapping(self):
+        """获取共享类别表（同一映射文件只解析一次，语言层复用同一实例）"""
+        self.class_table = get_class_table(self.class_mapping_file)
     
-    def _get_default_coco_names(self) -> Dict[int, str]:
+    def _require_class_table(self) -> ClassTable:
         """
-        获取 COCO 类别名称的唯一数据源。
-        
-        - 优先使用配置文件的英文名称（class_mapping 的键）
-        - 若未加载到配置（或缺失），直接抛出错误，提示用户提供映射
+        类别名称的唯一数据源是映射配置文件（类别 id 按其中的顺序），未加载到时直接抛出错误，提示用户提供映射。
         
         保持模块职责清晰：不再用硬编码列表兜底。
         """
-        if self.class_mapping:
-            english_names = list(self.class_mapping.keys())
-            return {i: name for i, name in enumerate(english_names)}
-        
+        if len(self.class_table):
+            return self.class_table
         mapping_hint = self.class_mapping_file or "server/config/coco_classes_zh_en.yaml"
         raise RuntimeError(
             f"未找到类别映射，请提供中英文映射配置文件: {mapping_hint}"
@@ -554,21 +610,62 @@ class YOLOv8nAdapter(BaseVisionModel):
     
     def _preprocess_image(self, image_data: bytes) -> np.ndarray:
         """图像预处理"""
-        nparr = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if image is None:
-            raise ValueError("无法解码图像数据。请确保输入是有效的 JPEG、PNG 或其他 OpenCV 支持的图像格式")
-        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        start = time.perf_counter()
+        with tracing.span("jpeg_decode"):
+            nparr = np.frombuffer(image_data, np.uint8)
+            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError("无法解码图像数据。请确保输入是有效的 JPEG、PNG 或其他 OpenCV 支持的图像格式")
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        _JPEG_DECODE.observe(time.perf_counter() - start)
+        note_allocation("decoded_image", image.nbytes)
         return image
     
-    def _prepare_onnx_input(self, image: np.ndarray) -> np.ndarray:
-        """准备 ONNX 输入"""
-        # YOLOv8 输入尺寸通常是 640x640
-        input_size = 640
+    @property
+    def default_input_size(self) -> int:
+        """模型默认输入边长：静态输入形状取其固定尺寸，否则为 YOLOv8 的 640"""
+        if self.input_shape and len(self.input_shape) == 4 and isinstance(self.input_shape[2], int) and self.input_shape[2] > 0:
+            return self.input_shape[2]
+        return 640
+    
+    def _has_dynamic_spatial(self) -> bool:
+        """ONNX 模型的高宽维度是否为动态（导出时 dynamic=True）"""
+        if not self.input_shape or len(self.input_shape) != 4:
+            return False
+        return all(not isinstance(dim, int) or dim <= 0 for dim in self.input_shape[2:])
+    
+    def supports_input_size(self, size: int) -> bool:
+        """是否可以按指定边长推理：PyTorch 与动态高宽的 ONNX 模型接受任意 32 的倍数，静态模型只接受固定尺寸"""
+        if size <= 0 or size % 32:
+            return False
+        if not self.use_onnx or self._has_dynamic_spatial():
+            return True
+        return size == self.default_input_size
+    
+    def _resolve_input_size(self, input_size: Optional[int]) -> int:
+        # 热重载可能换成不支持该尺寸的模型，此时退回默认尺寸
+        if input_size and input_size != self.default_input_size and self.supports_input_size(input_size):
+            return input_size
+        return self.default_input_size
+    
+    @staticmethod
+    def letterbox_scale(image_shape: tuple, input_size: int) -> float:
+        """letterbox 的缩放比例：原图坐标 × scale = 模型输入坐标（图像贴在左上角，右下填充）"""
+        h, w = image_shape[:2]
+        return min(input_size / h, input_size / w)
+    
+    def _prepare_onnx_input(self, image: np.ndarray, input_size: Optional[int] = None) -> Tuple[np.ndarray, float]:
+        """
+        准备 ONNX 输入（letterbox 到 input_size × input_size，None 使用模型默认尺寸）
+        
+        Returns:
+            (输入张量 [1, 3, input_size, input_size], 缩放比例)；解码时用缩放比例把框换算回原图坐标
+        """
+        input_size = self._resolve_input_size(input_size)
         h, w = image.shape[:2]
         
         # 缩放并填充
-        scale = min(input_size / h, input_size / w)
+        scale = self.letterbox_scale(image.shape, input_size)
         new_h, new_w = int(h * scale), int(w * scale)
         
         resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
@@ -577,155 +674,141 @@ class YOLOv8nAdapter(BaseVisionModel):
         padded = np.full((input_size, input_size, 3), 114, dtype=np.uint8)
         padded[:new_h, :new_w] = resized
         
-        # 转换为模型输入格式 [1, 3, 640, 640]，归一化到 [0, 1]
+        # 转换为模型输入格式 [1, 3, input_size, input_size]，归一化到 [0, 1]
         input_tensor = padded.transpose(2, 0, 1).astype(np.float32) / 255.0
         input_tensor = np.expand_dims(input_tensor, axis=0)
         
-        return input_tensor
+        return input_tensor, scale
     
     def _postprocess_onnx(
         self, 
         outputs: List[np.ndarray], 
-        image_shape: tuple
+        image_shape: tuple,
+        scale: float
     ) -> List[Dict[str, Any]]:
-        """ONNX 输出后处理"""
-        # YOLOv8 ONNX 输出格式通常是: [batch, 84, num_detections]
-        # 其中 84 = 4 (bbox: x_center, y_center, width, height) + 80 (classes)
-        # num_detections 通常是 8400 (80*80 + 40*40 + 20*20 = 6400 + 1600 + 400)
-        
-        output = outputs[0]  # 获取第一个输出 [batch, 84, num_detections]
+        """ONNX 输出后处理：向量化解码 + NMS，最后按类别表生成检测结果（scale 为 letterbox 缩放比例）"""
+        boxes, scores, class_ids = self._decode_onnx_output(outputs[0], image_shape, scale)
+        keep = self._nms(boxes, scores)
+        return self._to_detections(boxes[keep], scores[keep], class_ids[keep])
+    
+    def _decode_onnx_output(
+        self,
+        output: np.ndarray,
+        image_shape: tuple,
+        scale: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        解码 YOLOv8 原始输出，只产出数值数组（不涉及类别名称）
         
-        # 调试：输出形状信息
-        logger.debug(f"ONNX 输出原始形状: {output.shape}")
+        YOLOv8 ONNX 输出格式通常是: [batch, 4 + 类别数, num_detections]，
+        其中 4 = bbox (x_center, y_center, width, height，letterbox 后模型输入的像素坐标)，
+        num_detections 通常是 8400（80*80 + 40*40 + 20*20）。除以 scale 换算回原图像素坐标并裁剪到图像范围内，
+        完全落在填充区域的框被丢弃。
         
+        Returns:
+            (boxes [N, 4] 原图像素坐标 x1y1x2y2, scores [N], class_ids [N])，已按置信度阈值过滤
+        """
         # 移除 batch 维度
-        if len(output.shape) == 3:
-            output = output[0]  # [84, num_detections]
-        
-        # YOLOv8 输出格式是 [84, num_detections]，需要转置为 [num_detections, 84]
-        if output.shape[0] == 84:
-            output = output.T  # 转置为 [num_detections, 84]
-            logger.debug(f"转置后形状: {output.shape}")
-        elif output.shape[1] != 84:
-            logger.warning(f"意外的输出形状: {output.shape}，期望第二个维度为 84")
-            return []
-        
-        detections = []
+        if output.ndim == 3:
+            output = output[0]
+        logger.debug(f"ONNX 输出形状: {output.shape}")
+        
+        # 通道数远小于锚点数：[4 + 类别数, num_detections] 转置为 [num_detections, 4 + 类别数]（转置是视图，不复制）
+        if output.shape[0] < output.shape[1]:
+            output = output.T
+        if output.shape[1] <= 4:
+            logger.warning(f"意外的输出形状: {output.shape}，期望 [num_detections, 4 + 类别数]")
+            return np.empty((0, 4), np.float32), np.empty(0, np.float32), np.empty(0, np.int64)
+        
+        # 先按每行最高分过滤，只对少量候选行求类别，避免对全部锚点做 argmax
+        class_scores = output[:, 4:]
+        best = class_scores.max(axis=1)
+        candidates = np.flatnonzero(best >= self.confidence_threshold)
+        class_ids = class_scores[candidates].argmax(axis=1)
+        # 超出类别表的 id（模型类别数与映射不一致）直接丢弃
+        valid = class_ids < len(self.class_table)
+        if not valid.all():
+            logger.warning(f"检测到 {int((~valid).sum())} 个超出类别表范围的类别 ID，已跳过")
+            candidates, class_ids = candidates[valid], class_ids[valid]
+        scores = best[candidates]
+        
+        # 转换边界框格式 [x1, y1, x2, y2]：模型输入坐标 -> 原图像素坐标，裁剪到图像范围
         h, w = image_shape[:2]
+        xywh = output[candidates, :4].astype(np.float32)
+        half = xywh[:, 2:] / 2
+        boxes = np.concatenate([xywh[:, :2] - half, xywh[:, :2] + half], axis=1)
+        boxes /= np.float32(scale)
+        np.clip(boxes, 0, np.array([w, h, w, h], dtype=np.float32), out=boxes)
+        inside = (boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])
+        if not inside.all():
+            boxes, scores, class_ids = boxes[inside], scores[inside], class_ids[inside]
+        return boxes, scores, class_ids
+    
+    def _nms(self, boxes: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        """
+        NMS（与类别无关）：按置信度从高到低保留，与已保留框的 IOU 超过阈值的框被抑制
         
-        # 确保 class_names 是字典格式，且键是整数
-        if not isinstance(self.class_names, dict):
-            # 如果是列表或其他格式，转换为字典
-            if isinstance(self.class_names, (list, tuple)):
-                self.class_names = {i: str(name) for i, name in enumerate(self.class_names)}
-            else:
-                logger.warning(f"class_names 格式不正确: {type(self.class_names)}，使用默认 COCO 类别")
-                self.class_names = self._get_default_coco_names()
-        
-        # 确保所有键都是整数
-        self.class_names = {int(k): str(v) for k, v in self.class_names.items()}
-        
-        for detection in output:
-            # 检查 detection 的长度
-            if len(detection) < 84:
-                logger.warning(f"检测结果长度不足: {len(detection)}，期望 84，跳过")
-                continue
-            
-            # 提取边界框和类别分数
-            bbox = detection[:4]  # [x_center, y_center, width, height] (归一化)
-            scores = detection[4:84]  # 80个类别的分数（索引 4-83）
-            
-            # 找到最高分数和对应类别
-            class_id = int(np.argmax(scores))
-            confidence = float(scores[class_id])
-            
-            # 过滤低置信度检测
-            if confidence < self.confidence_threshold:
-                continue
-            
-            # 确保 class_id 在有效范围内（COCO 数据集是 0-79）
-            if class_id >= 80:
-                logger.warning(f"检测到无效的类别 ID: {class_id}（超出 COCO 80 类范围），跳过此检测")
-                continue
-            
-            # 获取类别名称（英文）
-            class_name_en = self.class_names.get(class_id)
-            if class_name_en is None:
-                # 使用默认 COCO 类别名称
-                default_names = self._get_default_coco_names()
-                class_name_en = default_names.get(class_id)
-                if class_name_en is None:
-                    logger.warning(f"未找到类别 ID {class_id} 的名称，使用默认名称")
-                    class_name_en = f"物体_{class_id}"
-                else:
-                    logger.debug(f"从默认类别名称获取: {class_id} -> {class_name_en}")
-            
-            # 翻译为中文（如果需要）
-            class_name = self._translate_class_name(class_name_en)
-            
-            # 转换边界框格式 [x1, y1, x2, y2] (像素坐标)
-            x_center, y_center, width, height = bbox
-            x1 = (x_center - width / 2) * w
-            y1 = (y_center - height / 2) * h
-            x2 = (x_center + width / 2) * w
-            y2 = (y_center + height / 2) * h
-            
-            detections.append({
-                "class": class_name,
-                "class_en": class_name_en,  # 保留英文名称
+        Returns:
+            保留框的下标（按置信度从高到低）
+        """
+        order = np.argsort(-scores, kind="stable")
+        if len(order) <= 1:
+            return order
+        x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+        areas = (x2 - x1) * (y2 - y1)
+        keep = []
+        while order.size:
+            i = order[0]
+            keep.append(i)
+            rest = order[1:]
+            inter = (
+                np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+                * np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+            )
+            union = areas[i] + areas[rest] - inter
+            iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+            order = rest[iou <= self.iou_threshold]
+        return np.asarray(keep, dtype=np.int64)
+    
+    def _to_detections(self, boxes: np.ndarray, scores: np.ndarray, class_ids: np.ndarray) -> List[Dict[str, Any]]:
+        """输出边界：按类别表下标取名称，生成检测结果字典"""
+        names = self.class_table.names(self.use_chinese)
+        names_en = self.class_table.names_en
+        return [
+            {
+                "class": names[class_id],
+                "class_en": names_en[class_id],  # 保留英文名称
                 "class_id": class_id,
                 "confidence": confidence,
-                "bbox": [float(x1), float(y1), float(x2), float(y2)]
-            })
-        
-        # NMS (简化版，使用置信度排序)
-        detections.sort(key=lambda x: x["confidence"], reverse=True)
-        filtered_detections = []
-        for det in detections:
-            # 简单的 IOU 过滤
-            overlap = False
-            for existing in filtered_detections:
-                iou = self._calculate_iou(det["bbox"], existing["bbox"])
-                if iou > self.iou_threshold:
-                    overlap = True
-                    break
-            if not overlap:
-                filtered_detections.append(det)
-        
-        return filtered_detections
-    
-    def _calculate_iou(self, box1: List[float], box2: List[float]) -> float:
-        """计算两个边界框的 IOU"""
-        x1_1, y1_1, x2_1, y2_1 = box1
-        x1_2, y1_2, x2_2, y2_2 = box2
-        
-        # 计算交集
-        x1_i = max(x1_1, x1_2)
-        y1_i = max(y1_1, y1_2)
-        x2_i = min(x2_1, x2_2)
-        y2_i = min(y2_1, y2_2)
-        
-        if x2_i <= x1_i or y2_i <= y1_i:
-            return 0.0
-        
-        intersection = (x2_i - x1_i) * (y2_i - y1_i)
-        area1 = (x2_1 - x1_1) * (y2_1 - y1_1)
-        area2 = (x2_2 - x1_2) * (y2_2 - y1_2)
-        union = area1 + area2 - intersection
-        
-        return intersection / union if union > 0 else 0.0
+                "bbox": bbox,
+            }
+            for class_id, confidence, bbox in zip(class_ids.tolist(), scores.tolist(), boxes.tolist())
+        ]
     
-    def _predict_onnx(self, image: np.ndarray) -> List[Dict[str, Any]]:
+    def _predict_onnx(self, image: np.ndarray, input_size: Optional[int] = None) -> List[Dict[str, Any]]:
         """ONNX 推理"""
-        input_tensor = self._prepare_onnx_input(image)
+        start = time.perf_counter()
+        with tracing.span("letterbox"):
+            input_tensor, scale = self._prepare_onnx_input(image, input_size)
+        letterbox_done = time.perf_counter()
+        _LETTERBOX.observe(letterbox_done - start)
         
         # 推理
-        outputs = self.ort_session.run(self.output_names, {self.input_name: input_tensor})
+        with tracing.span("ort_run"):
+            outputs = self.ort_session.run(self.output_names, {self.input_name: input_tensor})
+        run_done = time.perf_counter()
+        _ORT_RUN.observe(run_done - letterbox_done)
+        note_allocation("input_tensor", input_tensor.nbytes)
+        note_allocation("model_output", sum(output.nbytes for output in outputs))
         
         # 后处理
-        return self._postprocess_onnx(outputs, image.shape)
+        with tracing.span("postprocess") as postprocess_span:
+            detections = self._postprocess_onnx(outputs, image.shape, scale)
+            postprocess_span.set_attribute("detection_count", len(detections))
+        _POSTPROCESS.observe(time.perf_counter() - run_done)
+        return detections
     
-    def _predict_pytorch(self, image: np.ndarray) -> List[Dict[str, Any]]:
+    def _predict_pytorch(self, image: np.ndarray, input_size: Optional[int] = None) -> List[Dict[str, Any]]:
         """PyTorch 推理"""
         # ultralytics YOLO 模型可以直接接受 numpy 数组
         # 但需要确保格式正确：BGR 格式，uint8 类型
@@ -742,12 +825,14 @@ class YOLOv8nAdapter(BaseVisionModel):
         # 直接传递 numpy 数组给模型
         # ultralytics 8.0.0+ 支持直接传递 numpy 数组
         # 使用 source 参数明确指定，避免内部路径检查
+        predict_kwargs = {"imgsz": input_size} if input_size else {}
         try:
             results = self.model.predict(
                 source=image_bgr,
                 conf=self.confidence_threshold,
                 iou=self.iou_threshold,
-                verbose=False
+                verbose=False,
+                **predict_kwargs
             )
         except (ValueError, FileNotFoundError, TypeError) as e:
             # 如果直接传递失败，尝试使用临时文件（最后的手段）
@@ -760,7 +845,8 @@ class YOLOv8nAdapter(BaseVisionModel):
                         source=tmp_file.name,
                         conf=self.confidence_threshold,
                         iou=self.iou_threshold,
-                        verbose=False
+                        verbose=False,
+                        **predict_kwargs
                     )
                 finally:
                     # 清理临时文件
@@ -782,18 +868,9 @@ class YOLOv8nAdapter(BaseVisionModel):
                 if boxes is not None and len(boxes) > 0:
                     for box in boxes:
                         class_id = int(box.cls)
-                        class_name_en = self.class_names.get(class_id)
-                        if class_name_en is None:
-                            # 如果找不到，尝试从默认名称获取
-                            default_names = self._get_default_coco_names()
-                            class_name_en = default_names.get(class_id, f"物体_{class_id}")
-                        
-                        # 翻译为中文（如果需要）
-                        class_name = self._translate_class_name(class_name_en)
-                        
                         detections.append({
-                            "class": class_name,
-                            "class_en": class_name_en,  # 保留英文名称
+                            "class": self.class_table.name(class_id, self.use_chinese),
+                            "class_en": self.class_table.name(class_id, use_chinese=False),  # 保留英文名称
                             "class_id": class_id,
                             "confidence": float(box.conf),
                             "bbox": box.xyxy[0].tolist()  # [x1, y1, x2, y2]
@@ -801,7 +878,8 @@ class YOLOv8nAdapter(BaseVisionModel):
             else:
                 # 处理返回 Tensor 的情况（某些 ultralytics 版本或配置下可能发生）
                 if TORCH_AVAILABLE and hasattr(result, 'shape'):
-                    # 检查是否是 PyTorch Tensor
+                    # 检查是否是 PyTorch Tensor（PyTorch 模式下 ultralytics 已导入 torch）
+                    import torch
                     if isinstance(result, torch.Tensor) or (hasattr(result, 'shape') and hasattr(result, 'cpu')):
                         logger.debug(f"predict 返回了 Tensor 对象，shape: {result.shape}，尝试解析")
                         # Tensor 格式通常是 [N, 6]，其中 N 是检测框数量，6 是 [x1, y1, x2, y2, conf, cls]
@@ -819,16 +897,9 @@ class YOLOv8nAdapter(BaseVisionModel):
                                 x1, y1, x2, y2, conf, cls_id = det
                                 if conf >= self.confidence_threshold:
                                     class_id = int(cls_id)
-                                    class_name_en = self.class_names.get(class_id)
-                                    if class_name_en is None:
-                                        default_names = self._get_default_coco_names()
-                                        class_name_en = default_names.get(class_id, f"物体_{class_id}")
-                                    
-                                    class_name = self._translate_class_name(class_name_en)
-                                    
                                     detections.append({
-                                        "class": class_name,
-                                        "class_en": class_name_en,
+                                        "class": self.class_table.name(class_id, self.use_chinese),
+                                        "class_en": self.class_table.name(class_id, use_chinese=False),
                                         "class_id": class_id,
                                         "confidence": float(conf),
                                         "bbox": [float(x1), float(y1), float(x2), float(y2)]
@@ -846,12 +917,13 @@ class YOLOv8nAdapter(BaseVisionModel):
         
         return detections
     
-    async def describe(self, image_bytes: bytes) -> Dict[str, Any]:
+    async def describe(self, image_bytes: bytes, input_size: Optional[int] = None) -> Dict[str, Any]:
         """
         执行推理预测
         
         Args:
             image_bytes: 图像字节数据
+            input_size: 推理输入边长（会话协商的分辨率），None 使用模型默认尺寸
             
         Returns:
             包含检测结果的字典
@@ -861,28 +933,163 @@ class YOLOv8nAdapter(BaseVisionModel):
         try:
             # 预处理图像
             image = self._preprocess_image(image_bytes)
+            return self.describe_image(image, start_time=start_time, input_size=input_size)
             
-            # 执行推理
-            if self.use_onnx:
-                detections = self._predict_onnx(image)
-            else:
-                detections = self._predict_pytorch(image)
-            
-            inference_time = time.time() - start_time
-            
-            logger.info(f"YOLOv8n 推理完成: {len(detections)} 个检测, 耗时 {inference_time:.3f}s")
+        except Exception as e:
+            logger.error(f"推理失败: {e}", exc_info=True)
+            raise
+
+    def describe_image(
+        self,
+        image: np.ndarray,
+        start_time: Optional[float] = None,
+        input_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        对已解码的 RGB 图像执行推理（同步阻塞，可放到线程池中执行）
+        
+        Args:
+            image: RGB 图像数组
+            start_time: 计时起点，None 表示从本次调用开始计时
+            input_size: 推理输入边长，None 使用模型默认尺寸
             
-            return {
+        Returns:
+            与 describe() 相同格式的结果字典
+        """
+        start_time = start_time or time.time()
+        
+        # 执行推理
+        if self.use_onnx:
+            detections = self._predict_onnx(image, input_size)
+        else:
+            detections = self._predict_pytorch(image, input_size)
+        
+        inference_time = time.time() - start_time
+        
+        logger.info(
+            f"YOLOv8n 推理完成: {len(detections)} 个检测, 耗时 {inference_time:.3f}s",
+            extra=log_extra(per_frame=True, detection_count=len(detections), inference_time=inference_time),
+        )
+        
+        return {
+            "detections": detections,
+            "inference_time": inference_time,
+            "model": "yolov8n",
+            "timestamp": time.time(),
+            "image_shape": image.shape[:2]
+        }
+
+    def _supports_dynamic_batch(self) -> bool:
+        """ONNX 模型的批次维度是否为动态（导出时 dynamic=True）"""
+        if not self.input_shape:
+            return False
+        batch_dim = self.input_shape[0]
+        return not isinstance(batch_dim, int) or batch_dim <= 0
+
+    def detect_batch(
+        self,
+        images: List[np.ndarray],
+        timings: Optional[Dict[str, float]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        对已解码的 RGB 图像批量检测（同步阻塞，调用方应放到线程池中执行）
+
+        ONNX 模式且模型支持动态批次时，多张图像拼成一个批次只调用一次 ort_session.run；
+        否则逐张推理。
+
+        Args:
+            images: RGB 图像数组列表
+            timings: 可选，传入字典时累加各阶段耗时（letterbox / inference / postprocess，秒）
+
+        Returns:
+            与输入顺序一致的检测结果列表
+        """
+        if not images:
+            return []
+        timings = timings if timings is not None else {}
+
+        if not self.use_onnx:
+            start = time.time()
+            detections = [self._predict_pytorch(image) for image in images]
+            timings["inference"] = timings.get("inference", 0.0) + time.time() - start
+            return detections
+
+        # 直方图按单张图像（或单次 ort_session.run）记录，timings 累加整批耗时
+        start = time.time()
+        tensors = []
+        scales = []
+        for image in images:
+            with _LETTERBOX.time():
+                tensor, scale = self._prepare_onnx_input(image)
+            tensors.append(tensor)
+            scales.append(scale)
+        timings["letterbox"] = timings.get("letterbox", 0.0) + time.time() - start
+
+        start = time.time()
+        if self._supports_dynamic_batch():
+            with _ORT_RUN.time():
+                outputs = self.ort_session.run(self.output_names, {self.input_name: np.concatenate(tensors, axis=0)})[0]
+            per_image_outputs = [outputs[k:k + 1] for k in range(len(images))]
+        else:
+            per_image_outputs = []
+            for tensor in tensors:
+                with _ORT_RUN.time():
+                    per_image_outputs.append(self.ort_session.run(self.output_names, {self.input_name: tensor})[0])
+        timings["inference"] = timings.get("inference", 0.0) + time.time() - start
+
+        start = time.time()
+        detections = []
+        for output, image, scale in zip(per_image_outputs, images, scales):
+            with _POSTPROCESS.time():
+                detections.append(self._postprocess_onnx([output], image.shape, scale))
+        timings["postprocess"] = timings.get("postprocess", 0.0) + time.time() - start
+        return detections
+
+    def describe_batch(self, images: List[bytes]) -> List[Dict[str, Any]]:
+        """
+        批量推理（同步阻塞，调用方应放到线程池中执行）
+
+        单张图像解码失败不影响其他图像，对应位置返回 {"error": ...}。
+
+        Args:
+            images: 图像字节数据列表
+
+        Returns:
+            与输入顺序一致的结果列表，每项格式与 describe() 相同
+        """
+        batch_start = time.time()
+        decoded: List[Optional[np.ndarray]] = []
+        results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+
+        for i, image_bytes in enumerate(images):
+            try:
+                decoded.append(self._preprocess_image(image_bytes))
+            except Exception as e:
+                decoded.append(None)
+                results[i] = {"error": str(e)}
+
+        valid = [i for i, image in enumerate(decoded) if image is not None]
+        if not valid:
+            return results
+
+        per_image = self.detect_batch([decoded[i] for i in valid])
+
+        # 批次总耗时均摊到每张图像，便于与单张推理对比
+        inference_time = (time.time() - batch_start) / len(valid)
+        for i, detections in zip(valid, per_image):
+            results[i] = {
                 "detections": detections,
                 "inference_time": inference_time,
                 "model": "yolov8n",
                 "timestamp": time.time(),
-                "image_shape": image.shape[:2]
+                "image_shape": decoded[i].shape[:2]
             }
-            
-        except Exception as e:
-            logger.error(f"推理失败: {e}", exc_info=True)
-            raise
+
+        logger.info(
+            f"YOLOv8n 批量推理完成: {len(valid)} 张图像, 耗时 {time.time() - batch_start:.3f}s",
+            extra=log_extra(per_frame=True, batch_size=len(valid)),
+        )
+        return results
     
     def _print_model_info(self):
         """打印模型详细信息"""
@@ -892,13 +1099,15 @@ class YOLOv8nAdapter(BaseVisionModel):
         print(f"   模型类型: {'ONNX' if self.use_onnx else 'PyTorch'}")
         print(f"   执行设备: {self.execution_provider or '未知'}")
         print(f"   模型来源: {self.model_source or '未知'}")
+        if self.use_onnx:
+            print(f"   编译缓存: {self.artifact_cache_status}")
         print(f"   模型状态: {'✅ 可用' if (self.ort_session is not None or self.model is not None) else '❌ 不可用'}")
         
-        if self.class_names:
-            print(f"   类别数量: {len(self.class_names)}")
+        if len(self.class_table):
+            print(f"   类别数量: {len(self.class_table)}")
             # 显示前5个类别作为示例
-            sample_classes = list(self.class_names.values())[:5]
-            print(f"   示例类别: {', '.join(sample_classes)}" + ("..." if len(self.class_names) > 5 else ""))
+            sample_classes = self.class_table.names_en[:5]
+            print(f"   示例类别: {', '.join(sample_classes)}" + ("..." if len(self.class_table) > 5 else ""))
         
         if self.input_shape:
             print(f"   输入形状: {self.input_shape}")
@@ -917,8 +1126,9 @@ class YOLOv8nAdapter(BaseVisionModel):
             "model_type": "ONNX" if self.use_onnx else "PyTorch",
             "execution_provider": self.execution_provider or "未知",
             "model_source": self.model_source or "未知",
+            "artifact_cache": self.artifact_cache_status if self.use_onnx else None,
             "status": "可用" if (self.ort_session is not None or self.model is not None) else "不可用",
-            "class_count": len(self.class_names) if self.class_names else 0,
+            "class_count": len(self.class_table),
             "input_shape": list(self.input_shape) if self.input_shape else None,
             "confidence_threshold": self.confidence_threshold,
             "iou_threshold": self.iou_threshold
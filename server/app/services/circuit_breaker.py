@@ -0,0 +1,132 @@
+"""
+熔断器
+语言后端（本地/云端 LLM）连续失败达到阈值后熔断（open）：在 reset_timeout 内直接走模板回退，
+不再让每帧都等满超时；冷却期过后放行一次试探调用（half_open），成功则恢复（closed），失败则继续熔断。
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from ..core.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_TRANSITIONS = get_metrics_registry().counter(
+    "seeforme_circuit_breaker_transitions_total", "熔断器状态切换次数", ["breaker", "state"]
+)
+
+# 进程内全部熔断器，供健康检查与指标读取
+_breakers: Dict[str, "CircuitBreaker"] = {}
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器（线程安全）"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_short_circuited = 0
+        self.opened_at: Optional[float] = None
+        self.last_failure: Optional[str] = None
+        self._trial_started: Optional[float] = None
+        self._lock = threading.Lock()
+        _breakers[name] = self
+
+    def configure(self, failure_threshold: int, reset_timeout: float) -> None:
+        """更新阈值，保留当前状态与计数（热重载时沿用已打开的熔断）"""
+        with self._lock:
+            self.failure_threshold = max(1, failure_threshold)
+            self.reset_timeout = reset_timeout
+
+    def allow(self) -> bool:
+        """是否放行本次调用；熔断期间返回 False，冷却期过后每个冷却周期放行一次试探调用"""
+        if self.state == CLOSED:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+                self._transition(HALF_OPEN)
+                self._trial_started = now
+                return True
+            # 试探调用迟迟没有结果（如被取消）时，下一个冷却周期再放行一次
+            if self.state == HALF_OPEN and now - self._trial_started >= self.reset_timeout:
+                self._trial_started = now
+                return True
+            self.total_short_circuited += 1
+            return False
+
+    def record_success(self) -> None:
+        if self.state == CLOSED and self.consecutive_failures == 0:
+            return
+        with self._lock:
+            self.consecutive_failures = 0
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+                self.opened_at = None
+
+    def record_failure(self, reason: str = "") -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self.last_failure = reason or self.last_failure
+            if self.state == HALF_OPEN or (
+                self.state == CLOSED and self.consecutive_failures >= self.failure_threshold
+            ):
+                self._transition(OPEN)
+                self.opened_at = time.monotonic()
+
+    def _transition(self, state: str) -> None:
+        if state == OPEN:
+            logger.warning(
+                f"熔断器 {self.name} 打开：连续失败 {self.consecutive_failures} 次，"
+                f"{self.reset_timeout:.0f}s 内直接回退（最近错误: {self.last_failure}）"
+            )
+        else:
+            logger.info(f"熔断器 {self.name}: {self.state} -> {state}")
+        self.state = state
+        _TRANSITIONS.labels(self.name, state).inc()
+
+    def snapshot(self) -> Dict:
+        retry_in = None
+        if self.state == OPEN and self.opened_at is not None:
+            retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 1)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "retry_in": retry_in,
+            "total_failures": self.total_failures,
+            "total_short_circuited": self.total_short_circuited,
+            "last_failure": self.last_failure,
+        }
+
+
+def get_breaker(name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    """按名称取已有熔断器并应用新阈值，不存在时创建；适配器重建（热重载）不会把已打开的熔断重置为 closed"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        return CircuitBreaker(name, failure_threshold, reset_timeout)
+    breaker.configure(failure_threshold, reset_timeout)
+    return breaker
+
+
+def get_breakers() -> Dict[str, CircuitBreaker]:
+    return dict(_breakers)
+
+
+get_metrics_registry().gauge(
+    "seeforme_circuit_breaker_state", "熔断器状态（0=closed, 1=half_open, 2=open）", ["breaker"]
+).set_function(lambda: {(name,): _STATE_VALUES[breaker.state] for name, breaker in list(_breakers.items())})
@@ -0,0 +1,254 @@
+"""
+健康检查
+- 存活（liveness）：进程与事件循环可响应即可
+- 就绪（readiness）：模型已加载并预热（各模型状态见 models）、未饱和（并发与排队均已满、或连接数已满时返回 503，便于负载均衡器把流量路由到其他实例）；
+  语言后端不可达或熔断时仅标记为 degraded（仍可模板回退），除非配置 health.require_language；
+  附带 ORT 执行提供方与各阶段最近 60 秒 p50/p95
+- 深度检查（deep）：等待语言后端探测结果（缓存过期时当场探测），并附带各模型与语言后端的完整状态
+
+就绪检查只读取内存状态，不做任何 IO：语言后端探测结果按 probe_interval 缓存，
+缓存过期时由就绪检查在后台发起新的探测（模型加载完成后也会立即探测一次），下一次就绪检查即可读到。
+预派生多进程模式下每次请求只反映处理该请求的工作进程。
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..core.metrics import STAGE_ROLLING_WINDOW, STAGE_SECONDS
+from .admission import get_admission_controller
+from .circuit_breaker import OPEN, get_breakers
+from .model_registry import get_model_registry
+from .websocket_manager import get_ws_manager
+
+logger = logging.getLogger(__name__)
+
+_STARTED_AT = time.time()
+
+
+# 延迟导入配置，避免循环依赖
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class HealthService:
+    """汇总各组件状态，生成存活/就绪/深度检查报告"""
+
+    def __init__(self):
+        self._probe: Optional[Dict[str, Any]] = None
+        self._probe_at = 0.0
+        self._probe_lock: Optional[asyncio.Lock] = None
+        self._probe_task: Optional[asyncio.Task] = None
+
+    # ========= 各组件状态 =========
+    def _models(self) -> Dict[str, Any]:
+        registry = get_model_registry()
+        info: Dict[str, Any] = {
+            "state": registry.state,
+            "serving": registry.serving,
+            "vision_warmed_up": registry.vision_warmed_up,
+            "language_warmed_up": registry.language_warmed_up,
+            "models": registry.snapshot(),
+            "reload": registry.reload_status(),
+        }
+        if registry.load_error:
+            info["error"] = registry.load_error
+        if registry.loaded:
+            vision_model = registry.vision_model
+            session = getattr(vision_model, "ort_session", None)
+            info["vision"] = {
+                "model": getattr(vision_model, "model_path", None),
+                "runtime": "onnxruntime" if getattr(vision_model, "use_onnx", False) else "pytorch",
+                "providers": session.get_providers() if session is not None else [],
+            }
+        return info
+
+    def _load(self) -> Dict[str, Any]:
+        admission = get_admission_controller().snapshot()
+        ws = get_ws_manager().snapshot()
+        saturated_reasons = []
+        if admission["in_flight"] >= admission["max_concurrent"] and admission["waiting"] >= admission["max_queued"]:
+            saturated_reasons.append("admission_full")
+        if ws["active"] >= ws["max_connections"]:
+            saturated_reasons.append("connections_full")
+        return {
+            "in_flight": admission["in_flight"],
+            "waiting": admission["waiting"],
+            "max_concurrent": admission["max_concurrent"],
+            "max_queued": admission["max_queued"],
+            # 0~1：(处理中 + 排队) / (并发上限 + 排队上限)，负载均衡器可据此加权
+            "utilization": round(
+                (admission["in_flight"] + admission["waiting"])
+                / max(1, admission["max_concurrent"] + admission["max_queued"]),
+                3,
+            ),
+            "connections": ws["active"],
+            "max_connections": ws["max_connections"],
+            "connections_by_endpoint": ws["by_endpoint"],
+            "send_queue_depth": ws["queued"],
+            "saturated": bool(saturated_reasons),
+            "saturated_reasons": saturated_reasons,
+        }
+
+    def _language(self) -> Dict[str, Any]:
+        registry = get_model_registry()
+        info: Dict[str, Any] = {"mode": getattr(_get_settings().language, "MODE", "template")}
+        if registry.loaded:
+            info.update(registry.language_model.describe_backend())
+        breakers = get_breakers()
+        if "llm" in breakers:
+            info["breaker"] = breakers["llm"].snapshot()
+        if self._probe is not None:
+            info["probe"] = dict(self._probe, age=round(time.monotonic() - self._probe_at, 1))
+        return info
+
+    @staticmethod
+    def _latency() -> Dict[str, Any]:
+        stages = {}
+        for stage, summary in sorted(STAGE_SECONDS.rolling_summaries().items()):
+            if summary["count"]:
+                stages[stage] = {
+                    "count": summary["count"],
+                    "p50_ms": round(summary["p50"] * 1000, 2),
+                    "p95_ms": round(summary["p95"] * 1000, 2),
+                }
+        return {"window_seconds": STAGE_ROLLING_WINDOW, "stages": stages}
+
+    async def probe_language(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """探测语言后端（结果缓存 probe_interval 秒，并发请求共用一次探测）"""
+        health_cfg = _get_settings().health
+        registry = get_model_registry()
+        if not registry.loaded:
+            return None
+        if self._probe_lock is None:
+            self._probe_lock = asyncio.Lock()
+        async with self._probe_lock:
+            if not force and self._probe is not None and time.monotonic() - self._probe_at < health_cfg.PROBE_INTERVAL:
+                return self._probe
+            result = await registry.language_model.probe(timeout=health_cfg.PROBE_TIMEOUT)
+            if result is not None:
+                self._probe = result
+                self._probe_at = time.monotonic()
+                if not result.get("reachable"):
+                    logger.warning(f"语言后端不可达: {result.get('error')}")
+            return result
+
+    def refresh_probe(self) -> None:
+        """缓存过期时在后台刷新语言后端探测（不等待结果，需在事件循环中调用）"""
+        if not get_model_registry().loaded or (self._probe_task is not None and not self._probe_task.done()):
+            return
+        if self._probe is not None and time.monotonic() - self._probe_at < _get_settings().health.PROBE_INTERVAL:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._probe_task = loop.create_task(self._background_probe())
+
+    async def _background_probe(self) -> None:
+        try:
+            await self.probe_language()
+        except Exception as e:
+            logger.warning(f"语言后端探测失败: {e}")
+
+    # ========= 报告 =========
+    @staticmethod
+    def liveness() -> Dict[str, Any]:
+        return {
+            "status": "alive",
+            "pid": os.getpid(),
+            "uptime": round(time.time() - _STARTED_AT, 1),
+            "timestamp": time.time(),
+        }
+
+    def _evaluate(self, models: Dict[str, Any], load: Dict[str, Any], language: Dict[str, Any]) -> Tuple[str, List[str]]:
+        """返回 (status, reasons)：ready / degraded 视为就绪，not_ready / saturated 返回 503"""
+        settings = _get_settings()
+        reasons: List[str] = []
+        if not models["serving"]:
+            # 预热中（且 health.warmup_required）为 warming_up，其余为 models_loading / models_failed 等
+            reasons.append("warming_up" if models["state"] == "warming" else f"models_{models['state']}")
+            return "not_ready", reasons
+
+        if load["saturated"]:
+            return "saturated", list(load["saturated_reasons"])
+
+        language_problems = []
+        breaker = language.get("breaker")
+        if breaker is not None and breaker["state"] != "closed":
+            language_problems.append(f"llm_breaker_{breaker['state']}")
+        probe = language.get("probe")
+        if probe is not None and not probe.get("reachable"):
+            language_problems.append("llm_unreachable")
+        if language_problems:
+            hard = settings.health.REQUIRE_LANGUAGE and (
+                "llm_unreachable" in language_problems or (breaker is not None and breaker["state"] == OPEN)
+            )
+            return ("not_ready" if hard else "degraded"), language_problems
+        return "ready", reasons
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """就绪检查（只读内存状态），返回 (是否就绪, 报告)"""
+        self.refresh_probe()
+        models = self._models()
+        load = self._load()
+        language = self._language()
+        status, reasons = self._evaluate(models, load, language)
+        report = {
+            "status": status,
+            "reasons": reasons,
+            "pid": os.getpid(),
+            "timestamp": time.time(),
+            "models": {
+                "state": models["state"],
+                "vision_warmed_up": models["vision_warmed_up"],
+                "generation": models["reload"]["generation"],
+                **{name: slot["state"] for name, slot in models["models"].items()},
+            },
+            "vision": models.get("vision"),
+            "language": {
+                "mode": language["mode"],
+                "breaker": (language.get("breaker") or {}).get("state"),
+                "reachable": (language.get("probe") or {}).get("reachable"),
+                "probe_age": (language.get("probe") or {}).get("age"),
+            },
+            "load": load,
+            "latency": self._latency(),
+        }
+        return status in ("ready", "degraded"), report
+
+    async def deep(self) -> Tuple[bool, Dict[str, Any]]:
+        """深度检查：等待语言后端探测结果并附带完整的组件状态与各阶段近期耗时"""
+        await self.probe_language()
+        models = self._models()
+        load = self._load()
+        language = self._language()
+        status, reasons = self._evaluate(models, load, language)
+        liveness = self.liveness()
+        report = {
+            "status": status,
+            "reasons": reasons,
+            "pid": liveness["pid"],
+            "uptime": liveness["uptime"],
+            "timestamp": liveness["timestamp"],
+            "models": models,
+            "language": language,
+            "load": load,
+            "latency": self._latency(),
+        }
+        return status in ("ready", "degraded"), report
+
+
+# 全局健康检查服务实例
+_health_service: Optional[HealthService] = None
+
+
+def get_health_service() -> HealthService:
+    """获取全局健康检查服务（单例模式）"""
+    global _health_service
+    if _health_service is None:
+        _health_service = HealthService()
+    return _health_service
@@ -0,0 +1,203 @@
+"""
+热重载
+修改模型、阈值、语言模式、类别映射或提示词后无需重启：连接不断开，新模型在后台加载预热后原子切换。
+
+- 触发方式：管理接口 POST /api/v1/admin/reload，或开启 hot_reload.watch 后轮询 config/、prompts/ 与模型文件
+- 每次重载：重新读取 app.yaml（只更新 vision / language / model_cache 段）、原子地重新加载提示词，
+  再根据变化重建模型：vision / model_cache 段、模型文件变化重建视觉模型，language 段变化重建语言模型，
+  类别映射文件变化两者都重建（视觉模型的类别表与语言模型的中文名称都来自它）
+- 模型切换由 ModelRegistry.reload() 完成：切换前开始的请求继续使用旧实例，结束后旧实例释放
+
+预派生多进程模式下每个工作进程各自重载：管理接口只作用于处理该请求的进程，多进程部署请使用文件监视。
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .model_registry import get_model_registry
+
+logger = logging.getLogger(__name__)
+
+SERVER_DIR = Path(__file__).resolve().parent.parent.parent
+CONFIG_DIR = SERVER_DIR / "config"
+APP_CONFIG = CONFIG_DIR / "app.yaml"
+
+# 模型重建范围：auto 按变化的内容决定，none 只重新加载配置与提示词
+RELOAD_MODELS = ("auto", "all", "vision", "language", "none")
+
+
+# 延迟导入配置，避免循环依赖
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def _prompts_dir() -> Path:
+    from .ai_models.language.prompts import get_prompts_manager
+    return Path(get_prompts_manager(_get_settings().language.PROMPTS_DIR).prompts_dir)
+
+
+def _model_file() -> Path:
+    path = Path(_get_settings().vision.YOLO_MODEL_PATH)
+    if path.is_absolute() or path.exists():
+        return path
+    return SERVER_DIR / path
+
+
+class HotReloader:
+    """热重载协调器：比较监视文件的快照，重新加载配置与提示词并按需重建模型"""
+
+    def __init__(self):
+        self._baseline: Dict[str, Tuple[int, int]] = {}
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self.last_result: Optional[Dict[str, Any]] = None
+
+    @property
+    def config(self):
+        return _get_settings().hot_reload
+
+    # ---------- 文件快照 ----------
+    def _watched(self) -> List[Path]:
+        files = [p for p in CONFIG_DIR.glob("*.yaml")]
+        prompts_dir = _prompts_dir()
+        files += list(prompts_dir.glob("*.yaml")) + list(prompts_dir.glob("*.yml"))
+        files.append(_model_file())
+        return files
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for path in self._watched():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            snapshot[str(path)] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    @staticmethod
+    def _diff(old: Dict[str, Tuple[int, int]], new: Dict[str, Tuple[int, int]]) -> List[str]:
+        return sorted(path for path in old.keys() | new.keys() if old.get(path) != new.get(path))
+
+    # ---------- 重载 ----------
+    async def reload(self, models: str = "auto", reason: str = "admin") -> Dict[str, Any]:
+        """
+        重新加载配置与提示词，并按 models 重建模型：
+        auto 根据自上次重载以来变化的文件与配置段决定；all / vision / language 强制重建；none 不重建。
+        模型重建失败时抛出异常（当前实例继续服务）。
+        """
+        from app.core.config import reload_settings
+        from .ai_models.language.prompts import get_prompts_manager
+
+        if models not in RELOAD_MODELS:
+            raise ValueError(f"未知的重建范围: {models}")
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            start = time.monotonic()
+            changed = self._diff(self._baseline, self._scan())
+            model_file = str(_model_file())
+            sections = await asyncio.to_thread(reload_settings)
+            await asyncio.to_thread(get_prompts_manager().reload)
+
+            mapping_changed = any(Path(path).parent == CONFIG_DIR and Path(path) != APP_CONFIG for path in changed)
+            # 配置变化可能换了模型路径：新路径视为变化
+            model_file_changed = model_file in changed or str(_model_file()) != model_file
+            vision = models in ("all", "vision") or (models == "auto" and (
+                "vision" in sections or "model_cache" in sections or mapping_changed or model_file_changed
+            ))
+            language = models in ("all", "language") or (models == "auto" and ("language" in sections or mapping_changed))
+
+            # 模型仍在后台加载（或按退避重试）时没有可替换的一代：auto 只刷新配置，下一次加载尝试直接使用新配置；
+            # 显式指定的重建仍由 registry.reload 抛出 ModelsNotReady
+            deferred = models == "auto" and (vision or language) and not get_model_registry().loaded
+            if deferred:
+                vision = language = False
+            result: Dict[str, Any] = {
+                "reason": reason,
+                "changed_files": [str(Path(path).relative_to(SERVER_DIR)) if path.startswith(str(SERVER_DIR)) else path for path in changed],
+                "config_sections": sections,
+                "prompts_reloaded": True,
+                "rebuilt": [name for name, selected in (("vision", vision), ("language", language)) if selected],
+            }
+            if deferred:
+                result["deferred_to_initial_load"] = True
+            # 无论成败都以当前文件为新的基准，避免损坏的文件在每次轮询时反复触发
+            self._baseline = self._scan()
+            try:
+                if vision or language:
+                    await get_model_registry().reload(vision=vision, language=language, reason=reason)
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                result["generation"] = get_model_registry().generation
+                result["duration_s"] = round(time.monotonic() - start, 3)
+                result["finished_at"] = time.time()
+                self.last_result = result
+            return result
+
+    # ---------- 文件监视 ----------
+    def start(self) -> None:
+        """记录监视文件的基准快照；开启 hot_reload.watch 时启动轮询任务（需在事件循环中调用）"""
+        self._baseline = self._scan()
+        if not self.config.WATCH or (self._task is not None and not self._task.done()):
+            return
+        logger.info(f"热重载文件监视已启动：{len(self._baseline)} 个文件，间隔 {self.config.WATCH_INTERVAL}s")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        pending: Optional[Dict[str, Tuple[int, int]]] = None
+        pending_since = 0.0
+        while True:
+            await asyncio.sleep(self.config.WATCH_INTERVAL)
+            try:
+                current = await asyncio.to_thread(self._scan)
+                if not self._diff(self._baseline, current):
+                    pending = None
+                    continue
+                # 文件仍在变化（例如正在拷贝模型）时继续等待
+                if current != pending:
+                    pending, pending_since = current, time.monotonic()
+                    continue
+                if time.monotonic() - pending_since < self.config.DEBOUNCE:
+                    continue
+                pending = None
+                changed = self._diff(self._baseline, current)
+                logger.info(f"检测到文件变化，开始热重载: {', '.join(Path(p).name for p in changed)}")
+                await self.reload(reason="file_watch")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"热重载失败，继续使用当前模型: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "watch": bool(self._task is not None and not self._task.done()),
+            "watched_files": len(self._baseline),
+            "models": get_model_registry().reload_status(),
+            "last_result": self.last_result,
+        }
+
+
+# 全局热重载协调器
+_hot_reloader: Optional[HotReloader] = None
+
+
+def get_hot_reloader() -> HotReloader:
+    """获取全局热重载协调器（单例模式）"""
+    global _hot_reloader
+    if _hot_reloader is None:
+        _hot_reloader = HotReloader()
+    return _hot_reloader
@@ -0,0 +1,374 @@
+"""
+内存监控
+服务端长期运行、用户反复连接断开，逐帧分配（解码后的 1200 万像素图像、填充后的输入张量、检测结果字典）
+与会话级状态一旦泄漏会缓慢累积。本模块提供：
+
+- 周期采样：后台任务按 memory.sample_interval 采集 RSS、Python 分配块数、GC 计数，
+  tracemalloc 开启时附带已追踪的堆大小；保留最近 memory.history 个采样点，
+  窗口内 RSS 增长超过 memory.growth_warn_mb 时记录告警
+- tracemalloc 快照：由管理接口按需开启、拍摄快照并对比两次快照之间的分配差异
+- 会话内存归属（近似值）：每个连接的发送队列字节数 + 附属对象（如视频流解码缓冲）+ 正在处理的帧；
+  帧处理期间各环节通过 note_allocation() 把主要的大块分配（原始字节、解码图像、输入张量）记到当前帧上，
+  帧结束后保留该连接最近一帧与单帧峰值
+
+note_allocation() 在没有进行中的帧时只有一次 ContextVar 读取。
+预派生多进程模式下每个工作进程独立采样，一次请求只反映处理该请求的进程。
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import gc
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from ..core.metrics import get_metrics_registry
+
+logger = logging.getLogger(__name__)
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+# 延迟导入配置，避免循环依赖
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def current_rss() -> Optional[int]:
+    """当前常驻内存（字节）；Linux 读 /proc/self/statm，其他平台尝试 psutil，均不可用时返回 None"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+# ========= 逐帧分配归属 =========
+
+class FrameLedger:
+    """一帧处理期间记下的主要分配（近似值，不含 Python 对象开销）"""
+
+    __slots__ = ("items", "total")
+
+    def __init__(self):
+        self.items: Dict[str, int] = {}
+        self.total = 0
+
+    def add(self, name: str, nbytes: int) -> None:
+        self.items[name] = self.items.get(name, 0) + nbytes
+        self.total += nbytes
+
+
+_current_frame: contextvars.ContextVar[Optional[FrameLedger]] = contextvars.ContextVar(
+    "seeforme_frame_ledger", default=None
+)
+
+
+def note_allocation(name: str, nbytes: int) -> None:
+    """把一块分配记到当前帧（没有进行中的帧时忽略）"""
+    ledger = _current_frame.get()
+    if ledger is not None:
+        ledger.add(name, nbytes)
+
+
+def begin_frame(conn, input_bytes: int = 0) -> contextvars.Token:
+    """
+    开始一帧：之后的 note_allocation() 记到该帧（asyncio.create_task / to_thread 会复制上下文，
+    流水线内的子任务同样计入）；调用方在 finally 中调用 end_frame()
+    """
+    ledger = FrameLedger()
+    if input_bytes:
+        ledger.add("input", input_bytes)
+    conn.frame_ledger = ledger
+    return _current_frame.set(ledger)
+
+
+def end_frame(conn, token: contextvars.Token) -> None:
+    """结束一帧，把帧内存汇总到连接统计"""
+    ledger = conn.frame_ledger
+    _current_frame.reset(token)
+    conn.frame_ledger = None
+    if ledger is not None:
+        conn.record_frame_memory(ledger.total)
+
+
+def session_memory(conn) -> Dict[str, Any]:
+    """单个连接的近似内存归属"""
+    attached = 0
+    for obj in conn.attachments:
+        with contextlib.suppress(Exception):
+            attached += obj.memory_usage()
+    in_flight = conn.frame_ledger.total if conn.frame_ledger is not None else 0
+    return {
+        "client_id": conn.client_id,
+        "endpoint": conn.endpoint,
+        "session_id": conn.session_id,
+        "send_queue_bytes": conn.queued_bytes,
+        "attached_bytes": attached,
+        "in_flight_bytes": in_flight,
+        "total_bytes": conn.queued_bytes + attached + in_flight,
+        "last_frame_bytes": conn.stats.last_frame_bytes,
+        "peak_frame_bytes": conn.stats.peak_frame_bytes,
+    }
+
+
+# ========= 监控 =========
+
+def _format_stat(stat) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    return {
+        "where": f"{frame.filename}:{frame.lineno}",
+        "traceback": [f"{f.filename}:{f.lineno}" for f in stat.traceback] if len(stat.traceback) > 1 else None,
+        "size": stat.size,
+        "count": stat.count,
+    }
+
+
+def _format_diff(stat) -> Dict[str, Any]:
+    data = _format_stat(stat)
+    data["size_diff"] = stat.size_diff
+    data["count_diff"] = stat.count_diff
+    return data
+
+
+# 快照中排除 tracemalloc 自身与导入机制的分配
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class MemoryMonitor:
+    """周期采样 RSS/堆、管理 tracemalloc 快照、汇总会话内存"""
+
+    def __init__(self, config=None):
+        config = config or _get_settings().memory
+        self.config = config
+        self.samples: Deque[Dict[str, Any]] = deque(maxlen=max(2, config.HISTORY))
+        self.snapshots: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._next_snapshot_id = 1
+        self._task: Optional[asyncio.Task] = None
+        self._last_growth_warning = 0.0
+        # 增长检测只看该时刻之后的采样（模型加载完成后重新开始计算）
+        self._growth_since = 0.0
+
+    # ---------- 采样 ----------
+    def sample(self) -> Dict[str, Any]:
+        from .websocket_manager import get_ws_manager
+
+        sessions = [session_memory(conn) for conn in list(get_ws_manager().active_connections.values())]
+        data: Dict[str, Any] = {
+            "time": time.time(),
+            "rss": current_rss(),
+            "allocated_blocks": sys.getallocatedblocks(),
+            "gc_counts": list(gc.get_count()),
+            "gc_collections": [generation["collections"] for generation in gc.get_stats()],
+            "sessions": len(sessions),
+            "session_bytes": sum(session["total_bytes"] for session in sessions),
+        }
+        if tracemalloc.is_tracing():
+            traced, peak = tracemalloc.get_traced_memory()
+            data["traced"] = traced
+            data["traced_peak"] = peak
+        return data
+
+    def record_sample(self) -> Dict[str, Any]:
+        data = self.sample()
+        self.samples.append(data)
+        self._check_growth(data)
+        return data
+
+    def _check_growth(self, latest: Dict[str, Any]) -> None:
+        growth = self.growth()
+        if growth is None or growth["rss_growth_mb"] < self.config.GROWTH_WARN_MB:
+            return
+        # 同一窗口内只告警一次
+        if latest["time"] - self._last_growth_warning < self.config.GROWTH_WINDOW:
+            return
+        self._last_growth_warning = latest["time"]
+        logger.warning(
+            f"RSS 在 {growth['window_seconds']:.0f}s 内增长 {growth['rss_growth_mb']:.1f}MB "
+            f"（{growth['rss_start_mb']:.1f}MB -> {growth['rss_end_mb']:.1f}MB，会话数 {latest['sessions']}），"
+            f"可能存在内存泄漏，可通过 /api/v1/admin/memory/snapshots 对比 tracemalloc 快照"
+        )
+
+    def growth(self) -> Optional[Dict[str, Any]]:
+        """增长检测窗口内 RSS 的变化：窗口起点取窗口内最低值，避免把启动阶段的正常增长算作泄漏"""
+        samples = [s for s in self.samples if s["rss"] is not None and s["time"] >= self._growth_since]
+        if len(samples) < 2:
+            return None
+        latest = samples[-1]
+        window = [s for s in samples if latest["time"] - s["time"] <= self.config.GROWTH_WINDOW]
+        if len(window) < 2:
+            return None
+        start = min(window, key=lambda s: s["rss"])
+        # 最小二乘斜率（MB/小时）
+        t0 = window[0]["time"]
+        xs = [s["time"] - t0 for s in window]
+        ys = [s["rss"] / 1048576 for s in window]
+        mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+        denominator = sum((x - mean_x) ** 2 for x in xs)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / denominator if denominator else 0.0
+        return {
+            "window_seconds": latest["time"] - window[0]["time"],
+            "samples": len(window),
+            "rss_start_mb": round(start["rss"] / 1048576, 1),
+            "rss_end_mb": round(latest["rss"] / 1048576, 1),
+            "rss_growth_mb": round((latest["rss"] - start["rss"]) / 1048576, 1),
+            "rss_slope_mb_per_hour": round(slope * 3600, 2),
+        }
+
+    def restart_growth_window(self) -> None:
+        """从现在开始重新计算 RSS 增长（采样历史保留）：服务启动时先开始采样，模型加载完成后调用，避免把加载模型的内存算作泄漏"""
+        self._growth_since = time.time()
+
+    def start(self) -> None:
+        """启动后台采样任务（需在事件循环中调用）"""
+        if self.config.TRACEMALLOC_AT_STARTUP and not tracemalloc.is_tracing():
+            tracemalloc.start(self.config.TRACEMALLOC_FRAMES)
+        if self.config.SAMPLE_INTERVAL <= 0 or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.record_sample()
+            except Exception as e:
+                logger.warning(f"内存采样失败: {e}")
+            await asyncio.sleep(self.config.SAMPLE_INTERVAL)
+
+    # ---------- 报告 ----------
+    def report(self, top_sessions: int = 20, history: int = 60) -> Dict[str, Any]:
+        from .websocket_manager import get_ws_manager
+
+        sessions = [session_memory(conn) for conn in list(get_ws_manager().active_connections.values())]
+        sessions.sort(key=lambda s: (s["total_bytes"], s["peak_frame_bytes"]), reverse=True)
+        return {
+            "pid": os.getpid(),
+            "current": self.sample(),
+            "growth": self.growth(),
+            "tracemalloc": self.tracemalloc_status(),
+            "sessions": {
+                "count": len(sessions),
+                "total_bytes": sum(s["total_bytes"] for s in sessions),
+                "top": sessions[:top_sessions],
+            },
+            "history": list(self.samples)[-history:] if history > 0 else [],
+        }
+
+    # ---------- tracemalloc ----------
+    def tracemalloc_status(self) -> Dict[str, Any]:
+        status: Dict[str, Any] = {"tracing": tracemalloc.is_tracing(), "snapshots": self.list_snapshots()}
+        if tracemalloc.is_tracing():
+            traced, peak = tracemalloc.get_traced_memory()
+            status.update(frames=tracemalloc.get_traceback_limit(), traced=traced, traced_peak=peak)
+        return status
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        return [
+            {key: value for key, value in entry.items() if key != "snapshot"}
+            for entry in self.snapshots.values()
+        ]
+
+    def take_snapshot(self, label: str = "") -> Dict[str, Any]:
+        """拍摄 tracemalloc 快照（未开启时先开启；开启前的分配不会被记录）"""
+        started = False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.config.TRACEMALLOC_FRAMES)
+            started = True
+            logger.warning(f"已开启 tracemalloc（调用栈深度 {self.config.TRACEMALLOC_FRAMES}），请在对比结束后关闭")
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        traced, _ = tracemalloc.get_traced_memory()
+        entry = {
+            "id": self._next_snapshot_id,
+            "label": label,
+            "time": time.time(),
+            "traced": traced,
+            "rss": current_rss(),
+            "tracing_just_started": started,
+            "snapshot": snapshot,
+        }
+        self._next_snapshot_id += 1
+        self.snapshots[entry["id"]] = entry
+        while len(self.snapshots) > max(1, self.config.MAX_SNAPSHOTS):
+            self.snapshots.popitem(last=False)
+        return {key: value for key, value in entry.items() if key != "snapshot"}
+
+    def diff(self, base_id: int, target_id: Optional[int] = None, group_by: str = "lineno", limit: int = 30) -> Dict[str, Any]:
+        """对比两个快照（target_id 为空时现拍一个），按分配增长量排序"""
+        if base_id not in self.snapshots:
+            raise KeyError(f"快照不存在: {base_id}")
+        if target_id is None:
+            target_id = self.take_snapshot("diff")["id"]
+        elif target_id not in self.snapshots:
+            raise KeyError(f"快照不存在: {target_id}")
+        base, target = self.snapshots[base_id], self.snapshots[target_id]
+        stats = target["snapshot"].compare_to(base["snapshot"], group_by)
+        return {
+            "base": base_id,
+            "target": target_id,
+            "group_by": group_by,
+            "elapsed": round(target["time"] - base["time"], 1),
+            "traced_diff": target["traced"] - base["traced"],
+            "rss_diff": (target["rss"] - base["rss"]) if target["rss"] is not None and base["rss"] is not None else None,
+            "size_diff_total": sum(stat.size_diff for stat in stats),
+            "top": [_format_diff(stat) for stat in stats[:limit]],
+        }
+
+    def top(self, snapshot_id: int, group_by: str = "lineno", limit: int = 30) -> List[Dict[str, Any]]:
+        if snapshot_id not in self.snapshots:
+            raise KeyError(f"快照不存在: {snapshot_id}")
+        stats = self.snapshots[snapshot_id]["snapshot"].statistics(group_by)
+        return [_format_stat(stat) for stat in stats[:limit]]
+
+    def stop_tracing(self) -> None:
+        """关闭 tracemalloc 并丢弃全部快照"""
+        self.snapshots.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.warning("已关闭 tracemalloc")
+
+
+get_metrics_registry().gauge(
+    "seeforme_process_resident_memory_bytes", "进程常驻内存（字节）"
+).set_function(lambda: current_rss() or 0)
+get_metrics_registry().gauge(
+    "seeforme_tracemalloc_traced_bytes", "tracemalloc 已追踪的分配（字节，未开启时为 0）"
+).set_function(lambda: tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0)
+
+
+# 全局内存监控实例
+_memory_monitor: Optional[MemoryMonitor] = None
+
+
+def get_memory_monitor() -> MemoryMonitor:
+    """获取全局内存监控（单例模式）"""
+    global _memory_monitor
+    if _memory_monitor is None:
+        _memory_monitor = MemoryMonitor()
+    return _memory_monitor
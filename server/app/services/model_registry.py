@@ -0,0 +1,479 @@
+"""
+共享模型注册表
+视觉模型、语言模型与流水线在进程内只加载一次，WebSocket 与 HTTP 接口共用同一份实例。
+
+每个模型有独立的状态机：pending -> loading -> warming -> ready，加载失败进入 failed 并按指数退避重试。
+服务启动时在后台加载（start()），就绪前到达的图像由 wait_until_serving() 短暂等待，超时抛出 ModelsNotReady。
+
+热重载（reload()）在后台新建并预热模型，然后原子地切换到新一代流水线；请求通过 lease() 取得流水线，
+切换前开始的请求继续使用旧一代实例直到结束，旧实例随最后一个在途请求结束而释放。
+请求路径上从不同步加载模型：未就绪时 lease() / pipeline 直接抛出 ModelsNotReady，只有 load() 同步加载。
+"""
+
+import asyncio
+import contextlib
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Dict, Iterator, Optional
+
+from .ai_models.pipelines.vision_to_text import VisionToTextPipeline, create_language_model
+from .warmup import warm_language, warm_llm_connections, warm_vision
+
+logger = logging.getLogger(__name__)
+
+
+# 延迟导入配置，避免循环依赖
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+# 语言来源 -> 展示名称
+LANGUAGE_DISPLAY_NAMES = {
+    "template_default": "Template",
+    "model_local": "Qwen (local)",
+    "model_cloud": "Qwen (cloud)",
+}
+
+# 单个模型的状态
+PENDING = "pending"
+LOADING = "loading"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelsNotReady(Exception):
+    """模型未就绪：code 为 WARMING_UP（加载 / 预热 / 等待重试中）或 MODELS_UNAVAILABLE（已放弃重试）"""
+
+    def __init__(self, message: str, code: str = "WARMING_UP", retry_after: float = 2.0):
+        super().__init__(message)
+        self.code = code
+        self.retry_after = retry_after
+
+
+class ModelSlot:
+    """单个模型的加载状态"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = PENDING
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.warmup_error: Optional[str] = None
+        self.retry_at: Optional[float] = None
+        self.gave_up = False
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self.warmup_report: Optional[Dict[str, Any]] = None
+        self.changed_at = time.time()
+        self.lock = threading.Lock()
+
+    def transition(self, state: str) -> None:
+        if state != self.state:
+            logger.info(f"模型 {self.name}: {self.state} -> {state}")
+            self.state = state
+            self.changed_at = time.time()
+
+    @property
+    def loaded(self) -> bool:
+        return self.state in (WARMING, READY)
+
+    def snapshot(self) -> Dict[str, Any]:
+        info: Dict[str, Any] = {
+            "state": self.state,
+            "attempts": self.attempts,
+            "since": self.changed_at,
+        }
+        if self.load_seconds is not None:
+            info["load_seconds"] = round(self.load_seconds, 3)
+        if self.warmup_seconds is not None:
+            info["warmup_seconds"] = round(self.warmup_seconds, 3)
+        if self.error:
+            info["error"] = self.error
+        if self.warmup_error:
+            info["warmup_error"] = self.warmup_error
+        if self.warmup_report is not None:
+            info["warmup"] = self.warmup_report
+        if self.retry_at is not None:
+            info["retry_in"] = round(max(0.0, self.retry_at - time.time()), 1)
+        if self.gave_up:
+            info["gave_up"] = True
+        return info
+
+
+class ModelRegistry:
+    """进程级模型注册表，按 app.yaml 配置加载"""
+
+    def __init__(self):
+        self._pipeline: Optional[VisionToTextPipeline] = None
+        self._lock = threading.Lock()
+        self._vision_model = None
+        self._language_model = None
+        self._language_source: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self.models: Dict[str, ModelSlot] = {"vision": ModelSlot("vision"), "language": ModelSlot("language")}
+        self.vision_warmed_up = False
+        self.language_warmed_up = False
+        # 流水线代数：首次加载为第 1 代，每次热重载切换后加一
+        self.generation = 0
+        self._inflight: Dict[int, int] = {}
+        self._reload_lock: Optional[asyncio.Lock] = None
+        self._reload_status: Dict[str, Any] = {"state": "idle", "reloads": 0}
+
+    # ========= 状态 =========
+    @property
+    def loaded(self) -> bool:
+        return self._pipeline is not None
+
+    @property
+    def state(self) -> str:
+        """not_loaded / loading / warming / loaded / failed（供健康检查使用）"""
+        states = [slot.state for slot in self.models.values()]
+        if FAILED in states:
+            return "failed"
+        if LOADING in states:
+            return "loading"
+        if self._pipeline is None:
+            return "loading" if self._task is not None and not self._task.done() else "not_loaded"
+        if WARMING in states:
+            return "warming"
+        return "loaded"
+
+    @property
+    def load_error(self) -> Optional[str]:
+        for slot in self.models.values():
+            if slot.state == FAILED and slot.error:
+                return f"{slot.name}: {slot.error}"
+        return None
+
+    @property
+    def serving(self) -> bool:
+        """是否可以处理图像：模型已加载，且（要求预热时）预热已结束"""
+        if self._pipeline is None:
+            return False
+        settings = _get_settings()
+        if not (settings.vision.MODEL_WARMUP and settings.health.WARMUP_REQUIRED):
+            return True
+        return all(slot.state == READY for slot in self.models.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: slot.snapshot() for name, slot in self.models.items()}
+
+    def reload_status(self) -> Dict[str, Any]:
+        """热重载状态：当前代数、最近一次重载结果，以及仍有在途请求的旧代"""
+        with self._lock:
+            draining = {str(g): n for g, n in self._inflight.items() if g != self.generation}
+        return {**self._reload_status, "generation": self.generation, "draining": draining}
+
+    # ========= 加载 =========
+    def _build_vision(self):
+        from .ai_models.vision import YOLOv8nAdapter
+
+        settings = _get_settings()
+        cache = settings.model_cache
+        # 使用配置的模型路径，避免默认路径找不到文件触发导出
+        return YOLOv8nAdapter(
+            model_path=settings.vision.YOLO_MODEL_PATH,
+            use_onnx=settings.vision.YOLO_USE_ONNX,
+            confidence_threshold=settings.vision.YOLO_CONFIDENCE_THRESHOLD,
+            iou_threshold=settings.vision.YOLO_IOU_THRESHOLD,
+            intra_op_num_threads=settings.vision.ORT_INTRA_OP_THREADS,
+            artifact_cache_dir=cache.DIR if cache.ENABLED else None,
+            artifact_cache_max_entries=cache.MAX_ENTRIES,
+        )
+
+    def _create_vision(self) -> None:
+        self._vision_model = self._build_vision()
+
+    def _create_language(self) -> None:
+        self._language_model, self._language_source = create_language_model()
+
+    def _load_model(self, name: str) -> None:
+        """加载单个模型（幂等、线程安全），失败时记录错误并抛出"""
+        slot = self.models[name]
+        with slot.lock:
+            if slot.loaded:
+                return
+            slot.attempts += 1
+            slot.transition(LOADING)
+            start = time.monotonic()
+            try:
+                self._create_vision() if name == "vision" else self._create_language()
+            except Exception as e:
+                slot.error = f"{type(e).__name__}: {e}"
+                slot.transition(FAILED)
+                raise
+            slot.load_seconds = time.monotonic() - start
+            slot.error = None
+            slot.transition(WARMING if _get_settings().vision.MODEL_WARMUP else READY)
+
+    def _publish(self) -> Optional[VisionToTextPipeline]:
+        """两个模型都加载后组装共享流水线"""
+        with self._lock:
+            if self._pipeline is None and all(slot.loaded for slot in self.models.values()):
+                self._pipeline = VisionToTextPipeline(
+                    vision_model=self._vision_model,
+                    language_model=self._language_model,
+                    language_source_base=self._language_source,
+                )
+                self.generation = 1
+                logger.info("共享模型加载完成")
+        return self._pipeline
+
+    def load(self) -> VisionToTextPipeline:
+        """同步加载全部模型（不预热、不重试），返回共享流水线；预派生父进程与离线工具使用"""
+        if self._pipeline is not None:
+            return self._pipeline
+        for name in self.models:
+            self._load_model(name)
+        return self._publish()
+
+    async def _bring_up(self, name: str) -> None:
+        """加载（失败按指数退避重试）并预热单个模型"""
+        cfg = _get_settings().model_loading
+        slot = self.models[name]
+        while not slot.loaded:
+            try:
+                await asyncio.to_thread(self._load_model, name)
+            except Exception as e:
+                if cfg.MAX_ATTEMPTS and slot.attempts >= cfg.MAX_ATTEMPTS:
+                    slot.gave_up = True
+                    logger.error(f"模型 {name} 加载失败，已达最大次数 {slot.attempts}，不再重试: {e}")
+                    return
+                delay = min(cfg.RETRY_MAX, cfg.RETRY_INITIAL * 2 ** (slot.attempts - 1))
+                slot.retry_at = time.time() + delay
+                logger.warning(f"模型 {name} 第 {slot.attempts} 次加载失败，{delay:.1f}s 后重试: {e}")
+                await asyncio.sleep(delay)
+                slot.retry_at = None
+        self._publish()
+        # 预派生父进程中预热失败时，在工作进程中重试一次
+        warmed_up = self.vision_warmed_up if name == "vision" else self.language_warmed_up
+        if _get_settings().vision.MODEL_WARMUP and not warmed_up:
+            try:
+                await (self.warmup_vision() if name == "vision" else self.warmup_language())
+            except Exception as e:
+                logger.warning(f"模型 {name} 预热失败（不影响正常使用）: {e}")
+        elif _get_settings().vision.MODEL_WARMUP and name == "language":
+            # 父进程已预热：fork 后连接池已清空，工作进程重新建立到语言后端的长连接
+            backend = await warm_llm_connections(self._language_model)
+            if backend is not None and self.models[name].warmup_report is not None:
+                self.models[name].warmup_report["backend"] = backend
+
+    async def load_async(self) -> None:
+        """并行加载并预热视觉与语言模型，直到全部就绪（或达到最大重试次数）"""
+        await asyncio.gather(self._bring_up("vision"), self._bring_up("language"))
+
+    def start(self) -> asyncio.Task:
+        """在后台开始加载（重复调用返回同一个任务）"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.load_async())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def _not_ready(self) -> ModelsNotReady:
+        """当前未就绪的原因：已放弃重试为 MODELS_UNAVAILABLE，其余为 WARMING_UP"""
+        if any(slot.gave_up for slot in self.models.values()):
+            return ModelsNotReady(f"模型加载失败: {self.load_error}", code="MODELS_UNAVAILABLE", retry_after=60.0)
+        retry_at = [slot.retry_at for slot in self.models.values() if slot.retry_at is not None]
+        retry_after = max(1.0, max(retry_at) - time.time()) if retry_at else 2.0
+        message = {"warming": "模型预热中", "failed": "模型加载失败，正在重试"}.get(self.state, "模型加载中")
+        return ModelsNotReady(message, retry_after=retry_after)
+
+    async def wait_until_serving(self, timeout: Optional[float] = None) -> None:
+        """等待模型就绪，最多 timeout 秒（默认 model_loading.frame_wait），仍未就绪时抛出 ModelsNotReady"""
+        if self.serving:
+            return
+        if timeout is None:
+            timeout = _get_settings().model_loading.FRAME_WAIT
+        deadline = time.monotonic() + timeout
+        while not self.serving:
+            if any(slot.gave_up for slot in self.models.values()) or time.monotonic() >= deadline:
+                raise self._not_ready()
+            await asyncio.sleep(0.05)
+
+    # ========= 热重载 =========
+    async def reload(self, vision: bool = True, language: bool = True, reason: str = "") -> Dict[str, Any]:
+        """
+        按当前配置新建（并预热）指定的模型，成功后原子地切换到新一代流水线。
+        新视觉模型加载或预热失败时保留当前实例并抛出异常；多次调用依次执行。
+        """
+        if self._pipeline is None:
+            raise ModelsNotReady("模型尚未加载完成，无法热重载")
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+        async with self._reload_lock:
+            names = [name for name, selected in (("vision", vision), ("language", language)) if selected]
+            status = self._reload_status
+            status.update(state="reloading", models=names, reason=reason, started_at=time.time())
+            status.pop("error", None)
+            start = time.monotonic()
+            new_vision = new_language = new_source = None
+            reports: Dict[str, Dict[str, Any]] = {}
+            try:
+                if vision:
+                    new_vision = await asyncio.to_thread(self._build_vision)
+                if language:
+                    new_language, new_source = await asyncio.to_thread(create_language_model)
+                if _get_settings().vision.MODEL_WARMUP:
+                    if new_vision is not None:
+                        reports["vision"] = await self._exercise_vision(new_vision)
+                    if new_language is not None:
+                        try:
+                            reports["language"] = await self._exercise_language(new_language)
+                        except Exception as e:
+                            logger.warning(f"新语言模型预热失败（不影响切换）: {e}")
+            except Exception as e:
+                status.update(state="failed", error=f"{type(e).__name__}: {e}", finished_at=time.time())
+                logger.error(f"热重载失败，继续使用第 {self.generation} 代模型: {e}")
+                raise
+            retired = self._swap(new_vision, new_language, new_source)
+            for name, report in reports.items():
+                self.models[name].warmup_report = report
+            duration = time.monotonic() - start
+            status.update(state="idle", finished_at=time.time(), duration_s=round(duration, 3))
+            status["reloads"] += 1
+            logger.info(
+                f"热重载完成（{', '.join(names) or '无模型'}{'，' + reason if reason else ''}），"
+                f"第 {retired} 代 -> 第 {self.generation} 代，耗时 {duration:.2f}s"
+            )
+            return self.reload_status()
+
+    def _swap(self, vision_model, language_model, language_source: Optional[str]) -> int:
+        """切换到由新实例（None 表示沿用当前实例）组成的新一代流水线，返回被替换的代数"""
+        with self._lock:
+            old_pipeline, old_generation = self._pipeline, self.generation
+            if vision_model is not None:
+                self._vision_model = vision_model
+            if language_model is not None:
+                self._language_model, self._language_source = language_model, language_source
+            self._pipeline = VisionToTextPipeline(
+                vision_model=self._vision_model,
+                language_model=self._language_model,
+                language_source_base=self._language_source,
+            )
+            self.generation += 1
+            inflight = self._inflight.get(old_generation, 0)
+        # 被替换的实例在最后一个引用（在途请求）释放后回收，此时记录日志
+        for name, old, new in (
+            ("vision", old_pipeline.vision_model, vision_model),
+            ("language", old_pipeline.language_model, language_model),
+        ):
+            if new is not None and old is not new:
+                weakref.finalize(old, logger.info, f"第 {old_generation} 代 {name} 模型实例已释放")
+        if inflight:
+            logger.info(f"第 {old_generation} 代仍有 {inflight} 个在途请求，结束后释放旧实例")
+        return old_generation
+
+    @contextlib.contextmanager
+    def lease(self) -> Iterator[VisionToTextPipeline]:
+        """
+        取得当前一代流水线并计入在途请求；热重载切换后，已取得的请求继续使用旧实例直到结束
+
+        Raises:
+            ModelsNotReady: 流水线尚未组装（不在请求路径上同步加载，调用方应先 wait_until_serving）
+        """
+        with self._lock:
+            pipeline, generation = self._pipeline, self.generation
+            if pipeline is not None:
+                self._inflight[generation] = self._inflight.get(generation, 0) + 1
+        if pipeline is None:
+            raise self._not_ready()
+        try:
+            yield pipeline
+        finally:
+            with self._lock:
+                remaining = self._inflight[generation] - 1
+                if remaining:
+                    self._inflight[generation] = remaining
+                else:
+                    del self._inflight[generation]
+                retired = generation != self.generation
+            del pipeline
+            if retired and not remaining:
+                logger.info(f"第 {generation} 代的在途请求已全部结束")
+
+    # ========= 访问 =========
+    @property
+    def pipeline(self) -> VisionToTextPipeline:
+        """当前一代流水线；尚未加载时抛出 ModelsNotReady（需要同步加载的离线工具显式调用 load()）"""
+        pipeline = self._pipeline
+        if pipeline is None:
+            raise self._not_ready()
+        return pipeline
+
+    @property
+    def vision_model(self):
+        return self.pipeline.vision_model
+
+    @property
+    def language_model(self):
+        return self.pipeline.language_model
+
+    @property
+    def language_display_name(self) -> str:
+        return LANGUAGE_DISPLAY_NAMES.get(self.pipeline.language_source_base, "Unknown")
+
+    @property
+    def warmed_up(self) -> bool:
+        return self.vision_warmed_up and self.language_warmed_up
+
+    async def _warmup(self, name: str, run) -> None:
+        slot = self.models[name]
+        slot.transition(WARMING)
+        start = time.monotonic()
+        try:
+            await run()
+        except Exception as e:
+            slot.warmup_error = f"{type(e).__name__}: {e}"
+            raise
+        else:
+            slot.warmup_error = None
+        finally:
+            slot.warmup_seconds = time.monotonic() - start
+            slot.transition(READY)
+
+    @staticmethod
+    async def _exercise_vision(vision_model) -> Dict[str, Any]:
+        """按预热计划跑遍视觉模型的输入形状与批大小（见 warmup.py）"""
+        return await warm_vision(vision_model)
+
+    @staticmethod
+    async def _exercise_language(language_model) -> Dict[str, Any]:
+        """构建各模板的提示词并建立到语言后端的长连接（见 warmup.py）"""
+        return await warm_language(language_model)
+
+    async def warmup_vision(self) -> None:
+        async def run() -> None:
+            self.models["vision"].warmup_report = await self._exercise_vision(self._vision_model)
+            self.vision_warmed_up = True
+
+        await self._warmup("vision", run)
+
+    async def warmup_language(self) -> None:
+        async def run() -> None:
+            self.models["language"].warmup_report = await self._exercise_language(self._language_model)
+            self.language_warmed_up = True
+
+        await self._warmup("language", run)
+
+
+# 全局模型注册表实例
+_registry: Optional[ModelRegistry] = None
+
+
+def get_model_registry() -> ModelRegistry:
+    """获取全局模型注册表（单例模式）"""
+    global _registry
+    if _registry is None:
+        _registry = ModelRegistry()
+    return _registry
@@ -0,0 +1,208 @@
+"""
+线上按需性能剖析
+两种模式，同一时刻只允许一个剖析任务：
+
+- 栈采样（sample）：后台线程按固定频率采集所有线程的调用栈（sys._current_frames），
+  在限定时长后输出 collapsed-stack 文本（每行 "线程;帧1;帧2;... 次数"），可用 flamegraph.pl / speedscope 离线渲染
+- 流水线剖析（pipeline）：用 cProfile 包裹接下来的 N 次流水线执行（process_image_stream / process_frame_stream），
+  输出 pstats 文件（或文本摘要），可用 snakeviz / pstats 离线查看。
+  注意 cProfile 只记录启用它的线程（事件循环线程），剖析期间同一线程上其他协程的执行也会计入；
+  线程池中的推理与 LLM 调用请用栈采样模式观察
+
+未激活时没有后台线程，也不安装任何 profile 钩子；流水线入口只有一次属性判断（maybe_wrap）。
+预派生多进程模式下每个工作进程独立，一次请求只剖析处理该请求的进程。
+"""
+
+import asyncio
+import cProfile
+import io
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import AsyncGenerator, Dict, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+MAX_SAMPLE_DURATION = 60.0     # 栈采样最长时长（秒）
+MAX_SAMPLE_RATE = 1000.0       # 栈采样最高频率（Hz）
+MAX_PIPELINE_EXECUTIONS = 1000
+MAX_PIPELINE_TIMEOUT = 300.0   # 等待 N 次流水线执行的最长时间（秒）
+MAX_STACK_DEPTH = 128
+
+
+class ProfilerBusy(Exception):
+    """已有剖析任务在运行"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """后台线程定时采集所有线程的调用栈，按 collapsed-stack 聚合"""
+
+    def __init__(self, duration: float, rate: float):
+        self.duration = duration
+        self.interval = 1.0 / rate
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.overruns = 0  # 单次采集耗时超过采样间隔的次数（线程很多或栈很深时）
+
+    def run(self) -> None:
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + self.duration
+        next_tick = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                self.overruns += 1
+                next_tick = time.monotonic()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class PipelineCapture:
+    """用 cProfile 包裹接下来的 N 次流水线执行"""
+
+    def __init__(self, executions: int):
+        self.executions = executions
+        self.started = 0
+        self.completed = 0
+        self.profile = cProfile.Profile()
+        self.done = asyncio.Event()
+        self._active = 0
+
+    @property
+    def wants_more(self) -> bool:
+        return self.started < self.executions
+
+    async def wrap(self, stream: AsyncGenerator[T, None]) -> AsyncGenerator[T, None]:
+        self.started += 1
+        if self._active == 0:
+            self.profile.enable()
+        self._active += 1
+        try:
+            async for item in stream:
+                yield item
+        finally:
+            # finish() 可能已在超时时停止记录
+            if self._active > 0:
+                self._active -= 1
+                if self._active == 0:
+                    self.profile.disable()
+            self.completed += 1
+            if self.completed >= self.executions:
+                self.done.set()
+
+    def finish(self) -> None:
+        """超时结束时仍有执行未完成：停止记录"""
+        if self._active:
+            self._active = 0
+            self.profile.disable()
+
+    def pstats_bytes(self) -> bytes:
+        """与 pstats.Stats.dump_stats 相同的 marshal 格式"""
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
+
+    def text(self, sort: str = "cumulative", limit: int = 60) -> str:
+        self.profile.create_stats()
+        if not self.profile.stats:
+            # pstats.Stats 不接受空的剖析结果（超时且没有完成任何执行）
+            return f"没有记录到流水线执行（已完成 {self.completed}/{self.executions}）\n"
+        buffer = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=buffer)
+        stats.sort_stats(sort).print_stats(limit)
+        return buffer.getvalue()
+
+
+class ProfilerService:
+    """剖析任务调度：保证同一时刻只有一个任务，流水线入口通过 maybe_wrap 接入"""
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self._capture: Optional[PipelineCapture] = None
+        self.current: Optional[Dict] = None
+
+    def maybe_wrap(self, stream: AsyncGenerator[T, None]) -> AsyncGenerator[T, None]:
+        """流水线入口调用：未在剖析时原样返回，开销只有一次属性判断"""
+        capture = self._capture
+        if capture is None or not capture.wants_more:
+            return stream
+        return capture.wrap(stream)
+
+    def status(self) -> Dict:
+        return {"active": self.current is not None, "current": self.current}
+
+    async def sample_stacks(self, duration: float, rate: float) -> StackSampler:
+        if self._lock.locked():
+            raise ProfilerBusy(f"已有剖析任务在运行: {self.current}")
+        async with self._lock:
+            sampler = StackSampler(min(duration, MAX_SAMPLE_DURATION), min(rate, MAX_SAMPLE_RATE))
+            self.current = {"mode": "sample", "duration": sampler.duration, "rate": 1.0 / sampler.interval, "started_at": time.time()}
+            logger.warning(f"开始栈采样: {self.current}")
+            try:
+                thread = threading.Thread(target=sampler.run, name="stack-sampler", daemon=True)
+                thread.start()
+                await asyncio.to_thread(thread.join)
+            finally:
+                self.current = None
+            logger.warning(f"栈采样结束: {sampler.samples} 次采样, {len(sampler.stacks)} 个不同调用栈")
+            return sampler
+
+    async def profile_pipeline(self, executions: int, timeout: float) -> PipelineCapture:
+        if self._lock.locked():
+            raise ProfilerBusy(f"已有剖析任务在运行: {self.current}")
+        async with self._lock:
+            capture = PipelineCapture(min(executions, MAX_PIPELINE_EXECUTIONS))
+            timeout = min(timeout, MAX_PIPELINE_TIMEOUT)
+            self.current = {"mode": "pipeline", "executions": capture.executions, "timeout": timeout, "started_at": time.time()}
+            logger.warning(f"开始流水线剖析: {self.current}")
+            self._capture = capture
+            try:
+                await asyncio.wait_for(capture.done.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"流水线剖析超时，已完成 {capture.completed}/{capture.executions} 次执行")
+            finally:
+                self._capture = None
+                capture.finish()
+                self.current = None
+            return capture
+
+
+# 全局剖析服务实例
+_profiler: Optional[ProfilerService] = None
+
+
+def get_profiler() -> ProfilerService:
+    """获取全局剖析服务（单例模式）"""
+    global _profiler
+    if _profiler is None:
+        _profiler = ProfilerService()
+    return _profiler
@@ -0,0 +1,221 @@
+"""
+会话级流水线参数协商
+客户端在 /ws 或 /ws/vision 上发送 configure 事件，为本会话选择：
+- template：提示词模板（如 concise / detailed，须是当前提示词场景中存在的模板）
+- max_detections：参与描述的最大检测数（按置信度取前 N，0 表示不限制）
+- input_size：视觉模型输入边长（32 的倍数；静态输入尺寸的模型只接受其固定尺寸）
+- language：是否调用语言模型，关闭时直接使用模板描述（最快，不依赖 LLM）
+- stream_text：是否推送「稍等」提示与逐句 text_stream，关闭时只发送 final_result
+- vision_result：是否推送 vision_result（仅 /ws/vision 转发该事件）
+- track：是否开启多目标跟踪（检测带稳定的 track_id / 速度，短暂漏检的物体按预测位置保留几帧）
+- changes_only：只描述新出现 / 离开的物体，画面内物体没有变化时不调用语言模型（隐含 track）
+
+校验后的 SessionOptions 缓存在连接对象（ManagedConnection.options）上，每帧直接使用，不再逐帧读取配置。
+configure 只更新消息中出现的字段，值为 null 时恢复该字段的默认值；字段名同时接受 snake_case 与 camelCase。
+开启跟踪时跟踪器（ObjectTracker）同样缓存在连接对象（ManagedConnection.tracker）上，关闭跟踪时丢弃。
+"""
+
+import dataclasses
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 单帧参与描述的检测数上限
+MAX_DETECTIONS_LIMIT = 100
+# 输入边长范围（YOLOv8 的步长为 32）
+INPUT_SIZE_MIN = 160
+INPUT_SIZE_MAX = 1280
+INPUT_SIZE_STRIDE = 32
+
+# 不可作为会话模板的提示词模板（没有检测结果时专用）
+_RESERVED_TEMPLATES = ("no_detection",)
+
+
+# 延迟导入配置，避免循环依赖
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class InvalidSessionOptions(ValueError):
+    """configure 事件中的参数不合法"""
+
+    code = "INVALID_OPTIONS"
+
+
+@dataclass(frozen=True)
+class SessionOptions:
+    """单个会话的流水线参数（不可变，configure 时整体替换）"""
+    template: Optional[str] = None       # None 使用服务端配置的模板
+    max_detections: int = 0              # 0 表示不限制
+    input_size: Optional[int] = None     # None 使用模型默认输入尺寸
+    language: bool = True
+    stream_text: bool = True
+    vision_result: bool = True
+    track: bool = False
+    changes_only: bool = False
+
+    @property
+    def tracking(self) -> bool:
+        """是否需要跟踪器（changes_only 依赖跟踪结果）"""
+        return self.track or self.changes_only
+
+    def to_dict(self, camel: bool = False) -> Dict[str, Any]:
+        data = dataclasses.asdict(self)
+        if camel:
+            return {_camel(key): value for key, value in data.items()}
+        return data
+
+
+DEFAULT_OPTIONS = SessionOptions()
+
+
+def _camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(part.title() for part in rest)
+
+
+# 字段名 -> 接受的键名
+_FIELD_KEYS = {field.name: (field.name, _camel(field.name)) for field in dataclasses.fields(SessionOptions)}
+_KEY_FIELDS = {key: name for name, keys in _FIELD_KEYS.items() for key in keys}
+
+
+def available_templates() -> List[str]:
+    """当前提示词场景中可供会话选择的模板名称"""
+    from .ai_models.language.prompts import get_prompts_manager
+
+    settings = _get_settings()
+    scene = get_prompts_manager(settings.language.PROMPTS_DIR).prompts_cache.get(settings.language.PROMPTS_SCENE) or {}
+    return [name for name in (scene.get("templates") or {}) if name not in _RESERVED_TEMPLATES]
+
+
+def _as_bool(name: str, value: Any) -> bool:
+    if not isinstance(value, bool):
+        raise InvalidSessionOptions(f"{name} 必须是布尔值")
+    return value
+
+
+def _as_int(name: str, value: Any) -> int:
+    # bool 是 int 的子类，单独排除
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise InvalidSessionOptions(f"{name} 必须是整数")
+    return value
+
+
+def _validate_template(value: Any) -> str:
+    if not isinstance(value, str) or not value:
+        raise InvalidSessionOptions("template 必须是模板名称")
+    templates = available_templates()
+    if value not in templates:
+        raise InvalidSessionOptions(f"未知的提示词模板: {value}（可选: {', '.join(templates)}）")
+    return value
+
+
+def _validate_input_size(value: Any, vision_model: Any) -> int:
+    size = _as_int("input_size", value)
+    if not INPUT_SIZE_MIN <= size <= INPUT_SIZE_MAX or size % INPUT_SIZE_STRIDE:
+        raise InvalidSessionOptions(
+            f"input_size 必须是 {INPUT_SIZE_MIN}~{INPUT_SIZE_MAX} 之间 {INPUT_SIZE_STRIDE} 的倍数"
+        )
+    # 模型已加载时按其输入形状校验（静态输入尺寸的模型只接受固定尺寸）
+    if vision_model is not None and not vision_model.supports_input_size(size):
+        raise InvalidSessionOptions(
+            f"当前视觉模型的输入尺寸固定为 {vision_model.default_input_size}，不支持 {size}"
+            f"（导出 ONNX 时使用 dynamic=True 才能选择输入分辨率）"
+        )
+    return size
+
+
+def parse_session_options(
+    payload: Dict[str, Any],
+    current: Optional[SessionOptions] = None,
+    vision_model: Any = None,
+) -> SessionOptions:
+    """
+    校验 configure 事件中的参数并与当前参数合并
+
+    Args:
+        payload: 客户端提交的参数字典（只包含需要修改的字段）
+        current: 会话当前参数，None 表示默认参数
+        vision_model: 当前视觉模型（已加载时用于校验 input_size）
+
+    Returns:
+        合并后的 SessionOptions
+
+    Raises:
+        InvalidSessionOptions: 存在未知字段或取值不合法
+    """
+    if not isinstance(payload, dict):
+        raise InvalidSessionOptions("configure 参数必须是 JSON 对象")
+    unknown = sorted(key for key in payload if key not in _KEY_FIELDS)
+    if unknown:
+        raise InvalidSessionOptions(f"未知的参数: {', '.join(unknown)}")
+
+    changes: Dict[str, Any] = {}
+    for key, value in payload.items():
+        name = _KEY_FIELDS[key]
+        if value is None:
+            changes[name] = getattr(DEFAULT_OPTIONS, name)
+        elif name == "template":
+            changes[name] = _validate_template(value)
+        elif name == "max_detections":
+            value = _as_int(name, value)
+            if not 0 <= value <= MAX_DETECTIONS_LIMIT:
+                raise InvalidSessionOptions(f"max_detections 必须在 0~{MAX_DETECTIONS_LIMIT} 之间")
+            changes[name] = value
+        elif name == "input_size":
+            changes[name] = _validate_input_size(value, vision_model)
+        else:
+            changes[name] = _as_bool(name, value)
+    return dataclasses.replace(current or DEFAULT_OPTIONS, **changes)
+
+
+def create_tracker():
+    """按 app.yaml 的 tracking 段创建会话级跟踪器"""
+    from .ai_models.vision.tracker import ObjectTracker
+
+    cfg = _get_settings().tracking
+    return ObjectTracker(
+        high_threshold=cfg.HIGH_THRESHOLD,
+        match_iou=cfg.MATCH_IOU,
+        low_match_iou=cfg.LOW_MATCH_IOU,
+        min_hits=cfg.MIN_HITS,
+        max_lost=cfg.MAX_LOST,
+        coast_frames=cfg.COAST_FRAMES,
+    )
+
+
+def stream_options() -> SessionOptions:
+    """连续视频流端点的会话参数：按 app.yaml 的 tracking.stream / stream_changes_only 开启跟踪"""
+    cfg = _get_settings().tracking
+    return dataclasses.replace(DEFAULT_OPTIONS, track=cfg.STREAM, changes_only=cfg.STREAM_CHANGES_ONLY)
+
+
+def apply_session_options(conn: Any, options: SessionOptions) -> SessionOptions:
+    """把参数缓存到连接对象上，并按 tracking 创建或丢弃会话的跟踪器（计入会话内存）"""
+    conn.options = options
+    if options.tracking and conn.tracker is None:
+        conn.tracker = create_tracker()
+        conn.attach(conn.tracker)
+    elif not options.tracking and conn.tracker is not None:
+        conn.attachments.remove(conn.tracker)
+        conn.tracker = None
+    return options
+
+
+def configure_connection(conn: Any, payload: Dict[str, Any]) -> SessionOptions:
+    """
+    处理 configure 事件：校验参数并缓存到连接对象上（校验失败时连接保留原参数）
+
+    Raises:
+        InvalidSessionOptions: 参数不合法
+    """
+    from .model_registry import get_model_registry
+
+    registry = get_model_registry()
+    options = parse_session_options(payload, conn.options, registry.vision_model if registry.loaded else None)
+    apply_session_options(conn, options)
+    logger.info(f"会话参数已更新 [{conn.client_id}]: {conn.options.to_dict()}")
+    return conn.options
@@ -0,0 +1,462 @@
+"""
+连续视频流接入（实时引导模式）
+客户端通过 WebSocket 持续推送 MJPEG 帧或 H.264/容器格式的视频分片，
+服务端在后台线程中用 OpenCV 解码，并根据画面变化与推理负载自适应地抽帧，
+抽中的帧交给共享的 VisionToTextPipeline 处理。
+
+线程模型：
+- 事件循环线程：feed() 接收分片，放入有界缓冲队列
+- 解码线程：拆分/解码视频帧，计算缩略图差异，由 AdaptiveSampler 决定是否抽帧
+- 抽中的帧写入“最新帧槽位”（latest-wins），推理跟不上时旧帧直接被新帧覆盖，不会堆积
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# 延迟导入配置，避免循环依赖
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+STREAM_FORMATS = ("auto", "mjpeg", "h264")
+
+# 计算画面变化所用缩略图尺寸（16:9）
+THUMB_SIZE = (64, 36)
+
+_JPEG_SOI = b"\xff\xd8"
+_JPEG_EOI = b"\xff\xd9"
+
+
+@dataclass
+class SampledFrame:
+    """被抽中、等待推理的帧"""
+    image: np.ndarray  # RGB，与视觉模型预处理后的格式一致
+    frame_index: int
+    motion: float
+    reason: str  # first / motion / keepalive
+    captured_at: float
+
+
+class MJPEGSplitter:
+    """按 JPEG 起止标记（SOI/EOI）把任意切分的字节流拆成完整的 JPEG 帧"""
+
+    def __init__(self, max_buffer_bytes: int = 8 * 1024 * 1024):
+        self.max_buffer_bytes = max_buffer_bytes
+        self._buffer = bytearray()
+        self.discarded_bytes = 0
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        self._buffer.extend(chunk)
+        frames = []
+        while True:
+            start = self._buffer.find(_JPEG_SOI)
+            if start < 0:
+                # 保留最后一个字节，防止 SOI 标记被切在两个分片之间
+                self.discarded_bytes += max(0, len(self._buffer) - 1)
+                del self._buffer[:-1]
+                break
+            if start > 0:
+                self.discarded_bytes += start
+                del self._buffer[:start]
+            end = self._buffer.find(_JPEG_EOI, 2)
+            if end < 0:
+                break
+            frames.append(bytes(self._buffer[:end + 2]))
+            del self._buffer[:end + 2]
+
+        # 长时间找不到帧尾（数据损坏），丢弃缓冲重新同步
+        if len(self._buffer) > self.max_buffer_bytes:
+            self.discarded_bytes += len(self._buffer)
+            self._buffer.clear()
+        return frames
+
+
+def frame_thumbnail(image: np.ndarray) -> np.ndarray:
+    """缩小为灰度缩略图，用于低成本的画面变化检测"""
+    if image.ndim == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(image, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+class AdaptiveSampler:
+    """
+    自适应抽帧策略
+
+    - 两次抽帧的最小间隔随推理负载增长：
+      interval = max(min_interval, 近期处理耗时) * (1 + 负载占比 * load_backoff)
+    - 达到最小间隔后，只有画面变化超过 motion_threshold 才抽帧
+    - 画面长时间静止时，每隔 max_interval 仍抽一帧，保证描述不过期
+    """
+
+    def __init__(
+        self,
+        min_interval: Optional[float] = None,
+        max_interval: Optional[float] = None,
+        motion_threshold: Optional[float] = None,
+        load_backoff: Optional[float] = None,
+        load_fn: Optional[Callable[[], float]] = None,
+    ):
+        stream_cfg = _get_settings().stream
+        self.min_interval = min_interval if min_interval is not None else stream_cfg.MIN_INTERVAL
+        self.max_interval = max(
+            self.min_interval,
+            max_interval if max_interval is not None else stream_cfg.MAX_INTERVAL,
+        )
+        self.motion_threshold = motion_threshold if motion_threshold is not None else stream_cfg.MOTION_THRESHOLD
+        self.load_backoff = load_backoff if load_backoff is not None else stream_cfg.LOAD_BACKOFF
+        self.load_fn = load_fn
+
+        self.latency_ema = 0.0
+        self._last_thumb: Optional[np.ndarray] = None
+        self._last_sample_at: Optional[float] = None
+
+    def record_latency(self, seconds: float) -> None:
+        """记录一次抽帧的端到端处理耗时（指数滑动平均）"""
+        if self.latency_ema == 0.0:
+            self.latency_ema = seconds
+        else:
+            self.latency_ema = 0.7 * self.latency_ema + 0.3 * seconds
+
+    def current_interval(self) -> float:
+        load = 0.0
+        if self.load_fn is not None:
+            try:
+                load = min(1.0, max(0.0, self.load_fn()))
+            except Exception:
+                load = 0.0
+        base = max(self.min_interval, self.latency_ema)
+        return min(self.max_interval, base * (1.0 + load * self.load_backoff))
+
+    def motion(self, thumb: np.ndarray) -> float:
+        """与上一次抽中帧的平均像素差异，归一化到 0~1"""
+        if self._last_thumb is None:
+            return 1.0
+        return float(cv2.absdiff(thumb, self._last_thumb).mean()) / 255.0
+
+    def decide(self, thumb: np.ndarray, now: Optional[float] = None) -> Optional[tuple]:
+        """
+        判断当前帧是否需要抽取
+
+        Returns:
+            (reason, motion)，不抽取时返回 None
+        """
+        now = time.monotonic() if now is None else now
+        if self._last_sample_at is None:
+            reason = "first"
+            motion = 1.0
+        else:
+            elapsed = now - self._last_sample_at
+            if elapsed < self.current_interval():
+                return None
+            motion = self.motion(thumb)
+            if motion >= self.motion_threshold:
+                reason = "motion"
+            elif elapsed >= self.max_interval:
+                reason = "keepalive"
+            else:
+                return None
+
+        self._last_thumb = thumb
+        self._last_sample_at = now
+        return reason, motion
+
+
+class VideoStreamSession:
+    """
+    一路连续视频流的解码与抽帧
+
+    在事件循环中调用 feed() 推送数据、await next_frame() 获取抽中的帧；
+    解码在后台线程中进行，不阻塞事件循环。
+    """
+
+    _SENTINEL = None
+
+    def __init__(
+        self,
+        session_id: str,
+        stream_format: str = "auto",
+        sampler: Optional[AdaptiveSampler] = None,
+        max_buffer_bytes: Optional[int] = None,
+    ):
+        if stream_format not in STREAM_FORMATS:
+            raise ValueError(f"不支持的视频流格式: {stream_format}（可选: {', '.join(STREAM_FORMATS)}）")
+        self.session_id = session_id
+        self.stream_format = stream_format
+        self.sampler = sampler or AdaptiveSampler()
+        self.max_buffer_bytes = (
+            max_buffer_bytes if max_buffer_bytes is not None else _get_settings().stream.MAX_BUFFER_BYTES
+        )
+
+        # 统计
+        self.bytes_in = 0
+        self.frames_decoded = 0
+        self.frames_sampled = 0
+        self.frames_superseded = 0  # 抽中但在推理前被更新的帧覆盖
+        self.chunks_dropped = 0     # 解码跟不上、缓冲已满时丢弃的分片
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._chunks: "queue.Queue[Optional[bytes]]" = queue.Queue()
+        self._buffered_bytes = 0
+        self._buffer_lock = threading.Lock()
+
+        self._slot: Optional[SampledFrame] = None
+        self._slot_lock = threading.Lock()
+        self._slot_event: Optional[asyncio.Event] = None
+        self._finished = False
+        self._error: Optional[str] = None
+
+        self._threads: List[threading.Thread] = []
+        self._fifo_dir: Optional[str] = None
+        self._started = False
+
+    # ---------------- 事件循环侧 ----------------
+
+    def feed(self, chunk: bytes) -> bool:
+        """推送一段视频数据；缓冲超限时丢弃该分片并返回 False"""
+        if not chunk or self._finished:
+            return False
+        self.bytes_in += len(chunk)
+        with self._buffer_lock:
+            if self._buffered_bytes + len(chunk) > self.max_buffer_bytes:
+                self.chunks_dropped += 1
+                return False
+            self._buffered_bytes += len(chunk)
+
+        if not self._started:
+            if self.stream_format == "auto":
+                self.stream_format = "mjpeg" if chunk.startswith(_JPEG_SOI) else "h264"
+            self._start()
+        self._chunks.put(chunk)
+        return True
+
+    def end(self) -> None:
+        """客户端声明数据已发送完毕，解码线程处理完剩余数据后结束"""
+        if not self._started:
+            self._finish()
+            return
+        self._chunks.put(self._SENTINEL)
+
+    async def next_frame(self) -> Optional[SampledFrame]:
+        """等待下一个抽中的帧；视频流结束且没有待处理帧时返回 None"""
+        event = self._event()
+        while True:
+            with self._slot_lock:
+                frame, self._slot = self._slot, None
+                if frame is None and not self._finished:
+                    event.clear()
+            if frame is not None:
+                return frame
+            if self._finished:
+                return None
+            await event.wait()
+
+    def close(self) -> None:
+        """停止解码线程并清理临时文件（可重复调用）"""
+        if self._started and not self._finished:
+            self._chunks.put(self._SENTINEL)
+        self._unblock_fifo()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        if self._fifo_dir:
+            shutil.rmtree(self._fifo_dir, ignore_errors=True)
+            self._fifo_dir = None
+        self._finished = True
+
+    @property
+    def error(self) -> Optional[str]:
+        return self._error
+
+    def memory_usage(self) -> int:
+        """近似内存占用（字节）：待解码的分片 + 等待推理的帧 + 上一帧缩略图"""
+        total = self._buffered_bytes
+        slot = self._slot
+        if slot is not None:
+            total += slot.image.nbytes
+        thumb = getattr(self.sampler, "_last_thumb", None)
+        if thumb is not None:
+            total += thumb.nbytes
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "format": self.stream_format,
+            "bytes_in": self.bytes_in,
+            "frames_decoded": self.frames_decoded,
+            "frames_sampled": self.frames_sampled,
+            "frames_superseded": self.frames_superseded,
+            "chunks_dropped": self.chunks_dropped,
+            "sample_interval": round(self.sampler.current_interval(), 3),
+            "latency_ema": round(self.sampler.latency_ema, 3),
+        }
+
+    def _event(self) -> asyncio.Event:
+        # Event 需在事件循环内创建
+        if self._slot_event is None:
+            self._loop = asyncio.get_running_loop()
+            self._slot_event = asyncio.Event()
+        return self._slot_event
+
+    def _start(self) -> None:
+        self._event()
+        self._started = True
+        if self.stream_format == "mjpeg":
+            target = self._mjpeg_worker
+        else:
+            target = self._container_worker
+        thread = threading.Thread(target=target, name=f"stream-decode-{self.session_id}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+        logger.info(f"视频流解码线程启动 [{self.session_id}]: format={self.stream_format}")
+
+    # ---------------- 解码线程侧 ----------------
+
+    def _next_chunk(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        chunk = self._chunks.get(timeout=timeout)
+        if chunk is not None:
+            with self._buffer_lock:
+                self._buffered_bytes -= len(chunk)
+        return chunk
+
+    def _notify(self) -> None:
+        if self._loop is not None and self._slot_event is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._slot_event.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                pass
+
+    def _publish(self, image_bgr: np.ndarray, frame_index: int, reason: str, motion: float) -> None:
+        frame = SampledFrame(
+            image=cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB),
+            frame_index=frame_index,
+            motion=motion,
+            reason=reason,
+            captured_at=time.monotonic(),
+        )
+        with self._slot_lock:
+            if self._slot is not None:
+                self.frames_superseded += 1
+            self._slot = frame
+        self.frames_sampled += 1
+        self._notify()
+
+    def _finish(self, error: Optional[str] = None) -> None:
+        if error:
+            self._error = error
+        self._finished = True
+        self._notify()
+
+    def _mjpeg_worker(self) -> None:
+        """MJPEG：先以 1/8 尺寸灰度解码判断是否抽帧，只有抽中的帧才做全尺寸解码"""
+        splitter = MJPEGSplitter(self.max_buffer_bytes)
+        try:
+            while True:
+                chunk = self._next_chunk()
+                if chunk is None:
+                    break
+                for jpeg in splitter.feed(chunk):
+                    buf = np.frombuffer(jpeg, dtype=np.uint8)
+                    small = cv2.imdecode(buf, cv2.IMREAD_REDUCED_GRAYSCALE_8)
+                    if small is None:
+                        continue
+                    self.frames_decoded += 1
+                    decision = self.sampler.decide(frame_thumbnail(small))
+                    if decision is None:
+                        continue
+                    image = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+                    if image is None:
+                        continue
+                    reason, motion = decision
+                    self._publish(image, self.frames_decoded - 1, reason, motion)
+            self._finish()
+        except Exception as e:
+            logger.error(f"MJPEG 解码失败 [{self.session_id}]: {e}", exc_info=True)
+            self._finish(f"MJPEG 解码失败: {e}")
+
+    def _container_worker(self) -> None:
+        """H.264 / 容器格式：通过命名管道把分片交给 OpenCV(FFmpeg) 解码"""
+        try:
+            self._fifo_dir = tempfile.mkdtemp(prefix="seeforme_stream_")
+            fifo_path = os.path.join(self._fifo_dir, "stream")
+            os.mkfifo(fifo_path)
+        except (AttributeError, OSError) as e:
+            self._finish(f"当前平台不支持 H.264 视频流: {e}")
+            return
+
+        writer = threading.Thread(
+            target=self._fifo_writer, args=(fifo_path,),
+            name=f"stream-fifo-{self.session_id}", daemon=True,
+        )
+        self._threads.append(writer)
+        writer.start()
+
+        cap = None
+        try:
+            cap = cv2.VideoCapture(fifo_path, cv2.CAP_FFMPEG)
+            if not cap.isOpened():
+                self._finish("无法解码视频流（需要 OpenCV FFmpeg 支持）")
+                return
+            while True:
+                ok, image = cap.read()
+                if not ok:
+                    break
+                self.frames_decoded += 1
+                decision = self.sampler.decide(frame_thumbnail(image))
+                if decision is None:
+                    continue
+                reason, motion = decision
+                self._publish(image, self.frames_decoded - 1, reason, motion)
+            self._finish()
+        except Exception as e:
+            logger.error(f"视频流解码失败 [{self.session_id}]: {e}", exc_info=True)
+            self._finish(f"视频流解码失败: {e}")
+        finally:
+            if cap is not None:
+                cap.release()
+            # 解码端打开失败或提前退出时，写线程可能仍阻塞在 open() 上
+            self._unblock_fifo()
+
+    def _fifo_writer(self, fifo_path: str) -> None:
+        try:
+            # open 会阻塞到解码端打开管道
+            with open(fifo_path, "wb", buffering=0) as fifo:
+                while True:
+                    chunk = self._next_chunk()
+                    if chunk is None:
+                        break
+                    fifo.write(chunk)
+        except (BrokenPipeError, OSError) as e:
+            logger.debug(f"视频流管道写入结束 [{self.session_id}]: {e}")
+            # 丢弃未写入的分片
+            while True:
+                try:
+                    if self._next_chunk(timeout=0.1) is None:
+                        break
+                except queue.Empty:
+                    break
+
+    def _unblock_fifo(self) -> None:
+        """以非阻塞方式打开一次读端，唤醒阻塞在 open() 上的写线程"""
+        if not self._fifo_dir:
+            return
+        fifo_path = os.path.join(self._fifo_dir, "stream")
+        try:
+            fd = os.open(fifo_path, os.O_RDONLY | os.O_NONBLOCK)
+            os.close(fd)
+        except OSError:
+            pass
@@ -3,11 +3,21 @@
 整合视觉检测和语言生成流程，支持流式处理
 """
 
+import contextlib
 import logging
 import asyncio
-from typing import AsyncGenerator, Dict, Any, Optional
+import time
+from typing import AsyncGenerator, Dict, Any, Iterator, List, Optional, Tuple
 
+import numpy as np
+
+from ..core import tracing
 from .ai_models.pipelines.vision_to_text import VisionToTextPipeline
+from .admission import get_admission_controller, AdmissionRejected
+from .model_registry import get_model_registry
+from .profiler import get_profiler
+from .ai_models.vision.tracker import ObjectTracker
+from .session_options import SessionOptions
 
 logger = logging.getLogger(__name__)
 
@@ -20,15 +30,30 @@ class VisionService:
         初始化视觉服务
         
         Args:
-            pipeline: 视觉到文本流水线实例，如果为 None 则自动创建
+            pipeline: 视觉到文本流水线实例，如果为 None 则每次请求从共享模型注册表取当前一代流水线（支持热重载）
         """
-        self.pipeline = pipeline or VisionToTextPipeline()
+        self._pipeline = pipeline
         logger.info("视觉服务初始化完成")
     
+    @property
+    def pipeline(self) -> VisionToTextPipeline:
+        return self._pipeline or get_model_registry().pipeline
+    
+    @contextlib.contextmanager
+    def _lease(self) -> Iterator[VisionToTextPipeline]:
+        """单个请求全程使用同一代流水线，热重载切换不影响已开始的请求"""
+        if self._pipeline is not None:
+            yield self._pipeline
+            return
+        with get_model_registry().lease() as pipeline:
+            yield pipeline
+    
     async def process_image_stream(
         self,
         image_data: bytes,
-        session_id: str
+        session_id: str,
+        options: Optional[SessionOptions] = None,
+        tracker: Optional[ObjectTracker] = None
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """
         处理图像并流式返回结果
@@ -36,13 +61,20 @@ class VisionService:
         Args:
             image_data: 图像字节数据
             session_id: 会话 ID
+            options: 会话协商的流水线参数（缓存在连接上），None 使用默认值
+            tracker: 会话的多目标跟踪器（缓存在连接上），None 表示不跟踪
             
         Yields:
             处理结果字典
         """
         try:
-            async for result in self.pipeline.process_image_stream(image_data, session_id):
-                yield result
+            with self._lease() as pipeline:
+                # 按需剖析：未激活时原样返回流水线生成器
+                stream = get_profiler().maybe_wrap(tracing.traced_stream(
+                    "vision_service.process_image", pipeline.process_image_stream(image_data, session_id, options=options, tracker=tracker)
+                ))
+                async for result in stream:
+                    yield result
         except Exception as e:
             logger.error(f"图像处理失败 [{session_id}]: {e}", exc_info=True)
             yield {
@@ -70,5 +102,185 @@ class VisionService:
                 final_result = result.get("content", "处理失败")
         
         return final_result or "处理失败"
+    
+    async def process_frame_stream(
+        self,
+        image: np.ndarray,
+        session_id: str,
+        options: Optional[SessionOptions] = None,
+        tracker: Optional[ObjectTracker] = None
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        处理已解码的视频帧（连续视频流模式），跳过图像编解码
+
+        Args:
+            image: RGB 格式的视频帧
+            session_id: 会话 ID
+            options: 会话的流水线参数，None 使用默认值
+            tracker: 会话的多目标跟踪器，None 表示不跟踪
+
+        Yields:
+            处理结果字典（与 process_image_stream 相同）
+        """
+        try:
+            stream = tracing.traced_stream("vision_service.process_frame", self._frame_results(image, session_id, options, tracker))
+            async for result in get_profiler().maybe_wrap(stream):
+                yield result
+        except Exception as e:
+            logger.error(f"视频帧处理失败 [{session_id}]: {e}", exc_info=True)
+            yield {
+                "type": "error",
+                "session_id": session_id,
+                "content": f"处理失败: {str(e)}",
+                "timestamp": time.time()
+            }
+
+    async def _frame_results(
+        self,
+        image: np.ndarray,
+        session_id: str,
+        options: Optional[SessionOptions],
+        tracker: Optional[ObjectTracker]
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        with self._lease() as pipeline:
+            with tracing.span("vision_detect"):
+                vision_results = await asyncio.to_thread(pipeline.vision_model.describe_image, image)
+            async for result in pipeline.process_image_stream(
+                b"", session_id, vision_results=vision_results, options=options, tracker=tracker
+            ):
+                yield result
+
+    async def describe_batch(
+        self,
+        images: List[Tuple[str, bytes]],
+        session_id: str,
+        batch_size: int = 8
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        批量处理多张图像，按完成顺序逐个返回最终结果
+        
+        图像按 batch_size 分组，每组一次批量推理（在线程池中执行，不阻塞事件循环），
+        随后组内各图像并发生成描述。批量推理按图像数占用准入名额，推理结束即归还；每张图像的描述再各占 1 个名额。
+        同一请求同时处理的组数不超过 max_concurrent // batch_size，各组不会互相排队等待名额；
+        未获准入的图像返回 OVERLOADED 错误。
+        
+        Args:
+            images: (文件名, 图像字节) 列表
+            session_id: 会话 ID（用于日志）
+            batch_size: 单次推理的最大图像数
+            
+        Yields:
+            每张图像一条结果：final_result 或 error，带 index / filename
+        """
+        with self._lease() as pipeline:
+            # 客户端提前断开时立即关闭内部生成器，取消剩余任务
+            async with contextlib.aclosing(self._describe_batch(pipeline, images, session_id, batch_size)) as results:
+                async for result in results:
+                    yield result
+    
+    async def _describe_batch(
+        self,
+        pipeline: VisionToTextPipeline,
+        images: List[Tuple[str, bytes]],
+        session_id: str,
+        batch_size: int
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        admission = get_admission_controller()
+        # 单组占用的名额不能超过并发上限，否则永远无法获准
+        batch_size = max(1, min(batch_size, admission.max_concurrent))
+        # 同时处理的组数：各组同时持有的名额不超过并发上限，避免本请求的组之间互相排队直至超时
+        chunk_slots = asyncio.Semaphore(max(1, admission.max_concurrent // batch_size))
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        indexed = list(enumerate(images))
+        chunks = [indexed[i:i + batch_size] for i in range(0, len(indexed), batch_size)]
+        
+        async def run_chunk(chunk: List[Tuple[int, Tuple[str, bytes]]]) -> None:
+            async with chunk_slots:
+                # 组级错误处理只覆盖批量推理：此时组内图像都还没有结果，每张图像各补一条错误
+                try:
+                    async with admission.slot(weight=len(chunk)):
+                        vision_start = time.time()
+                        vision_results = await asyncio.to_thread(
+                            pipeline.vision_model.describe_batch,
+                            [image_bytes for _, (_, image_bytes) in chunk]
+                        )
+                        batch_vision_time = time.time() - vision_start
+                except AdmissionRejected as e:
+                    for index, (filename, _) in chunk:
+                        await queue.put(self._batch_error(index, filename, session_id, "OVERLOADED", str(e)))
+                    return
+                except Exception as e:
+                    logger.error(f"批量推理失败 [{session_id}]: {e}", exc_info=True)
+                    for index, (filename, _) in chunk:
+                        await queue.put(self._batch_error(index, filename, session_id, "VISION_FAILURE", f"处理失败: {str(e)}"))
+                    return
+                # 逐图描述的错误在 describe_one 内各自处理，保证每个 index 恰好一条结果
+                await asyncio.gather(*[
+                    describe_one(index, filename, result, batch_vision_time)
+                    for (index, (filename, _)), result in zip(chunk, vision_results)
+                ])
+        
+        async def describe_one(index: int, filename: str, vision_result: Dict[str, Any], batch_vision_time: float) -> None:
+            if "error" in vision_result:
+                await queue.put(self._batch_error(index, filename, session_id, "INVALID_IMAGE", vision_result["error"]))
+                return
+            detections = vision_result.get("detections", [])
+            try:
+                async with admission.slot():
+                    text = await pipeline.generate_text(detections, f"{session_id}#{index}", vision_result.get("image_shape"))
+            except AdmissionRejected as e:
+                await queue.put(self._batch_error(index, filename, session_id, "OVERLOADED", str(e)))
+                return
+            except Exception as e:
+                logger.error(f"图像描述失败 [{session_id}#{index}]: {e}", exc_info=True)
+                await queue.put(self._batch_error(index, filename, session_id, "LANGUAGE_PIPELINE_FAILURE", f"描述失败: {str(e)}"))
+                return
+            await queue.put({
+                "type": "final_result",
+                "index": index,
+                "filename": filename,
+                "session_id": session_id,
+                "content": text["content"],
+                "source": text["source"],
+                "detections": detections,
+                "detection_count": len(detections),
+                "vision_time": vision_result.get("inference_time", 0.0),
+                "batch_vision_time": batch_vision_time,
+                "language_time": text["language_time"],
+                "timestamp": time.time()
+            })
+        
+        tasks = [asyncio.create_task(run_chunk(chunk)) for chunk in chunks]
+        try:
+            for _ in range(len(images)):
+                yield await queue.get()
+        finally:
+            # 客户端提前断开时取消剩余任务
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    @staticmethod
+    def _batch_error(index: int, filename: str, session_id: str, code: str, content: str) -> Dict[str, Any]:
+        return {
+            "type": "error",
+            "index": index,
+            "filename": filename,
+            "session_id": session_id,
+            "code": code,
+            "content": content,
+            "timestamp": time.time()
+        }
+
+
+# 全局视觉服务实例
+_vision_service: Optional[VisionService] = None
 
 
+def get_vision_service() -> VisionService:
+    """获取全局视觉服务（单例模式，使用共享模型注册表）"""
+    global _vision_service
+    if _vision_service is None:
+        _vision_service = VisionService()
+    return _vision_service
@@ -0,0 +1,226 @@
+"""
+模型预热计划
+按 app.yaml 的 warmup 段，在正式服务的模型实例上跑一遍真实请求会走到的代码路径与输入形状，
+使启动（或热重载切换）后的第一个请求与稳定运行时一样快：
+
+- 视觉：默认输入边长与 input_sizes 中模型支持的每个边长各跑 iterations 次完整推理（JPEG 解码、letterbox、
+  ORT 推理、后处理）；batch_sizes 中每个批大小跑一次批量推理；ONNX 模式再用含数百个重叠候选框的合成输出
+  跑解码与 NMS（真实图像在预热模型上往往没有候选框，走不到 NMS）
+- 语言：为当前场景的每个提示词模板构建提示词与回退模板（类别名称、编译后的模板、提示词缓存），
+  并通过连接池向语言后端并发发送 llm_connections 个 max_tokens=1 的请求，建立长连接
+
+预热图像默认是内置合成场景（1280×720，渐变背景 + 不同颜色大小的物体 + 传感器噪声），JPEG 解码与缩放的耗时接近真实照片；
+也可通过 warmup.image 指定一张真实照片。每个步骤的首次与末次耗时记录在报告中（健康检查 models.<name>.warmup）。
+"""
+
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SERVER_DIR = Path(__file__).resolve().parent.parent.parent
+
+# 合成场景尺寸（手机横屏常见分辨率，需要缩放与填充）
+_SCENE_SIZE = (1280, 720)
+# NMS 预热的候选框数：约 60 个目标、每个目标 5 个重叠框
+_NMS_OBJECTS = 60
+_NMS_BOXES_PER_OBJECT = 5
+# YOLOv8 三个检测头的步长
+_STRIDES = (8, 16, 32)
+# 语言预热使用的示例类别（COCO：人、椅子、电视、杯子），类别表中不存在时跳过
+_SAMPLE_CLASS_IDS = (0, 56, 62, 41)
+
+
+# 延迟导入配置，避免循环依赖
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+def synthetic_scene(width: int = _SCENE_SIZE[0], height: int = _SCENE_SIZE[1], seed: int = 0) -> np.ndarray:
+    """生成 BGR 合成场景：上下渐变的背景、若干不同颜色大小的矩形与椭圆物体、轻微传感器噪声"""
+    import cv2
+
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None]
+    x = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :]
+    image = np.empty((height, width, 3), dtype=np.float32)
+    image[..., 0] = 170 - 60 * y + 20 * x
+    image[..., 1] = 160 - 40 * y
+    image[..., 2] = 140 - 30 * y + 30 * (1 - x)
+    image = image.astype(np.uint8)
+    for i in range(10):
+        color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+        cx, cy = int(rng.integers(width // 10, width * 9 // 10)), int(rng.integers(height // 5, height * 9 // 10))
+        w, h = int(rng.integers(width // 20, width // 5)), int(rng.integers(height // 10, height // 3))
+        if i % 2:
+            cv2.ellipse(image, (cx, cy), (w // 2, h // 2), 0, 0, 360, color, -1)
+        else:
+            cv2.rectangle(image, (cx - w // 2, cy - h // 2), (cx + w // 2, cy + h // 2), color, -1)
+    noisy = image.astype(np.float32) + rng.normal(0, 6, size=image.shape).astype(np.float32)
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+
+def load_warmup_image(path: Optional[str] = None) -> bytes:
+    """预热图像的 JPEG 字节：配置了 warmup.image 且可读时使用该文件，否则编码内置合成场景"""
+    import cv2
+
+    if path:
+        image_path = Path(path)
+        if not image_path.is_absolute():
+            image_path = SERVER_DIR / image_path
+        try:
+            return image_path.read_bytes()
+        except OSError as e:
+            logger.warning(f"预热图像读取失败，使用内置合成场景: {e}")
+    ok, buffer = cv2.imencode(".jpg", synthetic_scene(), [cv2.IMWRITE_JPEG_QUALITY, 90])
+    if not ok:
+        raise RuntimeError("预热图像 JPEG 编码失败")
+    return buffer.tobytes()
+
+
+def synthetic_output(num_classes: int, input_size: int, confidence: float, seed: int = 0) -> np.ndarray:
+    """
+    构造 YOLOv8 原始输出 [1, 4 + 类别数, 锚点数]（中心点格式，模型输入的像素坐标）：
+    每个目标在相近位置有多个重叠候选框，其余锚点分数低于阈值
+    """
+    rng = np.random.default_rng(seed)
+    anchors = sum((input_size // stride) ** 2 for stride in _STRIDES)
+    output = np.empty((4 + num_classes, anchors), dtype=np.float32)
+    output[:4] = rng.uniform(0.05, 0.95, size=(4, anchors))
+    output[4:] = rng.uniform(0.0, confidence * 0.5, size=(num_classes, anchors))
+
+    count = min(anchors, _NMS_OBJECTS * _NMS_BOXES_PER_OBJECT)
+    picked = rng.choice(anchors, size=count, replace=False)
+    objects = np.arange(count) // _NMS_BOXES_PER_OBJECT
+    centers = rng.uniform(0.15, 0.85, size=(_NMS_OBJECTS, 2))
+    sizes = rng.uniform(0.05, 0.3, size=(_NMS_OBJECTS, 2))
+    output[0:2, picked] = (centers[objects] + rng.normal(0, 0.01, size=(count, 2))).T
+    output[2:4, picked] = (sizes[objects] + rng.normal(0, 0.01, size=(count, 2))).T
+    # 纵向压缩到上半部（横屏图像 letterbox 后的有效区域），再换算为输入像素坐标
+    output[[1, 3]] *= 0.5
+    output[:4] *= input_size
+    classes = rng.integers(0, num_classes, size=_NMS_OBJECTS)[objects]
+    output[4 + classes, picked] = rng.uniform(max(confidence, 0.3), 0.95, size=count)
+    return output[None, ...]
+
+
+async def _run_step(steps: List[Dict[str, Any]], name: str, fn: Callable[[], Any], iterations: int) -> Any:
+    """在线程池中执行 iterations 次，记录首次与末次耗时（毫秒），返回最后一次的结果"""
+    timings = []
+    result = None
+    for _ in range(max(1, iterations)):
+        start = time.perf_counter()
+        result = await asyncio.to_thread(fn)
+        timings.append((time.perf_counter() - start) * 1000)
+    steps.append({"step": name, "runs": len(timings), "first_ms": round(timings[0], 2), "last_ms": round(timings[-1], 2)})
+    return result
+
+
+async def warm_vision(vision_model) -> Dict[str, Any]:
+    """按预热计划预热视觉模型，返回各步骤耗时"""
+    plan = _get_settings().warmup
+    iterations = max(1, plan.ITERATIONS)
+    image_bytes = await asyncio.to_thread(load_warmup_image, plan.IMAGE)
+    steps: List[Dict[str, Any]] = []
+    skipped: List[str] = []
+
+    default_size = vision_model.default_input_size
+    sizes = [default_size]
+    for size in plan.INPUT_SIZES:
+        if size in sizes:
+            continue
+        if vision_model.supports_input_size(size):
+            sizes.append(size)
+        else:
+            skipped.append(f"input_size={size}")
+
+    # 单张推理：与 WebSocket 帧相同的路径（JPEG 解码 + 推理 + 后处理），每个输入边长一次
+    for size in sizes:
+        await _run_step(
+            steps, f"describe@{size}",
+            lambda size=size: vision_model.describe_image(vision_model._preprocess_image(image_bytes), input_size=size),
+            iterations,
+        )
+
+    # 批量推理：HTTP 批量接口的批次形状
+    for batch_size in sorted(set(plan.BATCH_SIZES)):
+        if batch_size <= 1:
+            continue
+        await _run_step(
+            steps, f"batch@{batch_size}",
+            lambda batch_size=batch_size: vision_model.describe_batch([image_bytes] * batch_size),
+            iterations,
+        )
+
+    # 解码与 NMS：在数百个候选框上运行一次（含类别名称生成）
+    if vision_model.use_onnx and len(vision_model.class_table):
+        image_shape = (_SCENE_SIZE[1], _SCENE_SIZE[0], 3)
+        for size in sizes:
+            output = synthetic_output(len(vision_model.class_table), size, vision_model.confidence_threshold)
+            scale = vision_model.letterbox_scale(image_shape, size)
+            await _run_step(
+                steps, f"postprocess@{size}",
+                lambda output=output, scale=scale: vision_model._postprocess_onnx([output], image_shape, scale),
+                iterations,
+            )
+
+    report: Dict[str, Any] = {"steps": steps}
+    if skipped:
+        report["skipped"] = skipped
+        logger.warning(f"预热跳过模型不支持的形状: {', '.join(skipped)}")
+    return report
+
+
+def _sample_detections(class_table) -> List[Dict[str, Any]]:
+    """语言预热用的示例检测结果（与视觉层输出格式一致）"""
+    width, height = _SCENE_SIZE
+    detections = []
+    for k, class_id in enumerate(cid for cid in _SAMPLE_CLASS_IDS if cid < len(class_table)):
+        x1 = width * (0.1 + 0.2 * k)
+        detections.append({
+            "class": class_table.name(class_id),
+            "class_en": class_table.names_en[class_id],
+            "class_id": class_id,
+            "confidence": round(0.9 - 0.1 * k, 2),
+            "bbox": [x1, height * 0.3, x1 + width * 0.15, height * 0.8],
+        })
+    return detections
+
+
+def _prime_prompts(prompt_wrapper) -> int:
+    """为当前场景的每个提示词模板构建一次提示词与回退模板，返回构建的提示词数"""
+    detections = _sample_detections(prompt_wrapper.class_table)
+    templates = prompt_wrapper.prompts_manager.compiled.get(prompt_wrapper.prompts_scene) or {}
+    names = [name for name in templates if name != "no_detection"] or [prompt_wrapper.prompts_template]
+    image_shape = (_SCENE_SIZE[1], _SCENE_SIZE[0])
+    for name in names:
+        prompt_wrapper.build_prompt(detections, name, image_shape)
+    prompt_wrapper.build_prompt([])
+    prompt_wrapper.fallback_template(detections, image_shape)
+    prompt_wrapper.fallback_template([])
+    return len(names)
+
+
+async def warm_llm_connections(language_model) -> Optional[Dict[str, Any]]:
+    """通过连接池建立到语言后端的长连接（不依赖外部后端的语言模型返回 None）"""
+    plan = _get_settings().warmup
+    return await language_model.warmup(plan.LLM_CONNECTIONS, plan.LLM_TIMEOUT)
+
+
+async def warm_language(language_model) -> Dict[str, Any]:
+    """按预热计划预热语言模型，返回各步骤耗时与后端连接结果"""
+    steps: List[Dict[str, Any]] = []
+    report: Dict[str, Any] = {"steps": steps}
+    prompt_wrapper = getattr(language_model, "prompt_wrapper", None)
+    if prompt_wrapper is not None:
+        report["templates"] = await _run_step(steps, "prompts", lambda: _prime_prompts(prompt_wrapper), 1)
+    backend = await warm_llm_connections(language_model)
+    if backend is not None:
+        report["backend"] = backend
+    return report
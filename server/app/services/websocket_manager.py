@@ -1,17 +1,375 @@
-"""WebSocket 连接管理占位模块。"""
+"""
+WebSocket 连接管理
+统一登记 /ws 与 /ws/vision/{session_id} 的连接：
+- 每个连接携带统计计数（收发帧数、字节数、处理耗时、丢弃数）与最近活跃时间
+- 后台巡检任务回收长时间无活动的连接（死连接）
+- 总连接数上限，超出时拒绝新连接
+- 每个连接一个有界发送队列，广播时慢客户端只会丢弃自己的消息，不会阻塞其他连接
+- 每个连接缓存客户端通过 configure 事件协商的流水线参数（SessionOptions）
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import time
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
 
-from typing import Dict
 from fastapi import WebSocket
 
+from ..core import tracing
+from ..core.metrics import stage
+from .session_options import DEFAULT_OPTIONS, SessionOptions
+
+logger = logging.getLogger(__name__)
+
+_SEND = stage("send")
+
+
+# 延迟导入配置，避免循环依赖
+def _get_settings():
+    from app.core.config import settings
+    return settings
+
+
+class ConnectionLimitExceeded(Exception):
+    """连接数已达上限"""
+
+
+@dataclass
+class ConnectionStats:
+    """单个连接的统计计数（固定大小，不随帧数增长）"""
+    connected_at: float = field(default_factory=time.time)
+    last_activity: float = field(default_factory=time.monotonic)
+    frames_in: int = 0
+    frames_out: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    processing_time: float = 0.0
+    dropped: int = 0
+    last_frame_bytes: int = 0   # 最近一帧处理期间记下的分配（近似值，见 services/memory.py）
+    peak_frame_bytes: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["idle_seconds"] = round(time.monotonic() - self.last_activity, 3)
+        data.pop("last_activity")
+        return data
+
+
+class ManagedConnection:
+    """被管理的 WebSocket 连接：负责串行化写入、统计与有界发送队列"""
+
+    def __init__(
+        self,
+        client_id: str,
+        websocket: WebSocket,
+        endpoint: str,
+        session_id: Optional[str] = None,
+        send_queue_size: int = 32,
+        send_timeout: float = 5.0,
+    ):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.endpoint = endpoint
+        self.session_id = session_id
+        self.client_addr = (
+            f"{websocket.client.host}:{websocket.client.port}" if websocket.client else "unknown"
+        )
+        self.stats = ConnectionStats()
+        self.send_timeout = send_timeout
+        self.closed = False
+
+        # 所有写操作（直接发送与队列发送）共用一把锁，保证同一连接上的消息有序
+        self._send_lock = asyncio.Lock()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, send_queue_size))
+        self._sender_task: Optional[asyncio.Task] = None
+
+        # 会话内存归属：发送队列字节数、附属对象（需提供 memory_usage()）与正在处理的帧
+        self.queued_bytes = 0
+        self.attachments: List[Any] = []
+        self.frame_ledger = None
+
+        # 会话级流水线参数（configure 事件协商，每帧直接读取）
+        self.options: SessionOptions = DEFAULT_OPTIONS
+        # 会话级多目标跟踪器（options.tracking 开启时创建，见 session_options.apply_session_options）
+        self.tracker = None
+
+    # ========= 统计 =========
+    def touch(self) -> None:
+        """刷新最近活跃时间"""
+        self.stats.last_activity = time.monotonic()
+
+    def record_frame_in(self, nbytes: int) -> None:
+        """记录一次收到的消息/帧"""
+        self.stats.frames_in += 1
+        self.stats.bytes_in += nbytes
+        self.touch()
+
+    def record_processing(self, seconds: float) -> None:
+        """累计处理耗时"""
+        self.stats.processing_time += seconds
+
+    def record_drop(self, count: int = 1) -> None:
+        """记录被丢弃的帧或消息"""
+        self.stats.dropped += count
+
+    def record_frame_memory(self, nbytes: int) -> None:
+        """记录一帧处理期间的近似分配量"""
+        self.stats.last_frame_bytes = nbytes
+        if nbytes > self.stats.peak_frame_bytes:
+            self.stats.peak_frame_bytes = nbytes
+
+    def attach(self, obj: Any) -> None:
+        """登记随连接存在的会话级对象（如视频流解码会话），其 memory_usage() 计入该连接"""
+        self.attachments.append(obj)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    # ========= 发送 =========
+    async def send_json(self, payload: Dict[str, Any]) -> None:
+        """
+        直接发送 JSON（等待写入完成），超过 send_timeout 视为对端卡死并抛出 TimeoutError
+        """
+        text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        await self._send_text(text)
+
+    async def _send_text(self, text: str) -> None:
+        # send span 包含等待发送锁的时间（同一连接上排在前面的消息即发送积压）
+        with tracing.span("send", bytes=len(text)):
+            async with self._send_lock:
+                with _SEND.time():
+                    await asyncio.wait_for(self.websocket.send_text(text), timeout=self.send_timeout)
+        self.stats.frames_out += 1
+        self.stats.bytes_out += len(text.encode("utf-8"))
+
+    def enqueue(self, payload: Dict[str, Any]) -> bool:
+        """
+        非阻塞地把消息放入发送队列（用于广播）
+        队列满时丢弃最旧的一条，保证内存有界且最新消息优先
+
+        Returns:
+            是否未发生丢弃
+        """
+        if self.closed:
+            return False
+        text = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        no_drop = True
+        if self._queue.full():
+            with contextlib.suppress(asyncio.QueueEmpty):
+                self.queued_bytes -= len(self._queue.get_nowait())
+            self.record_drop()
+            no_drop = False
+        self._queue.put_nowait(text)
+        self.queued_bytes += len(text)
+        if self._sender_task is None or self._sender_task.done():
+            self._sender_task = asyncio.create_task(self._drain_queue())
+        return no_drop
+
+    async def _drain_queue(self) -> None:
+        """后台发送任务：逐条发送队列中的消息，发送超时则关闭该连接"""
+        try:
+            while not self._queue.empty() and not self.closed:
+                text = self._queue.get_nowait()
+                self.queued_bytes -= len(text)
+                await self._send_text(text)
+        except asyncio.TimeoutError:
+            logger.warning(f"连接发送超时，关闭连接: {self.client_id}")
+            await self.close(code=1011, reason="send timeout")
+        except Exception as e:
+            logger.debug(f"队列发送失败 [{self.client_id}]: {e}")
+            await self.close(code=1011, reason="send failed")
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        """关闭底层 WebSocket（幂等）"""
+        if self.closed:
+            return
+        self.closed = True
+        if self._sender_task and not self._sender_task.done() and self._sender_task is not asyncio.current_task():
+            self._sender_task.cancel()
+        # 丢弃未发送的消息，释放内存
+        pending = self._queue.qsize()
+        if pending:
+            self.record_drop(pending)
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self.queued_bytes = 0
+        self.attachments.clear()
+        with contextlib.suppress(Exception):
+            await asyncio.wait_for(self.websocket.close(code=code, reason=reason), timeout=self.send_timeout)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {
+            "client_id": self.client_id,
+            "endpoint": self.endpoint,
+            "session_id": self.session_id,
+            "client_addr": self.client_addr,
+            "queue_depth": self.queue_depth,
+            "queued_bytes": self.queued_bytes,
+            "options": self.options.to_dict(),
+        }
+        data.update(self.stats.to_dict())
+        return data
+
 
 class WebSocketManager:
-    def __init__(self) -> None:
-        self.active_connections: Dict[str, WebSocket] = {}
+    """WebSocket 连接注册表"""
+
+    def __init__(
+        self,
+        max_connections: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        idle_check_interval: Optional[float] = None,
+        send_queue_size: Optional[int] = None,
+        send_timeout: Optional[float] = None,
+    ) -> None:
+        ws_cfg = _get_settings().websocket
+        self.max_connections = max_connections if max_connections is not None else ws_cfg.MAX_CONNECTIONS
+        self.idle_timeout = idle_timeout if idle_timeout is not None else ws_cfg.IDLE_TIMEOUT
+        self.idle_check_interval = (
+            idle_check_interval if idle_check_interval is not None else ws_cfg.IDLE_CHECK_INTERVAL
+        )
+        self.send_queue_size = send_queue_size if send_queue_size is not None else ws_cfg.SEND_QUEUE_SIZE
+        self.send_timeout = send_timeout if send_timeout is not None else ws_cfg.SEND_TIMEOUT
+
+        self.active_connections: Dict[str, ManagedConnection] = {}
+        self._reaper_task: Optional[asyncio.Task] = None
+
+        # 已关闭连接的累计统计，便于观察长期运行情况
+        self.total_accepted = 0
+        self.total_rejected = 0
+        self.total_evicted = 0
+
+    async def connect(
+        self,
+        client_id: str,
+        websocket: WebSocket,
+        endpoint: str = "/ws",
+        session_id: Optional[str] = None,
+    ) -> ManagedConnection:
+        """
+        登记一个已 accept 的连接
 
-    async def connect(self, client_id: str, websocket: WebSocket) -> None:
-        self.active_connections[client_id] = websocket
+        Raises:
+            ConnectionLimitExceeded: 连接数已达上限
+        """
+        if len(self.active_connections) >= self.max_connections:
+            self.total_rejected += 1
+            raise ConnectionLimitExceeded(
+                f"连接数已达上限 {self.max_connections}"
+            )
+
+        conn = ManagedConnection(
+            client_id=client_id,
+            websocket=websocket,
+            endpoint=endpoint,
+            session_id=session_id,
+            send_queue_size=self.send_queue_size,
+            send_timeout=self.send_timeout,
+        )
+        self.active_connections[client_id] = conn
+        self.total_accepted += 1
+        self._ensure_reaper()
+        return conn
 
     async def disconnect(self, client_id: str) -> None:
-        self.active_connections.pop(client_id, None)
+        """注销连接并关闭底层 WebSocket（幂等）"""
+        conn = self.active_connections.pop(client_id, None)
+        if conn is not None:
+            await conn.close()
+
+    def get(self, client_id: str) -> Optional[ManagedConnection]:
+        return self.active_connections.get(client_id)
+
+    async def broadcast(self, payload: Dict[str, Any], endpoint: Optional[str] = None) -> int:
+        """
+        向所有连接（或指定端点的连接）广播消息
+        消息进入各连接的有界队列后立即返回，不等待任何客户端写入完成
+
+        Returns:
+            未发生丢弃的连接数
+        """
+        delivered = 0
+        for conn in list(self.active_connections.values()):
+            if endpoint is not None and conn.endpoint != endpoint:
+                continue
+            if conn.enqueue(payload):
+                delivered += 1
+        return delivered
+
+    async def close_all(self, code: int = 1001, reason: str = "server shutdown") -> None:
+        """关闭全部连接并停止巡检任务"""
+        for client_id in list(self.active_connections.keys()):
+            conn = self.active_connections.pop(client_id, None)
+            if conn is not None:
+                await conn.close(code=code, reason=reason)
+        if self._reaper_task and not self._reaper_task.done():
+            self._reaper_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._reaper_task
+        self._reaper_task = None
+
+    # ========= 空闲回收 =========
+    def _ensure_reaper(self) -> None:
+        if self.idle_timeout <= 0:
+            return
+        if self._reaper_task is None or self._reaper_task.done():
+            self._reaper_task = asyncio.create_task(self._reap_idle_loop())
+
+    async def _reap_idle_loop(self) -> None:
+        while self.active_connections:
+            await asyncio.sleep(self.idle_check_interval)
+            await self.evict_idle()
+
+    async def evict_idle(self) -> List[str]:
+        """关闭超过 idle_timeout 无活动的连接，返回被回收的 client_id 列表"""
+        now = time.monotonic()
+        evicted = []
+        for client_id, conn in list(self.active_connections.items()):
+            if now - conn.stats.last_activity > self.idle_timeout:
+                evicted.append(client_id)
+                self.active_connections.pop(client_id, None)
+                await conn.close(code=1001, reason="idle timeout")
+        if evicted:
+            self.total_evicted += len(evicted)
+            logger.info(f"回收空闲 WebSocket 连接 {len(evicted)} 个，剩余 {len(self.active_connections)} 个")
+        return evicted
+
+    # ========= 统计快照 =========
+    def snapshot(self, include_connections: bool = False) -> Dict[str, Any]:
+        """汇总统计，include_connections=True 时附带每个连接的明细"""
+        conns = list(self.active_connections.values())
+        summary: Dict[str, Any] = {
+            "active": len(conns),
+            "max_connections": self.max_connections,
+            "total_accepted": self.total_accepted,
+            "total_rejected": self.total_rejected,
+            "total_evicted": self.total_evicted,
+            "by_endpoint": {},
+            "frames_in": sum(c.stats.frames_in for c in conns),
+            "frames_out": sum(c.stats.frames_out for c in conns),
+            "bytes_in": sum(c.stats.bytes_in for c in conns),
+            "bytes_out": sum(c.stats.bytes_out for c in conns),
+            "dropped": sum(c.stats.dropped for c in conns),
+            "queued": sum(c.queue_depth for c in conns),
+        }
+        for conn in conns:
+            summary["by_endpoint"][conn.endpoint] = summary["by_endpoint"].get(conn.endpoint, 0) + 1
+        if include_connections:
+            summary["connections"] = [c.to_dict() for c in conns]
+        return summary
+
+
+# 全局连接管理器实例
+_ws_manager: Optional[WebSocketManager] = None
 
 
+def get_ws_manager() -> WebSocketManager:
+    """获取全局 WebSocket 连接管理器（单例模式）"""
+    global _ws_manager
+    if _ws_manager is None:
+        _ws_manager = WebSocketManager()
+    return _ws_manager
@@ -0,0 +1 @@
+"""核心模块测试包占位。"""
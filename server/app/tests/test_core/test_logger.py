@@ -0,0 +1,101 @@
+"""日志（逐帧采样、结构化格式、非阻塞队列）测试"""
+
+import json
+import logging
+import queue
+
+from app.utils import logger as log_module
+from app.utils.logger import JsonFormatter, NonBlockingQueueHandler, PerFrameSampler, TextFormatter, log_extra
+
+
+def record(name="app.services.pipeline", level=logging.INFO, per_frame=True, msg="帧处理完成", **extra):
+    rec = logging.LogRecord(name, level, __file__, 1, msg, None, None)
+    rec.per_frame = per_frame
+    for key, value in extra.items():
+        setattr(rec, key, value)
+    return rec
+
+
+def passed(sampler, count, **kwargs):
+    return [i for i in range(count) if sampler.filter(record(**kwargs))]
+
+
+def test_counter_sampling_keeps_one_in_stride():
+    sampler = PerFrameSampler(default_rate=0.1)
+    # 计数采样：第 1、11、21 条保留，结果确定
+    assert passed(sampler, 30) == [0, 10, 20]
+
+
+def test_non_per_frame_and_warnings_always_pass():
+    sampler = PerFrameSampler(default_rate=0.0)
+    assert len(passed(sampler, 5, per_frame=False)) == 5
+    assert len(passed(sampler, 5, level=logging.WARNING)) == 5
+    assert len(passed(sampler, 5, level=logging.ERROR)) == 5
+    # 采样率 0：逐帧 INFO 全部丢弃
+    assert passed(sampler, 5) == []
+
+
+def test_rate_one_keeps_everything():
+    sampler = PerFrameSampler(default_rate=1.0)
+    assert len(passed(sampler, 7)) == 7
+    # 大于 1 的采样率按 1 处理
+    assert len(passed(PerFrameSampler(default_rate=5.0), 7)) == 7
+
+
+def test_longest_prefix_wins():
+    sampler = PerFrameSampler(default_rate=0.1, rates={"app": 0.5, "app.services.vision": 1.0})
+    assert len(passed(sampler, 10, name="app.services.vision")) == 10
+    assert len(passed(sampler, 10, name="app.services.vision.yolo")) == 10
+    assert len(passed(sampler, 10, name="app.api.websocket")) == 5
+    # 前缀按 logger 层级匹配，"app" 不匹配 "application"
+    assert len(passed(sampler, 10, name="application")) == 1
+
+
+def test_counters_are_per_logger():
+    sampler = PerFrameSampler(default_rate=0.5)
+    assert sampler.filter(record(name="a"))
+    assert sampler.filter(record(name="b"))
+    assert not sampler.filter(record(name="a"))
+    assert not sampler.filter(record(name="b"))
+
+
+def test_log_extra():
+    assert log_extra() == {"per_frame": False}
+    assert log_extra("s1", per_frame=True, vision_time=0.05) == {
+        "per_frame": True, "session_id": "s1", "fields": {"vision_time": 0.05},
+    }
+
+
+def test_json_formatter_emits_session_and_fields():
+    rec = record(**log_extra("s1", vision_time=0.0512, detections=3))
+    line = JsonFormatter().format(rec)
+    payload = json.loads(line)
+    assert "\n" not in line
+    assert payload["msg"] == "帧处理完成"
+    assert payload["level"] == "INFO"
+    assert payload["session_id"] == "s1"
+    assert payload["vision_time"] == 0.0512 and payload["detections"] == 3
+
+
+def test_text_formatter_appends_fields():
+    rec = record(**log_extra("s1", vision_time=0.0512, detections=3))
+    text = TextFormatter().format(rec)
+    assert text.endswith("帧处理完成 | session=s1 vision_time=0.051 detections=3")
+
+
+def test_full_queue_drops_without_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    before = log_module._LOG_DROPPED._children[()].value
+    for _ in range(3):
+        handler.emit(record(per_frame=False))
+    assert handler.queue.qsize() == 1
+    assert log_module._LOG_DROPPED._children[()].value - before == 2
+
+
+def test_prepare_merges_args_and_keeps_extra():
+    handler = NonBlockingQueueHandler(queue.Queue())
+    rec = logging.LogRecord("app", logging.INFO, __file__, 1, "检测到 %d 个物体", (3,), None)
+    rec.session_id = "s1"
+    prepared = handler.prepare(rec)
+    assert prepared.msg == "检测到 3 个物体" and prepared.args is None
+    assert prepared.session_id == "s1"
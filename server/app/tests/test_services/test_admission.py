@@ -0,0 +1,115 @@
+"""请求准入控制（AdmissionController）测试：按权重占用名额、排队上限与等待超时"""
+
+import asyncio
+
+import pytest
+
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+def make(max_concurrent=4, max_queued=4, timeout=1.0):
+    return AdmissionController(max_concurrent=max_concurrent, max_queued=max_queued, timeout=timeout)
+
+
+def test_weight_counts_against_max_concurrent():
+    async def run():
+        admission = make()
+        order = []
+        async with admission.slot(weight=3):
+            assert admission.in_flight == 3
+
+            async def second():
+                async with admission.slot(weight=2):
+                    order.append(("second", admission.in_flight))
+
+            task = asyncio.create_task(second())
+            await asyncio.sleep(0.01)
+            # 3 + 2 > 4：排队等待
+            assert admission.waiting == 1 and not order
+            order.append(("first_done", admission.in_flight))
+        await task
+        return admission, order
+
+    admission, order = asyncio.run(run())
+    assert order == [("first_done", 3), ("second", 2)]
+    assert admission.in_flight == 0 and admission.waiting == 0
+    assert admission.total_admitted == 2
+
+
+def test_weight_above_limit_is_capped():
+    async def run():
+        admission = make(max_concurrent=4)
+        async with admission.slot(weight=10):
+            in_flight = admission.in_flight
+        return admission, in_flight
+
+    admission, in_flight = asyncio.run(run())
+    # 超过并发上限的权重按上限计，否则永远无法获准
+    assert in_flight == 4
+    assert admission.in_flight == 0
+
+
+def test_rejects_immediately_when_queue_full():
+    async def run():
+        admission = make(max_concurrent=1, max_queued=0)
+        async with admission.slot():
+            assert admission.is_saturated()
+            with pytest.raises(AdmissionRejected, match="队列已满"):
+                async with admission.slot():
+                    pass
+        return admission
+
+    admission = asyncio.run(run())
+    assert admission.total_rejected == 1
+    assert admission.total_admitted == 1
+    assert not admission.is_saturated()
+
+
+def test_rejects_after_wait_timeout():
+    async def run():
+        admission = make(max_concurrent=1, max_queued=1, timeout=5.0)
+        async with admission.slot():
+            with pytest.raises(AdmissionRejected, match="等待处理名额"):
+                async with admission.slot(timeout=0.05):
+                    pass
+            waiting = admission.waiting
+        return admission, waiting
+
+    admission, waiting = asyncio.run(run())
+    assert waiting == 0
+    assert admission.snapshot()["total_rejected"] == 1
+
+
+def test_slot_released_when_body_raises():
+    async def run():
+        admission = make(max_concurrent=2)
+        with pytest.raises(RuntimeError):
+            async with admission.slot(weight=2):
+                raise RuntimeError("处理失败")
+        async with admission.slot(weight=2, timeout=0.05):
+            pass
+        return admission
+
+    admission = asyncio.run(run())
+    assert admission.in_flight == 0
+    assert admission.total_admitted == 2
+    assert admission.total_rejected == 0
+
+
+def test_queued_waiters_admitted_as_capacity_frees():
+    async def run():
+        admission = make(max_concurrent=2, max_queued=8)
+        peak = 0
+
+        async def job():
+            nonlocal peak
+            async with admission.slot():
+                peak = max(peak, admission.in_flight)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(*[job() for _ in range(6)])
+        return admission, peak
+
+    admission, peak = asyncio.run(run())
+    assert peak == 2
+    assert admission.total_admitted == 6 and admission.total_rejected == 0
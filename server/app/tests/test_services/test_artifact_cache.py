@@ -0,0 +1,173 @@
+"""编译产物缓存（ArtifactCache）测试：缓存键、条目完整性、失效与清理，以及适配器的命中与损坏回退"""
+
+import json
+import os
+import time
+
+import pytest
+
+from app.services.ai_models.vision.artifact_cache import (
+    CLASSES_FILE,
+    FORMAT_VERSION,
+    META_FILE,
+    MODEL_FILE,
+    ArtifactCache,
+)
+
+FINGERPRINT = {
+    "ort_version": "1.20.0",
+    "providers": ["CPUExecutionProvider"],
+    "graph_optimization_level": "GraphOptimizationLevel.ORT_ENABLE_ALL",
+    "cpu": "x86_64:0123456789abcdef",
+    "class_mapping_sha256": "aa" * 32,
+}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "model.onnx"
+    path.write_bytes(b"onnx-v1")
+    return path
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(str(tmp_path / "cache"), max_entries=4)
+
+
+def publish(cache, key, source="/models/a.onnx"):
+    """按适配器的写法发布一个条目"""
+    staging = cache.staging_dir()
+    (staging / MODEL_FILE).write_bytes(b"ort")
+    return cache.commit(key, staging, classes={"0": "person"}, meta={"source": source})
+
+
+def test_key_is_stable_and_ignores_fingerprint_order(cache, source):
+    key = cache.key(str(source), FINGERPRINT)
+    assert key == cache.key(str(source), dict(reversed(list(FINGERPRINT.items()))))
+    assert len(key) == 32
+
+
+def test_key_changes_with_source_content(cache, source):
+    before = cache.key(str(source), FINGERPRINT)
+    source.write_bytes(b"onnx-v2")
+    assert cache.key(str(source), FINGERPRINT) != before
+
+
+@pytest.mark.parametrize("field, value", [
+    ("ort_version", "1.21.0"),
+    ("providers", ["CUDAExecutionProvider", "CPUExecutionProvider"]),
+    ("graph_optimization_level", "GraphOptimizationLevel.ORT_ENABLE_BASIC"),
+    ("cpu", "aarch64:fedcba9876543210"),
+    ("class_mapping_sha256", None),
+])
+def test_key_changes_with_each_fingerprint_field(cache, source, field, value):
+    assert cache.key(str(source), {**FINGERPRINT, field: value}) != cache.key(str(source), FINGERPRINT)
+
+
+def test_lookup_requires_complete_entry(cache):
+    assert cache.lookup("k1") is None
+    entry = cache.root / "k1"
+    entry.mkdir(parents=True)
+    (entry / MODEL_FILE).write_bytes(b"ort")
+    (entry / CLASSES_FILE).write_text("{}")
+    # 缺少 meta.json（写入中断）的条目不可用
+    assert cache.lookup("k1") is None
+    (entry / META_FILE).write_text("{}")
+    assert cache.lookup("k1") == entry
+
+
+def test_commit_publishes_entry(cache):
+    entry = publish(cache, "k1")
+    assert entry == cache.root / "k1"
+    assert cache.lookup("k1") == entry
+    assert cache.read_classes(entry) == {"0": "person"}
+    meta = json.loads((entry / META_FILE).read_text())
+    assert meta["key"] == "k1" and meta["format"] == FORMAT_VERSION
+    assert not [p for p in cache.root.iterdir() if p.name.startswith(".tmp-")]
+
+
+def test_commit_keeps_existing_entry_on_race(cache):
+    first = publish(cache, "k1")
+    # 另一进程已发布同一条目：丢弃本次的临时目录，沿用已有条目
+    assert publish(cache, "k1") == first
+    assert [p.name for p in cache.root.iterdir()] == ["k1"]
+
+
+def test_invalidate_removes_entry(cache):
+    publish(cache, "k1")
+    cache.invalidate("k1")
+    assert cache.lookup("k1") is None
+    assert not (cache.root / "k1").exists()
+    cache.invalidate("missing")
+
+
+def test_new_entry_replaces_old_one_for_same_source(cache):
+    publish(cache, "old", source="/models/a.onnx")
+    publish(cache, "other", source="/models/b.onnx")
+    publish(cache, "new", source="/models/a.onnx")
+    assert sorted(p.name for p in cache.root.iterdir()) == ["new", "other"]
+
+
+def test_prune_removes_stale_format_and_unreadable_meta(cache):
+    publish(cache, "good", source="/models/b.onnx")
+    legacy = cache.root / "legacy"
+    legacy.mkdir()
+    (legacy / META_FILE).write_text(json.dumps({"source": "/models/c.onnx", "format": FORMAT_VERSION - 1}))
+    broken = cache.root / "broken"
+    broken.mkdir()
+    (broken / META_FILE).write_text("{not json")
+    publish(cache, "new", source="/models/a.onnx")
+    assert sorted(p.name for p in cache.root.iterdir()) == ["good", "new"]
+
+
+def test_prune_only_removes_abandoned_staging_dirs(cache):
+    fresh = cache.staging_dir()
+    abandoned = cache.staging_dir()
+    old = time.time() - 7200
+    os.utime(abandoned, (old, old))
+    publish(cache, "k1")
+    # 其他进程正在写的临时目录保留，超过 1 小时的视为中断写入
+    assert fresh.exists()
+    assert not abandoned.exists()
+
+
+def test_prune_keeps_most_recently_used_entries(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), max_entries=2)
+    publish(cache, "a", source="/models/a.onnx")
+    publish(cache, "b", source="/models/b.onnx")
+    # 命中会刷新访问时间，最久未用的 b 先被清理
+    old = time.time() - 60
+    os.utime(cache.root / "b" / META_FILE, (old, old))
+    cache.lookup("a")
+    publish(cache, "c", source="/models/c.onnx")
+    assert sorted(p.name for p in cache.root.iterdir()) == ["a", "c"]
+
+
+def test_adapter_hits_cache_and_recovers_from_corrupt_entry(tmp_path):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("onnx")
+    from app.benchmarks.common import build_tiny_onnx
+    from app.services.ai_models.vision.yolov8_adapter import YOLOv8nAdapter
+
+    model_path = build_tiny_onnx(str(tmp_path / "tiny.onnx"))
+    cache_dir = tmp_path / "cache"
+
+    def load():
+        return YOLOv8nAdapter(model_path=model_path, artifact_cache_dir=str(cache_dir))
+
+    first = load()
+    assert first.artifact_cache_status == "miss"
+    (entry,) = list(cache_dir.iterdir())
+    assert (entry / MODEL_FILE).exists()
+
+    second = load()
+    assert second.artifact_cache_status == "hit"
+    assert second.class_table.to_dict() == first.class_table.to_dict()
+
+    # 条目损坏：删除后回退到源模型重新生成，加载不受影响
+    (entry / MODEL_FILE).write_bytes(b"corrupt")
+    third = load()
+    assert third.artifact_cache_status == "miss"
+    assert third.ort_session is not None
+    assert (entry / MODEL_FILE).read_bytes() != b"corrupt"
@@ -0,0 +1,125 @@
+"""熔断器（CircuitBreaker）测试：closed -> open -> half_open -> closed / open 的状态切换"""
+
+import itertools
+
+import pytest
+
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, get_breaker, get_breakers
+
+_names = itertools.count()
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def make(failure_threshold=3, reset_timeout=30.0):
+    return CircuitBreaker(f"test_{next(_names)}", failure_threshold, reset_timeout)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = make(failure_threshold=3)
+    breaker.record_failure("timeout")
+    breaker.record_failure("timeout")
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure("HTTP 500")
+    assert breaker.state == OPEN
+    assert breaker.last_failure == "HTTP 500"
+    assert not breaker.allow()
+    assert breaker.total_short_circuited == 1
+
+
+def test_success_resets_consecutive_count(clock):
+    breaker = make(failure_threshold=3)
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED
+    assert breaker.consecutive_failures == 2
+    assert breaker.total_failures == 4
+
+
+def test_half_open_trial_after_reset_timeout(clock):
+    breaker = make(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    clock.now += 29.9
+    assert not breaker.allow()
+    clock.now += 0.1
+    # 冷却期过后只放行一次试探调用
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_half_open_success_closes(clock):
+    breaker = make(failure_threshold=1)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.opened_at is None
+    assert breaker.allow()
+
+
+def test_half_open_failure_reopens(clock):
+    breaker = make(failure_threshold=5)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+    # 试探失败立即重新熔断，不需要再累计 failure_threshold 次
+    breaker.record_failure("still down")
+    assert breaker.state == OPEN
+    assert breaker.opened_at == clock.now
+    assert not breaker.allow()
+
+
+def test_stalled_trial_retried_next_period(clock):
+    breaker = make(failure_threshold=1, reset_timeout=10.0)
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    # 试探调用没有结果（如被取消）：下一个冷却周期再放行一次
+    clock.now += 5
+    assert not breaker.allow()
+    clock.now += 5
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+
+
+def test_snapshot(clock):
+    breaker = make(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure("timeout")
+    clock.now += 10
+    snapshot = breaker.snapshot()
+    assert snapshot["state"] == OPEN
+    assert snapshot["retry_in"] == 20.0
+    assert snapshot["last_failure"] == "timeout"
+    assert snapshot["failure_threshold"] == 1
+
+
+def test_get_breaker_reuses_state_and_updates_thresholds(clock):
+    name = f"test_{next(_names)}"
+    breaker = get_breaker(name, failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    # 适配器重建（热重载）取回同一个熔断器：保持熔断，只更新阈值
+    again = get_breaker(name, failure_threshold=4, reset_timeout=5.0)
+    assert again is breaker
+    assert again.state == OPEN
+    assert (again.failure_threshold, again.reset_timeout) == (4, 5.0)
+    assert get_breakers()[name] is breaker
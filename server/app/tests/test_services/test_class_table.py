@@ -0,0 +1,108 @@
+"""类别表（ClassTable）测试：按 id 取名、翻译回退、序列化往返，以及映射文件的解析缓存与失效"""
+
+import os
+
+import pytest
+
+from app.services.ai_models import class_table
+from app.services.ai_models.class_table import (
+    EMPTY_TABLE,
+    UNKNOWN_ZH,
+    ClassTable,
+    get_class_table,
+    register_class_table,
+)
+
+MAPPING = {"person": "人", "bicycle": "自行车", "car": "汽车"}
+
+
+def make(**kwargs):
+    return ClassTable.from_config(MAPPING, {"fallback_format": "{zh}({en})"}, **kwargs)
+
+
+def test_names_by_id():
+    table = make()
+    assert len(table) == 3
+    assert table.names() == ("人", "自行车", "汽车")
+    assert table.names(use_chinese=False) == ("person", "bicycle", "car")
+    assert table.name(2) == "汽车"
+    assert table.name(2, use_chinese=False) == "car"
+
+
+def test_name_out_of_range():
+    table = make()
+    assert table.name(99) == UNKNOWN_ZH
+    assert table.name(-1) == UNKNOWN_ZH
+    assert table.name(99, use_chinese=False) == "class_99"
+
+
+def test_unmapped_names_use_fallback_format():
+    table = make(names=["person", "scooter"])
+    assert table.names() == ("人", f"{UNKNOWN_ZH}(scooter)")
+    assert table.translate("bicycle") == "自行车"
+    assert table.translate("scooter") == f"{UNKNOWN_ZH}(scooter)"
+    # 已是中文的名称原样返回，空名称按未知处理
+    assert table.translate("行人") == "行人"
+    assert table.translate("") == UNKNOWN_ZH
+
+
+def test_with_names_renumbers_and_keeps_mapping():
+    table = make()
+    assert table.with_names(["person", "bicycle", "car"]) is table
+    renumbered = table.with_names(["car", "person"])
+    assert renumbered.names() == ("汽车", "人")
+    assert renumbered.fallback_format == table.fallback_format
+    assert renumbered.translate("bicycle") == "自行车"
+
+
+def test_dict_round_trip():
+    table = make(names=["person", "scooter", "car"])
+    restored = ClassTable.from_dict(table.to_dict(), source="cache/classes.json")
+    assert restored.to_dict() == table.to_dict()
+    assert restored.names() == table.names()
+    assert restored.translate("bicycle") == "自行车"
+    assert restored.source == "cache/classes.json"
+
+
+def test_table_is_immutable():
+    with pytest.raises(AttributeError):
+        make().names_en = ()
+
+
+@pytest.fixture
+def mapping_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(class_table, "_tables", {})
+    path = tmp_path / "classes.yaml"
+    path.write_text("mapping:\n  person: 人\n  car: 汽车\n", encoding="utf-8")
+    return path
+
+
+def test_mapping_file_parsed_once(mapping_file, monkeypatch):
+    first = get_class_table(str(mapping_file))
+    monkeypatch.setattr(class_table, "_parse", lambda path: pytest.fail("映射文件未变化时不应重新解析"))
+    assert get_class_table(str(mapping_file)) is first
+    assert first.names() == ("人", "汽车")
+    assert first.source == str(mapping_file)
+
+
+def test_mapping_file_change_reparses(mapping_file):
+    first = get_class_table(str(mapping_file))
+    mapping_file.write_text("mapping:\n  person: 人\n  car: 汽车\n  bus: 公交车\n", encoding="utf-8")
+    stat = mapping_file.stat()
+    os.utime(mapping_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    second = get_class_table(str(mapping_file))
+    assert second is not first
+    assert second.names() == ("人", "汽车", "公交车")
+
+
+def test_missing_or_invalid_mapping_file_gives_empty_table(mapping_file, tmp_path):
+    assert get_class_table(str(tmp_path / "missing.yaml")) is EMPTY_TABLE
+    mapping_file.write_text("mapping: [unclosed", encoding="utf-8")
+    assert get_class_table(str(mapping_file)) is EMPTY_TABLE
+
+
+def test_register_class_table_skips_parsing(mapping_file, monkeypatch):
+    cached = ClassTable.from_dict({"names": ["person"], "mapping": {"person": "人"}}, source="cache")
+    register_class_table(cached, str(mapping_file))
+    monkeypatch.setattr(class_table, "_parse", lambda path: pytest.fail("已登记的类别表不应重新解析"))
+    assert get_class_table(str(mapping_file)) is cached
@@ -0,0 +1,113 @@
+"""健康检查（HealthService）测试：就绪检查附带执行提供方、阶段耗时与后台刷新的语言后端探测"""
+
+import asyncio
+
+import pytest
+
+from app.core.metrics import STAGE_SECONDS
+from app.services import health
+from app.services.health import HealthService
+
+
+class FakeSession:
+    def get_providers(self):
+        return ["CPUExecutionProvider"]
+
+
+class FakeVisionModel:
+    model_path = "models/yolov8n.onnx"
+    use_onnx = True
+    ort_session = FakeSession()
+
+
+class FakeLanguageModel:
+    def __init__(self, reachable=True):
+        self.reachable = reachable
+        self.probes = 0
+
+    def describe_backend(self):
+        return {"backend": "fake"}
+
+    async def probe(self, timeout=2.0):
+        self.probes += 1
+        await asyncio.sleep(0)
+        return {"reachable": self.reachable, "latency": 0.001}
+
+
+class FakeRegistry:
+    state = "loaded"
+    serving = True
+    loaded = True
+    load_error = None
+    vision_warmed_up = True
+    language_warmed_up = True
+    vision_model = FakeVisionModel()
+
+    def __init__(self, language_model):
+        self.language_model = language_model
+
+    def snapshot(self):
+        return {"vision": {"state": "ready"}, "language": {"state": "ready"}}
+
+    def reload_status(self):
+        return {"state": "idle", "reloads": 0, "generation": 1, "draining": {}}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    def make(language_model):
+        monkeypatch.setattr(health, "get_model_registry", lambda: FakeRegistry(language_model))
+        return HealthService()
+    return make
+
+
+def test_readiness_reports_providers_and_stage_latency(service):
+    STAGE_SECONDS.labels("vision_infer").observe(0.012)
+    ready, report = service(FakeLanguageModel()).readiness()
+    assert ready
+    assert report["vision"]["providers"] == ["CPUExecutionProvider"]
+    assert report["vision"]["runtime"] == "onnxruntime"
+    assert "vision_infer" in report["latency"]["stages"]
+    assert {"p50_ms", "p95_ms", "count"} <= set(report["latency"]["stages"]["vision_infer"])
+
+
+def test_readiness_fills_probe_in_background(service):
+    language_model = FakeLanguageModel()
+    checker = service(language_model)
+
+    async def run():
+        # 首次就绪检查不等待探测，后台探测完成后下一次即可读到
+        _, first = checker.readiness()
+        await checker._probe_task
+        _, second = checker.readiness()
+        _, third = checker.readiness()
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+    assert first["language"]["reachable"] is None
+    assert second["language"]["reachable"] is True
+    assert third["language"]["probe_age"] is not None
+    # 缓存未过期时不再探测
+    assert language_model.probes == 1
+
+
+def test_unreachable_backend_marks_degraded(service):
+    checker = service(FakeLanguageModel(reachable=False))
+
+    async def run():
+        checker.readiness()
+        await checker._probe_task
+        return checker.readiness()
+
+    ready, report = asyncio.run(run())
+    assert ready
+    assert report["status"] == "degraded"
+    assert report["reasons"] == ["llm_unreachable"]
+
+
+def test_readiness_outside_event_loop_skips_probe(service):
+    checker = service(FakeLanguageModel())
+    ready, report = checker.readiness()
+    assert ready
+    assert report["language"]["reachable"] is None
+    assert checker._probe_task is None
@@ -0,0 +1,84 @@
+"""模型注册表（ModelRegistry）请求路径测试：未就绪时不同步加载，直接抛出 ModelsNotReady"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.services.model_registry import FAILED, LOADING, ModelRegistry, ModelsNotReady
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = ModelRegistry()
+
+    def forbidden():
+        raise AssertionError("请求路径上不应同步加载模型")
+
+    monkeypatch.setattr(registry, "_create_vision", forbidden)
+    monkeypatch.setattr(registry, "_create_language", forbidden)
+    return registry
+
+
+def test_lease_raises_warming_up_while_loading(registry):
+    registry.models["vision"].transition(LOADING)
+    with pytest.raises(ModelsNotReady) as exc:
+        with registry.lease():
+            pass
+    assert exc.value.code == "WARMING_UP"
+    assert registry.reload_status()["draining"] == {}
+
+
+def test_pipeline_raises_without_loading(registry):
+    with pytest.raises(ModelsNotReady) as exc:
+        registry.pipeline
+    assert exc.value.code == "WARMING_UP"
+    with pytest.raises(ModelsNotReady):
+        registry.vision_model
+
+
+def test_retry_after_follows_backoff(registry):
+    slot = registry.models["language"]
+    slot.transition(FAILED)
+    slot.retry_at = time.time() + 8
+    with pytest.raises(ModelsNotReady) as exc:
+        registry.pipeline
+    assert exc.value.code == "WARMING_UP"
+    assert 7 <= exc.value.retry_after <= 8
+
+
+def test_gave_up_reports_models_unavailable(registry):
+    slot = registry.models["vision"]
+    slot.error = "FileNotFoundError: models/yolov8n.onnx"
+    slot.transition(FAILED)
+    slot.gave_up = True
+    with pytest.raises(ModelsNotReady) as exc:
+        with registry.lease():
+            pass
+    assert exc.value.code == "MODELS_UNAVAILABLE"
+    assert "yolov8n.onnx" in str(exc.value)
+
+    # wait_until_serving 不等满超时，立即给出同样的原因
+    start = time.monotonic()
+    with pytest.raises(ModelsNotReady) as exc:
+        asyncio.run(registry.wait_until_serving(timeout=5))
+    assert exc.value.code == "MODELS_UNAVAILABLE"
+    assert time.monotonic() - start < 1
+
+
+def test_wait_until_serving_times_out_with_warming_up(registry):
+    with pytest.raises(ModelsNotReady) as exc:
+        asyncio.run(registry.wait_until_serving(timeout=0.1))
+    assert exc.value.code == "WARMING_UP"
+
+
+def test_lease_counts_inflight_per_generation(registry):
+    first = object()
+    registry._pipeline, registry.generation = first, 1
+    with registry.lease() as pipeline:
+        assert pipeline is first
+        assert registry._inflight == {1: 1}
+        # 热重载切换后，已取得的请求继续使用旧一代
+        registry._pipeline, registry.generation = object(), 2
+        assert registry.reload_status()["draining"] == {"1": 1}
+    assert registry._inflight == {}
@@ -0,0 +1,129 @@
+"""提示词构建缓存（PromptWrapper 的 LRU）测试：量化命中、字段相关的缓存键、容量淘汰与模板重载失效"""
+
+import pytest
+
+from app.services.ai_models.language.prompt_wrapper import PromptWrapper
+from app.services.ai_models.language.prompts.prompts_manager import CompiledTemplate
+
+
+class FakePromptsManager:
+    """按场景/模板名返回编译后的模板；reload 时递增 generation"""
+
+    def __init__(self, templates):
+        self.generation = 1
+        self.templates = {}
+        self.load(templates)
+
+    def load(self, templates):
+        self.templates = {name: CompiledTemplate.compile(text) for name, text in templates.items()}
+        self.generation += 1
+
+    def get_compiled(self, scene, template_name="default"):
+        return self.templates.get(template_name)
+
+    def get_prompt(self, scene, template_name="default"):
+        compiled = self.get_compiled(scene, template_name)
+        return compiled.text if compiled else None
+
+
+TEMPLATES = {
+    "default": "画面中有{objects}。",
+    "positions": "物体位置：{positions}",
+    "confidence": "检测结果：{objects_with_confidence}",
+    "count": "共{object_count}个物体：{objects}",
+}
+
+
+def det(name, confidence=0.9, bbox=(100, 100, 200, 200), class_id=None):
+    return {"class": name, "class_en": name, "confidence": confidence, "bbox": list(bbox), "class_id": class_id}
+
+
+@pytest.fixture
+def make():
+    def make(templates=TEMPLATES, **kwargs):
+        manager = FakePromptsManager(templates)
+        return PromptWrapper(manager, **kwargs), manager
+    return make
+
+
+def test_repeated_detections_hit_cache(make):
+    wrapper, _ = make()
+    first = wrapper.build_prompt([det("人"), det("椅子", 0.8)])
+    second = wrapper.build_prompt([det("人"), det("椅子", 0.8)])
+    assert first == second == "画面中有人、椅子。"
+    info = wrapper.cache_info()
+    assert (info["hits"], info["misses"], info["size"]) == (1, 1, 1)
+    assert info["hit_rate"] == 0.5
+
+
+def test_fields_unused_by_template_do_not_split_cache(make):
+    wrapper, _ = make()
+    # 默认模板只用 objects：置信度与坐标变化仍命中
+    wrapper.build_prompt([det("人", 0.9, (100, 100, 200, 200))])
+    wrapper.build_prompt([det("人", 0.6, (300, 50, 400, 120))])
+    assert wrapper.cache_info()["hits"] == 1
+
+
+def test_bbox_jitter_within_quantum_hits(make):
+    wrapper, _ = make(bbox_quantum=8)
+    first = wrapper.build_prompt([det("人", bbox=(104, 104, 200, 200))], "positions")
+    second = wrapper.build_prompt([det("人", bbox=(106, 102, 198, 203))], "positions")
+    assert first == second == "物体位置：人: [104, 104, 200, 200]"
+    third = wrapper.build_prompt([det("人", bbox=(140, 100, 200, 200))], "positions")
+    assert third != first
+    assert wrapper.cache_info()["hits"] == 1
+
+
+def test_confidence_is_part_of_key_when_used(make):
+    wrapper, _ = make()
+    assert wrapper.build_prompt([det("人", 0.904)], "confidence") == "检测结果：人(90%)"
+    # 百分数取整后相同的置信度命中，不同则重新组装
+    assert wrapper.build_prompt([det("人", 0.896)], "confidence") == "检测结果：人(90%)"
+    assert wrapper.build_prompt([det("人", 0.5)], "confidence") == "检测结果：人(50%)"
+    assert wrapper.cache_info()["hits"] == 1
+
+
+def test_object_count_beyond_top_k(make):
+    wrapper, _ = make()
+    few = [det("人", 0.9 - i * 0.01) for i in range(5)]
+    many = few + [det("椅子", 0.1)]
+    # 只有前 5 个进入提示词，但总数不同不能复用
+    assert wrapper.build_prompt(few, "count").startswith("共5个物体")
+    assert wrapper.build_prompt(many, "count").startswith("共6个物体")
+    assert wrapper.cache_info()["hits"] == 0
+
+
+def test_lru_evicts_least_recently_used(make):
+    wrapper, _ = make(cache_size=2)
+    wrapper.build_prompt([det("人")])
+    wrapper.build_prompt([det("椅子")])
+    wrapper.build_prompt([det("人")])  # 命中，人 成为最近使用
+    wrapper.build_prompt([det("桌子")])  # 淘汰 椅子
+    assert wrapper.cache_info()["size"] == 2
+    wrapper.build_prompt([det("人")])
+    wrapper.build_prompt([det("椅子")])
+    info = wrapper.cache_info()
+    assert (info["hits"], info["misses"]) == (2, 4)
+
+
+def test_template_reload_invalidates_cache(make):
+    wrapper, manager = make()
+    assert wrapper.build_prompt([det("人")]) == "画面中有人。"
+    manager.load({**TEMPLATES, "default": "我看到了{objects}"})
+    assert wrapper.build_prompt([det("人")]) == "我看到了人"
+    assert wrapper.cache_info()["hits"] == 0
+
+
+def test_cache_disabled(make):
+    wrapper, _ = make(cache_size=0)
+    wrapper.build_prompt([det("人")])
+    wrapper.build_prompt([det("人")])
+    info = wrapper.cache_info()
+    assert (info["size"], info["hits"], info["misses"]) == (0, 0, 0)
+    assert info["hit_rate"] is None
+
+
+def test_empty_detections_bypass_cache(make):
+    wrapper, _ = make()
+    assert wrapper.build_prompt([])
+    assert wrapper.cache_info()["misses"] == 0
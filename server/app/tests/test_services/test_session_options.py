@@ -0,0 +1,142 @@
+"""会话级参数协商（parse_session_options）测试"""
+
+import pytest
+
+from app.services import session_options
+from app.services.session_options import (
+    DEFAULT_OPTIONS,
+    InvalidSessionOptions,
+    SessionOptions,
+    parse_session_options,
+)
+
+
+class StaticInputModel:
+    """输入尺寸固定为 640 的视觉模型"""
+    default_input_size = 640
+
+    def supports_input_size(self, size):
+        return size == self.default_input_size
+
+
+def test_empty_payload_keeps_current():
+    current = SessionOptions(max_detections=5, language=False)
+    assert parse_session_options({}) == DEFAULT_OPTIONS
+    assert parse_session_options({}, current) == current
+
+
+def test_only_given_fields_change():
+    current = SessionOptions(max_detections=5, stream_text=False)
+    options = parse_session_options({"language": False}, current)
+    assert options == SessionOptions(max_detections=5, stream_text=False, language=False)
+
+
+@pytest.mark.parametrize("payload", [{"unknown": 1}, {"maxDetection": 3}, {"MaxDetections": 3}])
+def test_unknown_key_rejected(payload):
+    with pytest.raises(InvalidSessionOptions, match="未知的参数"):
+        parse_session_options(payload)
+
+
+def test_unknown_keys_listed_and_nothing_applied():
+    with pytest.raises(InvalidSessionOptions) as exc:
+        parse_session_options({"language": False, "zeta": 1, "alpha": 2})
+    assert "alpha, zeta" in str(exc.value)
+    assert exc.value.code == "INVALID_OPTIONS"
+
+
+def test_payload_must_be_object():
+    with pytest.raises(InvalidSessionOptions):
+        parse_session_options(["language"])
+
+
+@pytest.mark.parametrize("key", ["language", "stream_text", "vision_result", "track", "changes_only"])
+@pytest.mark.parametrize("value", [0, 1, "true", "false"])
+def test_bool_fields_require_bool(key, value):
+    with pytest.raises(InvalidSessionOptions, match="必须是布尔值"):
+        parse_session_options({key: value})
+
+
+@pytest.mark.parametrize("key", ["max_detections", "input_size"])
+@pytest.mark.parametrize("value", [True, False, 3.0, "320"])
+def test_int_fields_reject_bool_and_non_int(key, value):
+    with pytest.raises(InvalidSessionOptions, match="必须是整数"):
+        parse_session_options({key: value})
+
+
+@pytest.mark.parametrize("value", [0, 1, 100])
+def test_max_detections_in_range(value):
+    assert parse_session_options({"max_detections": value}).max_detections == value
+
+
+@pytest.mark.parametrize("value", [-1, 101])
+def test_max_detections_out_of_range(value):
+    with pytest.raises(InvalidSessionOptions, match="max_detections"):
+        parse_session_options({"max_detections": value})
+
+
+@pytest.mark.parametrize("value", [160, 320, 1280])
+def test_input_size_in_range(value):
+    assert parse_session_options({"input_size": value}).input_size == value
+
+
+@pytest.mark.parametrize("value", [128, 1312, 0, -320, 330])
+def test_input_size_out_of_range_or_not_stride(value):
+    with pytest.raises(InvalidSessionOptions, match="input_size"):
+        parse_session_options({"input_size": value})
+
+
+def test_input_size_checked_against_static_model():
+    model = StaticInputModel()
+    assert parse_session_options({"input_size": 640}, vision_model=model).input_size == 640
+    with pytest.raises(InvalidSessionOptions, match="固定为 640"):
+        parse_session_options({"input_size": 320}, vision_model=model)
+
+
+def test_null_resets_to_default():
+    current = SessionOptions(
+        template="concise", max_detections=5, input_size=320, language=False,
+        stream_text=False, vision_result=False, track=True, changes_only=True,
+    )
+    payload = {name: None for name in DEFAULT_OPTIONS.to_dict()}
+    assert parse_session_options(payload, current) == DEFAULT_OPTIONS
+    options = parse_session_options({"inputSize": None, "track": None}, current)
+    assert options.input_size is None
+    assert options.track is False
+    assert options.max_detections == 5
+
+
+def test_camel_case_keys():
+    options = parse_session_options({
+        "maxDetections": 3,
+        "inputSize": 320,
+        "streamText": False,
+        "visionResult": False,
+        "changesOnly": True,
+    })
+    assert options == SessionOptions(
+        max_detections=3, input_size=320, stream_text=False, vision_result=False, changes_only=True,
+    )
+    assert options.tracking
+
+
+def test_camel_case_values_validated():
+    with pytest.raises(InvalidSessionOptions, match="max_detections"):
+        parse_session_options({"maxDetections": 101})
+    with pytest.raises(InvalidSessionOptions, match="布尔值"):
+        parse_session_options({"changesOnly": 1})
+
+
+def test_to_dict_camel_round_trip():
+    options = SessionOptions(max_detections=7, input_size=480, changes_only=True)
+    assert parse_session_options(options.to_dict(camel=True)) == options
+    assert parse_session_options(options.to_dict()) == options
+
+
+def test_template_validated_against_available(monkeypatch):
+    monkeypatch.setattr(session_options, "available_templates", lambda: ["default", "concise"])
+    assert parse_session_options({"template": "concise"}).template == "concise"
+    with pytest.raises(InvalidSessionOptions, match="未知的提示词模板"):
+        parse_session_options({"template": "missing"})
+    for value in ("", 1, True):
+        with pytest.raises(InvalidSessionOptions, match="模板名称"):
+            parse_session_options({"template": value})
@@ -0,0 +1,130 @@
+"""空间关系引擎（analyze_layout）测试"""
+
+import pytest
+
+from app.services.ai_models.language.spatial import MAX_RELATIONS, ZONES, analyze_layout
+
+# (高, 宽)：九宫格每格 300×200
+SHAPE = (600, 900, 3)
+
+
+def box(cx, cy, w, h):
+    return [cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2]
+
+
+@pytest.mark.parametrize("index", range(9))
+def test_zone_from_center_on_3x3_grid(index):
+    row, col = divmod(index, 3)
+    layout = analyze_layout(["杯子"], [box(150 + 300 * col, 100 + 200 * row, 40, 40)], SHAPE)
+    assert layout.zones == (ZONES[index],)
+
+
+def test_zone_boundaries():
+    # 中心恰好落在 1/3 处归入中间一格
+    layout = analyze_layout(["a", "b"], [box(299, 300, 20, 20), box(300, 300, 20, 20)], SHAPE)
+    assert layout.zones == ("左侧", "正前方")
+
+
+def test_near_and_far_thresholds():
+    # 线性尺寸 sqrt(框面积 / 画面面积)：>= 0.35 近处，< 0.12 远处，其余不输出
+    layout = analyze_layout(
+        ["人", "椅子", "杯子"],
+        [box(450, 300, 360, 360), box(150, 300, 150, 150), box(750, 300, 40, 40)],
+        SHAPE,
+    )
+    assert layout.distances == ("近处", "", "远处")
+    assert layout.facts() == "正前方近处：人；左侧：椅子；右侧远处：杯子"
+
+
+def test_distance_threshold_edges():
+    area = SHAPE[0] * SHAPE[1]
+    near_side = (0.35 ** 2 * area) ** 0.5
+    far_side = (0.12 ** 2 * area) ** 0.5
+    layout = analyze_layout(
+        ["a", "b", "c"],
+        [
+            box(450, 300, near_side + 1, near_side + 1),
+            box(450, 300, far_side + 1, far_side + 1),
+            box(450, 300, far_side - 1, far_side - 1),
+        ],
+        SHAPE,
+    )
+    assert layout.distances == ("近处", "", "远处")
+
+
+def test_left_of_only_between_adjacent_objects():
+    # 三个物体在同一列从左到右排开：只输出相邻的两对，不输出「杯子在瓶子左边」
+    boxes = [box(30, 300, 50, 50), box(130, 300, 50, 50), box(230, 300, 50, 50)]
+    layout = analyze_layout(["杯子", "碗", "瓶子"], boxes, SHAPE)
+    assert layout.relations == ((0, 1, "左边"), (1, 2, "左边"))
+    assert layout.facts() == "左侧远处：杯子、碗、瓶子；杯子在碗左边；碗在瓶子左边"
+
+
+def test_left_of_skipped_when_zones_already_differ():
+    layout = analyze_layout(["杯子", "碗"], [box(150, 300, 50, 50), box(450, 300, 50, 50)], SHAPE)
+    assert layout.zones == ("左侧", "正前方")
+    assert layout.relations == ()
+
+
+def test_left_of_order_follows_x_not_input_order():
+    layout = analyze_layout(["碗", "杯子"], [box(230, 300, 50, 50), box(30, 300, 50, 50)], SHAPE)
+    assert layout.relations == ((1, 0, "左边"),)
+
+
+def test_no_relations_between_same_name():
+    layout = analyze_layout(["杯子", "杯子"], [box(30, 300, 50, 50), box(130, 300, 50, 50)], SHAPE)
+    assert layout.relations == ()
+    assert layout.facts() == "左侧远处：2个杯子"
+
+
+def test_in_front_by_lower_bottom_edge():
+    # 水平重叠、底边更低（更靠近镜头）的在前面
+    layout = analyze_layout(["椅子", "人"], [[120, 100, 280, 400], [100, 200, 300, 580]], SHAPE)
+    assert layout.relations == ((1, 0, "前面"),)
+    assert layout.facts().endswith("人在椅子前面")
+
+
+def test_in_front_needs_bottom_gap():
+    gap = 0.05 * SHAPE[0]
+    layout = analyze_layout(["椅子", "人"], [[120, 100, 280, 400], [100, 200, 300, 400 + gap - 1]], SHAPE)
+    assert layout.relations == ()
+
+
+def test_in_front_skipped_when_contained():
+    # 桌上的杯子：杯子框基本被桌子框包含，不输出「桌子在杯子前面」
+    layout = analyze_layout(["餐桌", "杯子"], [[0, 300, 600, 600], [250, 350, 300, 420]], SHAPE)
+    assert layout.relations == ()
+
+
+def test_relations_capped():
+    boxes = [box(20 + 55 * i, 300, 40, 40) for i in range(5)]
+    layout = analyze_layout(["a", "b", "c", "d", "e"], boxes, SHAPE)
+    assert len(layout.relations) == MAX_RELATIONS
+    assert layout.relations == ((0, 1, "左边"), (1, 2, "左边"), (2, 3, "左边"))
+
+
+@pytest.mark.parametrize("shape", [SHAPE, None])
+def test_empty_input(shape):
+    layout = analyze_layout([], [], shape)
+    assert layout.names == layout.zones == layout.distances == layout.relations == ()
+    assert layout.facts() == ""
+
+
+def test_unknown_image_shape_only_reports_relations():
+    boxes = [box(150, 300, 50, 50), box(450, 300, 50, 50), box(750, 300, 50, 50)]
+    layout = analyze_layout(["杯子", "碗", "瓶子"], boxes, None)
+    assert layout.zones == ("", "", "")
+    assert layout.distances == ("", "", "")
+    # 方位词不可用，左右关系不再受「方位区相同」限制，仍只输出相邻的一对
+    assert layout.relations == ((0, 1, "左边"), (1, 2, "左边"))
+    assert layout.facts() == "杯子、碗、瓶子；杯子在碗左边；碗在瓶子左边"
+    assert layout.sentence() == "图片中有一个杯子、一个碗和一个瓶子。杯子在碗左边，碗在瓶子左边。"
+
+
+def test_sentence_groups_by_zone_and_distance():
+    layout = analyze_layout(
+        ["人", "杯子", "杯子"],
+        [box(450, 300, 360, 360), box(750, 300, 40, 40), box(800, 300, 40, 40)],
+        SHAPE,
+    )
+    assert layout.sentence() == "正前方近处有一个人，右侧远处有2个杯子。"
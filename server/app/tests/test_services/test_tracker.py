@@ -0,0 +1,149 @@
+"""多目标跟踪器（ObjectTracker）测试"""
+
+from app.services.ai_models.vision.tracker import LOST, TRACKED, ObjectTracker
+
+
+def det(class_id, bbox, confidence=0.9, name=None):
+    return {"class": name or f"class_{class_id}", "class_id": class_id, "confidence": confidence, "bbox": list(bbox)}
+
+
+def shifted(bbox, dx=0.0, dy=0.0):
+    x1, y1, x2, y2 = bbox
+    return [x1 + dx, y1 + dy, x2 + dx, y2 + dy]
+
+
+PERSON = [100, 100, 200, 300]
+CHAIR = [400, 200, 500, 350]
+
+
+def ids(result):
+    return {d["class_id"]: d["track_id"] for d in result.detections}
+
+
+def test_track_ids_stable_across_frames():
+    tracker = ObjectTracker()
+    first = tracker.update([det(0, PERSON), det(56, CHAIR)])
+    assert {d["class_id"] for d in first.appeared} == {0, 56}
+    expected = ids(first)
+    assert len(set(expected.values())) == 2
+
+    for frame in range(1, 6):
+        # 缓慢移动、检测顺序变化都不影响编号
+        result = tracker.update([det(56, shifted(CHAIR, dx=-3 * frame)), det(0, shifted(PERSON, dx=5 * frame))])
+        assert ids(result) == expected
+        assert not result.changed
+        assert all(d["track_state"] == TRACKED for d in result.detections)
+    person = next(d for d in result.detections if d["class_id"] == 0)
+    assert person["track_age"] == 6
+    assert person["track_hits"] == 6
+    # 匀速右移，速度估计朝 +x
+    assert person["velocity"][0] > 0
+
+
+def test_new_track_needs_min_hits_after_first_frame():
+    tracker = ObjectTracker(min_hits=3)
+    tracker.update([det(0, PERSON)])
+
+    for _ in range(2):
+        result = tracker.update([det(0, PERSON), det(41, CHAIR)])
+        assert [d["class_id"] for d in result.detections] == [0]
+        assert not result.appeared
+
+    result = tracker.update([det(0, PERSON), det(41, CHAIR)])
+    assert [d["class_id"] for d in result.appeared] == [41]
+    assert {d["class_id"] for d in result.detections} == {0, 41}
+
+
+def test_unconfirmed_track_dropped_on_first_miss():
+    tracker = ObjectTracker(min_hits=2)
+    tracker.update([det(0, PERSON)])
+    tracker.update([det(0, PERSON), det(41, CHAIR)])
+    result = tracker.update([det(0, PERSON)])
+    assert not result.departed
+    assert len(tracker) == 1
+
+
+def test_lost_track_coasts_then_departs_after_max_lost():
+    tracker = ObjectTracker(max_lost=4, coast_frames=2)
+    track_id = tracker.update([det(0, PERSON)]).detections[0]["track_id"]
+
+    # 前 coast_frames 帧按预测位置继续输出，状态为 lost
+    for _ in range(2):
+        result = tracker.update([])
+        assert [d["track_id"] for d in result.detections] == [track_id]
+        assert result.detections[0]["track_state"] == LOST
+        assert not result.departed
+
+    # 滑行期后不再输出，但轨迹保留到连续漏检超过 max_lost
+    for _ in range(2):
+        result = tracker.update([])
+        assert result.detections == []
+        assert not result.departed
+    assert len(tracker) == 1
+
+    result = tracker.update([])
+    assert [d["track_id"] for d in result.departed] == [track_id]
+    assert result.departed[0]["track_state"] == LOST
+    assert len(tracker) == 0
+
+
+def test_low_confidence_detection_continues_tracked_track():
+    tracker = ObjectTracker(high_threshold=0.5)
+    track_id = tracker.update([det(0, PERSON)]).detections[0]["track_id"]
+
+    result = tracker.update([det(0, shifted(PERSON, dx=2), confidence=0.2)])
+    assert [d["track_id"] for d in result.detections] == [track_id]
+    assert result.detections[0]["track_state"] == TRACKED
+    assert result.detections[0]["track_hits"] == 2
+
+
+def test_low_confidence_detection_never_creates_or_revives_tracks():
+    tracker = ObjectTracker(high_threshold=0.5)
+    # 低置信度检测不新建轨迹
+    assert tracker.update([det(0, PERSON, confidence=0.2)]).detections == []
+    assert len(tracker) == 0
+
+    tracker = ObjectTracker(high_threshold=0.5)
+    track_id = tracker.update([det(0, PERSON)]).detections[0]["track_id"]
+    tracker.update([])
+    # 上一帧已经漏检的轨迹不参与第二轮匹配
+    result = tracker.update([det(0, PERSON, confidence=0.2)])
+    assert result.detections[0]["track_id"] == track_id
+    assert result.detections[0]["track_state"] == LOST
+    assert result.detections[0]["track_hits"] == 1
+
+
+def test_tracks_never_match_across_classes():
+    tracker = ObjectTracker(min_hits=2)
+    person_id = tracker.update([det(0, PERSON)]).detections[0]["track_id"]
+
+    # 同一位置换成另一类别：人按漏检处理，椅子新建（未确认）轨迹
+    result = tracker.update([det(56, PERSON)])
+    assert [(d["class_id"], d["track_id"], d["track_state"]) for d in result.detections] == [(0, person_id, LOST)]
+
+    result = tracker.update([det(56, PERSON)])
+    chair = next(d for d in result.detections if d["class_id"] == 56)
+    assert chair["track_id"] != person_id
+    assert [d["class_id"] for d in result.appeared] == [56]
+
+
+def test_tracks_match_by_name_without_class_id():
+    tracker = ObjectTracker()
+    first = tracker.update([{"class": "人", "confidence": 0.9, "bbox": PERSON}])
+    result = tracker.update([
+        {"class": "椅子", "confidence": 0.9, "bbox": PERSON},
+        {"class": "人", "confidence": 0.9, "bbox": shifted(PERSON, dx=2)},
+    ])
+    person = next(d for d in result.detections if d["class"] == "人")
+    assert person["track_id"] == first.detections[0]["track_id"]
+    assert person["track_state"] == TRACKED
+
+
+def test_reset_keeps_ids_increasing():
+    tracker = ObjectTracker()
+    first_id = tracker.update([det(0, PERSON)]).detections[0]["track_id"]
+    tracker.reset()
+    assert len(tracker) == 0 and tracker.frame_count == 0
+    result = tracker.update([det(0, PERSON)])
+    assert result.detections[0]["track_id"] > first_id
+    assert [d["class_id"] for d in result.appeared] == [0]
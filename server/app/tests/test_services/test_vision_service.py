@@ -0,0 +1,112 @@
+"""批量描述（VisionService.describe_batch 与 /vision/describe NDJSON 端点）测试"""
+
+import asyncio
+import json
+from collections import Counter
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import vision as vision_endpoint
+from app.core.config import settings
+from app.services import vision_service
+from app.services.admission import AdmissionController
+from app.services.vision_service import VisionService
+
+
+class FakeVisionModel:
+    def describe_batch(self, images):
+        results = []
+        for image in images:
+            if image == b"bad":
+                results.append({"error": "无法解码图像"})
+            else:
+                results.append({
+                    "detections": [{"class": "人", "confidence": 0.9, "bbox": [0, 0, 5, 5]}],
+                    "image_shape": (10, 10, 3),
+                    "inference_time": 0.001,
+                })
+        return results
+
+
+class FakePipeline:
+    """第 failing 张图像的语言生成在同组其他图像已出结果之后抛错"""
+
+    def __init__(self, failing=()):
+        self.vision_model = FakeVisionModel()
+        self.failing = {f"#{index}" for index in failing}
+
+    async def generate_text(self, detections, session_id, image_shape=None):
+        if any(session_id.endswith(suffix) for suffix in self.failing):
+            await asyncio.sleep(0.02)
+            raise RuntimeError("语言后端异常")
+        return {"content": "前方有一个人", "source": "llm", "language_time": 0.001}
+
+
+class ReadyRegistry:
+    async def wait_until_serving(self, timeout=None):
+        return None
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def make(pipeline):
+        # 每个 TestClient 有自己的事件循环，准入控制器不能跨循环复用
+        admission = AdmissionController(max_concurrent=4, max_queued=16, timeout=5.0)
+        monkeypatch.setattr(vision_service, "get_admission_controller", lambda: admission)
+        monkeypatch.setattr(vision_endpoint, "get_admission_controller", lambda: admission)
+        monkeypatch.setattr(vision_endpoint, "get_model_registry", lambda: ReadyRegistry())
+        monkeypatch.setattr(vision_endpoint, "get_vision_service", lambda: VisionService(pipeline=pipeline))
+        monkeypatch.setattr(settings.vision, "BATCH_SIZE", 3)
+        app = FastAPI()
+        app.include_router(vision_endpoint.router)
+        return TestClient(app)
+    return make
+
+
+def post_images(client, images):
+    files = [("files", (name, data, "image/jpeg")) for name, data in images]
+    response = client.post("/vision/describe", files=files)
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_every_image_gets_one_line(client):
+    images = [(f"{i}.jpg", b"bad" if i == 4 else b"jpeg") for i in range(7)]
+    lines = post_images(client(FakePipeline()), images)
+    assert sorted(line["index"] for line in lines) == list(range(7))
+    by_index = {line["index"]: line for line in lines}
+    assert by_index[4]["type"] == "error" and by_index[4]["code"] == "INVALID_IMAGE"
+    assert all(by_index[i]["type"] == "final_result" for i in range(7) if i != 4)
+    assert by_index[0]["filename"] == "0.jpg"
+
+
+def test_one_failing_description_only_fails_its_own_index(client):
+    images = [(f"{i}.jpg", b"jpeg") for i in range(7)]
+    lines = post_images(client(FakePipeline(failing=[1, 5])), images)
+
+    counts = Counter(line["index"] for line in lines)
+    assert counts == Counter(range(7))
+    errors = {line["index"]: line for line in lines if line["type"] == "error"}
+    assert set(errors) == {1, 5}
+    assert all(error["code"] == "LANGUAGE_PIPELINE_FAILURE" for error in errors.values())
+
+
+def test_vision_failure_fails_whole_chunk_once(client):
+    class BrokenVisionModel(FakeVisionModel):
+        def describe_batch(self, images):
+            if b"boom" in images:
+                raise RuntimeError("推理失败")
+            return super().describe_batch(images)
+
+    pipeline = FakePipeline()
+    pipeline.vision_model = BrokenVisionModel()
+    # batch_size=3：第二组（3~5）推理失败，其余组正常
+    images = [(f"{i}.jpg", b"boom" if i == 4 else b"jpeg") for i in range(7)]
+    lines = post_images(client(pipeline), images)
+
+    assert Counter(line["index"] for line in lines) == Counter(range(7))
+    failed = sorted(line["index"] for line in lines if line["type"] == "error")
+    assert failed == [3, 4, 5]
+    assert all(line["code"] == "VISION_FAILURE" for line in lines if line["type"] == "error")
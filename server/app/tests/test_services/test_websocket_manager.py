@@ -0,0 +1,184 @@
+"""WebSocket 连接管理（ManagedConnection 有界发送队列、WebSocketManager 上限与空闲回收）测试"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.websocket_manager import ConnectionLimitExceeded, ManagedConnection, WebSocketManager
+
+
+class FakeWebSocket:
+    """记录发送内容；blocked 时 send_text 挂起直到放行（模拟慢客户端）"""
+
+    def __init__(self, blocked=False):
+        self.client = SimpleNamespace(host="127.0.0.1", port=50000)
+        self.sent = []
+        self.closed_with = None
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        self.sent.append(json.loads(text))
+
+    async def close(self, code=1000, reason=""):
+        self.closed_with = (code, reason)
+
+
+def make_connection(websocket, **kwargs):
+    return ManagedConnection("c1", websocket, "/ws", **kwargs)
+
+
+def test_full_queue_drops_oldest_and_keeps_newest():
+    async def run():
+        websocket = FakeWebSocket(blocked=True)
+        conn = make_connection(websocket, send_queue_size=2)
+        results = [conn.enqueue({"n": n}) for n in range(4)]
+        depth, queued_bytes = conn.queue_depth, conn.queued_bytes
+        websocket.gate.set()
+        await conn._sender_task
+        return conn, websocket, results, depth, queued_bytes
+
+    conn, websocket, results, depth, queued_bytes = asyncio.run(run())
+    assert results == [True, True, False, False]
+    assert depth == 2
+    assert queued_bytes == 2 * len('{"n":0}')
+    assert websocket.sent == [{"n": 2}, {"n": 3}]
+    assert conn.stats.dropped == 2
+    assert conn.stats.frames_out == 2
+    assert conn.queued_bytes == 0 and conn.queue_depth == 0
+
+
+def test_send_json_preserves_order_with_queue():
+    async def run():
+        websocket = FakeWebSocket()
+        conn = make_connection(websocket)
+        conn.enqueue({"n": 1})
+        await conn.send_json({"n": 2})
+        await conn._sender_task
+        return websocket.sent
+
+    sent = asyncio.run(run())
+    assert sorted(m["n"] for m in sent) == [1, 2]
+
+
+def test_send_timeout_closes_connection():
+    async def run():
+        websocket = FakeWebSocket(blocked=True)
+        conn = make_connection(websocket, send_timeout=0.05)
+        conn.enqueue({"n": 1})
+        conn.enqueue({"n": 2})
+        await conn._sender_task
+        return conn, websocket
+
+    conn, websocket = asyncio.run(run())
+    assert conn.closed
+    assert websocket.closed_with == (1011, "send timeout")
+    # 超时的那条之后未发送的消息计入丢弃，队列清空
+    assert conn.stats.dropped == 1
+    assert conn.queue_depth == 0 and conn.queued_bytes == 0
+    assert conn.enqueue({"n": 3}) is False
+
+
+def test_close_is_idempotent_and_releases_attachments():
+    async def run():
+        websocket = FakeWebSocket()
+        conn = make_connection(websocket)
+        conn.attach(object())
+        await conn.close(code=1001, reason="bye")
+        await conn.close(code=1000)
+        return conn, websocket
+
+    conn, websocket = asyncio.run(run())
+    assert websocket.closed_with == (1001, "bye")
+    assert conn.attachments == []
+
+
+def test_stats_and_to_dict():
+    async def run():
+        conn = make_connection(FakeWebSocket(), session_id="s1")
+        conn.record_frame_in(100)
+        conn.record_frame_in(50)
+        conn.record_processing(0.25)
+        conn.record_frame_memory(4096)
+        conn.record_frame_memory(1024)
+        return conn.to_dict()
+
+    data = asyncio.run(run())
+    assert data["frames_in"] == 2 and data["bytes_in"] == 150
+    assert data["processing_time"] == 0.25
+    assert data["last_frame_bytes"] == 1024 and data["peak_frame_bytes"] == 4096
+    assert data["client_addr"] == "127.0.0.1:50000"
+    assert data["session_id"] == "s1"
+    assert "last_activity" not in data and data["idle_seconds"] >= 0
+
+
+def make_manager(**kwargs):
+    defaults = dict(max_connections=2, idle_timeout=0, idle_check_interval=1.0, send_queue_size=2, send_timeout=1.0)
+    return WebSocketManager(**{**defaults, **kwargs})
+
+
+def test_connection_limit():
+    async def run():
+        manager = make_manager()
+        await manager.connect("a", FakeWebSocket())
+        await manager.connect("b", FakeWebSocket(), endpoint="/ws/vision", session_id="s")
+        with pytest.raises(ConnectionLimitExceeded):
+            await manager.connect("c", FakeWebSocket())
+        snapshot = manager.snapshot()
+        await manager.disconnect("a")
+        await manager.connect("c", FakeWebSocket())
+        return manager, snapshot
+
+    manager, snapshot = asyncio.run(run())
+    assert snapshot["active"] == 2
+    assert snapshot["by_endpoint"] == {"/ws": 1, "/ws/vision": 1}
+    assert manager.total_rejected == 1
+    assert manager.total_accepted == 3
+    assert set(manager.active_connections) == {"b", "c"}
+
+
+def test_broadcast_slow_client_only_drops_its_own_messages():
+    async def run():
+        manager = make_manager(max_connections=3)
+        slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+        await manager.connect("slow", slow)
+        await manager.connect("fast", fast)
+        await manager.connect("other", FakeWebSocket(), endpoint="/ws/vision")
+        delivered = []
+        for n in range(4):
+            delivered.append(await manager.broadcast({"n": n}, endpoint="/ws"))
+            # 广播之间快客户端发完积压，慢客户端一直卡在第一条
+            await asyncio.sleep(0.01)
+        await manager.get("fast")._sender_task
+        slow_depth = manager.get("slow").queue_depth
+        snapshot = manager.snapshot()
+        await manager.close_all()
+        return delivered, fast, manager, slow_depth, snapshot
+
+    delivered, fast, manager, slow_depth, snapshot = asyncio.run(run())
+    # 慢客户端第一条卡在发送中、后两条排队，第四条挤掉最旧的排队消息；快客户端与其他端点不受影响
+    assert delivered == [2, 2, 2, 1]
+    assert [m["n"] for m in fast.sent] == [0, 1, 2, 3]
+    assert slow_depth == 2
+    assert snapshot["dropped"] == 1
+    assert manager.active_connections == {}
+
+
+def test_evict_idle():
+    async def run():
+        manager = make_manager(idle_timeout=0.05)
+        await manager.connect("idle", FakeWebSocket())
+        busy = await manager.connect("busy", FakeWebSocket())
+        await asyncio.sleep(0.1)
+        busy.touch()
+        evicted = await manager.evict_idle()
+        await manager.close_all()
+        return manager, evicted
+
+    manager, evicted = asyncio.run(run())
+    assert evicted == ["idle"]
+    assert manager.total_evicted == 1
@@ -0,0 +1,2 @@
+"""命令行工具包。"""
+
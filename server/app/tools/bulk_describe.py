@@ -0,0 +1,345 @@
+"""
+离线批量描述工具
+不启动服务器，直接对图片目录、通配符或视频文件批量运行 YOLOv8n（可选语言模型），
+结果按 JSONL 输出，每行附带各阶段耗时；支持进度显示与断点续跑。
+
+用法示例（在 server 目录下执行）：
+    python -m app.tools.bulk_describe captures/ -o out.jsonl
+    python -m app.tools.bulk_describe "captures/**/*.jpg" -o out.jsonl --batch-size 16 --workers 4
+    python -m app.tools.bulk_describe walk.mp4 -o walk.jsonl --frame-stride 15 --language
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v"}
+
+# 读取线程结束标记
+_END = object()
+
+
+@dataclass
+class FrameItem:
+    """读取线程产出的一帧/一张图像"""
+    key: str                       # 唯一键，用于断点续跑（图片为路径，视频帧为 路径#帧号）
+    source: str
+    frame_index: Optional[int]
+    image: np.ndarray              # RGB
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def expand_inputs(inputs: List[str]) -> List[str]:
+    """把目录 / 通配符 / 文件展开为有序的文件列表"""
+    paths: List[str] = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                for name in files:
+                    if Path(name).suffix.lower() in IMAGE_EXTENSIONS | VIDEO_EXTENSIONS:
+                        paths.append(os.path.join(root, name))
+        elif any(ch in item for ch in "*?["):
+            paths.extend(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            logger.warning(f"输入不存在，已跳过: {item}")
+    return sorted(dict.fromkeys(paths))
+
+
+def estimate_total(paths: List[str], frame_stride: int) -> int:
+    """估算待处理帧数（视频按帧数 / 步长估算），用于进度显示"""
+    total = 0
+    for path in paths:
+        if Path(path).suffix.lower() in VIDEO_EXTENSIONS:
+            cap = cv2.VideoCapture(path)
+            frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            cap.release()
+            total += (frames + frame_stride - 1) // frame_stride if frames > 0 else 0
+        else:
+            total += 1
+    return total
+
+
+def iter_frames(paths: List[str], frame_stride: int, done: Set[str]) -> Iterator[FrameItem]:
+    """逐个解码图像 / 视频帧，跳过检查点中已完成的键"""
+    for path in paths:
+        if Path(path).suffix.lower() in VIDEO_EXTENSIONS:
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                logger.warning(f"无法打开视频，已跳过: {path}")
+                continue
+            frame_index = -1
+            try:
+                while True:
+                    start = time.time()
+                    # 不需要的帧只 grab 不 retrieve，避免无谓的解码开销
+                    if not cap.grab():
+                        break
+                    frame_index += 1
+                    key = f"{path}#{frame_index}"
+                    if frame_index % frame_stride != 0 or key in done:
+                        continue
+                    ok, frame = cap.retrieve()
+                    if not ok:
+                        continue
+                    image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    yield FrameItem(key, path, frame_index, image, {"decode": time.time() - start})
+            finally:
+                cap.release()
+        else:
+            if path in done:
+                continue
+            start = time.time()
+            frame = cv2.imread(path, cv2.IMREAD_COLOR)
+            if frame is None:
+                logger.warning(f"无法解码图像，已跳过: {path}")
+                continue
+            image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            yield FrameItem(path, path, None, image, {"decode": time.time() - start})
+
+
+def reader_thread(paths: List[str], frame_stride: int, done: Set[str], out_queue: "queue.Queue") -> None:
+    """读取线程：解码结果放入有界队列，队列满时阻塞以限制内存占用"""
+    try:
+        for item in iter_frames(paths, frame_stride, done):
+            out_queue.put(item)
+    except Exception as e:
+        logger.error(f"读取线程异常: {e}", exc_info=True)
+    finally:
+        out_queue.put(_END)
+
+
+class Checkpoint:
+    """断点文件：每行一个已完成的键，追加写入"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        self._file = open(path, "a", encoding="utf-8")
+
+    def mark(self, keys: List[str]) -> None:
+        self._file.write("".join(f"{key}\n" for key in keys))
+        self._file.flush()
+        self.done.update(keys)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class Progress:
+    """向 stderr 输出进度（处理数、吞吐、预计剩余时间）"""
+
+    def __init__(self, total: int, already_done: int, enabled: bool = True, interval: float = 1.0):
+        self.total = total
+        self.already_done = already_done
+        self.enabled = enabled
+        self.interval = interval
+        self.count = 0
+        self.start = time.time()
+        self._last = 0.0
+
+    def update(self, n: int, force: bool = False) -> None:
+        self.count += n
+        now = time.time()
+        if not self.enabled or (not force and now - self._last < self.interval):
+            return
+        self._last = now
+        elapsed = max(now - self.start, 1e-6)
+        rate = self.count / elapsed
+        done = self.already_done + self.count
+        if self.total > 0:
+            remaining = max(self.total - done, 0)
+            eta = remaining / rate if rate > 0 else float("inf")
+            msg = f"\r[{done}/{self.total}] {done * 100 / self.total:5.1f}% | {rate:6.1f} 帧/s | 剩余约 {eta:6.0f}s"
+        else:
+            msg = f"\r[{done}] {rate:6.1f} 帧/s"
+        sys.stderr.write(msg)
+        sys.stderr.flush()
+
+    def finish(self) -> None:
+        if self.enabled:
+            self.update(0, force=True)
+            sys.stderr.write("\n")
+
+
+def build_vision_model(args):
+    """按命令行参数（缺省取 app.yaml）构建 YOLOv8n 适配器"""
+    from app.core.config import settings
+    from app.services.ai_models.vision import YOLOv8nAdapter
+
+    return YOLOv8nAdapter(
+        model_path=args.model_path or settings.vision.YOLO_MODEL_PATH,
+        use_onnx=settings.vision.YOLO_USE_ONNX,
+        confidence_threshold=(
+            args.confidence if args.confidence is not None else settings.vision.YOLO_CONFIDENCE_THRESHOLD
+        ),
+        iou_threshold=settings.vision.YOLO_IOU_THRESHOLD,
+    )
+
+
+def process_batch(vision_model, pipeline, items: List[FrameItem]) -> List[Dict]:
+    """工作线程：批量检测，可选生成描述，返回 JSONL 记录"""
+    timings: Dict[str, float] = {}
+    batch_start = time.time()
+    detections_list = vision_model.detect_batch([item.image for item in items], timings)
+    n = len(items)
+
+    records = []
+    for item, detections in zip(items, detections_list):
+        record = {
+            "key": item.key,
+            "source": item.source,
+            "frame_index": item.frame_index,
+            "image_shape": list(item.image.shape[:2]),
+            "batch_size": n,
+            "detections": detections,
+            "detection_count": len(detections),
+            # 批次阶段耗时按图像均摊
+            "timings": {
+                "decode": round(item.timings.get("decode", 0.0), 6),
+                **{stage: round(seconds / n, 6) for stage, seconds in timings.items()},
+            },
+        }
+        records.append(record)
+
+    if pipeline is not None:
+        async def describe_all():
+            return await asyncio.gather(*[
+                pipeline.generate_text(record["detections"], record["key"], record["image_shape"]) for record in records
+            ])
+
+        texts = asyncio.run(describe_all())
+        for record, text in zip(records, texts):
+            record["description"] = text["content"]
+            record["language_source"] = text["source"]
+            record["timings"]["language"] = round(text["language_time"], 6)
+
+    batch_time = time.time() - batch_start
+    for record in records:
+        record["timings"]["batch_total"] = round(batch_time, 6)
+    return records
+
+
+def run(args) -> int:
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        print("未找到任何可处理的图像或视频", file=sys.stderr)
+        return 1
+
+    checkpoint_path = args.checkpoint or f"{args.output}.ckpt"
+    if args.restart:
+        for path in (args.output, checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+    checkpoint = Checkpoint(checkpoint_path)
+    if checkpoint.done:
+        print(f"从断点继续：已完成 {len(checkpoint.done)} 项（{checkpoint_path}）", file=sys.stderr)
+
+    vision_model = build_vision_model(args)
+    pipeline = None
+    if args.language:
+        from app.services.ai_models.pipelines import VisionToTextPipeline
+        pipeline = VisionToTextPipeline(vision_model=vision_model)
+
+    total = estimate_total(paths, args.frame_stride) if not args.no_progress else 0
+    progress = Progress(total, len(checkpoint.done), enabled=not args.no_progress)
+
+    frames: "queue.Queue" = queue.Queue(maxsize=args.batch_size * args.workers * 2)
+    reader = threading.Thread(
+        target=reader_thread,
+        args=(paths, args.frame_stride, set(checkpoint.done), frames),
+        name="bulk-reader",
+        daemon=True,
+    )
+    reader.start()
+
+    output = open(args.output, "a", encoding="utf-8")
+    pending: List[Future] = []
+
+    def drain(block_until: int) -> None:
+        # 按提交顺序写出已完成的批次，限制同时在途的批次数
+        while pending and (len(pending) > block_until or pending[0].done()):
+            records = pending.pop(0).result()
+            for record in records:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            # 先落盘结果再记检查点：崩溃时最多重复处理一个批次，不会遗漏
+            checkpoint.mark([record["key"] for record in records])
+            progress.update(len(records))
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="bulk-worker") as executor:
+            batch: List[FrameItem] = []
+            while True:
+                item = frames.get()
+                if item is _END:
+                    break
+                batch.append(item)
+                if len(batch) >= args.batch_size:
+                    pending.append(executor.submit(process_batch, vision_model, pipeline, batch))
+                    batch = []
+                    drain(block_until=args.workers)
+            if batch:
+                pending.append(executor.submit(process_batch, vision_model, pipeline, batch))
+            drain(block_until=0)
+    except KeyboardInterrupt:
+        print("\n已中断，可使用相同参数重新运行以从断点继续", file=sys.stderr)
+        return 130
+    finally:
+        progress.finish()
+        output.close()
+        checkpoint.close()
+
+    print(f"完成：本次处理 {progress.count} 项，结果写入 {args.output}", file=sys.stderr)
+    return 0
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="离线批量描述图片目录 / 通配符 / 视频文件")
+    parser.add_argument("inputs", nargs="+", help="图片目录、通配符（需加引号）或视频文件，可传多个")
+    parser.add_argument("-o", "--output", required=True, help="输出 JSONL 文件路径（追加写入）")
+    parser.add_argument("--checkpoint", help="断点文件路径，默认 <output>.ckpt")
+    parser.add_argument("--restart", action="store_true", help="忽略已有输出与断点，从头开始")
+    parser.add_argument("--batch-size", type=int, default=8, help="单次推理的图像数（默认 8）")
+    parser.add_argument("--workers", type=int, default=max(1, min(4, (os.cpu_count() or 2) // 2)),
+                        help="推理工作线程数")
+    parser.add_argument("--frame-stride", type=int, default=1, help="视频每隔 N 帧取一帧（默认 1）")
+    parser.add_argument("--model-path", help="YOLO 模型路径，默认取 app.yaml")
+    parser.add_argument("--confidence", type=float, help="置信度阈值，默认取 app.yaml")
+    parser.add_argument("--language", action="store_true", help="同时运行语言模型生成描述（按 app.yaml 的 language.mode）")
+    parser.add_argument("--no-progress", action="store_true", help="不输出进度")
+    args = parser.parse_args(argv)
+    args.batch_size = max(1, args.batch_size)
+    args.workers = max(1, args.workers)
+    args.frame_stride = max(1, args.frame_stride)
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    return run(parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
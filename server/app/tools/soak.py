@@ -0,0 +1,479 @@
+"""
+内存浸泡测试
+模拟用户反复连接、发送若干帧、断开，累计处理数千帧，期间定期采样 RSS，
+预热结束后内存增长超过阈值即以非零状态码退出，用于发现逐帧分配或会话级状态的泄漏。
+
+默认在本进程内启动完整服务端（uvicorn + 生成的微型 ONNX 模型 + 子进程桩 LLM），完全离线；
+客户端只保留计数，不随帧数增长，因此进程 RSS 的变化即服务端的变化。
+也可以用 --url 对已运行的服务端做浸泡，此时通过 /api/v1/admin/memory 读取其 RSS（需要管理员令牌）。
+
+判定（预热之后的采样点）：
+- 增长：末尾 3 个采样点 RSS 中位数 - 开头 3 个采样点 RSS 中位数 <= --max-growth-mb
+- 斜率：RSS 对已处理帧数的最小二乘斜率 <= --max-slope-mb（MB / 1000 帧）；
+  预热后不足 1000 帧时分配器的阶梯式增长会让斜率失真，此时只判定增长
+- 结束后（仅进程内模式）：没有残留的连接（线程数变化只报告：默认线程池的工作线程会常驻）
+
+--tracemalloc 会让服务端慢一个数量级，帧数应相应减少。
+
+用法（在 server 目录下执行）：
+    python -m app.tools.soak                                   # 3000 帧，并发 8，混合端点
+    python -m app.tools.soak --frames 10000 --endpoints vision,stream --tracemalloc
+    python -m app.tools.soak --url http://127.0.0.1:8000 --admin-token $ADMIN_TOKEN --frames 20000
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+ENDPOINTS = ("vision", "vision_json", "ws", "stream")
+
+# 预热后跨度不少于此帧数时才判定斜率
+SLOPE_MIN_FRAMES = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class SoakCounters:
+    """全局计数（固定大小）"""
+
+    def __init__(self, total_frames: int):
+        self.total_frames = total_frames
+        self.started = 0
+        self.completed = 0
+        self.errors = 0
+        self.sessions = 0
+
+    def claim(self, count: int = 1) -> int:
+        """领取最多 count 帧的配额，返回实际领取数"""
+        granted = max(0, min(count, self.total_frames - self.started))
+        self.started += granted
+        return granted
+
+
+class SoakClient:
+    """一个模拟用户：循环“连接 -> 发送若干帧 -> 断开”，直到总帧数用完"""
+
+    def __init__(self, index: int, endpoint: str, images: List[bytes], args: argparse.Namespace, counters: SoakCounters):
+        self.index = index
+        self.endpoint = endpoint
+        self.images = images
+        self.args = args
+        self.counters = counters
+        self._image_index = index
+
+    def _next_image(self) -> bytes:
+        image = self.images[self._image_index % len(self.images)]
+        self._image_index += 1
+        return image
+
+    def _url(self, session_id: str) -> str:
+        base = self.args.ws_url.rstrip("/")
+        if self.endpoint == "ws":
+            return f"{base}/ws"
+        if self.endpoint == "stream":
+            return f"{base}/ws/vision/stream/{session_id}?format=mjpeg"
+        return f"{base}/ws/vision/{session_id}"
+
+    async def _wait_final(self, ws) -> bool:
+        """等待一帧的最终结果；返回是否成功"""
+        while True:
+            raw = await asyncio.wait_for(ws.recv(), timeout=self.args.request_timeout)
+            if isinstance(raw, bytes):
+                continue
+            message = json.loads(raw)
+            kind = message.get("eventType") if self.endpoint == "ws" else message.get("type")
+            if kind in ("final_result", "result"):
+                return True
+            if kind == "error":
+                return False
+
+    async def _run_session(self, frames: int) -> None:
+        import websockets
+
+        session_id = f"soak_{uuid.uuid4().hex[:8]}_{self.index}"
+        async with websockets.connect(self._url(session_id), max_size=None, open_timeout=10) as ws:
+            self.counters.sessions += 1
+            if self.endpoint == "stream":
+                await self._run_stream(ws, frames)
+                return
+            if self.endpoint == "ws":
+                # /ws 连接建立后先收到 connection 消息
+                await asyncio.wait_for(ws.recv(), timeout=self.args.request_timeout)
+            for _ in range(frames):
+                image = self._next_image()
+                if self.endpoint == "vision":
+                    await ws.send(image)
+                elif self.endpoint == "vision_json":
+                    await ws.send(json.dumps({"image": base64.b64encode(image).decode("ascii")}))
+                else:
+                    now_ms = int(time.time() * 1000)
+                    await ws.send(json.dumps({
+                        "eventType": "image_data",
+                        "data": {"imageData": base64.b64encode(image).decode("ascii"), "sessionId": session_id, "format": "base64"},
+                        "timestamp": now_ms,
+                        "sessionId": session_id,
+                    }))
+                try:
+                    ok = await self._wait_final(ws)
+                except asyncio.TimeoutError:
+                    ok = False
+                if ok:
+                    self.counters.completed += 1
+                else:
+                    self.counters.errors += 1
+
+    async def _run_stream(self, ws, frames: int) -> None:
+        """推送 MJPEG 帧（按 --stream-fps 节奏）后发送 end，服务端处理完剩余帧后关闭连接"""
+        interval = 1.0 / self.args.stream_fps
+        for _ in range(frames):
+            await ws.send(self._next_image())
+            await asyncio.sleep(interval)
+        await ws.send(json.dumps({"type": "end"}))
+        try:
+            async for _ in ws:
+                pass
+        except Exception:
+            pass
+        # 视频流按服务端抽帧处理，推送的帧都计为完成
+        self.counters.completed += frames
+
+    async def run(self) -> None:
+        while True:
+            frames = self.counters.claim(self.args.frames_per_session)
+            if frames == 0:
+                return
+            try:
+                await self._run_session(frames)
+            except Exception as e:
+                self.counters.errors += 1
+                logger.warning(f"客户端 {self.index} 会话失败: {type(e).__name__}: {e}")
+
+
+# ========= 内存读取 =========
+
+class LocalMemoryProbe:
+    """进程内模式：直接读取本进程的内存监控"""
+
+    def __init__(self):
+        from app.services.memory import get_memory_monitor
+        self.monitor = get_memory_monitor()
+
+    async def read(self) -> Dict[str, Any]:
+        return self.monitor.sample()
+
+    async def take_snapshot(self, label: str) -> Optional[int]:
+        return self.monitor.take_snapshot(label)["id"]
+
+    async def diff(self, base: int, limit: int) -> Dict[str, Any]:
+        return self.monitor.diff(base, limit=limit)
+
+
+class RemoteMemoryProbe:
+    """远程模式：通过管理接口读取服务端的内存"""
+
+    def __init__(self, url: str, token: str):
+        self.url = url.rstrip("/") + "/api/v1/admin/memory"
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+    async def _request(self, method: str, path: str = "", **params) -> Dict[str, Any]:
+        import requests
+
+        response = await asyncio.to_thread(
+            requests.request, method, self.url + path, headers=self.headers, params=params, timeout=30,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def read(self) -> Dict[str, Any]:
+        return (await self._request("GET", top=0, history=0))["current"]
+
+    async def take_snapshot(self, label: str) -> Optional[int]:
+        return (await self._request("POST", "/snapshots", label=label))["id"]
+
+    async def diff(self, base: int, limit: int) -> Dict[str, Any]:
+        return await self._request("GET", "/diff", base=base, limit=limit)
+
+
+# ========= 判定 =========
+
+def evaluate(samples: List[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    """对预热之后的采样点判定内存是否平稳"""
+    steady = [s for s in samples if s["frames"] >= args.warmup_frames and s["rss"] is not None]
+    if len(steady) < 4:
+        return {"ok": None, "reason": f"预热后的采样点不足（{len(steady)} 个），请增加 --frames 或减小 --sample-every"}
+    head = statistics.median(s["rss"] for s in steady[:3]) / 1048576
+    tail = statistics.median(s["rss"] for s in steady[-3:]) / 1048576
+    xs = [s["frames"] / 1000 for s in steady]
+    ys = [s["rss"] / 1048576 for s in steady]
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    denominator = sum((x - mean_x) ** 2 for x in xs)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / denominator if denominator else 0.0
+    failures = []
+    if tail - head > args.max_growth_mb:
+        failures.append(f"RSS 增长 {tail - head:.1f}MB > {args.max_growth_mb}MB")
+    if steady[-1]["frames"] - steady[0]["frames"] >= SLOPE_MIN_FRAMES and slope > args.max_slope_mb:
+        failures.append(f"RSS 斜率 {slope:.2f}MB/千帧 > {args.max_slope_mb}MB/千帧")
+    blocks = [s["allocated_blocks"] for s in steady]
+    return {
+        "ok": not failures,
+        "failures": failures,
+        "samples": len(steady),
+        "rss_start_mb": round(head, 1),
+        "rss_end_mb": round(tail, 1),
+        "rss_growth_mb": round(tail - head, 1),
+        "rss_slope_mb_per_1k_frames": round(slope, 3),
+        "allocated_blocks_growth": blocks[-1] - blocks[0],
+    }
+
+
+# ========= 进程内服务端 =========
+
+async def start_local_server(args: argparse.Namespace):
+    """在本事件循环中启动完整服务端（微型模型 + 桩 LLM），返回 (uvicorn.Server, serve 任务, 桩 LLM 子进程)"""
+    import uvicorn
+
+    from app.benchmarks.common import free_port, resolve_model, start_stub_llm
+    from app.core.config import settings
+
+    model_path, synthetic = resolve_model(args.model, force_tiny=args.model is None, tiny_detections=args.detections)
+    settings.vision.YOLO_MODEL_PATH = model_path
+    settings.vision.YOLO_USE_ONNX = True
+    stub = None
+    if args.language == "stub":
+        stub, base_url = await asyncio.to_thread(start_stub_llm, args.stub_ttft, args.stub_tokens_per_sec)
+        settings.language.MODE = "qwen_local"
+        settings.language.QWEN_BASE_URL = base_url
+    else:
+        settings.language.MODE = "template"
+
+    from app.main import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="on"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            if stub is not None:
+                stub.terminate()
+            raise RuntimeError("服务端启动失败")
+        await asyncio.sleep(0.1)
+    # 模型在后台加载，就绪后再开始发送，避免预热期间的 WARMING_UP 回复计入错误
+    from app.services.model_registry import get_model_registry
+    await get_model_registry().wait_until_serving(timeout=300)
+    args.ws_url = f"ws://127.0.0.1:{port}"
+    sys.stderr.write(
+        f"服务端已启动: {args.ws_url}（模型 {'微型' if synthetic else model_path}，语言 {args.language}）\n"
+    )
+    return server, task, stub
+
+
+def load_images(args: argparse.Namespace) -> List[bytes]:
+    from app.benchmarks.common import encode_jpeg, synthetic_image
+
+    # 移动端上传前压缩为最大 1920x1080、质量 0.7 的 JPEG；不同图像避免命中结果缓存
+    return [encode_jpeg(synthetic_image(1920, 1080, seed=i), quality=70) for i in range(args.images)]
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    endpoints = args.endpoints.split(",")
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"未知的端点: {sorted(unknown)}，可选: {', '.join(ENDPOINTS)}")
+
+    server = task = stub = None
+    if args.url:
+        if not args.admin_token:
+            raise ValueError("远程模式需要管理员令牌（--admin-token 或环境变量 ADMIN_TOKEN）")
+        args.ws_url = args.url.replace("http://", "ws://").replace("https://", "wss://")
+        probe = RemoteMemoryProbe(args.url, args.admin_token)
+    else:
+        server, task, stub = await start_local_server(args)
+        probe = LocalMemoryProbe()
+
+    images = load_images(args)
+    counters = SoakCounters(args.frames)
+    threads_before = threading.active_count()
+    samples: List[Dict[str, Any]] = []
+    snapshot_id: Optional[int] = None
+    tracemalloc_diff = None
+
+    async def sampler() -> None:
+        nonlocal snapshot_id
+        next_at = 0
+        while True:
+            done = counters.completed + counters.errors
+            if done >= next_at:
+                reading = await probe.read()
+                samples.append({
+                    "frames": done,
+                    "time": time.time(),
+                    "rss": reading.get("rss"),
+                    "allocated_blocks": reading.get("allocated_blocks"),
+                    "sessions": reading.get("sessions"),
+                })
+                rss = reading.get("rss")
+                sys.stderr.write(
+                    f"帧 {done:>7}/{args.frames}  会话 {counters.sessions:>5}  错误 {counters.errors:>4}  "
+                    f"RSS {rss / 1048576 if rss else float('nan'):8.1f} MB\n"
+                )
+                if args.tracemalloc and snapshot_id is None and done >= args.warmup_frames:
+                    snapshot_id = await probe.take_snapshot("soak-warmup")
+                next_at += args.sample_every
+            if done >= args.frames:
+                return
+            await asyncio.sleep(0.2)
+
+    start = time.monotonic()
+    sampler_task = asyncio.create_task(sampler())
+    try:
+        clients = [
+            SoakClient(i, endpoints[i % len(endpoints)], images, args, counters)
+            for i in range(args.concurrency)
+        ]
+        await asyncio.gather(*(client.run() for client in clients))
+        # 采样任务在帧数用完后自行结束（出错导致帧数不足时直接取消）
+        await asyncio.sleep(0.5)
+        if not sampler_task.done():
+            sampler_task.cancel()
+        final = await probe.read()
+        samples.append({
+            "frames": counters.completed + counters.errors,
+            "time": time.time(),
+            "rss": final.get("rss"),
+            "allocated_blocks": final.get("allocated_blocks"),
+            "sessions": final.get("sessions"),
+        })
+        if snapshot_id is not None:
+            tracemalloc_diff = await probe.diff(snapshot_id, args.tracemalloc_top)
+    finally:
+        if not sampler_task.done():
+            sampler_task.cancel()
+
+    elapsed = time.monotonic() - start
+    verdict = evaluate(samples, args)
+
+    leftovers: Dict[str, Any] = {}
+    if server is not None:
+        from app.services.websocket_manager import get_ws_manager
+
+        # 给服务端一点时间清理刚断开的连接与解码线程
+        await asyncio.sleep(1.0)
+        leftovers = {
+            "connections": len(get_ws_manager().active_connections),
+            "threads": threading.active_count() - threads_before,
+        }
+        if leftovers["connections"]:
+            verdict.setdefault("failures", []).append(f"残留 {leftovers['connections']} 个连接")
+            verdict["ok"] = False
+        server.should_exit = True
+        await task
+    if stub is not None:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+    return {
+        "tool": "soak",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "pid": os.getpid(),
+        "config": {
+            "frames": args.frames,
+            "concurrency": args.concurrency,
+            "frames_per_session": args.frames_per_session,
+            "endpoints": endpoints,
+            "warmup_frames": args.warmup_frames,
+            "language": None if args.url else args.language,
+            "target": args.url or "in-process",
+        },
+        "elapsed": round(elapsed, 1),
+        "frames_completed": counters.completed,
+        "frames_failed": counters.errors,
+        "sessions": counters.sessions,
+        "verdict": verdict,
+        "leftovers": leftovers,
+        "tracemalloc_diff": tracemalloc_diff,
+        "samples": samples,
+    }
+
+
+def print_summary(result: Dict[str, Any]) -> None:
+    verdict = result["verdict"]
+    sys.stderr.write(
+        f"\n{result['frames_completed']} 帧完成，{result['frames_failed']} 帧失败，"
+        f"{result['sessions']} 个会话，耗时 {result['elapsed']}s\n"
+    )
+    if verdict.get("ok") is None:
+        sys.stderr.write(f"无法判定: {verdict['reason']}\n")
+        return
+    sys.stderr.write(
+        f"预热后 RSS {verdict['rss_start_mb']}MB -> {verdict['rss_end_mb']}MB（{verdict['rss_growth_mb']:+}MB），"
+        f"斜率 {verdict['rss_slope_mb_per_1k_frames']:+}MB/千帧，Python 分配块 {verdict['allocated_blocks_growth']:+}\n"
+    )
+    if result["leftovers"]:
+        sys.stderr.write(f"结束后残留: 连接 {result['leftovers']['connections']}，线程 {result['leftovers']['threads']:+}\n")
+    diff = result.get("tracemalloc_diff")
+    if diff:
+        sys.stderr.write(f"\ntracemalloc 预热后增长最多的位置（合计 {diff['size_diff_total'] / 1024:+.1f} KiB）:\n")
+        for entry in diff["top"]:
+            sys.stderr.write(f"  {entry['size_diff'] / 1024:+10.1f} KiB  {entry['count_diff']:+7}  {entry['where']}\n")
+    sys.stderr.write("内存平稳\n" if verdict["ok"] else f"内存未平稳: {'; '.join(verdict['failures'])}\n")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="内存浸泡测试：反复连接断开并处理数千帧，断言内存平稳")
+    parser.add_argument("--frames", type=int, default=3000, help="总帧数（默认 3000）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时在线的模拟用户数（默认 8）")
+    parser.add_argument("--frames-per-session", type=int, default=20, help="每个会话发送的帧数，之后断开重连（默认 20）")
+    parser.add_argument("--endpoints", default="vision,vision_json,ws,stream",
+                        help=f"模拟用户使用的端点，按用户轮流分配（{', '.join(ENDPOINTS)}）")
+    parser.add_argument("--warmup-frames", type=int, default=500, help="预热帧数，之后的采样才参与判定（默认 500）")
+    parser.add_argument("--sample-every", type=int, default=100, help="每处理多少帧采样一次内存（默认 100）")
+    parser.add_argument("--max-growth-mb", type=float, default=25.0, help="预热后允许的 RSS 增长（MB，默认 25）")
+    parser.add_argument("--max-slope-mb", type=float, default=5.0, help="允许的 RSS 斜率（MB/千帧，默认 5）")
+    parser.add_argument("--tracemalloc", action="store_true", help="预热后拍摄 tracemalloc 快照，结束时输出增长最多的位置")
+    parser.add_argument("--tracemalloc-top", type=int, default=15, help="输出的位置数（默认 15）")
+    parser.add_argument("--images", type=int, default=8, help="轮流发送的合成图像数（默认 8）")
+    parser.add_argument("--stream-fps", type=float, default=10.0, help="stream 端点的推帧速率（默认 10）")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="单帧等待结果的超时（秒，默认 30）")
+    # 进程内模式
+    parser.add_argument("--model", help="ONNX 模型路径（默认生成微型模型）")
+    parser.add_argument("--detections", type=int, default=3, help="微型模型每帧产生的检测数（默认 3）")
+    parser.add_argument("--language", choices=("stub", "template"), default="stub", help="语言后端（默认 stub：子进程桩 LLM）")
+    parser.add_argument("--stub-ttft", type=float, default=0.05, help="桩 LLM 首 token 延迟（秒，默认 0.05）")
+    parser.add_argument("--stub-tokens-per-sec", type=float, default=0.0, help="桩 LLM 生成速度（默认 0：瞬间生成）")
+    # 远程模式
+    parser.add_argument("--url", help="对已运行的服务端做浸泡（如 http://127.0.0.1:8000），不在本进程启动服务端")
+    parser.add_argument("--admin-token", default=os.getenv("ADMIN_TOKEN"), help="远程模式的管理员令牌（默认取环境变量 ADMIN_TOKEN）")
+    parser.add_argument("-o", "--output", help="结果 JSON 输出路径（含全部采样点）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # 逐帧 INFO 日志会淹没进度输出
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("app").setLevel(logging.WARNING)
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    result = asyncio.run(run(args))
+    print_summary(result)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(json.dumps(result, ensure_ascii=False, indent=2) + "\n")
+        sys.stderr.write(f"结果已写入 {args.output}\n")
+    verdict = result["verdict"]
+    if verdict.get("ok") is None:
+        return 2
+    return 0 if verdict["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+视频流推送测试工具
+把本地视频文件按实时速度推送到 /ws/vision/stream/{session_id}，模拟移动端“实时引导”模式，
+并打印服务端返回的描述结果与抽帧统计。
+
+- mjpeg：逐帧解码后重新编码为 JPEG 推送（与移动端逐帧上传一致）
+- h264：直接按码率推送文件原始字节（H.264 裸流、MPEG-TS、MP4 等 FFmpeg 可流式读取的格式）
+
+用法示例（在 server 目录下执行，需先启动服务器）：
+    python -m app.tools.stream_video walk.mp4
+    python -m app.tools.stream_video walk.mp4 --format h264 --speed 2
+    python -m app.tools.stream_video walk.mp4 --url ws://192.168.1.10:8000 --chunk-size 4096
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from typing import AsyncIterator
+
+import cv2
+
+
+async def iter_mjpeg(path: str, speed: float, quality: int, max_width: int) -> AsyncIterator[bytes]:
+    """按视频帧率逐帧产出 JPEG 数据"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise SystemExit(f"无法打开视频: {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    frame_interval = 1.0 / (fps * speed)
+    start = time.monotonic()
+    index = 0
+    try:
+        while True:
+            ok, frame = await asyncio.to_thread(cap.read)
+            if not ok:
+                break
+            height, width = frame.shape[:2]
+            if max_width and width > max_width:
+                frame = cv2.resize(frame, (max_width, int(height * max_width / width)), interpolation=cv2.INTER_AREA)
+            ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if ok:
+                yield jpeg.tobytes()
+            index += 1
+            delay = start + index * frame_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+    finally:
+        cap.release()
+
+
+async def iter_raw(path: str, speed: float, chunk_size: int) -> AsyncIterator[bytes]:
+    """按视频平均码率分片产出文件原始字节"""
+    cap = cv2.VideoCapture(path)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+    frame_count = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+    cap.release()
+    total = os.path.getsize(path)
+    duration = frame_count / fps if frame_count > 0 else 0
+    bytes_per_second = total / duration * speed if duration > 0 else float("inf")
+    start = time.monotonic()
+    sent = 0
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+            sent += len(chunk)
+            delay = start + sent / bytes_per_second - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+
+async def run(args: argparse.Namespace) -> int:
+    import websockets
+
+    session_id = args.session_id or f"stream_{uuid.uuid4().hex[:8]}"
+    url = f"{args.url.rstrip('/')}/ws/vision/stream/{session_id}?format={args.format}"
+    print(f"连接 {url}", file=sys.stderr)
+
+    async with websockets.connect(url, max_size=None) as ws:
+        done = asyncio.Event()
+        stats = {}
+
+        async def receiver() -> None:
+            async for raw in ws:
+                message = json.loads(raw)
+                message_type = message.get("type")
+                if message_type == "final_result":
+                    print(
+                        f"[帧 {message.get('frame_index')} | {message.get('reason')} | "
+                        f"变化 {message.get('motion', 0):.3f} | 视觉 {message.get('vision_time', 0):.3f}s] "
+                        f"{message.get('content')}"
+                    )
+                elif message_type == "error":
+                    print(f"错误: {message.get('content')}", file=sys.stderr)
+                elif message_type == "stream_stats":
+                    stats.update(message.get("data", {}))
+                    done.set()
+                elif args.verbose:
+                    print(json.dumps(message, ensure_ascii=False))
+
+        receive_task = asyncio.create_task(receiver())
+
+        start = time.monotonic()
+        if args.format == "mjpeg":
+            source = iter_mjpeg(args.video, args.speed, args.quality, args.max_width)
+        else:
+            source = iter_raw(args.video, args.speed, args.chunk_size)
+        async for data in source:
+            # MJPEG 帧也可以按 chunk_size 切分，验证服务端的帧拆分
+            if args.format == "mjpeg" and args.chunk_size:
+                for offset in range(0, len(data), args.chunk_size):
+                    await ws.send(data[offset:offset + args.chunk_size])
+            else:
+                await ws.send(data)
+
+        await ws.send(json.dumps({"type": "end"}))
+        try:
+            await asyncio.wait_for(done.wait(), timeout=args.drain_timeout)
+        except asyncio.TimeoutError:
+            print("等待服务端统计超时", file=sys.stderr)
+        receive_task.cancel()
+
+    elapsed = time.monotonic() - start
+    print(f"推流结束，耗时 {elapsed:.1f}s", file=sys.stderr)
+    if stats:
+        print(json.dumps(stats, ensure_ascii=False, indent=2), file=sys.stderr)
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="把本地视频文件推送到连续视频流端点")
+    parser.add_argument("video", help="本地视频文件路径")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000", help="服务器地址（默认 ws://127.0.0.1:8000）")
+    parser.add_argument("--session-id", help="会话 ID（默认随机生成）")
+    parser.add_argument("--format", choices=["mjpeg", "h264"], default="mjpeg", help="推流格式（默认 mjpeg）")
+    parser.add_argument("--speed", type=float, default=1.0, help="播放倍速（默认 1.0 实时）")
+    parser.add_argument("--quality", type=int, default=70, help="MJPEG 的 JPEG 质量（默认 70，与移动端一致）")
+    parser.add_argument("--max-width", type=int, default=640, help="MJPEG 帧最大宽度，0 表示不缩放（默认 640）")
+    parser.add_argument("--chunk-size", type=int, default=64 * 1024, help="单条消息最大字节数（默认 64KB）")
+    parser.add_argument("--drain-timeout", type=float, default=30.0, help="推流结束后等待剩余结果的秒数")
+    parser.add_argument("-v", "--verbose", action="store_true", help="打印所有服务端消息")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        return asyncio.run(run(args))
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+"""
+OpenAI 兼容的本地桩 LLM 服务
+实现 /v1/chat/completions（普通与 SSE 流式），可配置首 token 延迟、生成速度、抖动、错误率、挂起概率与并发上限，
+用于在笔记本上确定性地测试 QwenChatAdapter、流水线的超时/回退逻辑，以及配合 ws_load 做压测，
+不需要真实的 llama.cpp / vLLM。
+
+默认监听 127.0.0.1:8001，与 app.yaml 中 language.qwen_local.base_url 一致，启动后服务端无需改配置。
+
+用法示例（在 server 目录下执行）：
+    python -m app.tools.stub_llm
+    python -m app.tools.stub_llm --ttft 0.8 --tokens-per-sec 25 --jitter 0.2
+    python -m app.tools.stub_llm --error-rate 0.1 --hang-prob 0.05 --max-concurrency 2 --seed 42
+    curl http://127.0.0.1:8001/stats
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_RESPONSE = "前方约两米处有一个人正在向你走来。你的左侧有一把椅子和一张桌子。请注意脚下，继续直行是安全的。"
+
+
+@dataclass
+class StubConfig:
+    ttft: float = 0.5                 # 首 token 延迟（秒，不含排队与预填充）
+    tokens_per_sec: float = 30.0      # 生成速度（token/秒），<=0 表示瞬间生成
+    prefill_tokens_per_sec: float = 0.0  # 预填充速度（prompt token/秒），>0 时首 token 延迟随 prompt 长度增加
+    jitter: float = 0.0               # 延迟抖动比例，实际延迟在 [1-jitter, 1+jitter] 倍之间均匀分布
+    error_rate: float = 0.0           # 返回错误的概率
+    error_status: int = 500           # 错误时的 HTTP 状态码
+    hang_prob: float = 0.0            # 挂起（不返回任何数据）的概率，用于触发客户端读取超时
+    hang_seconds: float = 3600.0      # 挂起时长（秒）
+    max_concurrency: int = 0          # 同时生成的请求数上限，超出的请求排队，<=0 表示不限
+    queue_limit: int = -1             # 排队上限，超出返回 503，<0 表示不限
+    response: str = DEFAULT_RESPONSE  # 生成的回复文本（每个汉字/字符视为一个 token）
+    seed: Optional[int] = None        # 随机种子，固定后错误/挂起/抖动序列可复现
+
+
+class StubState:
+    """运行时计数，供 /stats 查看"""
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.semaphore = asyncio.Semaphore(config.max_concurrency) if config.max_concurrency > 0 else None
+        self.in_flight = 0
+        self.queued = 0
+        self.counts: Dict[str, int] = {
+            "requests": 0, "stream": 0, "completed": 0, "errors": 0, "hangs": 0, "rejected": 0, "disconnected": 0,
+        }
+
+    def jittered(self, value: float) -> float:
+        if value <= 0 or self.config.jitter <= 0:
+            return max(0.0, value)
+        return value * self.rng.uniform(1 - self.config.jitter, 1 + self.config.jitter)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"in_flight": self.in_flight, "queued": self.queued, **self.counts, "config": asdict(self.config)}
+
+
+def _tokens(text: str, max_tokens: int) -> List[str]:
+    """按字符切分为 token（中文场景下近似一字一 token）"""
+    return list(text[:max_tokens]) if max_tokens > 0 else list(text)
+
+
+def _prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    return sum(len(str(m.get("content") or "")) for m in messages)
+
+
+def _error_response(status: int, message: str, error_type: str) -> JSONResponse:
+    return JSONResponse(status_code=status, content={"error": {"message": message, "type": error_type, "code": status}})
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="SeeForMe Stub LLM")
+    state = StubState(config)
+    app.state.stub = state
+
+    @app.get("/v1/models")
+    async def models() -> Dict[str, Any]:
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "seeforme"}]}
+
+    @app.get("/stats")
+    async def stats() -> Dict[str, Any]:
+        return state.snapshot()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        model = body.get("model") or "stub"
+        stream = bool(body.get("stream", False))
+        max_tokens = int(body.get("max_tokens") or 0)
+        state.counts["requests"] += 1
+        if stream:
+            state.counts["stream"] += 1
+
+        # 并发上限：超出的请求排队，排队也超限时直接拒绝
+        if state.semaphore is not None and state.semaphore.locked():
+            if 0 <= config.queue_limit <= state.queued:
+                state.counts["rejected"] += 1
+                return _error_response(503, "stub server overloaded", "server_overloaded")
+        state.queued += 1
+        try:
+            if state.semaphore is not None:
+                await state.semaphore.acquire()
+        finally:
+            state.queued -= 1
+
+        state.in_flight += 1
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                state.in_flight -= 1
+                if state.semaphore is not None:
+                    state.semaphore.release()
+
+        try:
+            roll = state.rng.random()
+            if roll < config.hang_prob:
+                state.counts["hangs"] += 1
+                await asyncio.sleep(config.hang_seconds)
+                release()
+                return _error_response(504, "stub hang elapsed", "timeout")
+            if roll < config.hang_prob + config.error_rate:
+                await asyncio.sleep(state.jittered(config.ttft))
+                state.counts["errors"] += 1
+                release()
+                return _error_response(config.error_status, "injected failure", "server_error")
+
+            prompt_tokens = _prompt_tokens(messages)
+            first_token_delay = state.jittered(config.ttft)
+            if config.prefill_tokens_per_sec > 0:
+                first_token_delay += state.jittered(prompt_tokens / config.prefill_tokens_per_sec)
+            tokens = _tokens(config.response, max_tokens)
+            token_interval = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            created = int(time.time())
+            usage = {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(tokens),
+                "total_tokens": prompt_tokens + len(tokens),
+            }
+        except BaseException:
+            release()
+            raise
+
+        if not stream:
+            try:
+                await asyncio.sleep(first_token_delay)
+                # 首 token 之后的 token 按生成速度逐个产出
+                await asyncio.sleep(sum(state.jittered(token_interval) for _ in tokens[1:]))
+                state.counts["completed"] += 1
+            except asyncio.CancelledError:
+                state.counts["disconnected"] += 1
+                raise
+            finally:
+                release()
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop" if len(tokens) == len(config.response) else "length",
+                }],
+                "usage": usage,
+            }
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def events():
+            try:
+                await asyncio.sleep(first_token_delay)
+                yield chunk({"role": "assistant", "content": ""})
+                for index, token in enumerate(tokens):
+                    if index > 0:
+                        await asyncio.sleep(state.jittered(token_interval))
+                    yield chunk({"content": token})
+                yield chunk({}, "stop" if len(tokens) == len(config.response) else "length")
+                yield "data: [DONE]\n\n"
+                state.counts["completed"] += 1
+            except asyncio.CancelledError:
+                state.counts["disconnected"] += 1
+                raise
+            finally:
+                release()
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的本地桩 LLM 服务（延迟与故障注入）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8001, help="监听端口（默认 8001，与 qwen_local 配置一致）")
+    parser.add_argument("--ttft", type=float, default=0.5, help="首 token 延迟（秒，默认 0.5）")
+    parser.add_argument("--tokens-per-sec", type=float, default=30.0, help="生成速度（token/秒，默认 30，<=0 表示瞬间生成）")
+    parser.add_argument("--prefill-tokens-per-sec", type=float, default=0.0,
+                        help="预填充速度（prompt token/秒，默认 0 表示不计预填充耗时）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟抖动比例（0~1，默认 0）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回错误的概率（默认 0）")
+    parser.add_argument("--error-status", type=int, default=500, help="错误时的 HTTP 状态码（默认 500）")
+    parser.add_argument("--hang-prob", type=float, default=0.0, help="请求挂起不返回的概率（默认 0）")
+    parser.add_argument("--hang-seconds", type=float, default=3600.0, help="挂起时长（秒，默认 3600）")
+    parser.add_argument("--max-concurrency", type=int, default=0, help="同时生成的请求数上限，超出排队（默认 0 不限）")
+    parser.add_argument("--queue-limit", type=int, default=-1, help="排队上限，超出返回 503（默认 -1 不限）")
+    parser.add_argument("--response", default=DEFAULT_RESPONSE, help="回复文本（每个字符视为一个 token）")
+    parser.add_argument("--seed", type=int, help="随机种子，固定后注入的故障与抖动序列可复现")
+    args = parser.parse_args(argv)
+    if not 0 <= args.error_rate + args.hang_prob <= 1:
+        parser.error("--error-rate 与 --hang-prob 之和必须在 0~1 之间")
+    if not 0 <= args.jitter < 1:
+        parser.error("--jitter 必须在 [0, 1) 之间")
+    return args
+
+
+def main(argv=None) -> int:
+    import uvicorn
+
+    args = parse_args(argv)
+    config = StubConfig(
+        ttft=args.ttft,
+        tokens_per_sec=args.tokens_per_sec,
+        prefill_tokens_per_sec=args.prefill_tokens_per_sec,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        hang_prob=args.hang_prob,
+        hang_seconds=args.hang_seconds,
+        max_concurrency=args.max_concurrency,
+        queue_limit=args.queue_limit,
+        response=args.response,
+        seed=args.seed,
+    )
+    print(f"桩 LLM 服务: http://{args.host}:{args.port}/v1/chat/completions", file=sys.stderr)
+    print(json.dumps(asdict(config), ensure_ascii=False), file=sys.stderr)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
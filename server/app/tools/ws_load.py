@@ -0,0 +1,404 @@
+"""
+WebSocket 压测工具
+模拟多个移动端同时连接 /ws 与 /ws/vision/{session_id}，按移动端真实消息格式发送图像与心跳，
+逐级提高并发数，统计每个客户端的首段文本耗时、最终结果耗时以及错误/限流比例，
+输出“延迟-并发”报告，用于评估单机在 p95 预算内能服务的并发用户数。
+
+- /ws：发送 {"eventType": "image_data", "data": {"imageData": base64, ...}, "sessionId": ...}，
+  并按间隔发送 {"eventType": "heartbeat"}（与移动端 CommunicationModule 一致）
+- /ws/vision/{session_id}：发送 {"image": base64}（或 --vision-binary 直接发送二进制 JPEG）
+- 每个客户端同一时刻只有一个未完成的请求（移动端在处理中不会再次拍照），
+  按 --rate 的间隔发送；上一张结果返回较晚时，下一张在结果返回后立即发送
+
+用法示例（在 server 目录下执行，需先启动服务器）：
+    python -m app.tools.ws_load --images captures/ --concurrency 1,2,4,8,16 --duration 30
+    python -m app.tools.ws_load --endpoint mixed --rate 0.5 --budget-ms 1500 -o load.json
+    python -m app.tools.ws_load --url ws://192.168.1.10:8000 --endpoint vision --vision-binary
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg"}
+ENDPOINTS = ("ws", "vision", "mixed")
+
+# 请求结果
+COMPLETED = "completed"
+SHED = "shed"            # 服务端准入控制拒绝（code=OVERLOADED）
+ERROR = "error"
+TIMEOUT = "timeout"
+
+
+@dataclass
+class RequestRecord:
+    sent_at: float
+    first_text_at: Optional[float] = None
+    final_at: Optional[float] = None
+    outcome: Optional[str] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def finish(self, outcome: str) -> None:
+        if self.outcome is None:
+            self.outcome = outcome
+            self.final_at = time.monotonic()
+            self.done.set()
+
+
+@dataclass
+class ClientStats:
+    client: int
+    endpoint: str
+    connected: bool = False
+    connect_error: Optional[str] = None
+    requests: List[RequestRecord] = field(default_factory=list)
+    heartbeat_rtts: List[float] = field(default_factory=list)
+
+
+def load_images(path: Optional[str], count: int) -> List[str]:
+    """读取 JPEG 目录并 base64 编码；未指定目录时生成与移动端压缩参数一致的合成图像"""
+    images: List[bytes] = []
+    if path:
+        files = sorted(p for p in Path(path).rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+        if not files:
+            raise SystemExit(f"目录中没有 JPEG 图像: {path}")
+        images = [p.read_bytes() for p in files]
+    else:
+        from app.benchmarks.common import encode_jpeg, synthetic_image
+        # 移动端上传前压缩为最大 1920x1080、质量 0.7 的 JPEG
+        images = [encode_jpeg(synthetic_image(1920, 1080, seed=i), quality=70) for i in range(count)]
+    return [base64.b64encode(data).decode("ascii") for data in images]
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "p50": round(pick(0.5), 1),
+        "p95": round(pick(0.95), 1),
+        "p99": round(pick(0.99), 1),
+        "max": round(ordered[-1], 1),
+    }
+
+
+class LoadClient:
+    """一个模拟移动端：单连接、同一时刻最多一个未完成请求、独立的心跳"""
+
+    def __init__(self, index: int, endpoint: str, images: List[str], args: argparse.Namespace):
+        self.index = index
+        self.endpoint = endpoint
+        self.images = images
+        self.args = args
+        self.session_id = f"load_{uuid.uuid4().hex[:8]}_{index}"
+        self.stats = ClientStats(client=index, endpoint=endpoint)
+        self._current: Optional[RequestRecord] = None
+        self._heartbeat_sent: List[float] = []
+
+    @property
+    def url(self) -> str:
+        base = self.args.url.rstrip("/")
+        if self.endpoint == "ws":
+            return f"{base}/ws"
+        return f"{base}/ws/vision/{self.session_id}"
+
+    def _image_message(self, image_b64: str):
+        now_ms = int(time.time() * 1000)
+        if self.endpoint == "ws":
+            return json.dumps({
+                "eventType": self.args.event_type,
+                "data": {
+                    "imageData": image_b64,
+                    "sessionId": self.session_id,
+                    "timestamp": now_ms,
+                    "format": "base64",
+                    "compression": True,
+                },
+                "timestamp": now_ms,
+                "sessionId": self.session_id,
+            })
+        if self.args.vision_binary:
+            return base64.b64decode(image_b64)
+        return json.dumps({"image": image_b64})
+
+    def _on_message(self, raw) -> None:
+        if isinstance(raw, bytes):
+            return
+        message = json.loads(raw)
+        now = time.monotonic()
+        if self.endpoint == "ws":
+            kind = message.get("eventType")
+            data = message.get("data") or {}
+        else:
+            kind = message.get("type")
+            data = message
+
+        if kind == "pong":
+            if self._heartbeat_sent:
+                self.stats.heartbeat_rtts.append((now - self._heartbeat_sent.pop(0)) * 1000)
+            return
+
+        request = self._current
+        if request is None or request.outcome is not None:
+            return
+        if kind == "text_stream":
+            if request.first_text_at is None:
+                request.first_text_at = now
+        elif kind == "final_result":
+            if request.first_text_at is None:
+                request.first_text_at = now
+            request.finish(COMPLETED)
+        elif kind == "error":
+            request.finish(SHED if data.get("code") == "OVERLOADED" else ERROR)
+
+    async def _reader(self, ws) -> None:
+        try:
+            async for raw in ws:
+                self._on_message(raw)
+        finally:
+            # 连接断开时结束未完成的请求
+            if self._current is not None:
+                self._current.finish(ERROR)
+
+    async def _heartbeat(self, ws) -> None:
+        while True:
+            await asyncio.sleep(self.args.heartbeat_interval)
+            now_ms = int(time.time() * 1000)
+            self._heartbeat_sent.append(time.monotonic())
+            await ws.send(json.dumps({"eventType": "heartbeat", "data": {"timestamp": now_ms}, "timestamp": now_ms}))
+
+    async def run(self, start_delay: float, deadline: float) -> ClientStats:
+        import websockets
+
+        await asyncio.sleep(start_delay)
+        try:
+            ws = await websockets.connect(self.url, max_size=None, open_timeout=self.args.connect_timeout)
+        except Exception as e:
+            self.stats.connect_error = f"{type(e).__name__}: {e}"
+            return self.stats
+
+        self.stats.connected = True
+        reader = asyncio.create_task(self._reader(ws))
+        heartbeat = asyncio.create_task(self._heartbeat(ws)) if self.endpoint == "ws" and self.args.heartbeat_interval > 0 else None
+        interval = 1.0 / self.args.rate
+        # 各客户端的发送时刻错开，避免所有请求同时到达
+        next_send = time.monotonic() + random.uniform(0, interval)
+        image_index = self.index
+        try:
+            while True:
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if time.monotonic() >= deadline or reader.done():
+                    break
+
+                request = RequestRecord(sent_at=time.monotonic())
+                self._current = request
+                self.stats.requests.append(request)
+                await ws.send(self._image_message(self.images[image_index % len(self.images)]))
+                image_index += 1
+                try:
+                    await asyncio.wait_for(request.done.wait(), timeout=self.args.request_timeout)
+                except asyncio.TimeoutError:
+                    request.finish(TIMEOUT)
+                next_send = max(next_send + interval, time.monotonic())
+        except Exception as e:
+            if self._current is not None:
+                self._current.finish(ERROR)
+            self.stats.connect_error = self.stats.connect_error or f"{type(e).__name__}: {e}"
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+            await ws.close()
+            reader.cancel()
+        return self.stats
+
+
+def summarize_level(concurrency: int, duration: float, clients: List[ClientStats]) -> Dict[str, Any]:
+    requests = [r for c in clients for r in c.requests]
+    counts = {outcome: sum(1 for r in requests if r.outcome == outcome) for outcome in (COMPLETED, SHED, ERROR, TIMEOUT)}
+    total = len(requests)
+    completed = [r for r in requests if r.outcome == COMPLETED]
+
+    def client_summary(c: ClientStats) -> Dict[str, Any]:
+        done = [r for r in c.requests if r.outcome == COMPLETED]
+        return {
+            "client": c.client,
+            "endpoint": c.endpoint,
+            "connected": c.connected,
+            "connect_error": c.connect_error,
+            "requests": len(c.requests),
+            **{outcome: sum(1 for r in c.requests if r.outcome == outcome) for outcome in (COMPLETED, SHED, ERROR, TIMEOUT)},
+            "time_to_first_text_p95_ms": percentiles([(r.first_text_at - r.sent_at) * 1000 for r in done])["p95"],
+            "time_to_final_p95_ms": percentiles([(r.final_at - r.sent_at) * 1000 for r in done])["p95"],
+        }
+
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(duration, 2),
+        "connect_failures": sum(1 for c in clients if not c.connected),
+        "requests": total,
+        **counts,
+        "shed_rate": counts[SHED] / total if total else 0.0,
+        "error_rate": (counts[ERROR] + counts[TIMEOUT]) / total if total else 0.0,
+        "throughput_rps": round(counts[COMPLETED] / duration, 3) if duration > 0 else 0.0,
+        "time_to_first_text_ms": percentiles([(r.first_text_at - r.sent_at) * 1000 for r in completed]),
+        "time_to_final_ms": percentiles([(r.final_at - r.sent_at) * 1000 for r in completed]),
+        "heartbeat_rtt_ms": percentiles([rtt for c in clients for rtt in c.heartbeat_rtts]),
+        "clients": [client_summary(c) for c in clients],
+    }
+
+
+async def run_level(concurrency: int, images: List[str], args: argparse.Namespace) -> Dict[str, Any]:
+    clients = []
+    for i in range(concurrency):
+        endpoint = args.endpoint if args.endpoint != "mixed" else ("ws" if i % 2 == 0 else "vision")
+        clients.append(LoadClient(i, endpoint, images, args))
+
+    start = time.monotonic()
+    deadline = start + args.ramp + args.duration
+    results = await asyncio.gather(*(
+        client.run(args.ramp * i / concurrency, deadline) for i, client in enumerate(clients)
+    ))
+    return summarize_level(concurrency, time.monotonic() - start, list(results))
+
+
+def print_report(levels: List[Dict[str, Any]], budget_ms: Optional[float]) -> None:
+    header = (
+        f"{'并发':>6} {'请求':>6} {'完成':>6} {'限流%':>7} {'错误%':>7} {'吞吐/s':>8} "
+        f"{'首段p50':>9} {'首段p95':>9} {'最终p50':>9} {'最终p95':>9} {'最终p99':>9}"
+    )
+    sys.stderr.write(header + "\n")
+    for level in levels:
+        first = level["time_to_first_text_ms"]
+        final = level["time_to_final_ms"]
+
+        def fmt(value: Optional[float]) -> str:
+            return f"{value:9.0f}" if value is not None else f"{'-':>9}"
+
+        over = budget_ms is not None and (final["p95"] is None or final["p95"] > budget_ms)
+        sys.stderr.write(
+            f"{level['concurrency']:>6} {level['requests']:>6} {level[COMPLETED]:>6} "
+            f"{level['shed_rate'] * 100:>7.1f} {level['error_rate'] * 100:>7.1f} {level['throughput_rps']:>8.2f} "
+            f"{fmt(first['p50'])} {fmt(first['p95'])} {fmt(final['p50'])} {fmt(final['p95'])} {fmt(final['p99'])}"
+            f"{'  超出预算' if over else ''}\n"
+        )
+
+
+def capacity(levels: List[Dict[str, Any]], budget_ms: Optional[float], max_error_rate: float) -> Dict[str, Any]:
+    """p95 最终耗时不超过预算、且错误+限流比例不超过阈值的最大并发数"""
+    if budget_ms is None:
+        return {}
+    within = [
+        level["concurrency"] for level in levels
+        if level["time_to_final_ms"]["p95"] is not None
+        and level["time_to_final_ms"]["p95"] <= budget_ms
+        and level["error_rate"] + level["shed_rate"] <= max_error_rate
+    ]
+    return {
+        "budget_ms": budget_ms,
+        "max_error_rate": max_error_rate,
+        "max_concurrency_within_budget": max(within) if within else 0,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    images = load_images(args.images, args.synthetic_count)
+    levels = []
+    for index, concurrency in enumerate(args.concurrency):
+        if index > 0 and args.cooldown > 0:
+            await asyncio.sleep(args.cooldown)
+        sys.stderr.write(f"并发 {concurrency}：运行 {args.duration:.0f}s ...\n")
+        levels.append(await run_level(concurrency, images, args))
+
+    print_report(levels, args.budget_ms)
+    report = {
+        "tool": "ws_load",
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "url": args.url,
+            "endpoint": args.endpoint,
+            "event_type": args.event_type,
+            "vision_binary": args.vision_binary,
+            "rate_per_client": args.rate,
+            "duration_s": args.duration,
+            "ramp_s": args.ramp,
+            "request_timeout_s": args.request_timeout,
+            "heartbeat_interval_s": args.heartbeat_interval,
+            "images": len(images),
+            "image_source": os.path.abspath(args.images) if args.images else "synthetic",
+        },
+        "levels": levels,
+        "capacity": capacity(levels, args.budget_ms, args.max_error_rate),
+    }
+    if report["capacity"]:
+        sys.stderr.write(
+            f"p95 预算 {args.budget_ms:.0f}ms 内的最大并发: {report['capacity']['max_concurrency_within_budget']}\n"
+        )
+    return report
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="模拟多个移动端的 WebSocket 压测工具（延迟-并发报告）")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000", help="服务器地址（默认 ws://127.0.0.1:8000）")
+    parser.add_argument("--endpoint", choices=ENDPOINTS, default="ws",
+                        help="压测端点：ws=/ws，vision=/ws/vision/{session_id}，mixed=两者各半（默认 ws）")
+    parser.add_argument("--images", help="JPEG 图像目录（默认生成 1080p 合成图像）")
+    parser.add_argument("--synthetic-count", type=int, default=4, help="未指定目录时生成的合成图像数量")
+    parser.add_argument("--concurrency", default="1,2,4,8",
+                        type=lambda s: [int(x) for x in s.split(",") if x],
+                        help="逐级测试的并发客户端数，逗号分隔（默认 1,2,4,8）")
+    parser.add_argument("--rate", type=float, default=0.5, help="每个客户端每秒发送的图像数（默认 0.5，即每 2 秒一张）")
+    parser.add_argument("--duration", type=float, default=30.0, help="每级持续秒数（默认 30）")
+    parser.add_argument("--ramp", type=float, default=2.0, help="每级内客户端依次建立连接的时间窗口（秒，默认 2）")
+    parser.add_argument("--cooldown", type=float, default=3.0, help="两级之间的间隔秒数（默认 3）")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="单个请求等待最终结果的超时（秒，默认 30）")
+    parser.add_argument("--connect-timeout", type=float, default=10.0, help="建立连接的超时（秒，默认 10）")
+    parser.add_argument("--heartbeat-interval", type=float, default=30.0,
+                        help="/ws 心跳间隔（秒，默认 30，与移动端一致；0 表示不发送）")
+    parser.add_argument("--event-type", choices=["image_data", "image_analysis"], default="image_data",
+                        help="/ws 图像消息的 eventType（默认 image_data）")
+    parser.add_argument("--vision-binary", action="store_true", help="/ws/vision 直接发送二进制 JPEG（默认 JSON base64）")
+    parser.add_argument("--budget-ms", type=float, help="p95 最终结果耗时预算（毫秒），报告满足预算的最大并发")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="满足预算时允许的错误+限流比例（默认 0.01）")
+    parser.add_argument("-o", "--output", help="报告 JSON 输出路径（默认打印到标准输出）")
+    args = parser.parse_args(argv)
+    if args.rate <= 0:
+        parser.error("--rate 必须大于 0")
+    if not args.concurrency or min(args.concurrency) <= 0:
+        parser.error("--concurrency 必须是正整数列表")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        report = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        return 130
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        sys.stderr.write(f"报告已写入 {args.output}\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
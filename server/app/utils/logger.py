@@ -1,9 +1,234 @@
-"""日志配置占位。"""
+"""
+日志配置
 
+- 非阻塞输出：根 logger 只挂一个 QueueHandler，记录放入有界队列后立即返回，由后台线程（QueueListener）写 stdout，
+  避免 Docker 下 stdout 写阻塞事件循环；队列满时丢弃记录并计入 seeforme_log_records_dropped_total
+- 结构化：format=json 时每条记录输出一行 JSON，携带 session_id、阶段耗时等字段（通过 log_extra() 传入）
+- 逐帧日志采样：标记为逐帧（log_extra(per_frame=True)）的 INFO/DEBUG 记录按 logger 名称前缀采样，
+  WARNING 及以上始终输出
+- 预派生多进程：fork 后子进程重新创建队列和后台线程（父进程的后台线程不会被复制到子进程）
+"""
+
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+from ..core.metrics import get_metrics_registry
+
+_LOG_DROPPED = get_metrics_registry().counter(
+    "seeforme_log_records_dropped_total", "日志队列已满而丢弃的记录数"
+)
+
+# uvicorn 自带 StreamHandler（同步写 stdout），统一改为经由根 logger 输出
+_UVICORN_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access")
 
 
 def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(name)
 
 
+def log_extra(session_id: Optional[str] = None, per_frame: bool = False, **fields: Any) -> Dict[str, Any]:
+    """
+    构造 logger 调用的 extra 参数
+
+    Args:
+        session_id: 会话 ID（JSON 格式中输出为 session_id 字段）
+        per_frame: 是否为逐帧日志（每处理一张图像都会打印），受采样率控制
+        **fields: 其他结构化字段，如各阶段耗时 vision_time=0.05
+
+    示例：
+        logger.info("视觉检测完成", extra=log_extra(session_id, per_frame=True, vision_time=0.05))
+    """
+    extra: Dict[str, Any] = {"per_frame": per_frame}
+    if session_id is not None:
+        extra["session_id"] = session_id
+    if fields:
+        extra["fields"] = fields
+    return extra
+
+
+def _iso_time(record: logging.LogRecord) -> str:
+    return datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds")
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录输出一行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": _iso_time(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "msg": record.getMessage(),
+        }
+        session_id = getattr(record, "session_id", None)
+        if session_id is not None:
+            payload["session_id"] = session_id
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            payload.setdefault(key, value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """可读文本格式，结构化字段以 key=value 追加在消息之后"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        message = super().formatMessage(record)
+        parts = []
+        session_id = getattr(record, "session_id", None)
+        if session_id is not None:
+            parts.append(f"session={session_id}")
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            parts.append(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}")
+        return f"{message} | {' '.join(parts)}" if parts else message
+
+
+class PerFrameSampler(logging.Filter):
+    """
+    逐帧日志采样：按 logger 名称最长前缀匹配采样率，每 1/rate 条保留一条（计数采样，结果确定）
+    """
+
+    def __init__(self, default_rate: float = 1.0, rates: Optional[Dict[str, float]] = None):
+        super().__init__()
+        self.default_rate = default_rate
+        # 前缀越长越优先
+        self.rates = sorted((rates or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self._strides: Dict[str, int] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _stride(self, name: str) -> int:
+        stride = self._strides.get(name)
+        if stride is None:
+            rate = self.default_rate
+            for prefix, prefix_rate in self.rates:
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = prefix_rate
+                    break
+            # 0 表示逐帧日志全部丢弃
+            stride = 0 if rate <= 0 else max(1, round(1 / min(rate, 1.0)))
+            self._strides[name] = stride
+        return stride
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not getattr(record, "per_frame", False):
+            return True
+        stride = self._stride(record.name)
+        if stride <= 1:
+            return stride == 1
+        with self._lock:
+            count = self._counters.get(record.name, 0)
+            self._counters[record.name] = count + 1
+        return count % stride == 0
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """队列满时丢弃记录而不是阻塞调用方（事件循环）"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 在调用线程中合并消息参数并格式化异常堆栈（其引用的对象可能随后被修改），保留 extra 字段
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _LOG_DROPPED.inc()
+
+
+def _get_settings():
+    """延迟导入配置，避免循环导入"""
+    from ..core.config import settings
+    return settings
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_output_handler: Optional[logging.Handler] = None
+
+
+def setup_logging(config=None) -> None:
+    """
+    按配置初始化日志（可重复调用，后一次覆盖前一次）
+
+    Args:
+        config: LoggingConfig，None 表示使用 app.yaml 中的 logging 配置
+    """
+    global _listener, _queue_handler, _output_handler
+    config = config or _get_settings().logging
+    shutdown_logging()
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if config.FORMAT.lower() == "json" else TextFormatter())
+    _output_handler = output
+
+    if config.ASYNC:
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=max(0, config.QUEUE_SIZE)))
+        _listener = QueueListener(_queue_handler.queue, output)
+        _listener.start()
+        handler: logging.Handler = _queue_handler
+    else:
+        handler = output
+    handler.addFilter(PerFrameSampler(config.PER_FRAME_SAMPLE_RATE, config.SAMPLING))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, config.LEVEL.upper(), logging.INFO))
+
+    for name in _UVICORN_LOGGERS:
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+    if not config.ACCESS_LOG:
+        logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
+
+
+def shutdown_logging() -> None:
+    """停止后台写线程（会先写完队列中剩余的记录）"""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+
+
+def _reinit_after_fork() -> None:
+    """
+    fork 后的子进程中没有父进程的后台写线程，且旧队列的内部锁可能处于被持有状态：
+    换用新队列并重新启动写线程
+    """
+    global _listener
+    if _queue_handler is None or _listener is None:
+        return
+    _queue_handler.queue = queue.Queue(maxsize=_queue_handler.queue.maxsize)
+    _listener = QueueListener(_queue_handler.queue, _output_handler)
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+atexit.register(shutdown_logging)